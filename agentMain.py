@@ -1,256 +1,412 @@
+import os
 import time
-import re
+import logging
 from agents import Runner, ItemHelpers
 from openai.types.responses import ResponseTextDeltaEvent, ResponseTextAnnotationDeltaEvent
 from agent_modules.reportsAgent import create_reports_agent
 from agent_modules.communityAgent import community_pricing_agent, PricingAgentContext as CommunityAgentContext
 from agent_modules.knowledgeBaseAgent import KnowledgeBaseAgent
+from helpers.stream_helpers import stream_sections_concurrently, stream_sections_sequentially
+from helpers.deadline import Deadline, run_with_deadline, stream_with_deadline
+from helpers.knowledge_base_helper import get_default_namespaces
+from helpers.embedding_service import RequestEmbeddings, get_embedding_model
+from helpers.source_router import RoutingDecision, get_source_router, log_routing_decision
+from helpers.answer_cache import get_answer_cache, record_events, replay_events
+from helpers.stream_events import Citation, TextDelta, Annotation, Completion
+from helpers.warm_runtime import get_runtime
+from helpers.request_metrics import get_timeline
 
-async def stream_agent_response(prompt: str, user_id: str = "system"):
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Run the reports, community and knowledge base sections at the same time
+CONCURRENT_AGENT_SECTIONS = os.getenv("CONCURRENT_AGENT_SECTIONS", "true").lower() == "true"
+
+# Section titles used in "partial results" notices
+SECTION_LABELS = {
+    "reports": "Expert reports",
+    "community": "Community knowledge",
+    "kb": "Knowledge base",
+}
+
+def partial_results_notice(source: str):
+    """Build the text event emitted when a section runs out of time."""
+    label = SECTION_LABELS.get(source, source)
+    return TextDelta(f"\n\n⏱️ Partial results: {label} took too long and was cut short.\n\n")
+
+def cancel_streamed_run(result):
+    """Cancel a streamed agent run that is still in progress."""
+    if result is None or getattr(result, "is_complete", True):
+        return
+    cancel = getattr(result, "cancel", None)
+    if callable(cancel):
+        cancel()
+
+def track_tool_latency(source: str, event, tool_started):
+    """
+    Record agent tool latency from stream events.
+
+    Covers hosted tools (FileSearch: in_progress -> completed raw events)
+    and function tools (tool_called -> tool_output run items).
+
+    Args:
+        source: Section name used as the span prefix
+        event: Agent stream event
+        tool_started: perf_counter() when the pending tool call started, or None
+
+    Returns:
+        The start time of the tool call now in progress, or None
+    """
+    if event.type == "raw_response_event":
+        kind = event.data.type
+    elif event.type == "run_item_stream_event":
+        kind = event.name
+    else:
+        return tool_started
+
+    if kind in ("response.file_search_call.in_progress", "tool_called"):
+        return time.perf_counter()
+    if kind in ("response.file_search_call.completed", "tool_output") and tool_started is not None:
+        get_timeline().record(f"{source}.tool", (time.perf_counter() - tool_started) * 1000)
+        return None
+    return tool_started
+
+def section_error(message: str):
+    """Build the text event for a section error (marked so it is never cached)."""
+    return TextDelta(message, error=True)
+
+async def embed_prompt(prompt: str, embeddings: RequestEmbeddings, deadline: Deadline):
     """
-    Stream responses from reports, community, and knowledge base agents sequentially.
-    Runs reports agent first, then community agent, then knowledge base agent, streaming responses as they come.
-    
+    Embed the prompt once for routing, the answer cache and the KB search.
+
     Args:
         prompt: The user's pricing question
-        user_id: The ID of the user making the request (for knowledge base access control)
-        
+        embeddings: Request-scoped embedding service
+        deadline: Overall request deadline
+
+    Returns:
+        The prompt embedding, or None if it could not be computed in time
+    """
+    try:
+        return await embeddings.embed_for(prompt, "router", deadline=deadline.for_call("embedding"))
+    except Exception as e:
+        logger.warning(f"Error embedding prompt: {e}")
+        return None
+
+def route_sources(embedding) -> RoutingDecision:
+    """
+    Decide which sources to run for a prompt.
+
+    Scores the prompt embedding against the local source router vectors
+    (no extra LLM call). Falls back to running every source when the
+    router is unavailable or there is no embedding.
+
+    Args:
+        embedding: Prompt embedding, or None if it could not be computed
+
+    Returns:
+        RoutingDecision with the sources to run
+    """
+    router = get_source_router()
+    if router is None:
+        return RoutingDecision.run_everything("router_unavailable")
+    if router.model != get_embedding_model("router"):
+        return RoutingDecision.run_everything("router_model_mismatch")
+    if embedding is None:
+        return RoutingDecision.run_everything("embedding_failed")
+
+    return router.route(embedding)
+
+async def stream_reports_section(prompt: str):
+    """
+    Stream the expert reports section.
+
+    Args:
+        prompt: The user's pricing question
+
     Yields:
-        Events containing text deltas, annotations, status updates, or completion signals
-        
-    Format:
-    - Text deltas: {"type": "text_delta", "data": "text content"}
-    - Annotations: {"type": "annotation", "data": {"type": "citation", "citation": {...}}}
-    - Completion: {"type": "completion", "data": None}
-    
-    Universal Citation Format:
-    {
-        "id": "unique-id",           # File ID, topic ID, or generated ID
-        "title": "Document Title",   # Document title with source prefix
-        "source": "report|community|kb", # Source of the citation
-        "url": "optional-url",       # URL for community posts or KB entries (optional)
-        "content": "optional-content", # Preview content if available (optional)
-        "metadata": {}               # Additional source-specific metadata (optional)
-    }
+        Text delta and annotation events for the reports section
     """
-    print(f"Processing query: {prompt}")
-    
-    # Send initial status message
-    yield {"type": "text_delta", "data": "🔍 Processing your question...\n\n"}
-    
-    # Run reports agent first
+    timeline = get_timeline()
+    reports_result = None
+    tool_started = None
     try:
         # Start reports agent with markdown header
-        yield {"type": "text_delta", "data": "\n\n## 📊 INSIGHTS FROM EXPERT REPORTS\n\n"}
-        
-        # Create and run the reports agent with streaming
-        reports_agent = create_reports_agent()
+        yield TextDelta("\n\n## 📊 INSIGHTS FROM EXPERT REPORTS\n\n")
+
+        # Run the reports agent with streaming (the agent is kept warm across invocations)
+        reports_agent = get_runtime().get("reports_agent", create_reports_agent)
         reports_result = Runner.run_streamed(reports_agent, prompt)
-        
+
         # Process the streaming events from reports agent
         async for event in reports_result.stream_events():
+            tool_started = track_tool_latency("reports", event, tool_started)
+
             # Handle annotation events
             if event.type == "raw_response_event" and event.data.type == "response.output_text.annotation.added":
                 # Format annotation for the UI client using universal format
-                annotation = event.data.annotation
-                
-                # Debug: Print raw report annotation
-                print(f"Raw report annotation: {annotation}")
-                
-                # Extract fields with proper fallbacks
-                citation_id = getattr(annotation, "file_id", f"report-{time.time()}")
-                citation_title = getattr(annotation, 'filename', 'Expert Report')
-                
-                # Ensure we have a valid ID
-                if not citation_id:
-                    citation_id = f"report-{time.time()}"
-                
-                formatted_annotation = {
-                    "type": "citation",
-                    "citation": {
-                        "id": citation_id,
-                        "title": f"[Report] {citation_title}",
-                        "source": "report",
-                        "content": getattr(annotation, 'content', ''),
-                        "metadata": {
-                            "original_type": "file_citation",
-                            "file_id": citation_id
-                        }
-                    }
-                }
-                
-                # Debug: Print formatted report annotation
-                print(f"Formatted report annotation: {formatted_annotation}")
-                
-                yield {"type": "annotation", "data": formatted_annotation}
+                yield Annotation(Citation.from_report_annotation(event.data.annotation))
 
             # Handle text delta events
-            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):  
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
                 if event.data.type == "response.output_text.delta":
-                    # Normalize text to prevent excessive newlines
-                    delta_text = event.data.delta
-                    # Replace 3 or more consecutive newlines with just 2
-                    delta_text = re.sub(r'\n{3,}', '\n\n', delta_text)
-                    yield {"type": "text_delta", "data": delta_text}
+                    timeline.mark("reports.first_token")
+                    # Excess newlines are collapsed once, when the frame is encoded
+                    yield TextDelta(event.data.delta)
                 elif event.data.type == "response.completion":
                     # Reports agent completed
-                    yield {"type": "text_delta", "data": "\n\n---\n\n"}  # Add separator between agents
-                    yield {"type": "text_delta", "data": "   ✅ Expert reports analysis complete\n\n"}
-            
+                    yield TextDelta("\n\n---\n\n")  # Add separator between agents
+                    yield TextDelta("   ✅ Expert reports analysis complete\n\n")
+
     except Exception as e:
-        print(f"Error during reports execution: {e}")
-        yield {"type": "text_delta", "data": f"\n⚠️ Error retrieving reports: {str(e)}\n\n"}
-    
-    # Then run community agent
+        logger.error(f"Error during reports execution: {e}")
+        yield section_error(f"\n⚠️ Error retrieving reports: {str(e)}\n\n")
+    finally:
+        timeline.mark("reports.done")
+        # Stop the agent run if the section was cancelled (e.g. its deadline passed)
+        cancel_streamed_run(reports_result)
+
+async def stream_community_section(prompt: str, embeddings: RequestEmbeddings = None):
+    """
+    Stream the community knowledge section.
+
+    Args:
+        prompt: The user's pricing question
+        embeddings: Request-scoped embedding service shared with the other sections
+
+    Yields:
+        Text delta and annotation events for the community section
+    """
+    timeline = get_timeline()
+    community_result = None
+    tool_started = None
     try:
         # Start community agent with markdown header
-        yield {"type": "text_delta", "data": "\n\n## 📚 COMMUNITY KNOWLEDGE\n\n"}
-        
+        yield TextDelta("\n\n## 📚 COMMUNITY KNOWLEDGE\n\n")
+
         # Create and run the community agent with streaming
-        community_context = CommunityAgentContext()
+        community_context = CommunityAgentContext(embeddings=embeddings)
         community_result = Runner.run_streamed(
             community_pricing_agent,
             [{"content": prompt, "role": "user"}],
             context=community_context
         )
-        
+
         # Process the streaming events from community agent
         async for event in community_result.stream_events():
+            tool_started = track_tool_latency("community", event, tool_started)
+
             # Handle annotation events
             if event.type == "raw_response_event" and event.data.type == "response.output_text.annotation.added":
                 # Format annotation for the UI client using universal format
-                annotation = event.data.annotation
-                
-                # Debug: Print raw community annotation
-                print(f"Raw community annotation: {annotation}")
-                
-                # Extract fields with proper fallbacks
-                post_id = getattr(annotation, "post_id", "")
-                topic_id = getattr(annotation, "topic_id", getattr(annotation, "file_id", f"community-{time.time()}"))
-                citation_title = getattr(annotation, 'title', getattr(annotation, 'filename', 'Community Post'))
-                citation_url = getattr(annotation, "discourse_url", getattr(annotation, "url", ""))
-                
-                # Ensure we have a valid ID
-                if not topic_id:
-                    topic_id = f"community-{time.time()}"
-                
-                formatted_annotation = {
-                    "type": "citation",
-                    "citation": {
-                        "id": topic_id,
-                        "title": f"[Community] {citation_title}",
-                        "source": "community",
-                        "url": citation_url,
-                        "content": getattr(annotation, 'content', ''),
-                        "metadata": {
-                            "original_type": "post_citation",
-                            "post_id": post_id,
-                            "topic_id": topic_id
-                        }
-                    }
-                }
-                
-                # Debug: Print formatted community annotation
-                print(f"Formatted community annotation: {formatted_annotation}")
-                
-                yield {"type": "annotation", "data": formatted_annotation}
+                yield Annotation(Citation.from_community_annotation(event.data.annotation))
 
             # Handle text delta events
-            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):  
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
                 if event.data.type == "response.output_text.delta":
-                    # Normalize text to prevent excessive newlines
-                    delta_text = event.data.delta
-                    # Replace 3 or more consecutive newlines with just 2
-                    delta_text = re.sub(r'\n{3,}', '\n\n', delta_text)
-                    yield {"type": "text_delta", "data": delta_text}
+                    timeline.mark("community.first_token")
+                    # Excess newlines are collapsed once, when the frame is encoded
+                    yield TextDelta(event.data.delta)
                 elif event.data.type == "response.completion":
                     # Community agent completed
-                    yield {"type": "text_delta", "data": "\n\n"}
-                    yield {"type": "text_delta", "data": "   ✅ Community knowledge search complete\n\n"}
-        
+                    yield TextDelta("\n\n")
+                    yield TextDelta("   ✅ Community knowledge search complete\n\n")
+
         # Check for annotations stored in the context and yield them
         if hasattr(community_context, 'annotations') and community_context.annotations:
-            print(f"Found {len(community_context.annotations)} annotations in community context")
+            logger.debug("Found %d annotations in community context", len(community_context.annotations))
             for annotation_data in community_context.annotations:
                 # Format annotation for the UI client using universal format
-                topic_id = annotation_data.get("topic_id", f"community-{time.time()}")
-                title = annotation_data.get("title", "Community Post")
-                url = annotation_data.get("url", "")
-                
-                formatted_annotation = {
-                    "type": "citation",
-                    "citation": {
-                        "id": topic_id,
-                        "title": f"[Community] {title}",
-                        "source": "community",
-                        "url": url,
-                        "content": annotation_data.get("content", ""),
-                        "metadata": {
-                            "original_type": "post_citation",
-                            "topic_id": topic_id
-                        }
-                    }
-                }
-                
-                print(f"Yielding community context annotation: {formatted_annotation}")
-                yield {"type": "annotation", "data": formatted_annotation}
-                
-        # Run Knowledge Base Agent
-        try:
-            # Start Knowledge Base Agent with markdown header
-            yield {"type": "text_delta", "data": "\n\n## 📚 INSIGHTS FROM KNOWLEDGE BASE\n\n"}
-            
-            # Initialize Knowledge Base Agent
-            kb_agent = KnowledgeBaseAgent()
-            
-            # Create a simple context with user_id
-            from openai_agents import AgentContext, State
-            kb_context = AgentContext(state=State({"user_id": user_id}))
-            
-            # Process the query with the Knowledge Base Agent
-            kb_response = await kb_agent.process_query(prompt, kb_context)
-            
-            # Handle results
-            if kb_response.get("results"):
-                # Process each result
-                for result in kb_response.get("results", []):
-                    content = result.get("content", "")
-                    citation_id = result.get("citation")
-                    
-                    # Yield the content
-                    yield {"type": "text_delta", "data": content + "\n\n"}
-                    
-                # Process citations
-                for citation in kb_response.get("citations", []):
-                    formatted_annotation = {
-                        "type": "citation",
-                        "citation": {
-                            "id": citation.get("id"),
-                            "title": f"[Knowledge Base] {citation.get('title')}",
-                            "source": "kb",
-                            "url": citation.get("url", ""),
-                            "content": citation.get("content", ""),
-                            "metadata": {
-                                "original_type": "kb_citation",
-                                "entry_id": citation.get("id")
-                            }
-                        }
-                    }
-                    
-                    yield {"type": "annotation", "data": formatted_annotation}
-            else:
-                yield {"type": "text_delta", "data": "No relevant knowledge base entries found for this query.\n\n"}
-                
-            yield {"type": "text_delta", "data": "   ✅ Knowledge base search complete\n\n"}
-                
-        except Exception as e:
-            print(f"Error during knowledge base execution: {e}")
-            yield {"type": "text_delta", "data": f"\n⚠️ Error accessing knowledge base: {str(e)}\n\n"}
-        
+                yield Annotation(Citation.from_topic_citation(annotation_data))
+
+        # The agent still answers after a failed or timed-out search; say so,
+        # and mark the section so the degraded answer is not cached
+        if community_context.search_error:
+            yield section_error(f"\n⚠️ Community search incomplete: {community_context.search_error}\n\n")
+
+    except Exception as e:
+        logger.error(f"Error during community execution: {e}")
+        yield section_error(f"\n⚠️ Error retrieving community knowledge: {str(e)}\n\n")
+    finally:
+        timeline.mark("community.done")
+        # Stop the agent run if the section was cancelled (e.g. its deadline passed)
+        cancel_streamed_run(community_result)
+
+async def stream_knowledge_base_section(prompt: str, user_id: str = "system", embeddings: RequestEmbeddings = None):
+    """
+    Stream the knowledge base section.
+
+    Args:
+        prompt: The user's pricing question
+        user_id: The ID of the user making the request (for knowledge base access control)
+        embeddings: Request-scoped embedding service shared with the other sections
+
+    Yields:
+        Text delta and annotation events for the knowledge base section
+    """
+    timeline = get_timeline()
+    try:
+        # Start Knowledge Base Agent with markdown header
+        yield TextDelta("\n\n## 📚 INSIGHTS FROM KNOWLEDGE BASE\n\n")
+
+        # Get the warm Knowledge Base Agent (the first build connects to Pinecone,
+        # so keep it off the event loop)
+        kb_agent = await run_with_deadline(get_runtime().get, "kb_agent", KnowledgeBaseAgent)
+
+        # Create a simple context with user_id
+        from openai_agents import AgentContext, State
+        kb_context = AgentContext(state=State({"user_id": user_id}))
+
+        # Reuse the prompt embedding computed for routing and caching when available
+        query_embedding = None
+        if embeddings is not None:
+            query_embedding = await embeddings.embed_for(prompt, "kb")
+
+        # Process the query with the Knowledge Base Agent
+        kb_response = await kb_agent.process_query(prompt, kb_context, query_embedding=query_embedding)
+
+        # Handle results
+        if kb_response.get("results"):
+            # Process each result
+            for result in kb_response.get("results", []):
+                content = result.get("content", "")
+
+                # Yield the content
+                timeline.mark("kb.first_token")
+                yield TextDelta(content + "\n\n")
+
+            # Process citations
+            for citation in kb_response.get("citations", []):
+                yield Annotation(Citation.from_kb_citation(citation))
+        else:
+            yield TextDelta("No relevant knowledge base entries found for this query.\n\n")
+
+        yield TextDelta("   ✅ Knowledge base search complete\n\n")
+
+    except Exception as e:
+        logger.error(f"Error during knowledge base execution: {e}")
+        # Rebuild the agent on the next request in case it is what broke
+        get_runtime().discard("kb_agent")
+        yield section_error(f"\n⚠️ Error accessing knowledge base: {str(e)}\n\n")
+    finally:
+        timeline.mark("kb.done")
+
+async def stream_agent_response(
+    prompt: str,
+    user_id: str = "system",
+    concurrent: bool = None,
+    deadline: Deadline = None,
+    route: bool = True,
+    use_cache: bool = True
+):
+    """
+    Stream responses from reports, community, and knowledge base agents.
+    Sections are always delivered in order: reports first, then community, then knowledge base.
+    In concurrent mode all three agents start at once; the first section streams live while
+    the others are buffered and flushed as soon as their turn comes.
+
+    Args:
+        prompt: The user's pricing question
+        user_id: The ID of the user making the request (for knowledge base access control)
+        concurrent: Run the sections concurrently (defaults to CONCURRENT_AGENT_SECTIONS)
+        deadline: Overall deadline; each section gets its own budget within it and is
+            cut short with a "partial results" notice when the budget runs out
+        route: Skip sources the source router considers unable to answer
+        use_cache: Replay sections cached for a near-identical prompt instead of running them
+
+    Yields:
+        Events containing text deltas, annotations, status updates, or completion signals
+
+    Format (typed events from helpers.stream_events; each also supports
+    event["type"] / event["data"] like the former dicts):
+    - Text deltas: TextDelta, type "text_delta", data "text content"
+    - Annotations: Annotation, type "annotation", data {"type": "citation", "citation": {...}}
+    - Completion: Completion, type "completion", data None
+
+    Universal Citation Format:
+    {
+        "id": "unique-id",           # File ID, topic ID, or generated ID
+        "title": "Document Title",   # Document title with source prefix
+        "source": "report|community|kb", # Source of the citation
+        "url": "optional-url",       # URL for community posts or KB entries (optional)
+        "content": "optional-content", # Preview content if available (optional)
+        "metadata": {}               # Additional source-specific metadata (optional)
+    }
+    """
+    logger.info(f"Processing query: {prompt}")
+
+    if concurrent is None:
+        concurrent = CONCURRENT_AGENT_SECTIONS
+    if deadline is None:
+        deadline = Deadline(None)
+
+    # Send initial status message
+    yield TextDelta("🔍 Processing your question...\n\n")
+
+    def bounded(source, section):
+        # Each source gets its own budget, started when the section starts
+        return lambda: stream_with_deadline(
+            section(),
+            deadline.for_source(source),
+            timeout_events=[partial_results_notice(source)]
+        )
+
+    # Embeddings are computed at most once per (text, model) for the whole request;
+    # the prompt embedding serves routing, the answer cache and the KB search
+    embeddings = RequestEmbeddings()
+    cache = get_answer_cache() if use_cache else None
+    router_available = route and get_source_router() is not None
+    embedding = await embed_prompt(prompt, embeddings, deadline) if (cache or router_available) else None
+
+    # Decide which sources can answer this prompt
+    if route:
+        decision = route_sources(embedding)
+    else:
+        decision = RoutingDecision.run_everything("routing_disabled")
+    log_routing_decision(decision)
+
+    def cached(source, section, namespaces=()):
+        # Replay a cached section, or run it live and record it for next time
+        if cache is None or embedding is None:
+            return section
+        events = cache.lookup(embedding, source, user_id)
+        if events is not None:
+            logger.info(f"Replaying cached {source} section")
+            get_timeline().count(f"{source}.cache_hit")
+            return lambda: replay_events(events)
+        return lambda: record_events(
+            section(),
+            lambda recorded: cache.store(embedding, prompt, source, user_id, recorded, namespaces)
+        )
+
+    # Section factories and the KB namespaces each one draws from
+    section_factories = {
+        "reports": (lambda: stream_reports_section(prompt), ()),
+        "community": (lambda: stream_community_section(prompt, embeddings), ()),
+        "kb": (lambda: stream_knowledge_base_section(prompt, user_id, embeddings), get_default_namespaces(user_id)),
+    }
+
+    # Sections in client-visible order (recording happens inside the deadline,
+    # so sections cut short by their budget are never cached)
+    sections = [
+        bounded(source, cached(source, *section_factories[source]))
+        for source in decision.sources
+    ]
+
+    try:
+        if concurrent:
+            section_events = stream_sections_concurrently(sections)
+        else:
+            section_events = stream_sections_sequentially(sections)
+
+        async for event in section_events:
+            yield event
+
         # Send completion event after all agents have been processed
-        yield {"type": "completion", "data": None}
-            
+        yield Completion()
+
     except Exception as e:
-        print(f"Error during agent execution: {e}")
-        yield {"type": "text_delta", "data": f"\n⚠️ Error processing your question: {str(e)}\n\n"}
-        yield {"type": "completion", "data": None}
+        logger.error(f"Error during agent execution: {e}")
+        yield TextDelta(f"\n⚠️ Error processing your question: {str(e)}\n\n")
+        yield Completion()
@@ -30,6 +30,7 @@ from agents import (
     handoff,
     trace,
 )
+from agents.tool import default_tool_error_function
 from agents.extensions.handoff_prompt import RECOMMENDED_PROMPT_PREFIX
 from openai import OpenAI
 from openai.types.responses import ResponseTextDeltaEvent, ResponseTextAnnotationDeltaEvent
@@ -44,19 +45,44 @@ from helpers.community_helpers import (
     PINECONE_INDEX_NAME,
     PINECONE_NAMESPACE
 )
+from helpers.warm_runtime import get_runtime
+from helpers.stream_events import (
+    Citation,
+    TextDelta,
+    Annotation,
+    Completion,
+    encode_frame,
+    encode_annotations_frame,
+    encode_error_frame
+)
+
 
-# Initialize Pinecone client if API key is available
-pc = None
-index = None
+### CLIENTS
 
-if PINECONE_API_KEY:
+def connect_community_index():
+    """Connect to the community Pinecone index."""
+    index = Pinecone(api_key=PINECONE_API_KEY).Index(PINECONE_INDEX_NAME)
+    print(f"Successfully connected to Pinecone index: {PINECONE_INDEX_NAME}")
+    return index
+
+def get_community_index():
+    """
+    Get the community Pinecone index, kept warm for the container lifetime.
+    
+    A failed connection is retried on the next search instead of disabling
+    community search until the container is recycled.
+    
+    Returns:
+        The Pinecone index, or None if it is not available
+    """
+    if not PINECONE_API_KEY:
+        return None
     try:
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-        index = pc.Index(PINECONE_INDEX_NAME)
-        print(f"Successfully connected to Pinecone index: {PINECONE_INDEX_NAME}")
+        return get_runtime().get("community_index", connect_community_index)
     except Exception as e:
         print(f"Error connecting to Pinecone: {e}")
         print("Community knowledge search will not be available.")
+        return None
 
 
 ### CONTEXT
@@ -67,13 +93,23 @@ class PricingAgentContext(BaseModel):
     last_search_results: Dict[str, Any] | None = None
     full_topics: Dict[str, Any] = {}
     annotations: List[Dict[str, Any]] = []
+    # Request-scoped embedding service (helpers.embedding_service.RequestEmbeddings)
+    embeddings: Any = None
+    # Why a search failed or returned partial results (the answer is then degraded)
+    search_error: str | None = None
 
 
 ### TOOLS
 
+def record_search_failure(context: RunContextWrapper[PricingAgentContext], error: Exception) -> str:
+    """Mark the answer as degraded when the search tool raises, and tell the agent."""
+    context.context.search_error = str(error)
+    return default_tool_error_function(context, error)
+
 @function_tool(
     name_override="community_knowledge_search", 
-    description_override="Search the community knowledge base for information about pricing topics."
+    description_override="Search the community knowledge base for information about pricing topics.",
+    failure_error_function=record_search_failure
 )
 async def community_knowledge_search(
     context: RunContextWrapper[PricingAgentContext], 
@@ -94,9 +130,12 @@ async def community_knowledge_search(
     
     # Check if required clients are initialized
     if not OPENAI_API_KEY:
+        context.context.search_error = "OpenAI API key is not set"
         return "Error: OpenAI API key is not set or client initialization failed. Please set the OPENAI_API_KEY environment variable."
             
-    if not pc or not index:
+    index = get_community_index()
+    if not index:
+        context.context.search_error = "Pinecone index is not available"
         return "Error: Pinecone client is not initialized or connection failed. Please set the PINECONE_API_KEY environment variable and ensure the index exists."
     
     print(f"Processing query: '{query}'")
@@ -107,6 +146,8 @@ async def community_knowledge_search(
     
     # Store the results in context for future reference
     context.context.last_search_results = results
+    if results.get("error"):
+        context.context.search_error = results["error"]
     
     # Format the results as a readable string
     formatted_results = format_search_results(results, context.context)
@@ -155,7 +196,7 @@ async def stream_community_agent_response(prompt: str):
         prompt: The user's pricing question
         
     Yields:
-        Events containing text deltas, annotations, or completion signals
+        TextDelta, Annotation (universal citation format) and, last, Completion events
     """
     context = PricingAgentContext()
     result = Runner.run_streamed(
@@ -167,16 +208,13 @@ async def stream_community_agent_response(prompt: str):
     async for event in result.stream_events():
         # Handle annotation events
         if event.type == "raw_response_event" and event.data.type == "response.output_text.annotation.added":
-            yield {"type": "annotation", "data": event.data.annotation}
+            yield Annotation(Citation.from_community_annotation(event.data.annotation))
 
         # Handle text delta events
         if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):  
             if event.data.type == "response.output_text.delta":
-                # Normalize text to prevent excessive newlines
-                delta_text = event.data.delta
-                # Replace 3 or more consecutive newlines with just 2
-                delta_text = re.sub(r'\n{3,}', '\n\n', delta_text)
-                yield {"type": "text_delta", "data": delta_text}
+                # Excess newlines are collapsed once, when the frame is encoded
+                yield TextDelta(event.data.delta)
             elif event.data.type == "response.completion":
                 # Don't yield completion yet, we'll do it after processing context annotations
                 pass
@@ -186,10 +224,10 @@ async def stream_community_agent_response(prompt: str):
         print(f"Found {len(context.annotations)} annotations in community context")
         for annotation in context.annotations:
             print(f"Yielding community context annotation: {annotation}")
-            yield {"type": "annotation", "data": annotation}
+            yield Annotation(Citation.from_topic_citation(annotation))
     
     # Now yield completion after all annotations have been processed
-    yield {"type": "completion", "data": None}
+    yield Completion()
 
 
 # Sends streamed data over WebSocket to the client
@@ -202,135 +240,36 @@ async def send_community_streamed_response(apigateway, connection_id, prompt):
         prompt: The user's pricing question
     """
     try:
-        annotations = []
+        citations = []
         
         async for event in stream_community_agent_response(prompt):
             
-            if event["type"] == "text_delta":
-                # Normalize text to prevent excessive newlines
-                text_data = event["data"]
-                # Replace 3 or more consecutive newlines with just 2
-                text_data = re.sub(r'\n{3,}', '\n\n', text_data)
-                
+            if isinstance(event, TextDelta):
                 # Send text deltas immediately
                 apigateway.post_to_connection(
                     ConnectionId=connection_id,
-                    Data=json.dumps({'text': text_data, 'done': False}).encode('utf-8')
+                    Data=encode_frame(event)
                 )
-            elif event["type"] == "annotation":
-                # Process annotation data
-                if isinstance(event["data"], dict):
-                    if "file_citation" in event["data"]:
-                        # Convert to the universal citation format
-                        file_id = event["data"]["file_citation"].get("file_id", f"community-{time.time()}")
-                        title = event["data"]["file_citation"].get("title", "Community Post")
-                        
-                        annotation_dict = {
-                            "type": "citation",
-                            "citation": {
-                                "id": file_id,
-                                "title": f"[Community] {title}" if not title.startswith("[Community]") else title,
-                                "source": "community",
-                                "content": "",
-                                "metadata": {
-                                    "original_type": "post_citation",
-                                    "topic_id": file_id
-                                }
-                            }
-                        }
-                    elif "type" in event["data"] and event["data"]["type"] == "topic_citation":
-                        # Handle topic_citation from context.annotations
-                        topic_id = event["data"].get("topic_id", f"community-{time.time()}")
-                        title = event["data"].get("title", "Community Post")
-                        url = event["data"].get("url", "")
-                        
-                        annotation_dict = {
-                            "type": "citation",
-                            "citation": {
-                                "id": topic_id,
-                                "title": f"[Community] {title}" if not title.startswith("[Community]") else title,
-                                "source": "community",
-                                "url": url,
-                                "content": event["data"].get("content", ""),
-                                "metadata": {
-                                    "original_type": "post_citation",
-                                    "topic_id": topic_id
-                                }
-                            }
-                        }
-                    else:
-                        # Convert to the universal citation format
-                        topic_id = event["data"].get("topic_id", event["data"].get("file_id", f"community-{time.time()}"))
-                        title = event["data"].get("title", event["data"].get("filename", "Community Post"))
-                        url = event["data"].get("url", "")
-                        
-                        annotation_dict = {
-                            "type": "citation",
-                            "citation": {
-                                "id": topic_id,
-                                "title": f"[Community] {title}" if not title.startswith("[Community]") else title,
-                                "source": "community",
-                                "url": url,
-                                "content": event["data"].get("content", ""),
-                                "metadata": {
-                                    "original_type": "post_citation",
-                                    "topic_id": topic_id,
-                                    "post_id": event["data"].get("post_id", "")
-                                }
-                            }
-                        }
-                else:
-                    # Convert to the universal citation format
-                    topic_id = getattr(event["data"], "topic_id", getattr(event["data"], "file_id", f"community-{time.time()}"))
-                    title = getattr(event["data"], "title", getattr(event["data"], "filename", "Community Post"))
-                    url = getattr(event["data"], "discourse_url", getattr(event["data"], "url", ""))
-                    
-                    annotation_dict = {
-                        "type": "citation",
-                        "citation": {
-                            "id": topic_id,
-                            "title": f"[Community] {title}" if not title.startswith("[Community]") else title,
-                            "source": "community",
-                            "url": url,
-                            "content": getattr(event["data"], "content", ""),
-                            "metadata": {
-                                "original_type": "post_citation",
-                                "topic_id": topic_id,
-                                "post_id": getattr(event["data"], "post_id", "")
-                            }
-                        }
-                    }
-                
-                # Debug: Print community annotation
-                print(f"Community agent generated annotation: {json.dumps(annotation_dict)}")
-                
-                annotations.append(annotation_dict)
+            elif isinstance(event, Annotation):
+                citations.append(event.citation)
                 
                 # Send individual annotation immediately for real-time display
                 apigateway.post_to_connection(
                     ConnectionId=connection_id,
-                    Data=json.dumps({
-                        'text': '',
-                        'done': False,
-                        'annotation': annotation_dict
-                    }).encode('utf-8')
+                    Data=encode_frame(event)
                 )
 
-            elif event["type"] == "completion":
+            elif isinstance(event, Completion):
                 # When we get a completion event, send the annotations
                 apigateway.post_to_connection(
                     ConnectionId=connection_id,
-                    Data=json.dumps({
-                        'text': '',
-                        'done': False,
-                        'annotations': annotations
-                    }).encode('utf-8')
+                    Data=encode_annotations_frame(citations, done=False)
                 )
 
         # Final message to indicate the stream is done
         apigateway.post_to_connection(
             ConnectionId=connection_id,
-            Data=json.dumps({'text': '', 'annotations': annotations, 'done': True}).encode('utf-8')
+            Data=encode_annotations_frame(citations, done=True)
         )
     except Exception as e:
         print(f"Error during WebSocket streaming: {e}")
@@ -338,7 +277,7 @@ async def send_community_streamed_response(apigateway, connection_id, prompt):
         traceback.print_exc()
         apigateway.post_to_connection(
             ConnectionId=connection_id,
-            Data=json.dumps({'error': str(e), 'done': True}).encode('utf-8')
+            Data=encode_error_frame(str(e))
         )
 
 
@@ -369,27 +308,18 @@ async def main():
         annotations = []
         
         async for event in stream_community_agent_response(user_input):
-            if event["type"] == "text_delta":
+            if isinstance(event, TextDelta):
                 # Normalize text to prevent excessive newlines
-                text_data = event["data"]
                 # Replace 3 or more consecutive newlines with just 2
-                text_data = re.sub(r'\n{3,}', '\n\n', text_data)
+                text_data = re.sub(r'\n{3,}', '\n\n', event.text)
                 print(text_data, end="", flush=True)
-            elif event["type"] == "annotation":
-                annotation_dict = {
-                    "type": getattr(event["data"], "type", "file_citation"),
-                    "file_citation": {
-                        "file_id": getattr(event["data"], "file_id", ""),
-                        "title": getattr(event["data"], "filename", "")
-                    }
-                }
-                annotations.append(annotation_dict)
+            elif isinstance(event, Annotation):
+                annotations.append(event.citation)
         
         if annotations:
             print("\n\nReferences:")
-            for i, annotation in enumerate(annotations, 1):
-                file_citation = annotation.get("file_citation", {})
-                print(f"[{i}] {file_citation.get('title', 'Unknown')} - {file_citation.get('file_id', 'Unknown ID')}")
+            for i, citation in enumerate(annotations, 1):
+                print(f"[{i}] {citation.title or 'Unknown'} - {citation.id or 'Unknown ID'}")
         
         print("\n")
 
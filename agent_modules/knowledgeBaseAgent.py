@@ -13,10 +13,12 @@ from openai import OpenAI
 from openai_agents import Tool, AgentContext, State
 
 from helpers.knowledge_base_helper import (
-    get_kb_manager,
+    get_async_kb_manager,
     KnowledgeBaseEntryExtended,
     CURRENT_SCHEMA_VERSION
 )
+from helpers.deadline import await_with_deadline
+from helpers.request_metrics import timed
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,7 +29,7 @@ class KBSearchTool(Tool):
     
     description = "Search for information in the knowledge base using semantic similarity"
     
-    def execute(
+    async def execute(
         self, 
         query: str, 
         limit: int = 5, 
@@ -54,12 +56,14 @@ class KBSearchTool(Tool):
             }
         
         # Get knowledge base manager and search
-        kb_manager = get_kb_manager()
-        results = kb_manager.search(
+        kb_manager = get_async_kb_manager()
+        results = await kb_manager.search(
             query=query,
             user_id=user_id,
             limit=limit,
-            filter_dict=filter_dict
+            filter_dict=filter_dict,
+            views=True,
+            hybrid=True
         )
         
         # Format results for return
@@ -84,7 +88,7 @@ class KBMetadataSearchTool(Tool):
     
     description = "Search for information in the knowledge base by metadata fields"
     
-    def execute(
+    async def execute(
         self, 
         tags: Optional[List[str]] = None,
         created_by: Optional[str] = None,
@@ -115,8 +119,8 @@ class KBMetadataSearchTool(Tool):
             filter_dict["visibility"] = visibility
         
         # Get knowledge base manager and search
-        kb_manager = get_kb_manager()
-        results = kb_manager.filter_by_metadata(
+        kb_manager = get_async_kb_manager()
+        results = await kb_manager.filter_by_metadata(
             user_id=user_id,
             filter_dict=filter_dict,
             limit=limit
@@ -143,7 +147,7 @@ class KBCreateTool(Tool):
     
     description = "Create a new entry in the knowledge base"
     
-    def execute(
+    async def execute(
         self, 
         title: str, 
         content: str, 
@@ -188,8 +192,8 @@ class KBCreateTool(Tool):
             entry_data["custom_fields"] = custom_fields
         
         # Get knowledge base manager and create entry
-        kb_manager = get_kb_manager()
-        entry_id = kb_manager.create_entry(entry_data, user_id)
+        kb_manager = get_async_kb_manager()
+        entry_id = await kb_manager.create_entry(entry_data, user_id)
         
         return {"id": entry_id, "status": "created"}
 
@@ -198,7 +202,7 @@ class KBUpdateTool(Tool):
     
     description = "Update an existing entry in the knowledge base"
     
-    def execute(
+    async def execute(
         self, 
         entry_id: str, 
         title: Optional[str] = None,
@@ -245,8 +249,8 @@ class KBUpdateTool(Tool):
             update_data["custom_fields"] = custom_fields
         
         # Get knowledge base manager and update entry
-        kb_manager = get_kb_manager()
-        success = kb_manager.update_entry(entry_id, update_data, user_id)
+        kb_manager = get_async_kb_manager()
+        success = await kb_manager.update_entry(entry_id, update_data, user_id)
         
         return {"id": entry_id, "status": "updated" if success else "failed"}
 
@@ -255,7 +259,7 @@ class KBDeleteTool(Tool):
     
     description = "Delete an entry from the knowledge base"
     
-    def execute(self, entry_id: str) -> Dict[str, Any]:
+    async def execute(self, entry_id: str) -> Dict[str, Any]:
         """
         Delete a knowledge base entry.
         
@@ -268,8 +272,8 @@ class KBDeleteTool(Tool):
         user_id = self.context.state.get("user_id", "system")
         
         # Get knowledge base manager and delete entry
-        kb_manager = get_kb_manager()
-        success = kb_manager.delete_entry(entry_id, user_id)
+        kb_manager = get_async_kb_manager()
+        success = await kb_manager.delete_entry(entry_id, user_id)
         
         return {"id": entry_id, "status": "deleted" if success else "failed"}
 
@@ -278,7 +282,7 @@ class KBGetTool(Tool):
     
     description = "Retrieve a specific entry from the knowledge base by ID"
     
-    def execute(self, entry_id: str) -> Optional[Dict[str, Any]]:
+    async def execute(self, entry_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve a specific knowledge base entry.
         
@@ -291,8 +295,8 @@ class KBGetTool(Tool):
         user_id = self.context.state.get("user_id", "system")
         
         # Get knowledge base manager and retrieve entry
-        kb_manager = get_kb_manager()
-        entry = kb_manager.get_entry(entry_id, user_id)
+        kb_manager = get_async_kb_manager()
+        entry = await kb_manager.get_entry(entry_id, user_id)
         
         if not entry:
             return None
@@ -332,19 +336,25 @@ class KnowledgeBaseAgent:
         ]
         
         # Make sure Pinecone is initialized
-        get_kb_manager()
+        get_async_kb_manager()
     
     def get_tools(self) -> List[Tool]:
         """Get the tools provided by this agent."""
         return self.tools
     
-    async def process_query(self, query: str, context: AgentContext) -> Dict[str, Any]:
+    async def process_query(
+        self, 
+        query: str, 
+        context: AgentContext, 
+        query_embedding: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
         """
         Process a query using the knowledge base.
         
         Args:
             query: The user's query
             context: The agent context
+            query_embedding: Optional precomputed embedding of the query
             
         Returns:
             Response dictionary with results and citations
@@ -352,13 +362,18 @@ class KnowledgeBaseAgent:
         # Get user ID from context
         user_id = context.state.get("user_id", "system")
         
-        # Search the knowledge base
-        kb_manager = get_kb_manager()
-        search_results = kb_manager.search(
-            query=query,
-            user_id=user_id,
-            limit=5
-        )
+        # Search the namespaces concurrently, bounded by the section deadline
+        kb_manager = get_async_kb_manager()
+        with timed("kb_search"):
+            search_results = await await_with_deadline(
+                kb_manager.search(
+                    query=query,
+                    user_id=user_id,
+                    limit=5,
+                    query_embedding=query_embedding,
+                    views=True
+                )
+            )
         
         # Format results for response
         results = []
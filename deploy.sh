@@ -16,6 +16,13 @@ PROFILE="account2"
 mkdir -p build
 rm -f $ZIP_FILE
 
+# Build the source router vectors when missing or older than the exemplars
+# (embeds the exemplar prompts, so OPENAI_API_KEY must be set)
+if [ ! -f data/source_router_vectors.json ] || [ data/source_router_exemplars.json -nt data/source_router_vectors.json ]; then
+    echo "🧭 Building source router vectors..."
+    python3 -m helpers.source_router build
+fi
+
 # Create virtual environment
 python3.13 -m venv $VENV_DIR
 source $VENV_DIR/bin/activate
@@ -64,6 +71,10 @@ if [ -d "helpers" ]; then
     zip -r -g "$ZIP_FILE" helpers > /dev/null
 fi
 
+# Add the source router data (without the vectors every prompt runs every source)
+echo "📦 Adding source router data to the package..."
+zip -g "$ZIP_FILE" data/source_router_exemplars.json data/source_router_vectors.json > /dev/null
+
 # Update the existing Lambda function code
 echo "🔄 Updating Lambda function code..."
 aws lambda update-function-code \
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Schema Validation Benchmark
+
+This script measures the time per entry to validate a bulk write,
+comparing the former path (jsonschema.validate per entry, which checks
+the schema and builds a new validator on every call) with the compiled
+validators in helpers.schema_definitions: validate_entry one entry at a
+time, and validate_entries over the whole batch.
+
+Usage:
+    python examples/schema_validation_benchmark.py [entries]
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+from jsonschema import validate, ValidationError
+
+# Add parent directory to path to find our modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from helpers.schema_definitions import (
+    SCHEMA_VERSIONS,
+    CURRENT_SCHEMA_VERSION,
+    validate_entry,
+    validate_entries
+)
+
+# One invalid entry for every INVALID_EVERY entries
+INVALID_EVERY = 50
+
+
+def make_entries(count):
+    """Entries as create_entries sees them after filling in system fields."""
+    now = datetime.now().isoformat()
+    entries = []
+    for i in range(count):
+        entries.append({
+            "id": f"entry-{i}",
+            "title": f"Pricing note {i}",
+            "content": "Seat pricing is billed per user per month with annual discounts. " * 8,
+            "created_at": now,
+            "updated_at": now,
+            "created_by": "benchmark",
+            "tags": ["pricing", "seats", f"batch-{i % 10}"],
+            "confidence": 4,
+            "visibility": "team" if i % INVALID_EVERY else "everyone",
+            "schema_version": CURRENT_SCHEMA_VERSION
+        })
+    return entries
+
+
+def legacy_validate(entries):
+    """The former path: jsonschema.validate per entry."""
+    invalid = 0
+    for entry in entries:
+        try:
+            validate(instance=entry, schema=SCHEMA_VERSIONS[entry["schema_version"]])
+        except ValidationError:
+            invalid += 1
+    return invalid
+
+
+def compiled_validate(entries):
+    """validate_entry per entry, with the compiled validator."""
+    invalid = 0
+    for entry in entries:
+        try:
+            validate_entry(entry)
+        except ValidationError:
+            invalid += 1
+    return invalid
+
+
+def batch_validate(entries):
+    """validate_entries over the whole batch."""
+    return sum(1 for errors in validate_entries(entries) if errors)
+
+
+def measure(name, func, entries):
+    """Print the time per entry for one path (best of three runs)."""
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        invalid = func(entries)
+        timings.append(time.perf_counter() - start)
+    print(f"{name:10} {min(timings) / len(entries) * 1e6:8.2f} µs/entry  {invalid} invalid")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    entries = make_entries(count)
+    print(f"Validating {count} entries ({count // INVALID_EVERY} invalid)")
+    measure("legacy", legacy_validate, entries)
+    measure("compiled", compiled_validate, entries)
+    measure("batch", batch_validate, entries)
+
+
+if __name__ == "__main__":
+    main()
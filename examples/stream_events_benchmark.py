@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Stream Event Serialization Benchmark
+
+This script measures CPU time and allocations per event for turning a
+section's events into WebSocket frames, comparing the former dict-based
+path (fresh dicts per event, per-event json.dumps debug prints, and
+every citation re-encoded for the completion and final frames) with
+the typed events and single-pass serializer in helpers.stream_events.
+
+Usage:
+    python examples/stream_events_benchmark.py [events]
+"""
+
+import os
+import io
+import re
+import sys
+import json
+import time
+import tracemalloc
+import contextlib
+
+# Add parent directory to path to find our modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from helpers.stream_events import (
+    Citation,
+    TextDelta,
+    Annotation,
+    encode_frame,
+    encode_annotations_frame
+)
+
+# One citation for every CITATION_EVERY text deltas
+CITATION_EVERY = 20
+
+
+class RawAnnotation:
+    """Stand-in for an agent file annotation."""
+
+    def __init__(self, i):
+        self.file_id = f"file-{i}"
+        self.filename = f"Pricing report {i}.pdf"
+        self.content = "Usage-based pricing aligns revenue with value. " * 4
+
+
+def raw_events(count):
+    """Agent events: mostly small text deltas with a citation now and then."""
+    for i in range(count):
+        if i % CITATION_EVERY == 0:
+            yield RawAnnotation(i)
+        else:
+            yield f"token {i} of the answer "
+
+
+def legacy_frames(count):
+    """The former path: dict events, debug dumps and re-encoded citations."""
+    frames = []
+    annotations = []
+    for raw in raw_events(count):
+        if isinstance(raw, str):
+            event = {"type": "text_delta", "data": re.sub(r'\n{3,}', '\n\n', raw)}
+            print(event)
+            text = re.sub(r'\n{3,}', '\n\n', event["data"])
+            frames.append(json.dumps({'text': text, 'done': False}).encode('utf-8'))
+        else:
+            citation = {
+                "type": "citation",
+                "citation": {
+                    "id": raw.file_id,
+                    "title": f"[Report] {raw.filename}",
+                    "source": "report",
+                    "content": raw.content,
+                    "metadata": {"original_type": "file_citation", "file_id": raw.file_id}
+                }
+            }
+            print(f"Formatted report annotation: {citation}")
+            event = {"type": "annotation", "data": citation}
+            print(event)
+            print(f"Raw annotation event: {json.dumps(event)}")
+            print(f"Using universal format annotation: {json.dumps(citation)}")
+            print(f"Final processed annotation: {json.dumps(citation)}")
+            annotations.append(citation)
+            frames.append(json.dumps({'text': '', 'done': False, 'annotation': citation}).encode('utf-8'))
+
+    frames.append(json.dumps({'text': '', 'done': False, 'annotations': annotations}).encode('utf-8'))
+    for annotation in annotations:
+        print(f"Report annotation: {json.dumps(annotation)}")
+    frames.append(json.dumps({'text': '', 'annotations': annotations, 'done': True}).encode('utf-8'))
+    return frames
+
+
+def typed_frames(count):
+    """The current path: typed events encoded once."""
+    frames = []
+    citations = []
+    for raw in raw_events(count):
+        if isinstance(raw, str):
+            frames.append(encode_frame(TextDelta(raw)))
+        else:
+            event = Annotation(Citation.from_report_annotation(raw))
+            citations.append(event.citation)
+            frames.append(encode_frame(event))
+
+    frames.append(encode_annotations_frame(citations, done=False))
+    frames.append(encode_annotations_frame(citations, done=True))
+    return frames
+
+
+def measure(name, func, count):
+    """Print CPU time and allocations per event for one path."""
+    # Debug prints went to CloudWatch; discard them here but keep their cost
+    sink = io.StringIO()
+
+    with contextlib.redirect_stdout(sink):
+        start = time.perf_counter()
+        func(count)
+        elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        before = tracemalloc.take_snapshot()
+        frames = func(count)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0)
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    print(
+        f"{name:8} {elapsed / count * 1e6:8.2f} µs/event"
+        f"  {blocks / count:6.2f} live blocks/event"
+        f"  {allocated / count:8.1f} B/event"
+        f"  peak {peak / 1024:8.1f} KiB"
+        f"  {sum(len(f) for f in frames) / 1024:8.1f} KiB sent"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"Serializing {count} events ({count // CITATION_EVERY} citations)")
+    measure("legacy", legacy_frames, count)
+    measure("typed", typed_frames, count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Semantic answer cache for the PricingSaaS agent backend.
+
+This module caches the streamed answer of each source section (reports,
+community, knowledge base) keyed by the prompt embedding. A new prompt
+whose embedding is close enough to a cached one replays the stored
+events (text deltas and universal-format citations) instead of running
+the agents again. Each section has its own TTL, and knowledge base
+sections are dropped as soon as a write touches a namespace they drew
+from.
+
+Only complete answers are cached: a section that failed, or that
+answered from degraded results (e.g. a timed-out community search),
+marks one of its events as an error and is not recorded.
+
+The cache lives in process memory, so it is shared by all requests
+served by one warm container. The same goes for KB invalidation: it
+only sees writes made through this process. Writes made elsewhere (the
+edge functions, other containers) are covered by ANSWER_CACHE_KB_TTL_S
+alone, so keep that TTL as short as stale KB answers may be.
+"""
+
+import os
+import time
+import math
+import logging
+import itertools
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Configuration
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "256"))
+
+# Time to live per source section, in seconds
+SECTION_TTLS = {
+    "reports": float(os.getenv("ANSWER_CACHE_REPORTS_TTL_S", str(24 * 3600))),
+    "community": float(os.getenv("ANSWER_CACHE_COMMUNITY_TTL_S", str(6 * 3600))),
+    "kb": float(os.getenv("ANSWER_CACHE_KB_TTL_S", "3600")),
+}
+
+
+def section_key(source: str, user_id: str) -> str:
+    """
+    Build the cache key of a section.
+
+    Knowledge base answers depend on the user's private namespace, so
+    they are cached per user. Other sources are shared by all users.
+    """
+    if source == "kb":
+        return f"kb:{user_id}"
+    return source
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0:
+        return list(vector)
+    return [v / norm for v in vector]
+
+
+class CachedSection:
+    """The recorded events of one source section."""
+
+    __slots__ = ("events", "expires_at", "namespaces")
+
+    def __init__(self, events: List[Any], ttl: float, namespaces: Iterable[str] = ()):
+        self.events = events
+        self.expires_at = time.monotonic() + ttl
+        self.namespaces = frozenset(namespaces)
+
+    @property
+    def fresh(self) -> bool:
+        """Whether the section is still within its TTL."""
+        return time.monotonic() < self.expires_at
+
+
+class CachedAnswer:
+    """All cached sections for one prompt embedding."""
+
+    __slots__ = ("embedding", "prompt", "sections")
+
+    def __init__(self, embedding: List[float], prompt: str):
+        self.embedding = embedding
+        self.prompt = prompt
+        self.sections: Dict[str, CachedSection] = {}
+
+
+class SemanticAnswerCache:
+    """In-memory answer cache keyed by prompt embedding similarity."""
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttls: Optional[Dict[str, float]] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a cached prompt to match
+            max_entries: Maximum number of cached prompts (least recently used are evicted)
+            ttls: Time to live per source in seconds
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttls = ttls or SECTION_TTLS
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._ids = itertools.count()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+    def _best_match(self, embedding: List[float], key: Optional[str] = None):
+        """Find the most similar entry above the threshold (optionally with a fresh section)."""
+        best_id, best_score = None, self.threshold
+        for entry_id, entry in self._entries.items():
+            if key is not None:
+                section = entry.sections.get(key)
+                if section is None or not section.fresh:
+                    continue
+            score = sum(x * y for x, y in zip(embedding, entry.embedding))
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+        return best_id
+
+    def lookup(self, embedding: List[float], source: str, user_id: str) -> Optional[List[Any]]:
+        """
+        Get the cached events of a section for a similar prompt.
+
+        Args:
+            embedding: Prompt embedding
+            source: Source name ("reports", "community" or "kb")
+            user_id: ID of the user making the request
+
+        Returns:
+            The recorded events, or None on a miss
+        """
+        key = section_key(source, user_id)
+        entry_id = self._best_match(_normalize(embedding), key)
+        if entry_id is None:
+            self.stats["misses"] += 1
+            return None
+
+        self._entries.move_to_end(entry_id)
+        self.stats["hits"] += 1
+        return self._entries[entry_id].sections[key].events
+
+    def store(
+        self,
+        embedding: List[float],
+        prompt: str,
+        source: str,
+        user_id: str,
+        events: List[Any],
+        namespaces: Iterable[str] = ()
+    ) -> None:
+        """
+        Store the events of a completed section.
+
+        Args:
+            embedding: Prompt embedding
+            prompt: The prompt text (kept for debugging)
+            source: Source name ("reports", "community" or "kb")
+            user_id: ID of the user making the request
+            events: Ordered events of the section
+            namespaces: KB namespaces the section drew from
+        """
+        embedding = _normalize(embedding)
+        entry_id = self._best_match(embedding)
+        if entry_id is None:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = CachedAnswer(embedding, prompt)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        self._entries.move_to_end(entry_id)
+        self._entries[entry_id].sections[section_key(source, user_id)] = CachedSection(
+            list(events), self.ttls.get(source, 0), namespaces
+        )
+        self.stats["stores"] += 1
+
+    def invalidate_namespace(self, namespace: str) -> int:
+        """
+        Drop every cached section that drew from a KB namespace.
+
+        Args:
+            namespace: The namespace that was written to
+
+        Returns:
+            Number of sections dropped
+        """
+        dropped = 0
+        for entry in self._entries.values():
+            for key in [key for key, section in entry.sections.items() if namespace in section.namespaces]:
+                del entry.sections[key]
+                dropped += 1
+
+        if dropped:
+            self.stats["invalidations"] += dropped
+            logger.info(f"Answer cache dropped {dropped} section(s) after a write to {namespace}")
+        return dropped
+
+    def clear(self) -> None:
+        """Remove every cached answer."""
+        self._entries.clear()
+
+
+async def replay_events(events: List[Any]) -> AsyncIterator[Any]:
+    """Yield recorded section events."""
+    for event in events:
+        yield event
+
+
+async def record_events(
+    events: AsyncIterator[Any],
+    on_complete,
+) -> AsyncIterator[Any]:
+    """
+    Pass events through while recording them.
+
+    The recorded events are handed to on_complete only if the stream
+    finished normally and none of its events is marked as an error, so
+    failed, degraded or cancelled sections are never cached.
+
+    Args:
+        events: Section event stream
+        on_complete: Callback receiving the list of recorded events
+    """
+    recorded = []
+    failed = False
+    async for event in events:
+        # Works for typed stream events and legacy dict events alike
+        if event.get("error"):
+            failed = True
+        recorded.append(event)
+        yield event
+
+    if not failed:
+        on_complete(recorded)
+
+
+# We'll create the cache on demand and keep it for the container lifetime
+answer_cache = None
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Get the answer cache instance, or None if caching is disabled."""
+    global answer_cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if answer_cache is None:
+        answer_cache = SemanticAnswerCache()
+
+        # Drop KB sections when a write touches a namespace they drew from
+        from helpers.knowledge_base_helper import add_write_listener
+        add_write_listener(answer_cache.invalidate_namespace)
+    return answer_cache
@@ -4,11 +4,23 @@ Helper functions for the Community Agent to interact with Pinecone and Discourse
 
 import os
 import json
+import logging
+import asyncio
 import aiohttp
 from typing import Dict, Any, List, Optional, Set
 
 from openai import OpenAI
 
+from helpers.deadline import get_current_deadline, run_with_deadline
+from helpers.embedding_cache import get_embedding_cache
+from helpers.embedding_service import get_embedding_model
+from helpers.warm_runtime import get_http_session
+from helpers.request_metrics import timed, timed_coroutine
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 # Configure API keys and endpoints
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
@@ -16,6 +28,7 @@ PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "discourse-topics")
 PINECONE_NAMESPACE = os.getenv("PINECONE_NAMESPACE", "community")
 DISCOURSE_URL = os.getenv("DISCOURSE_URL", "https://community.pricingsaas.com")
 SCORE_THRESHOLD = 0.8  # Only consider results with 80% or higher score
+EMBEDDING_MODEL = get_embedding_model("community")  # Must match the model the community index was built with
 
 # Initialize OpenAI client
 openai_client = None
@@ -23,8 +36,9 @@ if OPENAI_API_KEY:
     try:
         openai_client = OpenAI(api_key=OPENAI_API_KEY)
     except Exception as e:
-        print(f"Error initializing OpenAI client: {e}")
+        logger.error(f"Error initializing OpenAI client: {e}")
 
+@timed_coroutine("query_optimization")
 async def optimize_query_for_embeddings(query):
     """
     Preprocess the user query to optimize it for embedding-based search.
@@ -54,7 +68,10 @@ async def optimize_query_for_embeddings(query):
         Return ONLY the optimized query text without any explanations or additional text.
         """
         
-        response = openai_client.chat.completions.create(
+        # Bounded by the section deadline; on timeout we fall back to the original query
+        response = await run_with_deadline(
+            openai_client.chat.completions.create,
+            deadline=get_current_deadline().for_call("query_optimization"),
             model="gpt-4-turbo",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -65,30 +82,32 @@ async def optimize_query_for_embeddings(query):
         )
         
         optimized_query = response.choices[0].message.content.strip()
-        print(f"Original query: '{query}'")
-        print(f"Optimized query: '{optimized_query}'")
+        logger.debug("Optimized query %r -> %r", query, optimized_query)
         
         return optimized_query
     except Exception as e:
-        print(f"Error optimizing query: {e}")
-        print("Falling back to original query")
+        logger.warning(f"Error optimizing query, falling back to original query: {e}")
         return query
 
-def generate_embedding(text):
-    """Generate embedding for the given text using OpenAI API"""
+def request_embedding(text, model=EMBEDDING_MODEL):
+    """Request the embedding of the given text from the OpenAI API"""
     if not openai_client:
         raise ValueError("OpenAI client is not initialized")
     
     try:
         response = openai_client.embeddings.create(
-            model="text-embedding-ada-002", 
+            model=model, 
             input=text
         )
         return response.data[0].embedding
     except Exception as e:
-        print(f"Error generating embedding: {e}")
+        logger.error(f"Error generating embedding: {e}")
         raise
 
+def generate_embedding(text, model=EMBEDDING_MODEL):
+    """Generate embedding for the given text, served from the embedding cache when possible"""
+    return get_embedding_cache().get_or_compute(text, model, lambda text: request_embedding(text, model))
+
 def query_pinecone(index, vector, top_k=5, filter=None):
     """Query Pinecone index with the given vector"""
     if not index:
@@ -112,7 +131,7 @@ def query_pinecone(index, vector, top_k=5, filter=None):
             
         return index.query(**query_params)
     except Exception as e:
-        print(f"Error querying Pinecone: {e}")
+        logger.error(f"Error querying Pinecone: {e}")
         raise
 
 def extract_text_from_html(html):
@@ -155,6 +174,7 @@ def format_topic_content(topic_data: Dict[str, Any]) -> str:
     
     return formatted_content
 
+@timed_coroutine("discourse")
 async def fetch_topic_from_discourse(topic_id: int) -> Optional[Dict[str, Any]]:
     """
     Fetch a topic from Discourse API
@@ -166,32 +186,39 @@ async def fetch_topic_from_discourse(topic_id: int) -> Optional[Dict[str, Any]]:
         The topic data as a dictionary, or None if the request failed
     """
     try:
-        print(f"Fetching topic {topic_id} from Discourse API...")
+        logger.debug("Fetching topic %s from Discourse API", topic_id)
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{DISCOURSE_URL}/t/{topic_id}.json") as response:
-                if not response.ok:
-                    print(f"Failed to fetch topic: {response.status} {response.reason}")
-                    # If we get a 404, the topic doesn't exist
-                    if response.status == 404:
-                        print(f"Topic {topic_id} not found. It may have been deleted or is not accessible.")
-                    # If we get a 403, we don't have permission to access the topic
-                    elif response.status == 403:
-                        print(f"Access denied for topic {topic_id}. It may be private or require authentication.")
-                    return None
-                
-                try:
-                    topic_data = await response.json()
-                    print(f"Successfully fetched topic {topic_id}")
-                    return topic_data
-                except json.JSONDecodeError:
-                    print(f"Error parsing JSON response for topic {topic_id}")
-                    return None
+        # Bound the request by the section deadline
+        timeout = aiohttp.ClientTimeout(total=get_current_deadline().for_call("discourse").remaining())
+        
+        # Reuse the warm session (and its open connections) across requests
+        session = await get_http_session()
+        async with session.get(f"{DISCOURSE_URL}/t/{topic_id}.json", timeout=timeout) as response:
+            if not response.ok:
+                logger.warning(f"Failed to fetch topic {topic_id}: {response.status} {response.reason}")
+                # If we get a 404, the topic doesn't exist
+                if response.status == 404:
+                    logger.info(f"Topic {topic_id} not found. It may have been deleted or is not accessible.")
+                # If we get a 403, we don't have permission to access the topic
+                elif response.status == 403:
+                    logger.info(f"Access denied for topic {topic_id}. It may be private or require authentication.")
+                return None
+            
+            try:
+                topic_data = await response.json()
+                logger.debug("Fetched topic %s", topic_id)
+                return topic_data
+            except json.JSONDecodeError:
+                logger.warning(f"Error parsing JSON response for topic {topic_id}")
+                return None
     except aiohttp.ClientError as e:
-        print(f"Network error fetching topic {topic_id}: {e}")
+        logger.warning(f"Network error fetching topic {topic_id}: {e}")
+        return None
+    except asyncio.TimeoutError:
+        logger.warning(f"Timed out fetching topic {topic_id}")
         return None
     except Exception as e:
-        print(f"Unexpected error fetching topic {topic_id}: {e}")
+        logger.error(f"Unexpected error fetching topic {topic_id}: {e}")
         return None
 
 def extract_topic_ids_from_matches(matches: List[Dict[str, Any]]) -> Set[int]:
@@ -282,11 +309,25 @@ async def process_pinecone_results(index, query, context):
         # Optimize the query for embedding-based search
         optimized_query = await optimize_query_for_embeddings(query)
         
-        # Generate embedding for the optimized query
-        query_vector = generate_embedding(optimized_query)
+        # Generate embedding for the optimized query (off the event loop, bounded by the deadline).
+        # Reuse the request-scoped embeddings when the agent context carries them.
+        deadline = get_current_deadline()
+        embeddings = getattr(context, "embeddings", None)
+        if embeddings is not None:
+            query_vector = await embeddings.embed(
+                optimized_query, EMBEDDING_MODEL, deadline=deadline.for_call("embedding")
+            )
+        else:
+            with timed("embedding"):
+                query_vector = await run_with_deadline(
+                    generate_embedding, optimized_query, deadline=deadline.for_call("embedding")
+                )
         
         # First, try to find matching posts - limit to top 5
-        post_results = query_pinecone(index, query_vector, 5, {"type": "post"})
+        with timed("pinecone"):
+            post_results = await run_with_deadline(
+                query_pinecone, index, query_vector, 5, {"type": "post"}, deadline=deadline.for_call("pinecone")
+            )
         
         if post_results["matches"] and len(post_results["matches"]) > 0:
             # Filter results to only include those with 80% or higher score
@@ -331,15 +372,18 @@ async def process_pinecone_results(index, query, context):
                                     "content": extract_text_from_html(topic_data.get('post_stream', {}).get('posts', [{}])[0].get('cooked', '')) if topic_data.get('post_stream', {}).get('posts') else ""
                                 }
                                 context.annotations.append(annotation)
-                                print(f"Added community annotation for topic {topic_id}: {annotation['title']}")
+                                logger.debug("Added community annotation for topic %s", topic_id)
                         except Exception as e:
-                            print(f"Error processing topic {topic_id}: {e}")
+                            logger.error(f"Error processing topic {topic_id}: {e}")
             else:
                 results["message"] = "No high-confidence matches found (threshold: 80%)."
         
         if not results.get("posts") or len(results["posts"]) == 0:
             # If no posts found or no high-confidence matches, try to find matching topics - limit to top 5
-            topic_results = query_pinecone(index, query_vector, 5, {"type": "topic"})
+            with timed("pinecone"):
+                topic_results = await run_with_deadline(
+                    query_pinecone, index, query_vector, 5, {"type": "topic"}, deadline=deadline.for_call("pinecone")
+                )
             
             if topic_results["matches"] and len(topic_results["matches"]) > 0:
                 # Filter results to only include those with 80% or higher score
@@ -389,12 +433,14 @@ async def process_pinecone_results(index, query, context):
                                     }
                                     context.annotations.append(annotation)
                             except Exception as e:
-                                print(f"Error processing topic {topic_id}: {e}")
+                                logger.error(f"Error processing topic {topic_id}: {e}")
                 else:
                     results["message"] = "No high-confidence matches found (threshold: 80%)."
             else:
                 results["message"] = "No relevant content found for your query."
     
+    except asyncio.TimeoutError:
+        results["error"] = "Community search timed out; results may be partial."
     except Exception as e:
         results["error"] = str(e)
     
@@ -0,0 +1,338 @@
+"""
+Full-content store for knowledge base entries.
+
+Pinecone metadata only holds a preview of each entry, so the Python KB
+path used to return "[Content would be retrieved from storage]" or a
+chunk instead of the entry body. ContentStore keeps the full content of
+every entry as a blob:
+- gzip-compressed, as {entry_id}.txt.gz (KB text compresses 3-5x);
+  uncompressed {entry_id}.txt blobs written by older code are still read
+- in the Supabase "kb-content" bucket shared with the edge function, or
+  in a local directory standing in for it
+- result sets are hydrated with get_many: cached bodies come from an LRU
+  bounded by CONTENT_CACHE_MAX_BYTES, the rest are downloaded in one
+  concurrent batch instead of one request per result
+
+The store is selected with KB_CONTENT_STORE ("supabase" or "local"); it
+is disabled when unset, and entries then keep their preview only.
+"""
+
+import os
+import gzip
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Store configuration
+KB_CONTENT_STORE = os.getenv("KB_CONTENT_STORE", "").lower()  # "supabase", "local" or "" (disabled)
+KB_CONTENT_BUCKET = os.getenv("KB_CONTENT_BUCKET", "kb-content")
+KB_CONTENT_DIR = os.getenv("KB_CONTENT_DIR", "/tmp/kb-content")
+CONTENT_CACHE_MAX_BYTES = int(os.getenv("KB_CONTENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CONTENT_FETCH_CONCURRENCY = int(os.getenv("KB_CONTENT_FETCH_CONCURRENCY", "16"))  # Downloads in flight at once
+
+# Blob names
+COMPRESSED_SUFFIX = ".txt.gz"
+LEGACY_SUFFIX = ".txt"
+
+
+def compress_content(content: str) -> bytes:
+    """Gzip an entry body (mtime fixed, so equal content gives equal blobs)."""
+    return gzip.compress(content.encode("utf-8"), compresslevel=6, mtime=0)
+
+
+def decompress_content(blob: bytes) -> str:
+    """Read a blob written by compress_content, or a plain UTF-8 blob."""
+    if blob[:2] == b"\x1f\x8b":
+        blob = gzip.decompress(blob)
+    return blob.decode("utf-8")
+
+
+class ContentStore(ABC):
+    """
+    Compressed entry bodies with an LRU cache and batched reads.
+
+    Subclasses implement the blob operations (read_blob, write_blob,
+    delete_blobs) for their storage.
+    """
+
+    def __init__(self, cache_max_bytes: int = CONTENT_CACHE_MAX_BYTES, concurrency: int = CONTENT_FETCH_CONCURRENCY):
+        """
+        Initialize the store.
+
+        Args:
+            cache_max_bytes: Size budget of the LRU of decompressed bodies
+            concurrency: Blob downloads/uploads in flight at once
+        """
+        self.cache_max_bytes = cache_max_bytes
+        self.concurrency = max(concurrency, 1)
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "downloads": 0, "bytes_stored": 0, "bytes_compressed": 0}
+
+    # Blob operations
+
+    @abstractmethod
+    def read_blob(self, name: str) -> Optional[bytes]:
+        """Read a blob (None if it does not exist)."""
+
+    @abstractmethod
+    def write_blob(self, name: str, data: bytes) -> None:
+        """Write or replace a blob."""
+
+    @abstractmethod
+    def delete_blobs(self, names: List[str]) -> None:
+        """Delete blobs (missing ones are ignored)."""
+
+    # LRU of decompressed bodies
+
+    def _cache_get(self, entry_id: str) -> Optional[str]:
+        with self._lock:
+            content = self._cache.get(entry_id)
+            if content is not None:
+                self._cache.move_to_end(entry_id)
+            return content
+
+    def _cache_put(self, entry_id: str, content: str) -> None:
+        with self._lock:
+            if entry_id in self._cache:
+                self._cache_bytes -= len(self._cache.pop(entry_id))
+            if len(content) > self.cache_max_bytes:
+                return
+            self._cache[entry_id] = content
+            self._cache_bytes += len(content)
+            while self._cache_bytes > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    def _cache_drop(self, entry_id: str) -> None:
+        with self._lock:
+            if entry_id in self._cache:
+                self._cache_bytes -= len(self._cache.pop(entry_id))
+
+    # Public API
+
+    def put(self, entry_id: str, content: str) -> None:
+        """
+        Store the full content of an entry.
+
+        Args:
+            entry_id: ID of the entry
+            content: Full content
+        """
+        blob = compress_content(content)
+        self.write_blob(f"{entry_id}{COMPRESSED_SUFFIX}", blob)
+        self.stats["bytes_stored"] += len(content.encode("utf-8"))
+        self.stats["bytes_compressed"] += len(blob)
+        self._cache_put(entry_id, content)
+
+    def put_many(self, contents: Dict[str, str]) -> Dict[str, Exception]:
+        """
+        Store the content of several entries concurrently.
+
+        Args:
+            contents: Mapping of entry ID to full content
+
+        Returns:
+            Mapping of the entry IDs that failed to their error
+        """
+        def put_one(item):
+            try:
+                self.put(*item)
+                return None
+            except Exception as e:
+                logger.error(f"Error storing content of entry {item[0]}: {e}")
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, max(len(contents), 1))) as executor:
+            errors = dict(zip(contents, executor.map(put_one, contents.items())))
+        return {entry_id: error for entry_id, error in errors.items() if error is not None}
+
+    def _download(self, entry_id: str) -> Optional[str]:
+        # Compressed blob first, then the uncompressed one older code wrote
+        for suffix in (COMPRESSED_SUFFIX, LEGACY_SUFFIX):
+            try:
+                blob = self.read_blob(f"{entry_id}{suffix}")
+            except Exception as e:
+                logger.warning(f"Error reading content of entry {entry_id}: {e}")
+                return None
+            if blob is not None:
+                self.stats["downloads"] += 1
+                return decompress_content(blob)
+        return None
+
+    def get(self, entry_id: str) -> Optional[str]:
+        """
+        Get the full content of an entry.
+
+        Args:
+            entry_id: ID of the entry
+
+        Returns:
+            The content, or None if it is not stored
+        """
+        return self.get_many([entry_id]).get(entry_id)
+
+    def get_many(self, entry_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Get the full content of several entries: cached ones from the LRU,
+        the others in one concurrent batch of downloads.
+
+        Args:
+            entry_ids: IDs of the entries
+
+        Returns:
+            Mapping of the entry IDs whose content is stored to their content
+        """
+        contents: Dict[str, str] = {}
+        missing: List[str] = []
+        for entry_id in dict.fromkeys(entry_ids):
+            content = self._cache_get(entry_id)
+            if content is None:
+                missing.append(entry_id)
+            else:
+                contents[entry_id] = content
+        self.stats["hits"] += len(contents)
+        self.stats["misses"] += len(missing)
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(missing))) as executor:
+                for entry_id, content in zip(missing, executor.map(self._download, missing)):
+                    if content is not None:
+                        contents[entry_id] = content
+                        self._cache_put(entry_id, content)
+        return contents
+
+    def delete(self, entry_id: str) -> None:
+        """
+        Delete the stored content of an entry.
+
+        Args:
+            entry_id: ID of the entry
+        """
+        self._cache_drop(entry_id)
+        self.delete_blobs([f"{entry_id}{COMPRESSED_SUFFIX}", f"{entry_id}{LEGACY_SUFFIX}"])
+
+    def report(self) -> Dict[str, Any]:
+        """Stats plus cache size and compression ratio."""
+        stored, compressed = self.stats["bytes_stored"], self.stats["bytes_compressed"]
+        return {
+            **self.stats,
+            "cache_entries": len(self._cache),
+            "cache_bytes": self._cache_bytes,
+            "compression_ratio": stored / compressed if compressed else None
+        }
+
+
+class SupabaseContentStore(ContentStore):
+    """Content store in a Supabase Storage bucket."""
+
+    def __init__(self, bucket: str = KB_CONTENT_BUCKET, client: Any = None, **kwargs):
+        """
+        Initialize the store.
+
+        Args:
+            bucket: Storage bucket
+            client: Supabase client (defaults to supabase_client.get_supabase_client())
+        """
+        super().__init__(**kwargs)
+        self.bucket = bucket
+        self._client = client
+
+    @property
+    def storage(self):
+        if self._client is None:
+            from supabase_client import get_supabase_client
+            self._client = get_supabase_client()
+        return self._client.storage.from_(self.bucket)
+
+    def read_blob(self, name):
+        try:
+            return self.storage.download(name)
+        except Exception as e:
+            # Missing objects surface as storage errors with a 404/not found status
+            if "not found" in str(e).lower() or "404" in str(e):
+                return None
+            raise
+
+    def write_blob(self, name, data):
+        self.storage.upload(name, data, {"content-type": "application/gzip", "upsert": "true"})
+
+    def delete_blobs(self, names):
+        self.storage.remove(names)
+
+
+class LocalContentStore(ContentStore):
+    """Content store in a local directory (stand-in for the bucket)."""
+
+    def __init__(self, directory: str = KB_CONTENT_DIR, **kwargs):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Directory holding the blobs (created if missing)
+        """
+        super().__init__(**kwargs)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def read_blob(self, name):
+        try:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write_blob(self, name, data):
+        # Write then rename, so readers never see a partial blob
+        path = os.path.join(self.directory, name)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+
+    def delete_blobs(self, names):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def create_content_store(name: str) -> Optional[ContentStore]:
+    """
+    Create a content store.
+
+    Args:
+        name: "supabase", "local", or "" for none
+
+    Returns:
+        The store, or None when disabled
+
+    Raises:
+        ValueError: For an unknown store name
+    """
+    if not name:
+        return None
+    if name == "supabase":
+        return SupabaseContentStore()
+    if name == "local":
+        return LocalContentStore()
+    raise ValueError(f"Unknown content store: {name}")
+
+
+# One store per container (None while KB_CONTENT_STORE is unset)
+content_store = None
+
+def get_content_store() -> Optional[ContentStore]:
+    """Get the container's content store, if one is configured."""
+    global content_store
+    if content_store is None and KB_CONTENT_STORE:
+        content_store = create_content_store(KB_CONTENT_STORE)
+    return content_store
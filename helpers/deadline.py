@@ -0,0 +1,224 @@
+"""
+Deadline helpers for time-budgeted streaming.
+
+This module provides a small Deadline object that is created from the
+Lambda context in lambda_handler and passed down to every agent section
+and outbound call. Each knowledge source gets its own time budget, capped
+by the time the Lambda has left, so a slow Pinecone or Discourse call can
+only cost its own section and never the final frames of the stream.
+"""
+
+import os
+import time
+import asyncio
+import contextvars
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+# Time kept back from the Lambda timeout to send the final annotations/done frames
+DEADLINE_RESERVE_MS = int(os.getenv("DEADLINE_RESERVE_MS", "3000"))
+
+# Per-source time budgets in seconds (capped by the overall deadline)
+SOURCE_TIME_BUDGETS = {
+    "reports": float(os.getenv("REPORTS_TIME_BUDGET_S", "60")),
+    "community": float(os.getenv("COMMUNITY_TIME_BUDGET_S", "45")),
+    "kb": float(os.getenv("KB_TIME_BUDGET_S", "20")),
+}
+
+# Budgets for individual outbound calls made inside a source
+CALL_TIME_BUDGETS = {
+    "query_optimization": float(os.getenv("QUERY_OPTIMIZATION_TIME_BUDGET_S", "8")),
+    "embedding": float(os.getenv("EMBEDDING_TIME_BUDGET_S", "5")),
+    "pinecone": float(os.getenv("PINECONE_TIME_BUDGET_S", "5")),
+    "discourse": float(os.getenv("DISCOURSE_TIME_BUDGET_S", "8")),
+}
+
+# Marker returned once a bounded stream is exhausted
+_STREAM_DONE = object()
+
+# Deadline of the section currently running (used by agent tools that cannot take extra arguments)
+_current_deadline: contextvars.ContextVar[Optional["Deadline"]] = contextvars.ContextVar(
+    "current_deadline", default=None
+)
+
+
+class Deadline:
+    """A point in time after which work should be abandoned."""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: Optional[float] = None):
+        """
+        Initialize the deadline.
+
+        Args:
+            expires_at: Absolute time.monotonic() value, or None for no deadline
+        """
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: Optional[float]) -> "Deadline":
+        """Create a deadline the given number of seconds from now."""
+        if seconds is None:
+            return cls(None)
+        return cls(time.monotonic() + seconds)
+
+    @classmethod
+    def from_lambda_context(cls, context: Any, reserve_ms: int = DEADLINE_RESERVE_MS) -> "Deadline":
+        """
+        Create a deadline from the Lambda context.
+
+        Args:
+            context: AWS Lambda context object
+            reserve_ms: Milliseconds kept back for sending the final frames
+
+        Returns:
+            Deadline ending reserve_ms before the Lambda hard timeout,
+            or an unbounded deadline when the context has no time information
+        """
+        get_remaining = getattr(context, "get_remaining_time_in_millis", None)
+        if not callable(get_remaining):
+            return cls(None)
+
+        remaining_ms = max(get_remaining() - reserve_ms, 0)
+        return cls.after(remaining_ms / 1000.0)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None if unbounded."""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def child(self, budget: Optional[float]) -> "Deadline":
+        """
+        Create a deadline for a sub-task with its own budget.
+
+        Args:
+            budget: Seconds allowed for the sub-task, or None for no extra limit
+
+        Returns:
+            Deadline that ends at the earlier of the budget and this deadline
+        """
+        if budget is None:
+            return Deadline(self.expires_at)
+
+        expires_at = time.monotonic() + budget
+        if self.expires_at is not None:
+            expires_at = min(expires_at, self.expires_at)
+        return Deadline(expires_at)
+
+    def for_source(self, source: str) -> "Deadline":
+        """Create the deadline for a knowledge source ("reports", "community" or "kb")."""
+        return self.child(SOURCE_TIME_BUDGETS.get(source))
+
+    def for_call(self, call: str) -> "Deadline":
+        """Create the deadline for an outbound call ("embedding", "pinecone", ...)."""
+        return self.child(CALL_TIME_BUDGETS.get(call))
+
+
+def get_current_deadline() -> Deadline:
+    """Get the deadline of the running section, or an unbounded one."""
+    return _current_deadline.get() or Deadline(None)
+
+
+async def run_with_deadline(func: Callable[..., Any], *args, deadline: Optional[Deadline] = None, **kwargs) -> Any:
+    """
+    Run a blocking call in a worker thread, bounded by a deadline.
+
+    Running the call off the event loop keeps the loop free to enforce the
+    other deadlines while the call is in flight.
+
+    Args:
+        func: Blocking function to call
+        deadline: Deadline for the call (defaults to the current section deadline)
+
+    Returns:
+        The function result
+
+    Raises:
+        asyncio.TimeoutError: If the deadline passes before the call returns
+    """
+    deadline = deadline or get_current_deadline()
+    if deadline.expired:
+        raise asyncio.TimeoutError()
+    return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), timeout=deadline.remaining())
+
+
+async def await_with_deadline(awaitable: Awaitable[Any], deadline: Optional[Deadline] = None) -> Any:
+    """
+    Await a coroutine, bounded by a deadline.
+
+    Args:
+        awaitable: Coroutine or future to await (cancelled if the deadline passes)
+        deadline: Deadline for the call (defaults to the current section deadline)
+
+    Returns:
+        The awaited result
+
+    Raises:
+        asyncio.TimeoutError: If the deadline passes before the call returns
+    """
+    deadline = deadline or get_current_deadline()
+    if deadline.expired:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise asyncio.TimeoutError()
+    return await asyncio.wait_for(awaitable, timeout=deadline.remaining())
+
+
+async def _next_event(iterator: AsyncIterator[Any]) -> Any:
+    """Get the next event of a stream, or _STREAM_DONE when it is exhausted."""
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return _STREAM_DONE
+
+
+async def stream_with_deadline(
+    events: AsyncIterator[Any],
+    deadline: Deadline,
+    timeout_events: Iterable[Any] = ()
+) -> AsyncIterator[Any]:
+    """
+    Yield events from a stream until the deadline passes.
+
+    When the deadline passes the stream is cancelled and the timeout events
+    (typically a "partial results" notice) are yielded instead.
+
+    Args:
+        events: Async event stream to bound
+        deadline: Deadline for the whole stream
+        timeout_events: Events to yield if the deadline passes
+
+    Yields:
+        Events from the stream, followed by timeout_events on expiry
+    """
+    iterator = events.__aiter__()
+
+    # Run every step of the stream in a context that carries this deadline,
+    # so agent tools further down can read it with get_current_deadline()
+    context = contextvars.copy_context()
+    context.run(_current_deadline.set, deadline)
+    loop = asyncio.get_running_loop()
+
+    try:
+        while True:
+            if deadline.expired:
+                raise asyncio.TimeoutError()
+            step = loop.create_task(_next_event(iterator), context=context)
+            event = await asyncio.wait_for(step, timeout=deadline.remaining())
+            if event is _STREAM_DONE:
+                return
+            yield event
+    except asyncio.TimeoutError:
+        for event in timeout_events:
+            yield event
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
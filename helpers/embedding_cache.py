@@ -0,0 +1,296 @@
+"""
+Persistent, content-addressed embedding cache.
+
+Every embedding call used to go to OpenAI, including repeated questions
+and re-saves of unchanged entries. EmbeddingCache keeps vectors in two
+tiers:
+- memory: an LRU of the most recently used vectors in this process
+- disk: a SQLite file (under /tmp on Lambda), so a warm container keeps
+  its vectors across invocations
+
+Entries are keyed by a hash of (model, dimensions, normalized text), so
+the same text embedded with another model never collides. Vectors are
+stored as float32 (half the size of the float64 lists the API returns;
+the difference is far below what similarity search can notice). The disk
+tier is trimmed to EMBEDDING_CACHE_MAX_BYTES, least recently used first.
+
+The cache is on by default inside Lambda and off elsewhere (local runs
+and tests call the API directly); set EMBEDDING_CACHE_ENABLED to force it
+either way.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from helpers.request_metrics import get_timeline
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+EMBEDDING_CACHE_ENABLED = os.getenv(
+    "EMBEDDING_CACHE_ENABLED", "1" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "0"
+).lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "/tmp/embedding_cache.sqlite3")
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "2048"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Share of the disk budget kept after a trim, so trims don't run on every write
+_TRIM_TARGET = 0.9
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for cache keys (trimmed, whitespace runs collapsed)."""
+    return " ".join(text.split())
+
+
+def cache_key(model: str, dimensions: Optional[int], text: str) -> str:
+    """
+    Build the cache key of an embedding.
+
+    Args:
+        model: Embedding model
+        dimensions: Vector dimensions (None for the model default)
+        text: Embedded text
+
+    Returns:
+        Hex SHA-256 of (model, dimensions, normalized text)
+    """
+    material = f"{model}\0{dimensions or ''}\0{normalize_text(text)}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + SQLite) embedding cache."""
+
+    def __init__(
+        self,
+        path: Optional[str] = EMBEDDING_CACHE_PATH,
+        memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS,
+        max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+        enabled: bool = EMBEDDING_CACHE_ENABLED
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite file of the disk tier, or None for memory only
+            memory_items: Vectors kept in the in-process LRU
+            max_bytes: Size budget of the disk tier (vector bytes)
+            enabled: When False every lookup misses and nothing is stored
+        """
+        self.path = path
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, array]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        # Open the disk tier on first use; any failure leaves the cache memory-only
+        if self._db is not None or not self.path:
+            return self._db
+        try:
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._disk_bytes = db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+            self._db = db
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache disk tier unavailable at {self.path}: {e}")
+            self.path = None
+        return self._db
+
+    def _remember(self, key: str, vector: array) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _trim_disk(self, db: sqlite3.Connection) -> None:
+        # Drop the least recently used vectors until the disk tier is back under budget
+        target = self.max_bytes * _TRIM_TARGET
+        rows = db.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._disk_bytes <= target:
+                break
+            evicted.append((key,))
+            self._disk_bytes -= size
+        db.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+        self.stats["evictions"] += len(evicted)
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return vector.tolist()
+
+        db = self._connect()
+        if db is not None:
+            try:
+                row = db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    db.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+                    vector = array("f")
+                    vector.frombytes(row[0])
+                    self._remember(key, vector)
+                    self.stats["disk_hits"] += 1
+                    return vector.tolist()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache read failed: {e}")
+
+        self.stats["misses"] += 1
+        return None
+
+    def _store(self, key: str, embedding: List[float]) -> None:
+        vector = array("f", embedding)
+        self._remember(key, vector)
+
+        db = self._connect()
+        if db is None:
+            return
+        try:
+            data = vector.tobytes()
+            replaced = db.execute("SELECT LENGTH(vector) FROM embeddings WHERE key = ?", (key,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                (key, data, time.time())
+            )
+            self._disk_bytes += len(data) - (replaced[0] if replaced else 0)
+            if self._disk_bytes > self.max_bytes:
+                self._trim_disk(db)
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def get(self, text: str, model: str, dimensions: Optional[int] = None) -> Optional[List[float]]:
+        """
+        Get a cached embedding.
+
+        Args:
+            text: Embedded text
+            model: Embedding model
+            dimensions: Vector dimensions (None for the model default)
+
+        Returns:
+            The embedding, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._lookup(cache_key(model, dimensions, text))
+
+    def put(self, text: str, model: str, embedding: List[float], dimensions: Optional[int] = None) -> None:
+        """
+        Store an embedding in both tiers.
+
+        Args:
+            text: Embedded text
+            model: Embedding model
+            embedding: The vector
+            dimensions: Vector dimensions (None for the model default)
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._store(cache_key(model, dimensions, text), embedding)
+
+    def get_or_compute(
+        self,
+        text: str,
+        model: str,
+        compute: Callable[[str], List[float]],
+        dimensions: Optional[int] = None
+    ) -> List[float]:
+        """
+        Get an embedding from the cache, computing and storing it on a miss.
+
+        Args:
+            text: Text to embed
+            model: Embedding model
+            compute: Blocking function embedding the text with that model
+            dimensions: Vector dimensions (None for the model default)
+
+        Returns:
+            The embedding
+        """
+        return self.get_many_or_compute([text], model, lambda texts: [compute(texts[0])], dimensions)[0]
+
+    def get_many_or_compute(
+        self,
+        texts: List[str],
+        model: str,
+        compute_many: Callable[[List[str]], List[List[float]]],
+        dimensions: Optional[int] = None
+    ) -> List[List[float]]:
+        """
+        Get several embeddings, computing only the missing ones in one call.
+
+        Args:
+            texts: Texts to embed
+            model: Embedding model
+            compute_many: Blocking function embedding a list of texts with that model
+            dimensions: Vector dimensions (None for the model default)
+
+        Returns:
+            The embeddings, in the order of the texts
+        """
+        if not self.enabled:
+            return compute_many(texts)
+
+        timeline = get_timeline()
+        keys = [cache_key(model, dimensions, text) for text in texts]
+        results: List[Optional[List[float]]] = []
+        with self._lock:
+            for key in keys:
+                results.append(self._lookup(key))
+
+        # Compute each missing text once, even if it appears several times
+        missing: Dict[str, int] = {}
+        for position, (key, result) in enumerate(zip(keys, results)):
+            if result is None and key not in missing:
+                missing[key] = position
+        timeline.count("embedding_cache.hits", len(texts) - len(missing))
+        if not missing:
+            return results
+
+        timeline.count("embedding_cache.misses", len(missing))
+        computed = compute_many([texts[position] for position in missing.values()])
+        fresh = dict(zip(missing, computed))
+        with self._lock:
+            for key, embedding in fresh.items():
+                self._store(key, embedding)
+
+        return [result if result is not None else fresh[key] for key, result in zip(keys, results)]
+
+    def report(self) -> Dict[str, int]:
+        """Get the hit/miss/eviction counters plus the current tier sizes."""
+        return {**self.stats, "memory_items": len(self._memory), "disk_bytes": self._disk_bytes}
+
+
+# One cache per container
+embedding_cache = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the container's embedding cache."""
+    global embedding_cache
+    if embedding_cache is None:
+        embedding_cache = EmbeddingCache()
+    return embedding_cache
@@ -0,0 +1,125 @@
+"""
+Request-scoped embedding service.
+
+One user question used to trigger several embedding calls: one for
+routing and caching, one in the KB search and one in the community
+search, each with its own model. RequestEmbeddings computes every
+(text, model) pair at most once per request, shares in-flight calls
+between concurrently running sections, and lets every retriever reuse
+the result.
+
+Embedding models are configured per retriever:
+- kb (also used for routing and the answer cache): KB_EMBEDDING_MODEL,
+  default text-embedding-3-small
+- community: COMMUNITY_EMBEDDING_MODEL, default text-embedding-ada-002
+
+Migrating to a single model:
+1. Re-embed the community index with the KB model (both are 1536-d, so
+   the existing index can be reused).
+2. Set UNIFIED_EMBEDDING_MODEL to that model. Every retriever then uses
+   it, and one embedding call serves routing, caching, KB and community
+   search whenever they embed the same text.
+"""
+
+import os
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+from helpers.deadline import Deadline, get_current_deadline, run_with_deadline
+from helpers.request_metrics import timed
+
+# Embedding model configuration
+KB_EMBEDDING_MODEL = os.getenv("KB_EMBEDDING_MODEL", "text-embedding-3-small")
+COMMUNITY_EMBEDDING_MODEL = os.getenv("COMMUNITY_EMBEDDING_MODEL", "text-embedding-ada-002")
+UNIFIED_EMBEDDING_MODEL = os.getenv("UNIFIED_EMBEDDING_MODEL", "")
+
+RETRIEVER_MODELS = {
+    "kb": KB_EMBEDDING_MODEL,
+    "router": KB_EMBEDDING_MODEL,
+    "answer_cache": KB_EMBEDDING_MODEL,
+    "community": COMMUNITY_EMBEDDING_MODEL,
+}
+
+
+def get_embedding_model(retriever: str) -> str:
+    """
+    Get the embedding model used by a retriever.
+
+    Args:
+        retriever: "kb", "router", "answer_cache" or "community"
+
+    Returns:
+        The unified model if one is configured, otherwise the retriever's own model
+    """
+    return UNIFIED_EMBEDDING_MODEL or RETRIEVER_MODELS[retriever]
+
+
+def _default_embed(text: str, model: str) -> List[float]:
+    # Imported lazily to keep this module free of client initialization
+    from helpers.knowledge_base_helper import generate_embedding
+    return generate_embedding(text, model=model)
+
+
+class RequestEmbeddings:
+    """Embeddings computed during one request, at most once per (text, model)."""
+
+    def __init__(self, embed_fn: Optional[Callable[[str, str], List[float]]] = None):
+        """
+        Initialize the request embeddings.
+
+        Args:
+            embed_fn: Blocking function embedding (text, model); defaults to
+                knowledge_base_helper.generate_embedding
+        """
+        self.embed_fn = embed_fn or _default_embed
+        self._tasks: Dict[Tuple[str, str], "asyncio.Future[List[float]]"] = {}
+        self.stats = {"calls": 0, "reused": 0}
+
+    async def _embed(self, text: str, model: str, deadline: Deadline) -> List[float]:
+        with timed("embedding"):
+            return await run_with_deadline(self.embed_fn, text, model, deadline=deadline)
+
+    async def embed(self, text: str, model: str, deadline: Optional[Deadline] = None) -> List[float]:
+        """
+        Get the embedding of a text, computing it only on first use.
+
+        Concurrent callers asking for the same (text, model) share one call.
+
+        Args:
+            text: Text to embed
+            model: Embedding model
+            deadline: Deadline for the call (defaults to the current section's embedding budget)
+
+        Returns:
+            The embedding vector
+        """
+        key = (model, text)
+        task = self._tasks.get(key)
+
+        if task is None:
+            deadline = deadline or get_current_deadline().for_call("embedding")
+            task = asyncio.ensure_future(self._embed(text, model, deadline))
+            self._tasks[key] = task
+            self.stats["calls"] += 1
+        else:
+            self.stats["reused"] += 1
+
+        try:
+            # Shield the shared call so one cancelled caller does not cancel the others
+            return await asyncio.shield(task)
+        except Exception:
+            # Forget failed calls so a later caller can retry
+            if task.done() and self._tasks.get(key) is task:
+                del self._tasks[key]
+            raise
+
+    async def embed_for(self, text: str, retriever: str, deadline: Optional[Deadline] = None) -> List[float]:
+        """Get the embedding of a text with the model of a retriever."""
+        return await self.embed(text, get_embedding_model(retriever), deadline)
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Get an already computed embedding without calling the API."""
+        task = self._tasks.get((model, text))
+        if task is None or not task.done() or task.cancelled() or task.exception():
+            return None
+        return task.result()
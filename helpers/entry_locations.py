@@ -0,0 +1,156 @@
+"""
+Entry location index for the knowledge base.
+
+Pinecone has no lookup by ID across namespaces, so get_entry used to
+probe public-kb, team-kb and the user's namespace one fetch at a time,
+and update/delete paid for that probe before their own call. The
+location index remembers where each entry lives (namespace, visibility,
+owner), so a lookup is a single fetch.
+
+The index is a small SQLite table, kept in sync by the create, update
+and delete paths. It is a hint, not the source of truth: entries written
+by another container are simply unknown here, and a location that no
+longer holds the entry is dropped and re-learned by a one-time probe.
+Inside Lambda it is stored under /tmp so warm containers keep it; else
+it lives in memory for the process.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# SQLite file of the index (":memory:" keeps it in the process only)
+ENTRY_LOCATIONS_PATH = os.getenv(
+    "ENTRY_LOCATIONS_PATH",
+    "/tmp/kb_entry_locations.sqlite3" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else ":memory:"
+)
+
+
+class EntryLocationIndex:
+    """Mapping of entry ID to namespace, visibility and owner."""
+
+    def __init__(self, path: str = ENTRY_LOCATIONS_PATH):
+        """
+        Initialize the index.
+
+        Args:
+            path: SQLite file, or ":memory:" for a process-local index
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "repairs": 0}
+        try:
+            self._db = self._connect(path)
+        except sqlite3.Error as e:
+            logger.warning(f"Entry location index unavailable at {path}, keeping it in memory: {e}")
+            self.path = ":memory:"
+            self._db = self._connect(self.path)
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS entry_locations ("
+            "entry_id TEXT PRIMARY KEY, namespace TEXT NOT NULL, visibility TEXT, "
+            "owner TEXT, updated_at REAL NOT NULL)"
+        )
+        return db
+
+    def get(self, entry_id: str) -> Optional[Dict[str, str]]:
+        """
+        Look up where an entry lives.
+
+        Args:
+            entry_id: ID of the entry
+
+        Returns:
+            Dict with namespace, visibility and owner, or None if unknown
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT namespace, visibility, owner FROM entry_locations WHERE entry_id = ?", (entry_id,)
+            ).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return {"namespace": row[0], "visibility": row[1], "owner": row[2]}
+
+    def put(self, entry_id: str, namespace: str, visibility: Optional[str] = None, owner: Optional[str] = None) -> None:
+        """
+        Record where an entry lives.
+
+        Args:
+            entry_id: ID of the entry
+            namespace: Namespace holding the entry
+            visibility: Visibility of the entry
+            owner: ID of the user who created the entry
+        """
+        self.put_many([(entry_id, namespace, visibility, owner)])
+
+    def put_many(self, locations: Iterable[Tuple[str, str, Optional[str], Optional[str]]]) -> None:
+        """
+        Record the locations of several entries in one transaction.
+
+        Args:
+            locations: (entry_id, namespace, visibility, owner) tuples
+        """
+        now = time.time()
+        rows = [(entry_id, namespace, visibility, owner, now) for entry_id, namespace, visibility, owner in locations]
+        if not rows:
+            return
+        with self._lock:
+            try:
+                self._db.execute("BEGIN")
+                self._db.executemany("INSERT OR REPLACE INTO entry_locations VALUES (?, ?, ?, ?, ?)", rows)
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._db.execute("ROLLBACK")
+                logger.warning(f"Could not record {len(rows)} entry locations: {e}")
+
+    def remove(self, entry_id: str) -> None:
+        """
+        Forget an entry's location (after a delete, or when it turned out stale).
+
+        Args:
+            entry_id: ID of the entry
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM entry_locations WHERE entry_id = ?", (entry_id,))
+
+    def repair(self, entry_id: str, namespace: Optional[str], visibility: Optional[str] = None, owner: Optional[str] = None) -> None:
+        """
+        Replace a missing or stale location with the result of a probe.
+
+        Args:
+            entry_id: ID of the entry
+            namespace: Namespace the probe found the entry in, or None if not found
+            visibility: Visibility of the entry
+            owner: ID of the user who created the entry
+        """
+        self.stats["repairs"] += 1
+        if namespace is None:
+            self.remove(entry_id)
+        else:
+            self.put(entry_id, namespace, visibility, owner)
+
+
+# One index per container
+entry_locations = None
+
+def get_entry_locations() -> EntryLocationIndex:
+    """Get the container's entry location index."""
+    global entry_locations
+    if entry_locations is None:
+        entry_locations = EntryLocationIndex()
+    return entry_locations
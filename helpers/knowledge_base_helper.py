@@ -8,9 +8,18 @@ This module provides utilities for knowledge base operations, including:
 """
 
 import os
+import json
+import time
 import uuid
+import heapq
+import hashlib
+import asyncio
 import logging
-from typing import Dict, List, Optional, Any, Union, Tuple
+import math
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Any, Union, Tuple
 from datetime import datetime
 from tenacity import retry, stop_after_attempt, wait_exponential
 
@@ -18,14 +27,22 @@ from pinecone import Pinecone, ServerlessSpec
 from openai import OpenAI
 from openai.types.create_embedding_response import CreateEmbeddingResponse
 
+from helpers.content_store import ContentStore, get_content_store
+from helpers.embedding_cache import get_embedding_cache, normalize_text
+from helpers.embedding_service import get_embedding_model
+from helpers.entry_locations import EntryLocationIndex, get_entry_locations
+from helpers.metadata_index import MetadataIndex, UnsupportedFilter, get_metadata_index
+from helpers.vector_backends import VectorBackend, PineconeBackend, get_numpy_backend
 from helpers.schema_definitions import (
     KnowledgeBaseEntryCore,
     KnowledgeBaseEntryExtended,
     validate_entry,
-    entry_to_metadata,
-    metadata_to_entry,
+    validate_entries,
+    format_validation_errors,
     CURRENT_SCHEMA_VERSION
 )
+from helpers.metadata_codec import EntryView, encode_metadata, decode_metadata
+from helpers.search_cache import SearchResultCache, create_search_cache, namespace_versions, search_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,15 +50,157 @@ logger = logging.getLogger(__name__)
 
 # Constants
 PINECONE_INDEX_NAME = "pricingsaas-kb"
-EMBEDDING_MODEL = "text-embedding-3-small"
+VECTOR_BACKEND = os.getenv("KB_VECTOR_BACKEND", "pinecone")  # "pinecone" or "numpy" (in-process)
+EMBEDDING_MODEL = get_embedding_model("kb")
 EMBEDDING_DIMENSIONS = 1536
 MAX_TOKEN_SIZE = 8000  # Max tokens for embedding model
 
+# Bulk ingestion limits
+EMBEDDING_BATCH_SIZE = int(os.getenv("KB_EMBEDDING_BATCH_SIZE", "100"))  # Texts per embeddings request
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("KB_EMBEDDING_BATCH_MAX_TOKENS", "200000"))  # Approximate tokens per request
+UPSERT_BATCH_SIZE = int(os.getenv("KB_UPSERT_BATCH_SIZE", "100"))  # Vectors per Pinecone upsert
+UPSERT_CONCURRENCY = int(os.getenv("KB_UPSERT_CONCURRENCY", "4"))  # Upserts in flight at once
+
+# Chunking of long entries
+CHUNK_MAX_TOKENS = int(os.getenv("KB_CHUNK_MAX_TOKENS", "800"))  # Approximate tokens per chunk (<= MAX_TOKEN_SIZE)
+CHUNK_OVERLAP_TOKENS = int(os.getenv("KB_CHUNK_OVERLAP_TOKENS", "100"))  # Tokens repeated between chunks
+CHUNK_ID_SEPARATOR = "#chunk-"  # Chunk vector IDs are {entry_id}#chunk-{n}
+SEARCH_OVERFETCH = int(os.getenv("KB_SEARCH_OVERFETCH", "3"))  # Matches fetched per result, as chunks share entries
+FETCH_BATCH_SIZE = 100  # IDs per Pinecone fetch when syncing the metadata index
+METADATA_SYNC_RETRY_S = float(os.getenv("KB_METADATA_SYNC_RETRY_S", "30"))  # Wait after a failed sync (doubles per failure)
+METADATA_SYNC_RETRY_MAX_S = float(os.getenv("KB_METADATA_SYNC_RETRY_MAX_S", "600"))  # Longest wait between failed syncs
+CONTENT_PREVIEW_CHARS = int(os.getenv("KB_CONTENT_PREVIEW_CHARS", "500"))  # Content kept in entry metadata
+PLACEHOLDER_CONTENT = "[Content would be retrieved from storage]"
+
+# Hybrid (BM25 + vector) search
+HYBRID_LEXICAL_CANDIDATES = int(os.getenv("KB_HYBRID_LEXICAL_CANDIDATES", "20"))  # BM25 results fused per search
+RRF_K = int(os.getenv("KB_RRF_K", "60"))  # Rank offset of reciprocal rank fusion
+
+# Index verification: cached in-process and in a marker file for INDEX_VERIFY_TTL_S
+INDEX_VERIFY_TTL_S = float(os.getenv("PINECONE_INDEX_VERIFY_TTL_S", "86400"))
+INDEX_MARKER_PATH = os.getenv(
+    "PINECONE_INDEX_MARKER_PATH",
+    "/tmp/pinecone_index_verified.json" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else ""
+)
+_verified_indexes: Dict[str, Dict[str, Any]] = {}
+
 # Initialize OpenAI client
 openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
+# Callbacks notified with the namespace after every create/update/delete
+_write_listeners: List[Callable[[str], Any]] = []
+
+def add_write_listener(listener: Callable[[str], Any]) -> None:
+    """
+    Register a callback that is notified after every write to a namespace.
+    
+    Caches that hold data derived from the knowledge base use this to drop
+    stale results as soon as a namespace they depend on changes.
+    
+    Args:
+        listener: Callable receiving the namespace that was written to
+    """
+    if listener not in _write_listeners:
+        _write_listeners.append(listener)
+
+def notify_namespace_write(namespace: str) -> None:
+    """
+    Notify the write listeners that a namespace changed.
+    
+    The namespace version is bumped first, so cached search results drawn
+    from it are stale before any listener runs.
+    
+    Args:
+        namespace: The namespace that was written to
+    """
+    namespace_versions.bump(namespace)
+    for listener in _write_listeners:
+        try:
+            listener(namespace)
+        except Exception as e:
+            logger.error(f"Error notifying write listener for namespace {namespace}: {e}")
+
+def get_index_dimension(description: Any) -> Optional[int]:
+    """Read the dimension from a Pinecone index description (model or dict)."""
+    dimension = getattr(description, "dimension", None)
+    if dimension is None and isinstance(description, dict):
+        dimension = description.get("dimension")
+    return dimension
+
+def read_index_marker() -> Dict[str, Any]:
+    """Read the persisted index verification marker ({} if missing or unreadable)."""
+    if not INDEX_MARKER_PATH:
+        return {}
+    try:
+        with open(INDEX_MARKER_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_index_marker(index_name: str, verification: Dict[str, Any]) -> None:
+    """Persist the verification of an index next to the others (best effort)."""
+    if not INDEX_MARKER_PATH:
+        return
+    marker = read_index_marker()
+    marker[index_name] = verification
+    try:
+        with open(INDEX_MARKER_PATH, "w") as f:
+            json.dump(marker, f)
+    except OSError as e:
+        logger.warning(f"Could not write index marker {INDEX_MARKER_PATH}: {e}")
+
+def verify_index(pc: Pinecone, index_name: str) -> Dict[str, Any]:
+    """
+    Check that the index exists with the embedding dimensions, at most once per TTL.
+    
+    A verification is cached in-process and in a marker file (under /tmp in
+    Lambda), so warm invocations and new containers within the TTL make no
+    call at all; otherwise it costs one describe_index call.
+    
+    Args:
+        pc: Pinecone client
+        index_name: Name of the index
+        
+    Returns:
+        Verification dict with dimension, host and verified_at
+        
+    Raises:
+        RuntimeError: If the index is missing, unreachable or has other dimensions
+            (create or recreate it with the ensure-index admin command)
+    """
+    now = time.time()
+    cached = _verified_indexes.get(index_name) or read_index_marker().get(index_name)
+    if (
+        cached
+        and cached.get("dimension") == EMBEDDING_DIMENSIONS
+        and now - cached.get("verified_at", 0) < INDEX_VERIFY_TTL_S
+    ):
+        _verified_indexes[index_name] = cached
+        return cached
+    
+    try:
+        description = pc.describe_index(index_name)
+    except Exception as e:
+        raise RuntimeError(
+            f"Pinecone index {index_name} is missing or unreachable ({e}); "
+            f"create it with: python -m helpers.knowledge_base_helper ensure-index"
+        ) from e
+    
+    dimension = get_index_dimension(description)
+    if dimension != EMBEDDING_DIMENSIONS:
+        raise RuntimeError(
+            f"Pinecone index {index_name} has dimension {dimension}, expected {EMBEDDING_DIMENSIONS}; "
+            f"recreate it with: python -m helpers.knowledge_base_helper ensure-index --recreate"
+        )
+    
+    verification = {"dimension": dimension, "host": getattr(description, "host", None), "verified_at": now}
+    _verified_indexes[index_name] = verification
+    write_index_marker(index_name, verification)
+    logger.info(f"Verified Pinecone index {index_name} (dimension {dimension})")
+    return verification
+
 def initialize_pinecone():
-    """Initialize Pinecone client and ensure index exists with correct dimensions."""
+    """Connect to the Pinecone index, verifying it lazily (see verify_index)."""
     api_key = os.environ.get("PINECONE_API_KEY")
     
     if not api_key:
@@ -53,30 +212,48 @@ def initialize_pinecone():
     # Get index name from environment or use default
     index_name = os.environ.get("PINECONE_INDEX", PINECONE_INDEX_NAME)
     
-    # Check if the index already exists
-    index_exists = index_name in [idx['name'] for idx in pc.list_indexes()]
+    verification = verify_index(pc, index_name)
+    
+    # Connecting by host skips the describe call Index(name) would make
+    if verification.get("host"):
+        return pc.Index(host=verification["host"])
+    return pc.Index(index_name)
+
+def ensure_pinecone_index(recreate: bool = False) -> bool:
+    """
+    Admin command: create the index, or recreate it on a dimension mismatch.
+    
+    Never run on the request path; use
+    python -m helpers.knowledge_base_helper ensure-index [--recreate]
+    
+    Args:
+        recreate: Delete and recreate an index whose dimension does not match
+            (this deletes all of its vectors)
+            
+    Returns:
+        True if the index exists with the expected dimension afterwards
+    """
+    api_key = os.environ.get("PINECONE_API_KEY")
+    if not api_key:
+        raise ValueError("PINECONE_API_KEY must be set")
+    
+    pc = Pinecone(api_key=api_key)
+    index_name = os.environ.get("PINECONE_INDEX", PINECONE_INDEX_NAME)
     
-    # If it exists, check if we need to recreate it with the correct dimensions
+    index_exists = index_name in [idx['name'] for idx in pc.list_indexes()]
     if index_exists:
-        try:
-            # Try to create a test vector to verify dimensions
-            test_index = pc.Index(index_name)
-            test_vector = [0.0] * EMBEDDING_DIMENSIONS
-            test_index.upsert(vectors=[("test-vector", test_vector, {})], namespace="test")
-            logger.info(f"Pinecone index {index_name} exists with correct dimensions")
-            test_index.delete(ids=["test-vector"], namespace="test")
-        except Exception as e:
-            # If we get a dimension mismatch error, delete and recreate the index
-            if "dimension" in str(e).lower():
-                logger.warning(f"Dimension mismatch detected in index {index_name}. Deleting and recreating...")
-                pc.delete_index(index_name)
-                logger.info(f"Deleted index {index_name} due to dimension mismatch")
-                index_exists = False
-            else:
-                # Some other error occurred
-                logger.error(f"Error testing Pinecone index: {e}")
+        dimension = get_index_dimension(pc.describe_index(index_name))
+        if dimension != EMBEDDING_DIMENSIONS:
+            if not recreate:
+                logger.error(
+                    f"Index {index_name} has dimension {dimension}, expected {EMBEDDING_DIMENSIONS}; "
+                    f"rerun with --recreate to delete and recreate it"
+                )
+                return False
+            logger.warning(f"Deleting index {index_name} (dimension {dimension}) to recreate it")
+            pc.delete_index(index_name)
+            index_exists = False
     
-    # Create the index if it doesn't exist or was deleted
     if not index_exists:
         logger.info(f"Creating Pinecone index: {index_name} with dimension {EMBEDDING_DIMENSIONS}")
         pc.create_index(
@@ -88,34 +265,310 @@ def initialize_pinecone():
                 region="us-east-1"
             )
         )
-        # Wait a moment for the index to initialize
-        import time
-        time.sleep(2)
     
-    # Get the index
-    return pc.Index(index_name)
+    # Record a fresh verification for this machine
+    _verified_indexes.pop(index_name, None)
+    write_index_marker(index_name, {})
+    verify_index(pc, index_name)
+    return True
+
+def create_vector_backend(name: Optional[str] = None) -> VectorBackend:
+    """
+    Create the vector store of the knowledge base.
+    
+    Args:
+        name: "pinecone" for the hosted index, or "numpy" for the shared
+            in-process store (defaults to KB_VECTOR_BACKEND)
+            
+    Returns:
+        The vector backend
+        
+    Raises:
+        ValueError: For an unknown backend name
+    """
+    name = (name or VECTOR_BACKEND).lower()
+    if name == "pinecone":
+        return PineconeBackend(initialize_pinecone())
+    if name == "numpy":
+        logger.info("Using the in-process NumPy vector backend")
+        return get_numpy_backend()
+    raise ValueError(f"Unknown vector backend: {name}")
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def generate_embedding(text: str) -> List[float]:
+def request_embeddings(texts: List[str], model: str) -> List[List[float]]:
     """
-    Generate embedding vector for text using OpenAI API.
+    Request embedding vectors for several texts in one OpenAI API request.
     
     Args:
-        text: Text to embed
+        texts: Texts to embed
+        model: Embedding model
         
     Returns:
-        List of float values representing the embedding vector
+        Embedding vectors, in the order of the texts
     """
     try:
         response: CreateEmbeddingResponse = openai_client.embeddings.create(
-            input=text,
-            model=EMBEDDING_MODEL
+            input=texts if len(texts) > 1 else texts[0],
+            model=model
         )
-        return response.data[0].embedding
+        # The API reports each vector's input position; don't rely on response order
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
     except Exception as e:
         logger.error(f"Error generating embedding: {e}")
         raise
 
+def generate_embedding(text: str, model: Optional[str] = None) -> List[float]:
+    """
+    Generate embedding vector for text using OpenAI API.
+    
+    Repeated texts are served from the embedding cache.
+    
+    Args:
+        text: Text to embed
+        model: Embedding model (defaults to the knowledge base model)
+        
+    Returns:
+        List of float values representing the embedding vector
+    """
+    return generate_embeddings([text], model)[0]
+
+def generate_embeddings(texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+    """
+    Generate embedding vectors for several texts in one OpenAI API request.
+    
+    Texts already in the embedding cache are not sent to the API.
+    
+    Args:
+        texts: Texts to embed
+        model: Embedding model (defaults to the knowledge base model)
+        
+    Returns:
+        Embedding vectors, in the order of the texts
+    """
+    if not texts:
+        return []
+    model = model or EMBEDDING_MODEL
+    return get_embedding_cache().get_many_or_compute(
+        texts, model, lambda missing: request_embeddings(missing, model), dimensions=EMBEDDING_DIMENSIONS
+    )
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+def chunk_text(
+    text: str, 
+    max_tokens: int = CHUNK_MAX_TOKENS, 
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> List[str]:
+    """
+    Split a text into overlapping, token-bounded chunks.
+    
+    Chunks end at a paragraph, sentence or word boundary when there is one
+    in the second half of the window. Texts that fit in one chunk are
+    returned unchanged.
+    
+    Args:
+        text: Text to split
+        max_tokens: Maximum estimated tokens per chunk
+        overlap_tokens: Estimated tokens repeated at the start of the next chunk
+        
+    Returns:
+        List of chunks (a single item for short texts)
+    """
+    max_chars = max(max_tokens, 1) * 4
+    if len(text) <= max_chars:
+        return [text]
+    overlap_chars = min(overlap_tokens * 4, max_chars // 2)
+    
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            for separator in ("\n\n", ". ", " "):
+                cut = text.rfind(separator, start + max_chars // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        
+        # Step back for the overlap, starting on a word boundary
+        start = max(end - overlap_chars, start + 1)
+        space = text.find(" ", start, end)
+        if overlap_chars and space != -1:
+            start = space + 1
+    return chunks
+
+def mean_vector(vectors: List[List[float]]) -> List[float]:
+    """
+    Average vectors and normalize the result to unit length.
+    
+    Args:
+        vectors: Vectors of equal dimensions
+        
+    Returns:
+        The normalized mean vector
+    """
+    sums = [sum(values) for values in zip(*vectors)]
+    norm = math.sqrt(sum(value * value for value in sums)) or 1.0
+    return [value / norm for value in sums]
+
+def embed_chunks(chunks: List[str]) -> List[List[float]]:
+    """
+    Embed the chunks of an entry in as few requests as the API limits allow.
+    
+    Args:
+        chunks: Chunk texts
+        
+    Returns:
+        Embedding vectors, in the order of the chunks
+    """
+    embeddings = []
+    for batch in batch_for_embedding(chunks):
+        embeddings.extend(generate_embeddings([chunks[i] for i in batch]))
+    return embeddings
+
+def content_hash(text: str) -> str:
+    """
+    Hash a text the way it is embedded (whitespace-normalized).
+    
+    Stored in vector metadata so updates can tell which content actually
+    changed and needs a new embedding.
+    
+    Args:
+        text: Embedded text
+        
+    Returns:
+        Short hex digest
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()[:16]
+
+def chunk_vector_id(entry_id: str, chunk_index: int) -> str:
+    """Get the vector ID of a chunk of an entry."""
+    return f"{entry_id}{CHUNK_ID_SEPARATOR}{chunk_index}"
+
+def build_entry_vectors(
+    entry: KnowledgeBaseEntryExtended, 
+    chunks: List[str], 
+    chunk_embeddings: List[List[float]]
+) -> List[Tuple[str, List[float], Dict[str, Any]]]:
+    """
+    Build the Pinecone vectors of an entry.
+    
+    Short entries are a single vector. A chunked entry gets one vector per
+    chunk, linked to the entry by its "id" and "parent_id" metadata, plus
+    an entry vector (the normalized mean of its chunks) under the entry ID,
+    so fetches by ID keep working.
+    
+    Content is the only embedded field, so every vector records the
+    content_hash, each chunk its chunk_hash, and the entry vector the list
+    of chunk_hashes (see KnowledgeBaseManager.reembed_entry). The entry
+    vector carries the first CONTENT_PREVIEW_CHARS of the content as its
+    content_preview; the full content lives in the content store.
+    
+    Args:
+        entry: The entry
+        chunks: Chunk texts (a single chunk for short entries)
+        chunk_embeddings: Embedding of each chunk
+        
+    Returns:
+        List of (id, vector, metadata) tuples to upsert
+    """
+    metadata = encode_metadata(entry)
+    metadata["content_hash"] = content_hash(entry.content)
+    metadata["content_preview"] = entry.content[:CONTENT_PREVIEW_CHARS]
+    if len(chunks) == 1:
+        return [(entry.id, chunk_embeddings[0], metadata)]
+    
+    chunk_hashes = [content_hash(chunk) for chunk in chunks]
+    vectors = [(entry.id, mean_vector(chunk_embeddings), {**metadata, "chunk_hashes": chunk_hashes})]
+    for chunk_index, (chunk, embedding) in enumerate(zip(chunks, chunk_embeddings)):
+        vectors.append((
+            chunk_vector_id(entry.id, chunk_index),
+            embedding,
+            {
+                **metadata,
+                "parent_id": entry.id,
+                "chunk_index": chunk_index,
+                "chunk_hash": chunk_hashes[chunk_index],
+                "content_preview": chunk
+            }
+        ))
+    return vectors
+
+def collapse_matches(matches: Iterable[Any], views: bool = False) -> List[Tuple[Union[KnowledgeBaseEntryExtended, EntryView], float]]:
+    """
+    Collapse Pinecone matches to unique entries.
+    
+    An entry's score is its best vector's score. Chunk matches carry the
+    chunk text, so the entry's content is its best matching chunk when one
+    matched (even if the entry vector, with its content preview, ranked
+    higher). Matches are kept as EntryViews while collapsing, so only the
+    entries that are returned get decoded.
+    
+    Args:
+        matches: Pinecone matches, best first
+        views: Return read-only EntryViews instead of entry models
+        
+    Returns:
+        List of (entry, score) tuples, best first
+    """
+    # Entry ID -> [view, best score, whether the view's content is a chunk]
+    best: Dict[str, List[Any]] = {}
+    for match in matches:
+        metadata = match.metadata
+        # Extract content from metadata or from separate storage
+        content = metadata.get("content_preview", "")
+        is_chunk = bool(metadata.get("parent_id"))
+        entry_id = metadata.get("parent_id") or metadata.get("id") or match.id
+        
+        current = best.get(entry_id)
+        if current is None:
+            best[entry_id] = [EntryView(metadata, content), match.score, is_chunk and bool(content)]
+        elif content and (not current[0].content or (is_chunk and not current[2])):
+            current[0] = EntryView(metadata, content)
+            current[2] = is_chunk
+    if views:
+        return [(view, score) for view, score, _ in best.values()]
+    return [(view.to_entry(), score) for view, score, _ in best.values()]
+
+def batch_for_embedding(
+    texts: List[str], 
+    max_items: int = EMBEDDING_BATCH_SIZE, 
+    max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS
+) -> List[List[int]]:
+    """
+    Split texts into embeddings requests that stay within the API limits.
+    
+    Token counts are estimated at 4 characters per token.
+    
+    Args:
+        texts: Texts to embed
+        max_items: Maximum texts per request
+        max_tokens: Maximum estimated tokens per request
+        
+    Returns:
+        Lists of text positions, one list per request
+    """
+    batches = []
+    batch, batch_tokens = [], 0
+    for position, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(position)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
 def sanitize_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
     """
     Sanitize metadata for Pinecone by flattening nested structures and
@@ -175,12 +628,136 @@ def get_namespace_for_visibility(visibility: str, user_id: str) -> str:
     else:  # private
         return f"user-{user_id}"
 
+def get_default_namespaces(user_id: str) -> List[str]:
+    """
+    Get the namespaces a user can read by default.
+    
+    Args:
+        user_id: ID of the user
+        
+    Returns:
+        Public, team, and the user's private namespace
+    """
+    return ["public-kb", "team-kb", f"user-{user_id}"]
+
+def build_metadata_filter(filter_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Format a metadata filter for Pinecone.
+    
+    Args:
+        filter_dict: Field filters; list values (e.g. tags) match any listed value
+        
+    Returns:
+        Pinecone metadata filter
+    """
+    # Handle array fields like 'tags' properly
+    pinecone_filter = {}
+    for key, value in filter_dict.items():
+        # For array values like tags, use the $in operator
+        if isinstance(value, list):
+            pinecone_filter[key] = {"$in": value}
+        else:
+            pinecone_filter[key] = value
+    
+    logger.info(f"Using Pinecone filter: {pinecone_filter}")
+    return pinecone_filter
+
+def merge_top_k(
+    result_lists: Iterable[List[Tuple[KnowledgeBaseEntryExtended, float]]], 
+    limit: int
+) -> List[Tuple[KnowledgeBaseEntryExtended, float]]:
+    """
+    Merge per-namespace search results into the overall top results.
+    
+    A min-heap holds at most `limit` results, so merging costs
+    O(n log limit) instead of sorting every match. Equal scores keep
+    their original order (earlier namespaces first).
+    
+    Args:
+        result_lists: Lists of (entry, score) tuples, one per namespace
+        limit: Maximum number of results to return
+        
+    Returns:
+        List of (entry, score) tuples sorted by relevance
+    """
+    if limit <= 0:
+        return []
+    
+    heap = []
+    for position, (entry, score) in enumerate(itertools.chain.from_iterable(result_lists)):
+        # The negated position makes earlier results win ties
+        item = (score, -position, entry)
+        if len(heap) < limit:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+    
+    heap.sort(key=lambda item: item[:2], reverse=True)
+    return [(entry, score) for score, _, entry in heap]
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[List[Tuple[KnowledgeBaseEntryExtended, float]]],
+    limit: int,
+    k: int = RRF_K
+) -> List[Tuple[KnowledgeBaseEntryExtended, float]]:
+    """
+    Combine ranked result lists with reciprocal rank fusion.
+    
+    Each entry scores the sum of 1 / (k + rank) over the lists it appears
+    in, so entries ranked well by several retrievers come first without
+    comparing their (incomparable) scores. An entry keeps the object of the
+    first list it appears in.
+    
+    Args:
+        rankings: Lists of (entry, score) tuples, each best first
+        limit: Maximum number of results to return
+        k: Rank offset (larger values flatten the rank differences)
+        
+    Returns:
+        List of (entry, fused score) tuples sorted by fused score
+    """
+    fused: Dict[str, List[Any]] = {}
+    for ranking in rankings:
+        for rank, (entry, _) in enumerate(ranking, start=1):
+            current = fused.setdefault(entry.id, [entry, 0.0])
+            current[1] += 1.0 / (k + rank)
+    # sorted() is stable: ties keep the order of the first list
+    return sorted(((entry, score) for entry, score in fused.values()), key=lambda item: item[1], reverse=True)[:limit]
+
 class KnowledgeBaseManager:
     """Manager class for knowledge base operations."""
     
-    def __init__(self):
-        """Initialize the knowledge base manager."""
-        self.index = initialize_pinecone()
+    def __init__(
+        self, 
+        locations: Optional[EntryLocationIndex] = None, 
+        metadata_index: Optional[MetadataIndex] = None,
+        backend: Optional[VectorBackend] = None,
+        content_store: Optional[ContentStore] = None,
+        search_cache: Optional[SearchResultCache] = None
+    ):
+        """
+        Initialize the knowledge base manager.
+        
+        Args:
+            locations: Entry location index (defaults to the shared one)
+            metadata_index: Local metadata index for filters (defaults to the shared one)
+            backend: Vector store (defaults to create_vector_backend())
+            content_store: Full-content store (defaults to the configured one, if any)
+            search_cache: Search result cache (defaults to a new one unless
+                KB_SEARCH_CACHE_ENABLED is false)
+        """
+        self.index = backend or create_vector_backend()
+        self.content_store = content_store or get_content_store()
+        self.locations = locations or get_entry_locations()
+        self.metadata_index = metadata_index or get_metadata_index()
+        self.search_cache = search_cache or create_search_cache()
+        
+        # Metadata index syncs run in the background, one at a time per namespace
+        self._sync_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="kb-metadata-sync")
+        self._sync_lock = threading.Lock()
+        self._syncs: Dict[str, Future] = {}
+        self._sync_failures: Dict[str, int] = {}
+        self._sync_retry_at: Dict[str, float] = {}
     
     def create_entry(self, entry_data: Dict[str, Any], user_id: str) -> str:
         """
@@ -193,117 +770,580 @@ class KnowledgeBaseManager:
         Returns:
             ID of the created entry
         """
-        # Generate a unique ID if not provided
-        if "id" not in entry_data:
-            entry_data["id"] = str(uuid.uuid4())
-        
-        # Set timestamps
-        now = datetime.now()
-        entry_data["created_at"] = now.isoformat()
-        entry_data["updated_at"] = now.isoformat()
-        
-        # Set creator
-        entry_data["created_by"] = user_id
+        entry = self.prepare_entry(entry_data, user_id)
         
-        # Set schema version
-        entry_data["schema_version"] = CURRENT_SCHEMA_VERSION
-        
-        # Validate entry against schema
-        validate_entry(entry_data)
-        
-        # Create entry object
-        entry = KnowledgeBaseEntryExtended(**entry_data)
-        
-        # Generate embedding for content
-        embedding = generate_embedding(entry.content)
-        
-        # Convert to metadata for Pinecone
-        metadata = entry_to_metadata(entry)
+        # Generate embeddings for content, chunking long entries
+        vectors = self.embed_entry(entry)
         
         # Determine namespace based on visibility
         namespace = get_namespace_for_visibility(entry.visibility, user_id)
-        logger.info(f"Creating entry {entry.id} in namespace: {namespace}")
+        logger.info(f"Creating entry {entry.id} ({len(vectors)} vectors) in namespace: {namespace}")
         
-        # Upsert vector to Pinecone
-        self.index.upsert(
-            vectors=[(entry.id, embedding, metadata)],
-            namespace=namespace
-        )
+        # Upsert vectors to Pinecone
+        for offset in range(0, len(vectors), UPSERT_BATCH_SIZE):
+            self.index.upsert(
+                vectors=vectors[offset:offset + UPSERT_BATCH_SIZE],
+                namespace=namespace
+            )
+        self.locations.put(entry.id, namespace, entry.visibility, user_id)
+        self.index_metadata(namespace, vectors)
+        self.store_contents([entry])
+        notify_namespace_write(namespace)
         
         return entry.id
     
-    def get_entry(self, entry_id: str, user_id: str) -> Optional[KnowledgeBaseEntryExtended]:
+    def embed_entry(self, entry: KnowledgeBaseEntryExtended) -> List[Tuple[str, List[float], Dict[str, Any]]]:
         """
-        Retrieve a knowledge base entry by ID.
+        Embed an entry's content, chunking it if it is long.
         
         Args:
-            entry_id: ID of the entry to retrieve
-            user_id: ID of the user making the request
+            entry: The entry
             
         Returns:
-            KnowledgeBaseEntryExtended object or None if not found
+            List of (id, vector, metadata) tuples to upsert (see build_entry_vectors)
         """
-        logger.info(f"Attempting to retrieve entry {entry_id} for user {user_id}")
-        namespaces = ["public-kb", "team-kb", f"user-{user_id}"]
-        
-        for namespace in namespaces:
-            try:
-                logger.info(f"Checking namespace: {namespace}")
-                fetch_response = self.index.fetch(ids=[entry_id], namespace=namespace)
-                
-                if not hasattr(fetch_response, 'vectors') or not fetch_response.vectors:
-                    logger.info(f"No vectors found in namespace {namespace}")
-                    continue
-                    
-                if entry_id not in fetch_response.vectors:
-                    logger.info(f"Entry ID {entry_id} not found in namespace {namespace}")
-                    continue
-                    
-                vector_data = fetch_response.vectors[entry_id]
-                
-                if not hasattr(vector_data, 'metadata') or not vector_data.metadata:
-                    logger.info(f"No metadata found for entry {entry_id} in namespace {namespace}")
-                    continue
-                
-                # Extract metadata and add ID if needed
-                metadata = vector_data.metadata
-                content = metadata.get("content_preview", "[Content would be retrieved from storage]")
-                metadata["id"] = entry_id
-                
-                logger.info(f"Entry {entry_id} found in namespace {namespace}")
-                return metadata_to_entry(metadata, content)
-                
-            except Exception as e:
-                logger.error(f"Error fetching entry {entry_id} from namespace {namespace}: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        # Not found in any namespace
-        logger.warning(f"Entry {entry_id} not found in any accessible namespace for user {user_id}")
-        return None
+        chunks = chunk_text(entry.content)
+        if len(chunks) == 1:
+            return build_entry_vectors(entry, chunks, [generate_embedding(entry.content)])
+        logger.info(f"Entry {entry.id} split into {len(chunks)} chunks")
+        return build_entry_vectors(entry, chunks, embed_chunks(chunks))
     
-    def update_entry(self, entry_id: str, update_data: Dict[str, Any], user_id: str) -> bool:
+    def list_chunk_ids(self, entry_id: str, namespace: str) -> List[str]:
         """
-        Update an existing knowledge base entry.
+        List the chunk vector IDs of an entry.
         
         Args:
-            entry_id: ID of the entry to update
-            update_data: Dictionary of fields to update
-            user_id: ID of the user making the update
+            entry_id: ID of the entry
+            namespace: Namespace of the entry
             
         Returns:
-            True if update successful, False otherwise
+            Chunk vector IDs (empty if the entry is not chunked or listing fails)
         """
-        # Get the current entry to ensure visibility
-        current_entry = self.get_entry(entry_id, user_id)
-        if not current_entry:
-            logger.error(f"Could not find entry {entry_id} to update")
-            return False
+        try:
+            return [
+                vector_id
+                for page in self.index.list(prefix=f"{entry_id}{CHUNK_ID_SEPARATOR}", namespace=namespace)
+                for vector_id in page
+            ]
+        except Exception as e:
+            logger.warning(f"Could not list chunks of entry {entry_id} in namespace {namespace}: {e}")
+            return []
+    
+    def index_metadata(self, namespace: str, vectors: List[Tuple[str, List[float], Dict[str, Any]]]) -> None:
+        """
+        Record the metadata of upserted entry vectors in the local metadata index.
         
-        # Make sure updated_at is current
-        update_data["updated_at"] = datetime.now().isoformat()
+        Args:
+            namespace: Namespace the vectors were upserted to
+            vectors: (id, vector, metadata) tuples; chunk vectors are skipped
+        """
+        self.metadata_index.upsert_many(namespace, [
+            {**metadata, "id": vector_id}
+            for vector_id, _, metadata in vectors
+            if CHUNK_ID_SEPARATOR not in vector_id
+        ])
+    
+    def sync_metadata_index(self, namespace: str) -> bool:
+        """
+        Reload the metadata of every entry of a namespace into the local index.
         
-        # Determine namespace based on visibility
+        Picks up entries written by other containers: the entry IDs are
+        listed (chunk vectors skipped) and their metadata fetched by ID,
+        FETCH_BATCH_SIZE at a time.
+        
+        Args:
+            namespace: Namespace to sync
+            
+        Returns:
+            True if the namespace was synced, False if listing or fetching failed
+        """
+        start = time.perf_counter()
+        try:
+            entry_ids = [
+                vector_id
+                for page in self.index.list(namespace=namespace)
+                for vector_id in page
+                if CHUNK_ID_SEPARATOR not in vector_id
+            ]
+            metadatas = []
+            for offset in range(0, len(entry_ids), FETCH_BATCH_SIZE):
+                fetch_response = self.index.fetch(ids=entry_ids[offset:offset + FETCH_BATCH_SIZE], namespace=namespace)
+                for vector_id, vector in (getattr(fetch_response, "vectors", None) or {}).items():
+                    if getattr(vector, "metadata", None):
+                        metadatas.append({**vector.metadata, "id": vector_id})
+        except Exception as e:
+            # Back off so a failing namespace is not rescanned on every request
+            with self._sync_lock:
+                failures = self._sync_failures.get(namespace, 0) + 1
+                self._sync_failures[namespace] = failures
+                delay = min(METADATA_SYNC_RETRY_S * 2 ** (failures - 1), METADATA_SYNC_RETRY_MAX_S)
+                self._sync_retry_at[namespace] = time.monotonic() + delay
+            logger.warning(f"Could not sync the metadata index for namespace {namespace} (retrying in {delay:.0f}s): {e}")
+            return False
+        
+        with self._sync_lock:
+            self._sync_failures.pop(namespace, None)
+            self._sync_retry_at.pop(namespace, None)
+        self.metadata_index.replace_namespace(namespace, metadatas)
+        logger.info(
+            f"Synced {len(metadatas)} entries of namespace {namespace} into the metadata index "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return True
+    
+    def schedule_sync(self, namespace: str) -> Optional[Future]:
+        """
+        Sync a namespace into the metadata index in the background.
+        
+        Args:
+            namespace: Namespace to sync
+            
+        Returns:
+            The future of the sync (the one already running, if any), or None
+            while the namespace is backing off after a failed sync
+        """
+        with self._sync_lock:
+            future = self._syncs.get(namespace)
+            if future is not None and not future.done():
+                return future
+            if time.monotonic() < self._sync_retry_at.get(namespace, 0):
+                return None
+            future = self._sync_executor.submit(self.sync_metadata_index, namespace)
+            self._syncs[namespace] = future
+            return future
+    
+    def refresh_metadata_index(self, namespaces: List[str], wait_for_sync: bool = False) -> List[str]:
+        """
+        Start background syncs of the namespaces the metadata index has not seen within its TTL.
+        
+        Requests never wait for a full namespace scan: a namespace synced
+        before is served as it is while it refreshes, and one never synced
+        is left to the caller's Pinecone fallback until its first sync ends.
+        
+        Args:
+            namespaces: Namespaces the caller is about to read
+            wait_for_sync: Wait for the started syncs (e.g. when warming a container)
+            
+        Returns:
+            The namespaces the index can answer for now
+        """
+        futures = [
+            self.schedule_sync(namespace)
+            for namespace in namespaces
+            if self.metadata_index.needs_sync(namespace)
+        ]
+        if wait_for_sync:
+            for future in futures:
+                if future is not None:
+                    future.result()
+        return [namespace for namespace in namespaces if self.metadata_index.has_synced(namespace)]
+    
+    def query_metadata_index(
+        self,
+        namespaces: List[str],
+        filter_dict: Dict[str, Any],
+        limit: int = 10,
+        offset: int = 0,
+        sort_by: str = "updated_at",
+        descending: bool = True
+    ) -> List[KnowledgeBaseEntryExtended]:
+        """
+        Filter entries with the local metadata index (namespaces must be synced).
+        
+        Args:
+            namespaces: Namespaces to filter
+            filter_dict: Metadata filters (see metadata_index.compile_filter)
+            limit: Maximum number of results
+            offset: Number of results to skip
+            sort_by: Metadata field to sort by
+            descending: Sort order
+            
+        Returns:
+            List of entries matching the filter
+            
+        Raises:
+            UnsupportedFilter: If the index cannot answer the filter
+        """
+        rows = self.metadata_index.query(namespaces, filter_dict, sort_by, descending, limit, offset)
+        return [
+            decode_metadata(metadata, metadata.get("content_preview", PLACEHOLDER_CONTENT), trusted=True)
+            for _, metadata in rows
+        ]
+    
+    def store_contents(self, entries: List[KnowledgeBaseEntryExtended]) -> None:
+        """
+        Save the full content of entries to the content store, if one is configured.
+        
+        A failure is logged but does not fail the write: the entry then
+        only has its preview.
+        
+        Args:
+            entries: Entries that were written
+        """
+        if not self.content_store or not entries:
+            return
+        errors = self.content_store.put_many({entry.id: entry.content for entry in entries})
+        if errors:
+            logger.error(f"Could not store the content of {len(errors)} entries: {sorted(errors)}")
+    
+    def hydrate(self, entries: List[KnowledgeBaseEntryExtended]) -> List[KnowledgeBaseEntryExtended]:
+        """
+        Replace the content previews of entries with their full content.
+        
+        All bodies are read in one batch (cached ones from memory, the rest
+        downloaded concurrently). Entries without stored content keep
+        their preview.
+        
+        Args:
+            entries: Entries with previews
+            
+        Returns:
+            The entries, in the same order, with full content where available
+        """
+        if not self.content_store or not entries:
+            return entries
+        contents = self.content_store.get_many(entry.id for entry in entries)
+        return [
+            entry.model_copy(update={"content": contents[entry.id]}) if entry.id in contents else entry
+            for entry in entries
+        ]
+    
+    def fill_system_fields(self, entry_data: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+        """
+        Fill in the system fields of a new entry (ID, timestamps, creator, schema version).
+        
+        Args:
+            entry_data: Entry data dictionary (updated in place)
+            user_id: ID of the user creating the entry
+            
+        Returns:
+            The same dictionary
+        """
+        # Generate a unique ID if not provided
+        if "id" not in entry_data:
+            entry_data["id"] = str(uuid.uuid4())
+        
+        # Set timestamps
+        now = datetime.now()
+        entry_data["created_at"] = now.isoformat()
+        entry_data["updated_at"] = now.isoformat()
+        
+        # Set creator
+        entry_data["created_by"] = user_id
+        
+        # Set schema version
+        entry_data["schema_version"] = CURRENT_SCHEMA_VERSION
+        return entry_data
+    
+    def prepare_entry(self, entry_data: Dict[str, Any], user_id: str) -> KnowledgeBaseEntryExtended:
+        """
+        Fill in the system fields of a new entry and validate it.
+        
+        Args:
+            entry_data: Entry data dictionary (updated in place)
+            user_id: ID of the user creating the entry
+            
+        Returns:
+            The validated entry
+            
+        Raises:
+            ValidationError: If the entry does not match the schema
+        """
+        self.fill_system_fields(entry_data, user_id)
+        
+        # Validate entry against schema
+        validate_entry(entry_data)
+        
+        # Create entry object
+        return KnowledgeBaseEntryExtended(**entry_data)
+    
+    def create_entries(self, entries: List[Dict[str, Any]], user_id: str) -> Dict[str, Any]:
+        """
+        Create many knowledge base entries at once.
+        
+        All entries are validated up front, their contents (chunked when
+        long) are embedded with many texts per embeddings request, and the
+        vectors are upserted per namespace in batches of UPSERT_BATCH_SIZE,
+        with up to UPSERT_CONCURRENCY batches in flight. A failing entry,
+        embeddings request or upsert batch only fails the entries it contains
+        (the vectors those entries had in other batches are deleted).
+        
+        Args:
+            entries: Entry data dictionaries
+            user_id: ID of the user creating the entries
+            
+        Returns:
+            Dictionary with:
+            - results: one {"id", "error"} dict per input entry, in input order
+              (error is None on success)
+            - created / failed: entry counts
+            - seconds / entries_per_second: throughput of the load
+        """
+        start = time.perf_counter()
+        results: List[Dict[str, Any]] = [{"id": None, "error": None} for _ in entries]
+        
+        # Validate everything in one pass before spending any API calls,
+        # reporting every schema error of each invalid entry
+        filled = [self.fill_system_fields(dict(entry_data), user_id) for entry_data in entries]
+        prepared: List[Tuple[int, KnowledgeBaseEntryExtended]] = []
+        for position, (entry_data, errors) in enumerate(zip(filled, validate_entries(filled))):
+            if errors:
+                results[position]["error"] = f"Invalid entry: {format_validation_errors(errors)}"
+                continue
+            try:
+                entry = KnowledgeBaseEntryExtended(**entry_data)
+                results[position]["id"] = entry.id
+                prepared.append((position, entry))
+            except Exception as e:
+                results[position]["error"] = f"Invalid entry: {getattr(e, 'message', e)}"
+        
+        # Split long contents and embed every chunk of every entry in batched requests
+        entry_chunks = [chunk_text(entry.content) for _, entry in prepared]
+        texts = [(i, chunk) for i, chunks in enumerate(entry_chunks) for chunk in chunks]
+        chunk_embeddings: List[List[List[float]]] = [[] for _ in prepared]
+        for batch in batch_for_embedding([chunk for _, chunk in texts]):
+            try:
+                embeddings = generate_embeddings([texts[i][1] for i in batch])
+            except Exception as e:
+                for i in batch:
+                    results[prepared[texts[i][0]][0]]["error"] = f"Embedding failed: {e}"
+                continue
+            for i, embedding in zip(batch, embeddings):
+                chunk_embeddings[texts[i][0]].append(embedding)
+        
+        # Group the vectors per namespace in upsert-sized batches
+        by_namespace: Dict[str, List[Tuple[int, Tuple[str, List[float], Dict[str, Any]]]]] = {}
+        for i, (position, entry) in enumerate(prepared):
+            if results[position]["error"]:
+                continue
+            namespace = get_namespace_for_visibility(entry.visibility, user_id)
+            for vector in build_entry_vectors(entry, entry_chunks[i], chunk_embeddings[i]):
+                by_namespace.setdefault(namespace, []).append((position, vector))
+        batches: List[Tuple[str, List[int], List[Tuple[str, List[float], Dict[str, Any]]]]] = []
+        for namespace, items in by_namespace.items():
+            for offset in range(0, len(items), UPSERT_BATCH_SIZE):
+                batch = items[offset:offset + UPSERT_BATCH_SIZE]
+                batches.append((namespace, [position for position, _ in batch], [vector for _, vector in batch]))
+        
+        def upsert_batch(batch) -> Optional[Exception]:
+            namespace, _, vectors = batch
+            try:
+                self.index.upsert(vectors=vectors, namespace=namespace)
+                return None
+            except Exception as e:
+                logger.error(f"Error upserting {len(vectors)} vectors to namespace {namespace}: {e}")
+                return e
+        
+        namespaces_by_position = {position: batch[0] for batch in batches for position in batch[1]}
+        with ThreadPoolExecutor(max_workers=max(UPSERT_CONCURRENCY, 1)) as executor:
+            errors = list(executor.map(upsert_batch, batches))
+        for (namespace, positions, _), error in zip(batches, errors):
+            if error is not None:
+                for position in positions:
+                    results[position]["error"] = f"Upsert failed: {error}"
+        
+        # A long entry can span batches: only entries whose vectors were all
+        # written are indexed, and the vectors already written for the others
+        # are deleted so they leave no orphaned chunks behind
+        written = set()
+        orphans: Dict[str, List[str]] = {}
+        for (namespace, positions, vectors), error in zip(batches, errors):
+            if error is not None:
+                continue
+            complete = [vector for position, vector in zip(positions, vectors) if results[position]["error"] is None]
+            if complete:
+                written.add(namespace)
+                self.index_metadata(namespace, complete)
+            orphans.setdefault(namespace, []).extend(
+                vector[0] for position, vector in zip(positions, vectors) if results[position]["error"] is not None
+            )
+        for namespace, vector_ids in orphans.items():
+            if not vector_ids:
+                continue
+            try:
+                self.index.delete(ids=vector_ids, namespace=namespace)
+            except Exception as e:
+                logger.error(f"Could not delete {len(vector_ids)} vectors of failed entries from namespace {namespace}: {e}")
+        
+        # Notify once per namespace rather than once per entry
+        for namespace in written:
+            notify_namespace_write(namespace)
+        
+        # Failed entries have no id
+        for result in results:
+            if result["error"]:
+                result["id"] = None
+        
+        self.locations.put_many(
+            (entry.id, namespaces_by_position[position], entry.visibility, user_id)
+            for position, entry in prepared
+            if results[position]["error"] is None
+        )
+        self.store_contents([entry for position, entry in prepared if results[position]["error"] is None])
+        
+        seconds = time.perf_counter() - start
+        created = sum(1 for result in results if result["error"] is None)
+        entries_per_second = created / seconds if seconds > 0 else 0.0
+        logger.info(
+            f"Bulk created {created}/{len(entries)} entries in {seconds:.2f}s "
+            f"({entries_per_second:.1f} entries/s)"
+        )
+        
+        return {
+            "results": results,
+            "created": created,
+            "failed": len(entries) - created,
+            "seconds": seconds,
+            "entries_per_second": entries_per_second
+        }
+    
+    def get_entry(
+        self, 
+        entry_id: str, 
+        user_id: str, 
+        include_content: bool = True
+    ) -> Optional[KnowledgeBaseEntryExtended]:
+        """
+        Retrieve a knowledge base entry by ID.
+        
+        Args:
+            entry_id: ID of the entry to retrieve
+            user_id: ID of the user making the request
+            include_content: Read the full content from the content store
+                (otherwise the entry has its content preview)
+            
+        Returns:
+            KnowledgeBaseEntryExtended object or None if not found
+        """
+        entry = self.find_entry(entry_id, user_id)
+        if entry is None or not include_content:
+            return entry
+        return self.hydrate([entry])[0]
+    
+    def find_entry(self, entry_id: str, user_id: str) -> Optional[KnowledgeBaseEntryExtended]:
+        """
+        Retrieve a knowledge base entry by ID, with its content preview only.
+        
+        Args:
+            entry_id: ID of the entry to retrieve
+            user_id: ID of the user making the request
+            
+        Returns:
+            KnowledgeBaseEntryExtended object or None if not found
+        """
+        logger.info(f"Attempting to retrieve entry {entry_id} for user {user_id}")
+        namespaces = get_default_namespaces(user_id)
+
+        # One fetch when the location index knows the entry's namespace
+        location = self.locations.get(entry_id)
+        if location and location["namespace"] in namespaces:
+            entry = self.fetch_from_namespace(entry_id, location["namespace"])
+            if entry is not None:
+                return entry
+            logger.info(f"Stale location for entry {entry_id}, probing all namespaces")
+
+        # Unknown or stale location: probe every namespace once and repair the index
+        for namespace in namespaces:
+            if location and namespace == location["namespace"]:
+                continue
+            entry = self.fetch_from_namespace(entry_id, namespace)
+            if entry is not None:
+                self.locations.repair(entry_id, namespace, entry.visibility, entry.created_by)
+                return entry
+
+        # Not found in any namespace: forget the location only if it was probed
+        # (another user's private location is valid, just not readable here)
+        if location and location["namespace"] in namespaces:
+            self.locations.repair(entry_id, None)
+        logger.warning(f"Entry {entry_id} not found in any accessible namespace for user {user_id}")
+        return None
+
+    def fetch_from_namespace(self, entry_id: str, namespace: str) -> Optional[KnowledgeBaseEntryExtended]:
+        """
+        Retrieve an entry from one namespace.
+
+        Args:
+            entry_id: ID of the entry to retrieve
+            namespace: Namespace to look in
+
+        Returns:
+            KnowledgeBaseEntryExtended object or None if not in this namespace
+        """
+        try:
+            logger.info(f"Checking namespace: {namespace}")
+            fetch_response = self.index.fetch(ids=[entry_id], namespace=namespace)
+
+            if not hasattr(fetch_response, 'vectors') or not fetch_response.vectors:
+                logger.info(f"No vectors found in namespace {namespace}")
+                return None
+
+            if entry_id not in fetch_response.vectors:
+                logger.info(f"Entry ID {entry_id} not found in namespace {namespace}")
+                return None
+
+            vector_data = fetch_response.vectors[entry_id]
+
+            if not hasattr(vector_data, 'metadata') or not vector_data.metadata:
+                logger.info(f"No metadata found for entry {entry_id} in namespace {namespace}")
+                return None
+
+            # Extract metadata and add ID if needed
+            metadata = vector_data.metadata
+            content = metadata.get("content_preview", PLACEHOLDER_CONTENT)
+            metadata["id"] = entry_id
+
+            logger.info(f"Entry {entry_id} found in namespace {namespace}")
+            return decode_metadata(metadata, content, trusted=True)
+
+        except Exception as e:
+            logger.error(f"Error fetching entry {entry_id} from namespace {namespace}: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+    def update_entry(self, entry_id: str, update_data: Dict[str, Any], user_id: str) -> bool:
+        """
+        Update an existing knowledge base entry.
+        
+        Args:
+            entry_id: ID of the entry to update
+            update_data: Dictionary of fields to update
+            user_id: ID of the user making the update
+            
+        Returns:
+            True if update successful, False otherwise
+        """
+        # Get the current entry to ensure visibility
+        current_entry = self.get_entry(entry_id, user_id, include_content=False)
+        if not current_entry:
+            logger.error(f"Could not find entry {entry_id} to update")
+            return False
+
+        return self.apply_update(current_entry, update_data, user_id)
+
+    def apply_update(
+        self,
+        current_entry: KnowledgeBaseEntryExtended,
+        update_data: Dict[str, Any],
+        user_id: str
+    ) -> bool:
+        """
+        Write an update to an entry that has already been retrieved.
+
+        Args:
+            current_entry: The entry as currently stored
+            update_data: Dictionary of fields to update
+            user_id: ID of the user making the update
+
+        Returns:
+            True if update successful, False otherwise
+        """
+        entry_id = current_entry.id
+
+        # Make sure updated_at is current
+        update_data["updated_at"] = datetime.now().isoformat()
+        
+        # Determine namespace based on visibility
         namespace = get_namespace_for_visibility(current_entry.visibility, user_id)
         logger.info(f"Updating entry {entry_id} in namespace: {namespace}")
         
@@ -314,7 +1354,7 @@ class KnowledgeBaseManager:
         entry_dict.update(update_data)
         
         # Convert to metadata format for Pinecone
-        metadata = entry_to_metadata(KnowledgeBaseEntryExtended(**entry_dict))
+        metadata = encode_metadata(KnowledgeBaseEntryExtended(**entry_dict))
         
         # Special handling for tags
         if "tags" in update_data and update_data["tags"] is not None:
@@ -324,31 +1364,115 @@ class KnowledgeBaseManager:
                 metadata["tags"] = update_data["tags"]
             logger.info(f"Updated tags: {metadata['tags']}")
         
-        # Update embeddings if title has changed
-        embedding = None
-        if "title" in update_data and update_data["title"] and update_data["title"] != current_entry.title:
-            logger.info(f"Title changed, generating new embedding")
-            embedding = generate_embedding(update_data["title"])
+        # New content is always stored and previewed; the stored chunk hashes
+        # only decide which chunks need embedding (none for a whitespace edit)
+        if update_data.get("content"):
+            stored = self.fetch_vectors([entry_id], namespace).get(entry_id)
+            stored_metadata = dict(getattr(stored, "metadata", None) or {})
+            logger.info(f"Content updated, re-embedding changed chunks")
+            return self.reembed_entry(KnowledgeBaseEntryExtended(**entry_dict), metadata, namespace, stored_metadata)
         
-        # Sanitize metadata for Pinecone
-        metadata = sanitize_metadata(metadata)
+        # Nothing semantic changed: just update the metadata, of the entry and of
+        # its chunks (so filters apply to them too); stored hashes are kept
+        logger.info(f"Updating entry metadata only")
+        self.index.update(
+            id=entry_id,
+            set_metadata=metadata,
+            namespace=namespace
+        )
+        for chunk_id in self.list_chunk_ids(entry_id, namespace):
+            self.index.update(id=chunk_id, set_metadata=metadata, namespace=namespace)
+        self.locations.put(entry_id, namespace, metadata.get("visibility"), current_entry.created_by)
+        # Merged like set_metadata, so the row keeps the content preview and
+        # hashes that filters and BM25 read
+        self.metadata_index.update(namespace, {**metadata, "id": entry_id})
+        notify_namespace_write(namespace)
         
-        # Update in Pinecone
-        if embedding:
-            # If embedding changed, we need to do a full upsert
-            logger.info(f"Upserting entry with new embedding")
-            self.index.upsert(
-                vectors=[(entry_id, embedding, metadata)],
-                namespace=namespace
-            )
-        else:
-            # Just update the metadata
-            logger.info(f"Updating entry metadata only")
-            self.index.update(
-                id=entry_id,
-                set_metadata=metadata,
-                namespace=namespace
-            )
+        return True
+    
+    def fetch_vectors(self, ids: List[str], namespace: str) -> Dict[str, Any]:
+        """
+        Fetch stored vectors (values and metadata) by ID.
+        
+        Args:
+            ids: Vector IDs
+            namespace: Namespace of the vectors
+            
+        Returns:
+            Mapping of the IDs found to their vectors (empty on error)
+        """
+        if not ids:
+            return {}
+        try:
+            fetch_response = self.index.fetch(ids=ids, namespace=namespace)
+            return dict(getattr(fetch_response, "vectors", None) or {})
+        except Exception as e:
+            logger.warning(f"Could not fetch vectors from namespace {namespace}: {e}")
+            return {}
+    
+    def reembed_entry(
+        self, 
+        entry: KnowledgeBaseEntryExtended, 
+        metadata: Dict[str, Any], 
+        namespace: str, 
+        stored_metadata: Dict[str, Any]
+    ) -> bool:
+        """
+        Replace the vectors of an entry whose content was updated, embedding only new chunks.
+        
+        The new content is chunked and each chunk hash is looked up among the
+        stored ones. Chunks that already exist (possibly at another position)
+        reuse their stored vector, so only edited chunks are sent to the
+        embeddings API; an edit that only changes whitespace embeds nothing
+        but still rewrites the previews and the stored content. Chunks left over from a longer previous version are
+        deleted.
+        
+        Args:
+            entry: The updated entry
+            metadata: Metadata of the updated entry
+            namespace: Namespace of the entry
+            stored_metadata: Metadata of the stored entry vector
+            
+        Returns:
+            True if update successful
+        """
+        # Vector ID holding each stored chunk hash (the entry vector itself for unchunked entries)
+        stored_ids: Dict[str, str] = {}
+        if stored_metadata.get("chunk_hashes"):
+            for chunk_index, stored_hash in enumerate(stored_metadata["chunk_hashes"]):
+                stored_ids.setdefault(stored_hash, chunk_vector_id(entry.id, chunk_index))
+        elif stored_metadata.get("content_hash"):
+            stored_ids[stored_metadata["content_hash"]] = entry.id
+        
+        chunks = chunk_text(entry.content)
+        hashes = [content_hash(chunk) for chunk in chunks]
+        reused = self.fetch_vectors(sorted({stored_ids[h] for h in hashes if h in stored_ids}), namespace)
+        
+        # Embed only the chunks without a stored vector, in batched requests
+        embeddings: List[Optional[List[float]]] = []
+        for chunk_hash in hashes:
+            stored = reused.get(stored_ids.get(chunk_hash, ""))
+            embeddings.append(list(stored.values) if getattr(stored, "values", None) else None)
+        changed = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        for i, embedding in zip(changed, embed_chunks([chunks[i] for i in changed])):
+            embeddings[i] = embedding
+        logger.info(f"Re-embedded {len(changed)} of {len(chunks)} chunks of entry {entry.id}")
+        
+        old_chunk_ids = set(self.list_chunk_ids(entry.id, namespace))
+        vectors = [
+            (vector_id, embedding, {**vector_metadata, **metadata})
+            for vector_id, embedding, vector_metadata in build_entry_vectors(entry, chunks, embeddings)
+        ]
+        for offset in range(0, len(vectors), UPSERT_BATCH_SIZE):
+            self.index.upsert(vectors=vectors[offset:offset + UPSERT_BATCH_SIZE], namespace=namespace)
+        
+        stale_ids = sorted(old_chunk_ids - {vector_id for vector_id, _, _ in vectors})
+        if stale_ids:
+            self.index.delete(ids=stale_ids, namespace=namespace)
+        self.locations.put(entry.id, namespace, entry.visibility, entry.created_by)
+        self.index_metadata(namespace, vectors)
+        self.store_contents([entry])
+        notify_namespace_write(namespace)
         
         return True
     
@@ -364,10 +1488,25 @@ class KnowledgeBaseManager:
             Boolean indicating success
         """
         # First retrieve the entry to check permissions
-        current_entry = self.get_entry(entry_id, user_id)
+        current_entry = self.get_entry(entry_id, user_id, include_content=False)
         if not current_entry:
             return False
-        
+
+        return self.apply_delete(current_entry, user_id)
+
+    def apply_delete(self, current_entry: KnowledgeBaseEntryExtended, user_id: str) -> bool:
+        """
+        Delete an entry that has already been retrieved, if the user may.
+
+        Args:
+            current_entry: The entry as currently stored
+            user_id: ID of the user making the deletion
+
+        Returns:
+            Boolean indicating success
+        """
+        entry_id = current_entry.id
+
         # Check if user has permission to delete
         if current_entry.created_by != user_id and current_entry.visibility == "private":
             return False
@@ -375,9 +1514,14 @@ class KnowledgeBaseManager:
         # Determine namespace
         namespace = get_namespace_for_visibility(current_entry.visibility, user_id)
         
-        # Delete from Pinecone
+        # Delete from Pinecone, together with the entry's chunks
         try:
-            self.index.delete(ids=[entry_id], namespace=namespace)
+            self.index.delete(ids=[entry_id] + self.list_chunk_ids(entry_id, namespace), namespace=namespace)
+            self.locations.remove(entry_id)
+            self.metadata_index.remove(entry_id)
+            if self.content_store:
+                self.content_store.delete(entry_id)
+            notify_namespace_write(namespace)
             return True
         except Exception as e:
             logger.error(f"Error deleting entry: {e}")
@@ -389,7 +1533,11 @@ class KnowledgeBaseManager:
         user_id: str, 
         limit: int = 10, 
         namespaces: Optional[List[str]] = None,
-        filter_dict: Optional[Dict[str, Any]] = None
+        filter_dict: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None,
+        include_content: bool = False,
+        views: bool = False,
+        hybrid: bool = False
     ) -> List[Tuple[KnowledgeBaseEntryExtended, float]]:
         """
         Search the knowledge base using semantic similarity.
@@ -400,119 +1548,274 @@ class KnowledgeBaseManager:
             limit: Maximum number of results to return
             namespaces: Optional list of namespaces to search in
             filter_dict: Optional Pinecone metadata filters
+            query_embedding: Optional precomputed embedding of the query
+                (from the request-scoped embedding service)
+            include_content: Return full content instead of previews
+                (see hydrate; previews can also be hydrated later)
+            views: Return read-only EntryViews, decoded as their fields are
+                read, instead of entry models (see metadata_codec)
+            hybrid: Also rank entries by BM25 over their title, tags and content
+                preview (see search_lexical) and fuse both rankings with
+                reciprocal rank fusion; scores are then fused scores, not cosine
             
         Returns:
             List of (entry, score) tuples sorted by relevance
         """
-        # Generate embedding for query
-        query_embedding = generate_embedding(query)
+        # Generate embedding for query unless the caller already has it
+        if query_embedding is None:
+            query_embedding = generate_embedding(query)
         
         # Default namespaces - user can see public, team, and their own private entries
         if not namespaces:
-            namespaces = [
-                "public-kb",
-                "team-kb",
-                f"user-{user_id}"
-            ]
+            namespaces = get_default_namespaces(user_id)
         
-        results = []
+        # Repeated searches are answered from the cache until a namespace changes
+        key, versions = self.search_cache_key(query, namespaces, filter_dict, query_embedding, limit, include_content, views, hybrid)
+        if key is not None:
+            cached = self.search_cache.get(key, versions)
+            if cached is not None:
+                return cached
         
-        # Search each namespace
+        # Search each namespace and keep the overall top results
+        result_lists = []
         for namespace in namespaces:
             try:
-                # Query Pinecone
-                query_response = self.index.query(
-                    vector=query_embedding,
-                    top_k=limit,
-                    namespace=namespace,
-                    filter=filter_dict,
-                    include_metadata=True
-                )
-                
-                # Process matches
-                for match in query_response.matches:
-                    metadata = match.metadata
-                    # Extract content from metadata or from separate storage
-                    content = metadata.get("content_preview", "")
-                    
-                    # Convert metadata to entry
-                    entry = metadata_to_entry(metadata, content)
-                    
-                    # Add to results with score
-                    results.append((entry, match.score))
+                result_lists.append(self.search_namespace(namespace, query_embedding, limit, filter_dict, views, raise_errors=True))
             except Exception as e:
                 logger.error(f"Error searching namespace {namespace}: {e}")
+                result_lists.append([])
+                key = None  # don't cache results missing a namespace
+        results = merge_top_k(result_lists, limit)
+        if hybrid:
+            lexical, complete = self.search_lexical(query, namespaces, filter_dict, max(limit, HYBRID_LEXICAL_CANDIDATES), views)
+            results = reciprocal_rank_fusion([results, lexical], limit)
+            if not complete:
+                key = None  # don't cache results with a degraded lexical ranking
+        if include_content:
+            results = list(zip(self.hydrate([entry for entry, _ in results]), [score for _, score in results]))
+        if key is not None:
+            self.search_cache.put(key, versions, results)
+        return results
+
+    def search_cache_key(
+        self,
+        query: str,
+        namespaces: List[str],
+        filter_dict: Optional[Dict[str, Any]],
+        query_embedding: List[float],
+        limit: int,
+        include_content: bool,
+        views: bool,
+        hybrid: bool
+    ) -> Tuple[Optional[Tuple], Optional[Tuple[int, ...]]]:
+        """
+        Get the search cache key of a search and the current versions of its namespaces.
+        
+        The query text is part of the key only for hybrid search, where BM25
+        ranks it directly; otherwise its embedding stands for it.
+        
+        Returns:
+            (key, versions), or (None, None) if the cache is disabled
+        """
+        if self.search_cache is None:
+            return None, None
+        key = search_key(
+            namespaces, query_embedding, filter_dict, limit,
+            query=normalize_text(query) if hybrid else None,
+            include_content=include_content, views=views
+        )
+        return key, self.search_cache.snapshot(namespaces)
+
+    def search_lexical(
+        self,
+        query: str,
+        namespaces: List[str],
+        filter_dict: Optional[Dict[str, Any]] = None,
+        limit: int = HYBRID_LEXICAL_CANDIDATES,
+        views: bool = False
+    ) -> Tuple[List[Tuple[KnowledgeBaseEntryExtended, float]], bool]:
+        """
+        Rank entries by BM25 in the local metadata index.
+        
+        Exact terms (product names, "seat-based", "overage") that embeddings
+        rank poorly still match here. Only namespaces the index has already
+        synced are ranked; stale ones refresh in the background (see
+        refresh_metadata_index), so the search never waits for a sync.
         
-        # Sort by score (descending) and limit results
-        results.sort(key=lambda x: x[1], reverse=True)
-        return results[:limit]
+        Args:
+            query: Search query text
+            namespaces: Namespaces to search
+            filter_dict: Optional metadata filters
+            limit: Maximum number of results
+            views: Return read-only EntryViews instead of entry models
+            
+        Returns:
+            (results, complete): (entry, BM25 score) tuples, best first, and
+            whether every namespace was ranked (False if some were never
+            synced or the index cannot answer the filter)
+        """
+        ready = self.refresh_metadata_index(namespaces)
+        if not ready:
+            return [], False
+        try:
+            rows = self.metadata_index.search_text(ready, query, limit, filter_dict)
+        except UnsupportedFilter as e:
+            logger.info(f"Metadata index cannot answer the filter ({e}), searching vectors only")
+            return [], False
+        results = []
+        for _, metadata, score in rows:
+            content = metadata.get("content_preview", PLACEHOLDER_CONTENT)
+            results.append((EntryView(metadata, content) if views else decode_metadata(metadata, content, trusted=True), score))
+        return results, len(ready) == len(namespaces)
+    
+    def query_top_k(self, namespace: str, limit: int) -> int:
+        """
+        Get the number of matches to query for up to limit entries.
+
+        Chunks of one entry can match together, so SEARCH_OVERFETCH matches
+        are fetched per entry, unless the metadata index has synced the
+        namespace and knows it has no chunked entries.
+
+        Args:
+            namespace: Namespace to query
+            limit: Maximum number of entries wanted
+
+        Returns:
+            Pinecone top_k
+        """
+        if self.metadata_index.has_synced(namespace) and not self.metadata_index.has_chunked_entries(namespace):
+            return limit
+        return limit * SEARCH_OVERFETCH
+
+    def search_namespace(
+        self,
+        namespace: str,
+        query_embedding: List[float],
+        limit: int = 10,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        views: bool = False,
+        raise_errors: bool = False
+    ) -> List[Tuple[KnowledgeBaseEntryExtended, float]]:
+        """
+        Search one namespace using semantic similarity.
+
+        Args:
+            namespace: Namespace to search
+            query_embedding: Embedding of the query
+            limit: Maximum number of results to return
+            filter_dict: Optional Pinecone metadata filters
+            views: Return read-only EntryViews instead of entry models
+            raise_errors: Raise query errors instead of returning no results
+
+        Returns:
+            List of (entry, score) tuples sorted by relevance (empty on error)
+        """
+        try:
+            query_response = self.index.query(
+                vector=query_embedding,
+                top_k=self.query_top_k(namespace, limit),
+                namespace=namespace,
+                filter=filter_dict,
+                include_metadata=True
+            )
+
+            # Collapse chunk matches back to unique entries by best score,
+            # decoding only the entries that are returned
+            results = collapse_matches(query_response.matches, views=True)[:limit]
+            return results if views else [(view.to_entry(), score) for view, score in results]
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.error(f"Error searching namespace {namespace}: {e}")
+            return []
     
     def filter_by_metadata(
         self, 
         user_id: str, 
         filter_dict: Dict[str, Any], 
         limit: int = 10,
-        namespaces: Optional[List[str]] = None
+        namespaces: Optional[List[str]] = None,
+        offset: int = 0,
+        sort_by: str = "updated_at",
+        descending: bool = True
     ) -> List[KnowledgeBaseEntryExtended]:
         """
         Filter knowledge base entries by metadata.
         
+        Filters are answered by the local metadata index, sorted and
+        paginated; namespaces it has not seen within its TTL are refreshed
+        in the background (see refresh_metadata_index). Filters it cannot
+        answer, or namespaces it has never synced, fall back to a Pinecone
+        query per namespace (results then come in namespace order rather
+        than sorted).
+        
         Args:
             user_id: ID of the user making the request
             filter_dict: Pinecone metadata filters
             limit: Maximum number of results
             namespaces: Optional list of namespaces to search in
+            offset: Number of results to skip (for pagination)
+            sort_by: Metadata field to sort by (e.g. updated_at, created_at, title)
+            descending: Sort order
             
         Returns:
             List of entries matching the filter
         """
         # Default namespaces
         if not namespaces:
-            namespaces = [
-                "public-kb",
-                "team-kb",
-                f"user-{user_id}"
-            ]
-        
-        results = []
-        
-        # Format filter for Pinecone - handle array fields like 'tags' properly
-        pinecone_filter = {}
-        for key, value in filter_dict.items():
-            # For array values like tags, use the $in operator
-            if isinstance(value, list):
-                pinecone_filter[key] = {"$in": value}
-            else:
-                pinecone_filter[key] = value
-        
-        logger.info(f"Using Pinecone filter: {pinecone_filter}")
+            namespaces = get_default_namespaces(user_id)
         
+        if len(self.refresh_metadata_index(namespaces)) == len(namespaces):
+            try:
+                return self.query_metadata_index(namespaces, filter_dict, limit, offset, sort_by, descending)
+            except UnsupportedFilter as e:
+                logger.info(f"Metadata index cannot answer the filter ({e}), querying Pinecone")
+
+        pinecone_filter = build_metadata_filter(filter_dict)
+
         # Query each namespace
+        results = []
         for namespace in namespaces:
-            try:
-                # Since we're just filtering by metadata, we can use a random vector
-                # This is a limitation of Pinecone - there's no direct metadata-only query
-                # In a production system, you might want to use a more sophisticated approach
-                dummy_vector = [0.0] * EMBEDDING_DIMENSIONS
-                
-                query_response = self.index.query(
-                    vector=dummy_vector,
-                    top_k=limit,
-                    namespace=namespace,
-                    filter=pinecone_filter,
-                    include_metadata=True
-                )
-                
-                # Process matches
-                for match in query_response.matches:
-                    metadata = match.metadata
-                    content = metadata.get("content_preview", "")
-                    entry = metadata_to_entry(metadata, content)
-                    results.append(entry)
-            except Exception as e:
-                logger.error(f"Error filtering in namespace {namespace}: {e}")
-        
-        return results[:limit]
+            results.extend(self.filter_namespace(namespace, pinecone_filter, limit + offset))
+
+        return results[offset:offset + limit]
+
+    def filter_namespace(
+        self,
+        namespace: str,
+        pinecone_filter: Dict[str, Any],
+        limit: int = 10
+    ) -> List[KnowledgeBaseEntryExtended]:
+        """
+        Filter the entries of one namespace by metadata.
+
+        Args:
+            namespace: Namespace to filter
+            pinecone_filter: Filter formatted by build_metadata_filter
+            limit: Maximum number of results
+
+        Returns:
+            List of entries matching the filter (empty on error)
+        """
+        try:
+            # Since we're just filtering by metadata, we can use a random vector
+            # This is a limitation of Pinecone - there's no direct metadata-only query
+            # In a production system, you might want to use a more sophisticated approach
+            dummy_vector = [0.0] * EMBEDDING_DIMENSIONS
+
+            query_response = self.index.query(
+                vector=dummy_vector,
+                top_k=self.query_top_k(namespace, limit),
+                namespace=namespace,
+                filter=pinecone_filter,
+                include_metadata=True
+            )
+
+            # Chunks carry their entry's metadata, so collapse them to unique entries
+            return [view.to_entry() for view, _ in collapse_matches(query_response.matches, views=True)[:limit]]
+        except Exception as e:
+            logger.error(f"Error filtering in namespace {namespace}: {e}")
+            return []
 
 # We'll create the manager instance on demand to avoid initialization issues
 kb_manager = None
@@ -523,3 +1826,296 @@ def get_kb_manager() -> KnowledgeBaseManager:
     if kb_manager is None:
         kb_manager = KnowledgeBaseManager()
     return kb_manager
+
+
+class AsyncKnowledgeBaseManager:
+    """
+    Async knowledge base operations with concurrent namespace queries.
+    
+    Each namespace is queried in its own worker thread and the calls run
+    concurrently, so a search over public, team and private entries takes
+    about as long as the slowest namespace instead of the sum of all three.
+    The blocking Pinecone client is reused from KnowledgeBaseManager.
+    """
+    
+    def __init__(self, manager: Optional[KnowledgeBaseManager] = None):
+        """
+        Initialize the async manager.
+        
+        Args:
+            manager: Synchronous manager to run the namespace calls on
+                (defaults to the shared instance)
+        """
+        self.manager = manager or get_kb_manager()
+    
+    async def create_entry(self, entry_data: Dict[str, Any], user_id: str) -> str:
+        """
+        Create a new knowledge base entry.
+        
+        Args:
+            entry_data: Entry data dictionary
+            user_id: ID of the user creating the entry
+            
+        Returns:
+            ID of the created entry
+        """
+        return await asyncio.to_thread(self.manager.create_entry, entry_data, user_id)
+    
+    async def create_entries(self, entries: List[Dict[str, Any]], user_id: str) -> Dict[str, Any]:
+        """
+        Create many knowledge base entries at once (see KnowledgeBaseManager.create_entries).
+        
+        Args:
+            entries: Entry data dictionaries
+            user_id: ID of the user creating the entries
+            
+        Returns:
+            Dictionary with per-entry results and throughput
+        """
+        return await asyncio.to_thread(self.manager.create_entries, entries, user_id)
+    
+    async def get_entry(
+        self, 
+        entry_id: str, 
+        user_id: str, 
+        include_content: bool = True
+    ) -> Optional[KnowledgeBaseEntryExtended]:
+        """
+        Retrieve a knowledge base entry by ID.
+        
+        Args:
+            entry_id: ID of the entry to retrieve
+            user_id: ID of the user making the request
+            include_content: Read the full content from the content store
+            
+        Returns:
+            KnowledgeBaseEntryExtended object or None if not found
+        """
+        entry = await self.find_entry(entry_id, user_id)
+        if entry is None or not include_content:
+            return entry
+        return (await asyncio.to_thread(self.manager.hydrate, [entry]))[0]
+    
+    async def find_entry(self, entry_id: str, user_id: str) -> Optional[KnowledgeBaseEntryExtended]:
+        """
+        Retrieve a knowledge base entry by ID, with its content preview only.
+        
+        An entry with a known location is a single fetch. Otherwise all
+        namespaces are fetched concurrently; if the ID exists in more than
+        one, the first namespace in priority order (public, team, private)
+        wins, and the location index is repaired.
+        
+        Args:
+            entry_id: ID of the entry to retrieve
+            user_id: ID of the user making the request
+            
+        Returns:
+            KnowledgeBaseEntryExtended object or None if not found
+        """
+        namespaces = get_default_namespaces(user_id)
+        locations = self.manager.locations
+        
+        location = locations.get(entry_id)
+        if location and location["namespace"] in namespaces:
+            entry = await asyncio.to_thread(self.manager.fetch_from_namespace, entry_id, location["namespace"])
+            if entry is not None:
+                return entry
+            logger.info(f"Stale location for entry {entry_id}, probing all namespaces")
+        
+        # Unknown or stale location: probe the other namespaces once
+        probed = [namespace for namespace in namespaces if not (location and namespace == location["namespace"])]
+        entries = await asyncio.gather(*[
+            asyncio.to_thread(self.manager.fetch_from_namespace, entry_id, namespace)
+            for namespace in probed
+        ])
+        for namespace, entry in zip(probed, entries):
+            if entry is not None:
+                locations.repair(entry_id, namespace, entry.visibility, entry.created_by)
+                return entry
+        
+        if location and location["namespace"] in namespaces:
+            locations.repair(entry_id, None)
+        logger.warning(f"Entry {entry_id} not found in any accessible namespace for user {user_id}")
+        return None
+    
+    async def update_entry(self, entry_id: str, update_data: Dict[str, Any], user_id: str) -> bool:
+        """
+        Update an existing knowledge base entry.
+        
+        Args:
+            entry_id: ID of the entry to update
+            update_data: Dictionary of fields to update
+            user_id: ID of the user making the update
+            
+        Returns:
+            True if update successful, False otherwise
+        """
+        current_entry = await self.get_entry(entry_id, user_id, include_content=False)
+        if not current_entry:
+            logger.error(f"Could not find entry {entry_id} to update")
+            return False
+        
+        return await asyncio.to_thread(self.manager.apply_update, current_entry, update_data, user_id)
+    
+    async def delete_entry(self, entry_id: str, user_id: str) -> bool:
+        """
+        Delete a knowledge base entry.
+        
+        Args:
+            entry_id: ID of the entry to delete
+            user_id: ID of the user making the deletion
+            
+        Returns:
+            Boolean indicating success
+        """
+        current_entry = await self.get_entry(entry_id, user_id, include_content=False)
+        if not current_entry:
+            return False
+        
+        return await asyncio.to_thread(self.manager.apply_delete, current_entry, user_id)
+    
+    async def search(
+        self, 
+        query: str, 
+        user_id: str, 
+        limit: int = 10, 
+        namespaces: Optional[List[str]] = None,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None,
+        include_content: bool = False,
+        views: bool = False,
+        hybrid: bool = False
+    ) -> List[Tuple[KnowledgeBaseEntryExtended, float]]:
+        """
+        Search the knowledge base using semantic similarity.
+        
+        Args:
+            query: Search query text
+            user_id: ID of the user making the search
+            limit: Maximum number of results to return
+            namespaces: Optional list of namespaces to search in
+            filter_dict: Optional Pinecone metadata filters
+            query_embedding: Optional precomputed embedding of the query
+            include_content: Return full content instead of previews
+            views: Return read-only EntryViews instead of entry models
+            hybrid: Fuse the vector ranking with a BM25 ranking (see
+                KnowledgeBaseManager.search)
+            
+        Returns:
+            List of (entry, score) tuples sorted by relevance
+        """
+        if query_embedding is None:
+            query_embedding = await asyncio.to_thread(generate_embedding, query)
+        
+        if not namespaces:
+            namespaces = get_default_namespaces(user_id)
+        
+        key, versions = self.manager.search_cache_key(
+            query, namespaces, filter_dict, query_embedding, limit, include_content, views, hybrid
+        )
+        if key is not None:
+            cached = self.manager.search_cache.get(key, versions)
+            if cached is not None:
+                return cached
+        
+        searches = [
+            asyncio.to_thread(self.manager.search_namespace, namespace, query_embedding, limit, filter_dict, views, True)
+            for namespace in namespaces
+        ]
+        if hybrid:
+            searches.append(asyncio.to_thread(
+                self.manager.search_lexical, query, namespaces, filter_dict, max(limit, HYBRID_LEXICAL_CANDIDATES), views
+            ))
+        result_lists = await asyncio.gather(*searches, return_exceptions=True)
+        if hybrid and isinstance(result_lists[-1], Exception):
+            raise result_lists[-1]
+        for position, (namespace, result) in enumerate(zip(namespaces, result_lists)):
+            if isinstance(result, Exception):
+                logger.error(f"Error searching namespace {namespace}: {result}")
+                result_lists[position] = []
+                key = None  # don't cache results missing a namespace
+        if hybrid:
+            lexical, complete = result_lists[-1]
+            results = reciprocal_rank_fusion([merge_top_k(result_lists[:-1], limit), lexical], limit)
+            if not complete:
+                key = None  # don't cache results with a degraded lexical ranking
+        else:
+            results = merge_top_k(result_lists, limit)
+        if include_content:
+            entries = await asyncio.to_thread(self.manager.hydrate, [entry for entry, _ in results])
+            results = list(zip(entries, [score for _, score in results]))
+        if key is not None:
+            self.manager.search_cache.put(key, versions, results)
+        return results
+    
+    async def filter_by_metadata(
+        self, 
+        user_id: str, 
+        filter_dict: Dict[str, Any], 
+        limit: int = 10,
+        namespaces: Optional[List[str]] = None,
+        offset: int = 0,
+        sort_by: str = "updated_at",
+        descending: bool = True
+    ) -> List[KnowledgeBaseEntryExtended]:
+        """
+        Filter knowledge base entries by metadata.
+        
+        The filter is answered by the local metadata index while stale
+        namespaces refresh in the background (see
+        KnowledgeBaseManager.filter_by_metadata).
+        
+        Args:
+            user_id: ID of the user making the request
+            filter_dict: Pinecone metadata filters
+            limit: Maximum number of results
+            namespaces: Optional list of namespaces to search in
+            offset: Number of results to skip (for pagination)
+            sort_by: Metadata field to sort by
+            descending: Sort order
+            
+        Returns:
+            List of entries matching the filter (in namespace order on the Pinecone fallback)
+        """
+        if not namespaces:
+            namespaces = get_default_namespaces(user_id)
+        
+        # Local SQLite lookups, off the event loop: they wait on the index
+        # lock while a background sync rewrites a namespace, and decode every row
+        if len(await asyncio.to_thread(self.manager.refresh_metadata_index, namespaces)) == len(namespaces):
+            try:
+                return await asyncio.to_thread(
+                    self.manager.query_metadata_index, namespaces, filter_dict, limit, offset, sort_by, descending
+                )
+            except UnsupportedFilter as e:
+                logger.info(f"Metadata index cannot answer the filter ({e}), querying Pinecone")
+        
+        pinecone_filter = build_metadata_filter(filter_dict)
+        
+        result_lists = await asyncio.gather(*[
+            asyncio.to_thread(self.manager.filter_namespace, namespace, pinecone_filter, limit + offset)
+            for namespace in namespaces
+        ])
+        return list(itertools.chain.from_iterable(result_lists))[offset:offset + limit]
+
+# Created on demand, like the synchronous manager
+async_kb_manager = None
+
+def get_async_kb_manager() -> AsyncKnowledgeBaseManager:
+    """Get the async knowledge base manager instance."""
+    global async_kb_manager
+    if async_kb_manager is None:
+        async_kb_manager = AsyncKnowledgeBaseManager()
+    return async_kb_manager
+
+
+if __name__ == "__main__":
+    import sys
+    
+    if len(sys.argv) < 2 or sys.argv[1] != "ensure-index":
+        print("Usage: python -m helpers.knowledge_base_helper ensure-index [--recreate]")
+        sys.exit(1)
+    
+    ok = ensure_pinecone_index(recreate="--recreate" in sys.argv[2:])
+    print("Index ready" if ok else "Index has the wrong dimension (see log)")
+    sys.exit(0 if ok else 1)
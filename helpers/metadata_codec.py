@@ -0,0 +1,277 @@
+"""
+Metadata codec for knowledge base entries.
+
+Every Pinecone match used to go through metadata_to_entry: a copy of the
+dict, a split of tags_csv, a scan of all keys for the custom_ prefix,
+json.loads on every custom string, ISO date parsing and then full
+pydantic validation. Writes walked the dict twice more (entry_to_metadata,
+then sanitize_metadata). This module does each direction in one pass:
+- encode_metadata turns an entry into Pinecone-ready metadata (no None
+  values, ISO dates, tags plus tags_csv, custom fields flattened to
+  custom_* keys, lists of strings, nested dicts flattened)
+- decode_metadata turns metadata back into an entry; with trusted=True
+  (metadata read from our own index, which encode_metadata wrote) the
+  model is built directly instead of being re-validated
+- EntryView is a read-only result that decodes fields as they are read
+  and only builds the full model on to_entry()
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Union
+
+from helpers.schema_definitions import KnowledgeBaseEntryExtended
+
+# Fields of the entry model
+ENTRY_FIELDS = frozenset(KnowledgeBaseEntryExtended.model_fields)
+
+# Fields stored as ISO strings
+DATETIME_FIELDS = frozenset(["created_at", "updated_at", "expiration"])
+
+# Fields without which a trusted decode falls back to validation
+REQUIRED_FIELDS = ("id", "title", "created_by")
+
+# (name, default, default factory) of each field, for filling in defaults
+# without validation (FieldInfo.get_default deep-copies on every call)
+FIELD_DEFAULTS = tuple(
+    (name, field.default, field.default_factory)
+    for name, field in KnowledgeBaseEntryExtended.model_fields.items()
+)
+
+# Prefix of flattened custom fields
+CUSTOM_PREFIX = "custom_"
+
+
+def encode_value(value: Any) -> Any:
+    """Encode a scalar or list for Pinecone (strings, numbers, booleans, lists of strings)."""
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return [str(item) for item in value if item is not None]
+    return str(value)
+
+
+def encode_metadata(entry: Union[KnowledgeBaseEntryExtended, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convert an entry to Pinecone metadata in one pass.
+
+    The content is left out (it is embedded, and previewed separately by
+    the caller), None values are dropped, and custom_fields become
+    custom_<name> keys with dicts and lists stored as JSON.
+
+    Args:
+        entry: Knowledge base entry (Pydantic model or dict)
+
+    Returns:
+        Dict with metadata formatted for Pinecone
+    """
+    # Read the model's field values in place instead of dumping a copy
+    fields = vars(entry) if isinstance(entry, KnowledgeBaseEntryExtended) else entry
+
+    metadata: Dict[str, Any] = {}
+    for key, value in fields.items():
+        if value is None or key == "content":
+            continue
+        if key == "tags" and isinstance(value, list):
+            # Array for $in filters, CSV for backward compatibility
+            tags = [str(tag) for tag in value if tag]
+            metadata["tags"] = tags
+            metadata["tags_csv"] = ",".join(tags)
+        elif key == "custom_fields" and isinstance(value, dict):
+            for name, custom_value in value.items():
+                if isinstance(custom_value, (dict, list)):
+                    metadata[f"{CUSTOM_PREFIX}{name}"] = json.dumps(custom_value)
+                elif custom_value is not None:
+                    metadata[f"{CUSTOM_PREFIX}{name}"] = encode_value(custom_value)
+        elif isinstance(value, dict):
+            # Pinecone has no nested objects: flatten with dot notation
+            for nested_key, nested_value in value.items():
+                if nested_value is not None:
+                    metadata[f"{key}.{nested_key}"] = encode_value(nested_value)
+        else:
+            metadata[key] = encode_value(value)
+    return metadata
+
+
+def decode_datetime(value: Any) -> Any:
+    """Parse an ISO string (other values, and unparseable strings, are returned as they are)."""
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+def decode_custom_value(value: Any) -> Any:
+    """Decode a custom field: only JSON objects and arrays were encoded as JSON."""
+    if isinstance(value, str) and value[:1] in ("{", "["):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    return value
+
+
+def decode_metadata(metadata: Dict[str, Any], content: str, trusted: bool = False) -> KnowledgeBaseEntryExtended:
+    """
+    Convert Pinecone metadata back to an entry in one pass.
+
+    Args:
+        metadata: Metadata from Pinecone (or the metadata index)
+        content: Content text (not stored in metadata)
+        trusted: The metadata was written by encode_metadata, so build the
+            model without re-validating it. Metadata missing a required
+            field or with an unparseable date is still validated.
+
+    Returns:
+        KnowledgeBaseEntryExtended: Entry as a Pydantic model
+
+    Raises:
+        pydantic.ValidationError: If the metadata is not a valid entry
+    """
+    fields: Dict[str, Any] = {}
+    custom_fields: Dict[str, Any] = {}
+    tags_csv = None
+    for key, value in metadata.items():
+        if key in ENTRY_FIELDS:
+            fields[key] = decode_datetime(value) if key in DATETIME_FIELDS else value
+        elif key.startswith(CUSTOM_PREFIX):
+            custom_fields[key[len(CUSTOM_PREFIX):]] = decode_custom_value(value)
+        elif key == "tags_csv":
+            tags_csv = value
+
+    # Entries written before tags were stored as an array only have the CSV
+    if "tags" not in fields and tags_csv is not None:
+        fields["tags"] = tags_csv.split(",") if tags_csv else []
+    fields["custom_fields"] = custom_fields
+    fields["content"] = content
+
+    if trusted and is_trusted_shape(fields):
+        return construct_entry(fields)
+    return KnowledgeBaseEntryExtended(**fields)
+
+
+def is_trusted_shape(fields: Dict[str, Any]) -> bool:
+    """Whether decoded fields can skip validation: required fields present, dates parsed."""
+    for name in REQUIRED_FIELDS:
+        if name not in fields:
+            return False
+    for name in DATETIME_FIELDS:
+        value = fields.get(name)
+        if value is not None and not isinstance(value, datetime):
+            return False
+    return True
+
+
+def construct_entry(fields: Dict[str, Any]) -> KnowledgeBaseEntryExtended:
+    """
+    Build an entry from already-typed fields without validation.
+
+    Equivalent to KnowledgeBaseEntryExtended.model_construct, which is
+    slower than validating for a model this small: missing fields get
+    their defaults and the instance state is set directly.
+
+    Args:
+        fields: Values of the model's fields (no other keys)
+
+    Returns:
+        KnowledgeBaseEntryExtended: The entry
+    """
+    values = {}
+    for name, default, default_factory in FIELD_DEFAULTS:
+        if name in fields:
+            values[name] = fields[name]
+        else:
+            values[name] = default_factory() if default_factory else default
+    entry = KnowledgeBaseEntryExtended.__new__(KnowledgeBaseEntryExtended)
+    object.__setattr__(entry, "__dict__", values)
+    object.__setattr__(entry, "__pydantic_fields_set__", set(fields))
+    object.__setattr__(entry, "__pydantic_extra__", None)
+    object.__setattr__(entry, "__pydantic_private__", None)
+    return entry
+
+
+class EntryView:
+    """
+    Read-only view of an entry in index metadata.
+
+    Attributes read like the entry model's (entry.title, entry.created_at,
+    ...) but are decoded only when first read; to_entry() builds the full
+    model (trusted decode) when a caller needs one.
+    """
+
+    __slots__ = ("_metadata", "_content", "_decoded", "_entry")
+
+    def __init__(self, metadata: Dict[str, Any], content: str):
+        """
+        Initialize the view.
+
+        Args:
+            metadata: Metadata from the index (not copied; must not be modified)
+            content: Content text
+        """
+        self._metadata = metadata
+        self._content = content
+        self._decoded: Dict[str, Any] = {}
+        self._entry: Optional[KnowledgeBaseEntryExtended] = None
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for names that are not slots: entry fields
+        if name not in ENTRY_FIELDS:
+            raise AttributeError(f"'EntryView' object has no attribute '{name}'")
+        if name not in self._decoded:
+            self._decoded[name] = self._decode_field(name)
+        return self._decoded[name]
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name not in EntryView.__slots__:
+            raise AttributeError("EntryView is read-only")
+        object.__setattr__(self, name, value)
+
+    def __repr__(self) -> str:
+        return f"EntryView(id={self.id!r}, title={self.title!r})"
+
+    def _decode_field(self, name: str) -> Any:
+        metadata = self._metadata
+        if name == "content":
+            return self._content
+        if name == "tags":
+            if "tags" in metadata:
+                return metadata["tags"]
+            tags_csv = metadata.get("tags_csv")
+            return tags_csv.split(",") if tags_csv else []
+        if name == "custom_fields":
+            return {
+                key[len(CUSTOM_PREFIX):]: decode_custom_value(value)
+                for key, value in metadata.items() if key.startswith(CUSTOM_PREFIX)
+            }
+        if name in metadata:
+            return decode_datetime(metadata[name]) if name in DATETIME_FIELDS else metadata[name]
+        return KnowledgeBaseEntryExtended.model_fields[name].get_default(call_default_factory=True)
+
+    def to_entry(self) -> KnowledgeBaseEntryExtended:
+        """Build (once) the full entry model."""
+        if self._entry is None:
+            self._entry = decode_metadata(self._metadata, self._content, trusted=True)
+        return self._entry
+
+    def model_copy(self, update: Optional[Dict[str, Any]] = None) -> "EntryView":
+        """
+        Copy the view with some fields replaced (mirrors BaseModel.model_copy).
+
+        Args:
+            update: Fields to replace
+
+        Returns:
+            A new view
+        """
+        update = dict(update or {})
+        content = update.pop("content", self._content)
+        return EntryView({**self._metadata, **encode_metadata(update)} if update else self._metadata, content)
+
+    def model_dump(self) -> Dict[str, Any]:
+        """Dump the full entry (see to_entry)."""
+        return self.to_entry().model_dump()
@@ -0,0 +1,418 @@
+"""
+Local metadata index for knowledge base filters.
+
+filter_by_metadata used to query Pinecone with a zero vector per
+namespace: a full vector query that cannot paginate and returns matches
+in arbitrary order. MetadataIndex keeps the metadata of every entry in a
+SQLite table instead:
+- tags are stored as inverted postings (tag -> entry), so tag filters
+  are index lookups
+- created_by, visibility, source, created_at, updated_at and expiration
+  are indexed columns, so owner/date filters, sorting and pagination are
+  answered locally in milliseconds
+- title, tags and content preview are in an FTS5 full-text index, so
+  search_text ranks entries by BM25 for hybrid search (disabled when the
+  SQLite build has no FTS5)
+
+The write paths of KnowledgeBaseManager keep the index in sync. Because a
+container only sees its own writes, each namespace is also re-synced from
+Pinecone (list IDs + fetch metadata by ID) once it is older than
+METADATA_INDEX_SYNC_TTL_S, in the background while requests keep reading
+the current index. Inside Lambda the index is stored under /tmp so
+warm containers keep it; elsewhere it lives in memory for the process.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# SQLite file of the index (":memory:" keeps it in the process only)
+METADATA_INDEX_PATH = os.getenv(
+    "METADATA_INDEX_PATH",
+    "/tmp/kb_metadata_index.sqlite3" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else ":memory:"
+)
+
+# Seconds after which a namespace is re-synced from Pinecone
+METADATA_INDEX_SYNC_TTL_S = float(os.getenv("METADATA_INDEX_SYNC_TTL_S", "300"))
+
+# Indexed scalar fields (also the fields results can be sorted by, with title)
+INDEXED_FIELDS = ("created_by", "visibility", "source", "created_at", "updated_at", "expiration")
+SORT_FIELDS = INDEXED_FIELDS + ("title",)
+
+# BM25 weights of the title, tags and content preview in text search
+TEXT_WEIGHTS = (3.0, 2.0, 1.0)
+
+# Comparison operators accepted in filters
+_COMPARISONS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+class UnsupportedFilter(ValueError):
+    """Raised for filters the local index cannot answer (callers fall back to Pinecone)."""
+
+
+def _tag_values(value: Any) -> Tuple[str, List[str]]:
+    # Normalize a tag filter to ("any" | "all", tags)
+    if isinstance(value, str):
+        return "any", [value]
+    if isinstance(value, list):
+        return "any", value
+    if isinstance(value, dict) and len(value) == 1:
+        operator, tags = next(iter(value.items()))
+        tags = [tags] if isinstance(tags, str) else list(tags)
+        if operator in ("$in", "$containsAny", "$eq"):
+            return "any", tags
+        if operator == "$all":
+            return "all", tags
+    raise UnsupportedFilter(f"Unsupported tag filter: {value}")
+
+
+def compile_filter(filter_dict: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """
+    Translate a metadata filter into a SQL WHERE clause.
+
+    Supported filters:
+    - tags / tags_csv: a tag, a list of tags (any), {"$in"|"$containsAny": [...]}
+      or {"$all": [...]}
+    - indexed fields: a value, a list of values (any), {"$in": [...]},
+      {"$nin": [...]} or comparisons ({"$gte": "2024-01-01", "$lt": ...}) on ISO strings
+
+    Args:
+        filter_dict: Metadata filter
+
+    Returns:
+        (clause, parameters); the clause is "1" for an empty filter
+
+    Raises:
+        UnsupportedFilter: For fields or operators the index does not cover
+    """
+    clauses, params = [], []
+    for field, value in filter_dict.items():
+        if field in ("tags", "tags_csv"):
+            mode, tags = _tag_values(value)
+            if not tags:
+                clauses.append("0")
+                continue
+            placeholders = ", ".join("?" for _ in tags)
+            subquery = f"SELECT entry_id FROM entry_tags WHERE tag IN ({placeholders})"
+            if mode == "all":
+                subquery += f" GROUP BY entry_id HAVING COUNT(DISTINCT tag) = {len(set(tags))}"
+            clauses.append(f"entry_id IN ({subquery})")
+            params.extend(tags)
+        elif field in INDEXED_FIELDS:
+            if isinstance(value, dict):
+                for operator, operand in value.items():
+                    if operator in ("$in", "$nin"):
+                        operand = list(operand)
+                        placeholders = ", ".join("?" for _ in operand)
+                        if operator == "$in":
+                            # Nothing is in an empty list
+                            clauses.append(f"{field} IN ({placeholders})" if operand else "0")
+                        elif operand:
+                            # Like Pinecone, entries without the field are not in the list
+                            clauses.append(f"({field} IS NULL OR {field} NOT IN ({placeholders}))")
+                        else:
+                            clauses.append("1")
+                        params.extend(operand)
+                    elif operator in _COMPARISONS:
+                        clauses.append(f"{field} {_COMPARISONS[operator]} ?")
+                        params.append(operand)
+                    else:
+                        raise UnsupportedFilter(f"Unsupported operator {operator} for {field}")
+            elif isinstance(value, list):
+                clauses.append(f"{field} IN ({', '.join('?' for _ in value)})" if value else "0")
+                params.extend(value)
+            else:
+                clauses.append(f"{field} = ?")
+                params.append(value)
+        else:
+            raise UnsupportedFilter(f"Field {field} is not in the metadata index")
+    return " AND ".join(clauses) or "1", params
+
+
+class MetadataIndex:
+    """SQLite index of knowledge base entry metadata."""
+
+    def __init__(self, path: str = METADATA_INDEX_PATH, sync_ttl: float = METADATA_INDEX_SYNC_TTL_S):
+        """
+        Initialize the index.
+
+        Args:
+            path: SQLite file, or ":memory:" for a process-local index
+            sync_ttl: Seconds after which a namespace needs a re-sync
+        """
+        self.path = path
+        self.sync_ttl = sync_ttl
+        self._lock = threading.Lock()
+        # Whether each namespace has chunked entries (see has_chunked_entries)
+        self._chunked: Dict[str, bool] = {}
+        try:
+            self._db = self._connect(path)
+        except sqlite3.Error as e:
+            logger.warning(f"Metadata index unavailable at {path}, keeping it in memory: {e}")
+            self.path = ":memory:"
+            self._db = self._connect(self.path)
+        self.text_search = self._create_text_index()
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")
+        columns = ", ".join(f"{field} TEXT" for field in INDEXED_FIELDS)
+        db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS entries (
+                entry_id TEXT PRIMARY KEY, namespace TEXT NOT NULL, title TEXT, {columns}, metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entry_tags (
+                tag TEXT NOT NULL, entry_id TEXT NOT NULL, PRIMARY KEY (tag, entry_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS entry_tags_entry ON entry_tags (entry_id);
+            CREATE INDEX IF NOT EXISTS entries_namespace ON entries (namespace, updated_at);
+            CREATE TABLE IF NOT EXISTS namespace_sync (namespace TEXT PRIMARY KEY, synced_at REAL NOT NULL);
+        """)
+        for field in INDEXED_FIELDS:
+            db.execute(f"CREATE INDEX IF NOT EXISTS entries_{field} ON entries ({field})")
+        return db
+
+    def _create_text_index(self) -> bool:
+        # Rows share the rowid of their entries row, so they are replaced and
+        # joined by rowid instead of scanning an unindexed ID column
+        try:
+            self._db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS entry_text "
+                "USING fts5(title_terms, tag_terms, content_terms, tokenize = 'porter unicode61')"
+            )
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Full-text search unavailable in the metadata index: {e}")
+            return False
+
+    def _write(self, namespace: str, metadata: Dict[str, Any]) -> None:
+        entry_id = metadata["id"]
+        if metadata.get("chunk_hashes"):
+            self._chunked[namespace] = True
+        tags = metadata.get("tags")
+        if not isinstance(tags, list):
+            tags = [tag for tag in str(metadata.get("tags_csv", "")).split(",") if tag]
+        if self.text_search:
+            self._db.execute("DELETE FROM entry_text WHERE rowid IN (SELECT rowid FROM entries WHERE entry_id = ?)", (entry_id,))
+        cursor = self._db.execute(
+            f"INSERT OR REPLACE INTO entries (entry_id, namespace, title, {', '.join(INDEXED_FIELDS)}, metadata) "
+            f"VALUES (?, ?, ?, {', '.join('?' for _ in INDEXED_FIELDS)}, ?)",
+            (entry_id, namespace, metadata.get("title"), *[metadata.get(field) for field in INDEXED_FIELDS], json.dumps(metadata, default=str))
+        )
+        self._db.execute("DELETE FROM entry_tags WHERE entry_id = ?", (entry_id,))
+        self._db.executemany("INSERT OR IGNORE INTO entry_tags VALUES (?, ?)", [(tag, entry_id) for tag in tags])
+        if self.text_search:
+            self._db.execute(
+                "INSERT INTO entry_text (rowid, title_terms, tag_terms, content_terms) VALUES (?, ?, ?, ?)",
+                (cursor.lastrowid, metadata.get("title") or "", " ".join(tags), metadata.get("content_preview") or "")
+            )
+
+    def _transaction(self, work) -> None:
+        # Writes are best effort: a failed write only leaves the index stale
+        # until the next sync of the namespace
+        with self._lock:
+            try:
+                self._db.execute("BEGIN")
+                work()
+                self._db.execute("COMMIT")
+            except (sqlite3.Error, KeyError) as e:
+                self._db.execute("ROLLBACK")
+                logger.warning(f"Could not update the metadata index: {e}")
+
+    def upsert(self, namespace: str, metadata: Dict[str, Any]) -> None:
+        """
+        Record or replace the metadata of an entry.
+
+        Args:
+            namespace: Namespace of the entry
+            metadata: Entry metadata as stored in Pinecone (must include "id")
+        """
+        self.upsert_many(namespace, [metadata])
+
+    def upsert_many(self, namespace: str, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """Record the metadata of several entries of a namespace in one transaction."""
+        metadatas = list(metadatas)
+        self._transaction(lambda: [self._write(namespace, metadata) for metadata in metadatas])
+
+    def update(self, namespace: str, metadata: Dict[str, Any]) -> None:
+        """
+        Merge metadata into an entry's row, like a Pinecone metadata update.
+
+        Fields not given (e.g. the content preview, which metadata updates
+        leave out) keep their indexed values.
+
+        Args:
+            namespace: Namespace of the entry
+            metadata: Changed metadata fields (must include "id")
+        """
+        def work():
+            row = self._db.execute("SELECT metadata FROM entries WHERE entry_id = ?", (metadata["id"],)).fetchone()
+            self._write(namespace, {**(json.loads(row[0]) if row else {}), **metadata})
+        self._transaction(work)
+
+    def remove(self, entry_id: str) -> None:
+        """Forget an entry."""
+        def work():
+            self._chunked.clear()
+            if self.text_search:
+                self._db.execute("DELETE FROM entry_text WHERE rowid IN (SELECT rowid FROM entries WHERE entry_id = ?)", (entry_id,))
+            self._db.execute("DELETE FROM entries WHERE entry_id = ?", (entry_id,))
+            self._db.execute("DELETE FROM entry_tags WHERE entry_id = ?", (entry_id,))
+        self._transaction(work)
+
+    def replace_namespace(self, namespace: str, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """
+        Replace everything known about a namespace (after a full sync).
+
+        Args:
+            namespace: The namespace
+            metadatas: Metadata of every entry in the namespace
+        """
+        metadatas = list(metadatas)
+
+        def work():
+            self._chunked.pop(namespace, None)
+            if self.text_search:
+                self._db.execute("DELETE FROM entry_text WHERE rowid IN (SELECT rowid FROM entries WHERE namespace = ?)", (namespace,))
+            self._db.execute(
+                "DELETE FROM entry_tags WHERE entry_id IN (SELECT entry_id FROM entries WHERE namespace = ?)", (namespace,)
+            )
+            self._db.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            for metadata in metadatas:
+                self._write(namespace, metadata)
+            self._db.execute("INSERT OR REPLACE INTO namespace_sync VALUES (?, ?)", (namespace, time.time()))
+        self._transaction(work)
+
+    def has_synced(self, namespace: str) -> bool:
+        """Whether a namespace was synced at least once (so the index can answer for it)."""
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM namespace_sync WHERE namespace = ?", (namespace,)).fetchone()
+        return row is not None
+
+    def has_chunked_entries(self, namespace: str) -> bool:
+        """
+        Whether any indexed entry of a namespace is split into chunk vectors.
+
+        The answer is cached until a write could change it; it only covers
+        what the index knows (see has_synced).
+        """
+        with self._lock:
+            chunked = self._chunked.get(namespace)
+            if chunked is None:
+                row = self._db.execute(
+                    "SELECT 1 FROM entries WHERE namespace = ? AND json_extract(metadata, '$.chunk_hashes') IS NOT NULL LIMIT 1",
+                    (namespace,)
+                ).fetchone()
+                chunked = self._chunked[namespace] = row is not None
+        return chunked
+
+    def needs_sync(self, namespace: str) -> bool:
+        """Whether a namespace was never synced, or not within the sync TTL."""
+        with self._lock:
+            row = self._db.execute("SELECT synced_at FROM namespace_sync WHERE namespace = ?", (namespace,)).fetchone()
+        return row is None or time.time() - row[0] > self.sync_ttl
+
+    def query(
+        self,
+        namespaces: List[str],
+        filter_dict: Optional[Dict[str, Any]] = None,
+        sort_by: str = "updated_at",
+        descending: bool = True,
+        limit: int = 10,
+        offset: int = 0
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Find entries by metadata.
+
+        Args:
+            namespaces: Namespaces to search
+            filter_dict: Metadata filter (see compile_filter)
+            sort_by: Field to sort by (one of SORT_FIELDS)
+            descending: Sort order
+            limit: Page size
+            offset: Entries to skip (for pagination)
+
+        Returns:
+            List of (namespace, metadata) tuples
+
+        Raises:
+            UnsupportedFilter: For filters or sort fields the index does not cover
+        """
+        if sort_by not in SORT_FIELDS:
+            raise UnsupportedFilter(f"Cannot sort by {sort_by}")
+        if not namespaces:
+            return []
+        clause, params = compile_filter(filter_dict or {})
+        sql = (
+            f"SELECT namespace, metadata FROM entries "
+            f"WHERE namespace IN ({', '.join('?' for _ in namespaces)}) AND {clause} "
+            f"ORDER BY {sort_by} IS NULL, {sort_by} {'DESC' if descending else 'ASC'}, entry_id "
+            f"LIMIT ? OFFSET ?"
+        )
+        with self._lock:
+            rows = self._db.execute(sql, (*namespaces, *params, limit, offset)).fetchall()
+        return [(namespace, json.loads(metadata)) for namespace, metadata in rows]
+
+    def search_text(
+        self,
+        namespaces: List[str],
+        query: str,
+        limit: int = 10,
+        filter_dict: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        """
+        Rank entries by BM25 over their title, tags and content preview.
+
+        Any query term may match (terms are stemmed); entries matching more
+        and rarer terms, especially in the title and tags, rank higher.
+
+        Args:
+            namespaces: Namespaces to search
+            query: Search text
+            limit: Maximum number of results
+            filter_dict: Metadata filter (see compile_filter)
+
+        Returns:
+            List of (namespace, metadata, score) tuples, best first (higher is better)
+
+        Raises:
+            UnsupportedFilter: For filters the index does not cover
+        """
+        terms = list(dict.fromkeys(re.findall(r"\w+", query.lower())))
+        if not self.text_search or not namespaces or not terms:
+            return []
+        clause, params = compile_filter(filter_dict or {})
+        sql = (
+            f"SELECT namespace, metadata, bm25(entry_text, {', '.join(str(weight) for weight in TEXT_WEIGHTS)}) AS rank "
+            f"FROM entry_text JOIN entries ON entries.rowid = entry_text.rowid "
+            f"WHERE entry_text MATCH ? AND namespace IN ({', '.join('?' for _ in namespaces)}) AND {clause} "
+            f"ORDER BY rank LIMIT ?"
+        )
+        match = " OR ".join(f'"{term}"' for term in terms)
+        with self._lock:
+            rows = self._db.execute(sql, (match, *namespaces, *params, limit)).fetchall()
+        # bm25() is lower for better matches
+        return [(namespace, json.loads(metadata), -rank) for namespace, metadata, rank in rows]
+
+
+# One index per container
+metadata_index = None
+
+def get_metadata_index() -> MetadataIndex:
+    """Get the container's metadata index."""
+    global metadata_index
+    if metadata_index is None:
+        metadata_index = MetadataIndex()
+    return metadata_index
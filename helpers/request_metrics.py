@@ -0,0 +1,198 @@
+"""
+Per-request latency timeline and structured metrics.
+
+Each request gets a RequestTimeline that records:
+- spans: stage durations (query optimization, embeddings, Pinecone,
+  Discourse, KB retrieval, agent tool calls, whole sections)
+- marks: time since the request started, kept for the first occurrence
+  only (e.g. time to first token per section)
+- counters: frames sent, text deltas received, etc.
+
+At the end of the request the timeline is emitted as one CloudWatch
+Embedded Metric Format (EMF) JSON line, which CloudWatch turns into
+metrics without any API call.
+
+The timeline lives in a context variable, so code anywhere below the
+handler (including section tasks and worker threads started with
+asyncio.to_thread) records into the right request without passing it
+around. Outside a request, a no-op timeline is returned.
+
+Per-event debug logging is sampled per request (LOG_SAMPLE_RATE): an
+unsampled request pays one attribute check per event and never formats
+a log message.
+"""
+
+import os
+import json
+import time
+import random
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+# CloudWatch namespace and dimensions of the emitted metrics
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "PricingSaaS/AgentBackend")
+METRICS_SERVICE = os.getenv("METRICS_SERVICE", "agent-websocket")
+
+# Fraction of requests whose individual stream events are logged
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.0"))
+
+
+class RequestTimeline:
+    """Spans, marks and counters of one request."""
+
+    def __init__(self, sampled: Optional[bool] = None):
+        """
+        Initialize the timeline; the request clock starts now.
+
+        Args:
+            sampled: Whether per-event debug logs are written for this request
+                (defaults to a LOG_SAMPLE_RATE draw)
+        """
+        self.started_at = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}
+        self.marks: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+        self.sampled = random.random() < LOG_SAMPLE_RATE if sampled is None else sampled
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the request started."""
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def record(self, name: str, duration_ms: float) -> None:
+        """Record one span duration."""
+        self.spans.setdefault(name, []).append(duration_ms)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """
+        Time the enclosed block as a span (recorded even if it raises).
+
+        Args:
+            name: Span name, e.g. "pinecone" or "community.tool"
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def mark(self, name: str) -> None:
+        """Record the time since the request started, the first time only."""
+        if name not in self.marks:
+            self.marks[name] = self.elapsed_ms()
+
+    def count(self, name: str, value: float = 1) -> None:
+        """Add to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_emf(self) -> Dict:
+        """
+        Build the CloudWatch EMF record of the request.
+
+        Spans are reported as their total duration (plus a "count" when a
+        stage ran several times), marks in milliseconds since the start,
+        and counters as plain counts.
+
+        Returns:
+            EMF record dict
+        """
+        values: Dict[str, float] = {"total": self.elapsed_ms()}
+        units: Dict[str, str] = {"total": "Milliseconds"}
+
+        for name, durations in self.spans.items():
+            values[f"{name}_ms"] = sum(durations)
+            units[f"{name}_ms"] = "Milliseconds"
+            if len(durations) > 1:
+                values[f"{name}_count"] = len(durations)
+                units[f"{name}_count"] = "Count"
+        for name, offset in self.marks.items():
+            values[f"{name}_ms"] = offset
+            units[f"{name}_ms"] = "Milliseconds"
+        for name, value in self.counters.items():
+            values[name] = value
+            units[name] = "Count"
+
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["Service"]],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()]
+                }]
+            },
+            "Service": METRICS_SERVICE,
+        }
+        record.update({name: round(value, 2) for name, value in values.items()})
+        return record
+
+    def emit(self) -> None:
+        """Write the EMF record as one stdout line (picked up by CloudWatch Logs)."""
+        print(json.dumps(self.to_emf()), flush=True)
+
+
+class _NullTimeline(RequestTimeline):
+    """Timeline used outside a request; records nothing."""
+
+    def __init__(self):
+        super().__init__(sampled=False)
+
+    def record(self, name: str, duration_ms: float) -> None:
+        pass
+
+    def mark(self, name: str) -> None:
+        pass
+
+    def count(self, name: str, value: float = 1) -> None:
+        pass
+
+
+_NULL_TIMELINE = _NullTimeline()
+
+# Timeline of the request being handled
+_current_timeline: contextvars.ContextVar[RequestTimeline] = contextvars.ContextVar(
+    "request_timeline", default=_NULL_TIMELINE
+)
+
+
+def start_request_timeline(sampled: Optional[bool] = None) -> RequestTimeline:
+    """
+    Start the timeline of a new request and make it current.
+
+    Args:
+        sampled: Force per-event debug logging on or off for this request
+
+    Returns:
+        The new timeline
+    """
+    timeline = RequestTimeline(sampled)
+    _current_timeline.set(timeline)
+    return timeline
+
+
+def get_timeline() -> RequestTimeline:
+    """Get the timeline of the current request (a no-op timeline outside requests)."""
+    return _current_timeline.get()
+
+
+def timed(name: str):
+    """Time a block as a span of the current request."""
+    return get_timeline().span(name)
+
+
+def timed_coroutine(name: str):
+    """
+    Decorate a coroutine function so each call is a span of the current request.
+
+    Args:
+        name: Span name
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with get_timeline().span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -5,11 +5,12 @@ This module contains JSON schema definitions for knowledge base entries,
 validation functions, and schema versioning utilities.
 """
 
-import json
 from datetime import datetime
 from typing import Dict, List, Optional, Union, Any, Literal
 
-from jsonschema import validate, ValidationError
+from jsonschema import FormatChecker, ValidationError
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 from pydantic import BaseModel, Field
 
 # Schema version for tracking and migrations
@@ -121,6 +122,47 @@ SCHEMA_VERSIONS = {
     # Add new versions here as the schema evolves
 }
 
+# Format checks applied by the compiled validators. "date-time" accepts the
+# ISO 8601 timestamps the helpers write (datetime.isoformat(), no offset
+# required), which jsonschema's stock RFC 3339 check would reject.
+FORMAT_CHECKER = FormatChecker()
+
+@FORMAT_CHECKER.checks("date-time", raises=ValueError)
+def is_iso_datetime(value: Any) -> bool:
+    """Check that a string parses with datetime.fromisoformat."""
+    if isinstance(value, str):
+        datetime.fromisoformat(value)
+    return True
+
+# One compiled validator per schema version, built on first use
+_validators: Dict[str, Any] = {}
+
+def get_validator(schema_version: str = CURRENT_SCHEMA_VERSION) -> Any:
+    """
+    Get the compiled validator for a schema version.
+    
+    The schema is checked and its validator built once per process;
+    jsonschema.validate used to do both on every call.
+    
+    Args:
+        schema_version: Version key in SCHEMA_VERSIONS
+        
+    Returns:
+        A jsonschema validator for the version's schema
+        
+    Raises:
+        ValidationError: If the schema version is unknown
+    """
+    validator = _validators.get(schema_version)
+    if validator is None:
+        if schema_version not in SCHEMA_VERSIONS:
+            raise ValidationError(f"Unknown schema version: {schema_version}")
+        schema = SCHEMA_VERSIONS[schema_version]
+        validator_class = validator_for(schema)
+        validator_class.check_schema(schema)
+        validator = _validators[schema_version] = validator_class(schema, format_checker=FORMAT_CHECKER)
+    return validator
+
 def validate_entry(entry_data: Dict[str, Any]) -> bool:
     """
     Validate a knowledge base entry against the schema.
@@ -134,127 +176,77 @@ def validate_entry(entry_data: Dict[str, Any]) -> bool:
     Raises:
         ValidationError: If validation fails
     """
-    schema_version = entry_data.get("schema_version", CURRENT_SCHEMA_VERSION)
+    validator = get_validator(entry_data.get("schema_version", CURRENT_SCHEMA_VERSION))
     
-    if schema_version not in SCHEMA_VERSIONS:
-        raise ValidationError(f"Unknown schema version: {schema_version}")
-        
-    schema = SCHEMA_VERSIONS[schema_version]
-    validate(instance=entry_data, schema=schema)
+    # Same error as jsonschema.validate: the most relevant one
+    error = best_match(validator.iter_errors(entry_data))
+    if error is not None:
+        raise error
     return True
 
-def entry_to_metadata(entry: Union[KnowledgeBaseEntryExtended, Dict[str, Any]]) -> Dict[str, Any]:
+def validate_entries(entries: List[Dict[str, Any]]) -> List[List[ValidationError]]:
     """
-    Convert entry to Pinecone metadata format.
+    Validate many knowledge base entries in one pass.
+    
+    Unlike validate_entry, nothing is raised: every error of every entry
+    is collected, so a bulk write can report all of them at once.
     
     Args:
-        entry: Knowledge base entry (Pydantic model or dict)
+        entries: Entry data dictionaries
         
     Returns:
-        Dict with metadata formatted for Pinecone
+        One list of ValidationErrors per entry, in input order
+        (empty for a valid entry)
     """
-    if isinstance(entry, KnowledgeBaseEntryExtended):
-        entry_dict = entry.model_dump()
-    else:
-        entry_dict = entry.copy()
-    
-    # Convert datetime objects to ISO format strings for Pinecone
-    for field in ["created_at", "updated_at", "expiration"]:
-        if field in entry_dict and entry_dict[field] is not None:
-            if isinstance(entry_dict[field], datetime):
-                entry_dict[field] = entry_dict[field].isoformat()
+    errors: List[List[ValidationError]] = []
+    for entry_data in entries:
+        try:
+            validator = get_validator(entry_data.get("schema_version", CURRENT_SCHEMA_VERSION))
+        except ValidationError as e:
+            errors.append([e])
+            continue
+        errors.append(list(validator.iter_errors(entry_data)))
+    return errors
+
+def format_validation_errors(errors: List[ValidationError]) -> str:
+    """
+    Join validation errors into one message, each prefixed with its field path.
     
-    # Remove content field as it's typically too large for metadata
-    # The content is embedded in the vector
-    if "content" in entry_dict:
-        entry_dict.pop("content")
+    Args:
+        errors: Errors of one entry
         
-    # Keep tags as array for Pinecone filtering and also provide CSV format for backward compatibility
-    if "tags" in entry_dict and isinstance(entry_dict["tags"], list):
-        # Keep the original array for filtering with $in operator
-        entry_dict["tags"] = [tag for tag in entry_dict["tags"] if tag]
-        # Also provide tags_csv for backward compatibility
-        entry_dict["tags_csv"] = ",".join(entry_dict["tags"])
-    
-    # Handle custom_fields - Pinecone doesn't accept empty dictionaries or nested objects
-    if "custom_fields" in entry_dict:
-        # If empty, remove it
-        if not entry_dict["custom_fields"]:
-            entry_dict.pop("custom_fields")
-        else:
-            # Convert any nested dictionaries to JSON strings
-            custom_fields = {}
-            for key, value in entry_dict["custom_fields"].items():
-                if isinstance(value, (dict, list)):
-                    custom_fields[f"custom_{key}"] = json.dumps(value)
-                elif value is not None:  # Skip None values
-                    custom_fields[f"custom_{key}"] = value
-            # Remove original custom_fields dict and add flattened fields
-            entry_dict.pop("custom_fields")
-            entry_dict.update(custom_fields)
-    
-    # Remove any None/null values as Pinecone doesn't accept them
-    cleaned_dict = {}
-    for key, value in entry_dict.items():
-        if value is not None:
-            cleaned_dict[key] = value
+    Returns:
+        str: e.g. "title: 'ab' is too short; visibility: 'x' is not one of [...]"
+    """
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error.path)}: {error.message}" if error.path else error.message
+        for error in errors
+    )
+
+def entry_to_metadata(entry: Union[KnowledgeBaseEntryExtended, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convert entry to Pinecone metadata format (see metadata_codec.encode_metadata).
     
-    return cleaned_dict
+    Args:
+        entry: Knowledge base entry (Pydantic model or dict)
+        
+    Returns:
+        Dict with metadata formatted for Pinecone
+    """
+    from helpers.metadata_codec import encode_metadata
+    return encode_metadata(entry)
 
-def metadata_to_entry(metadata: Dict[str, Any], content: str) -> KnowledgeBaseEntryExtended:
+def metadata_to_entry(metadata: Dict[str, Any], content: str, trusted: bool = False) -> KnowledgeBaseEntryExtended:
     """
-    Convert Pinecone metadata back to a knowledge base entry.
+    Convert Pinecone metadata back to a knowledge base entry (see metadata_codec.decode_metadata).
     
     Args:
         metadata: Metadata from Pinecone
         content: Content text (typically not stored in metadata)
+        trusted: Skip re-validation of metadata written by entry_to_metadata
         
     Returns:
         KnowledgeBaseEntryExtended: Entry as a Pydantic model
     """
-    entry_data = metadata.copy()
-    
-    # Add content back
-    entry_data["content"] = content
-    
-    # Convert tags back to list
-    if "tags_csv" in entry_data:
-        entry_data["tags"] = entry_data["tags_csv"].split(",") if entry_data["tags_csv"] else []
-        entry_data.pop("tags_csv")
-    
-    # Reconstruct custom_fields from flattened custom_ prefixed fields
-    custom_fields = {}
-    custom_keys = [k for k in list(entry_data.keys()) if k.startswith("custom_")]
-    
-    for key in custom_keys:
-        # Extract the original field name without the custom_ prefix
-        field_name = key[7:]  # Remove 'custom_' prefix
-        value = entry_data[key]
-        
-        # Try to parse JSON strings back to objects
-        if isinstance(value, str):
-            try:
-                value = json.loads(value)
-            except json.JSONDecodeError:
-                # If not valid JSON, keep as string
-                pass
-                
-        custom_fields[field_name] = value
-        entry_data.pop(key)  # Remove the flattened field
-    
-    # Add reconstructed custom_fields dict if not empty
-    if custom_fields:
-        entry_data["custom_fields"] = custom_fields
-    else:
-        entry_data["custom_fields"] = {}
-    
-    # Parse datetime strings
-    for field in ["created_at", "updated_at", "expiration"]:
-        if field in entry_data and isinstance(entry_data[field], str):
-            try:
-                entry_data[field] = datetime.fromisoformat(entry_data[field])
-            except ValueError:
-                # If parsing fails, keep as string
-                pass
-    
-    return KnowledgeBaseEntryExtended(**entry_data)
+    from helpers.metadata_codec import decode_metadata
+    return decode_metadata(metadata, content, trusted=trusted)
@@ -0,0 +1,442 @@
+"""
+Schema migrations for knowledge base vectors.
+
+SCHEMA_VERSIONS lists the entry schemas, but vectors already written keep
+the metadata of the version they were written with. A migration upgrades
+metadata from one version to the next:
+- register_migration(from_version, to_version, transform, transform_content)
+  records the step; transform rewrites a vector's metadata dict, and the
+  optional transform_content rewrites the entry content (the only embedded
+  field, so only those steps need re-embedding)
+- SchemaMigrator walks each namespace with paginated ID listing, fetches
+  every page of vectors in one request, and writes metadata-only upgrades
+  back as batched upserts of the stored values with the new metadata.
+  Entries whose content changes go through KnowledgeBaseManager.reembed_entry,
+  which only embeds the chunks that actually changed.
+- requests are spaced to MIGRATION_RATE_LIMIT per second, and a checkpoint
+  (the next page token of every namespace) is saved after each page, so a
+  killed run resumes where it stopped. Vectors already at the target
+  version are skipped, so re-processing a page is harmless; vectors that
+  failed keep their version and are retried by a run with --restart.
+
+Run with:
+    python -m helpers.schema_migrations migrate [--dry-run] [--restart] [namespace ...]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from helpers.metadata_codec import decode_metadata
+from helpers.schema_definitions import CURRENT_SCHEMA_VERSION, SCHEMA_VERSIONS
+from helpers.knowledge_base_helper import (
+    CHUNK_ID_SEPARATOR,
+    UPSERT_BATCH_SIZE,
+    KnowledgeBaseManager,
+    content_hash,
+    get_kb_manager,
+    notify_namespace_write
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Migration configuration
+MIGRATION_RATE_LIMIT = float(os.getenv("KB_MIGRATION_RATE_LIMIT", "10"))  # Vector store requests per second (0 = unlimited)
+MIGRATION_PAGE_SIZE = int(os.getenv("KB_MIGRATION_PAGE_SIZE", "100"))  # IDs per listed page (Pinecone allows up to 100)
+MIGRATION_CHECKPOINT_PATH = os.getenv("KB_MIGRATION_CHECKPOINT_PATH", "kb_migration_checkpoint.json")
+
+# Version of vectors written before schema_version was recorded
+BASE_SCHEMA_VERSION = "1.0.0"
+
+# Metadata describing a vector rather than its entry (kept out of re-embedded entry metadata)
+VECTOR_FIELDS = frozenset(["content_hash", "content_preview", "chunk_hashes", "parent_id", "chunk_index", "chunk_hash"])
+
+
+class Migration:
+    """One upgrade step between two schema versions."""
+
+    def __init__(
+        self,
+        from_version: str,
+        to_version: str,
+        transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        transform_content: Optional[Callable[[str], str]] = None
+    ):
+        """
+        Initialize the step.
+
+        Args:
+            from_version: Schema version the step applies to
+            to_version: Schema version it produces
+            transform: Returns the upgraded metadata of a vector (entry or
+                chunk); keys it does not know must be kept
+            transform_content: Returns the upgraded content of an entry
+                (entries are then re-embedded)
+        """
+        self.from_version = from_version
+        self.to_version = to_version
+        self.transform = transform
+        self.transform_content = transform_content
+
+
+# Registered steps, by the version they upgrade from
+MIGRATIONS: Dict[str, Migration] = {}
+
+def register_migration(
+    from_version: str,
+    to_version: str,
+    transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    transform_content: Optional[Callable[[str], str]] = None
+) -> Migration:
+    """
+    Register the upgrade step from one schema version to the next.
+
+    Args:
+        from_version: Schema version the step applies to
+        to_version: Schema version it produces (must be in SCHEMA_VERSIONS)
+        transform: Metadata transform (see Migration)
+        transform_content: Content transform (see Migration)
+
+    Returns:
+        The registered step
+
+    Raises:
+        ValueError: If to_version is not a known schema version
+    """
+    if to_version not in SCHEMA_VERSIONS:
+        raise ValueError(f"Unknown schema version: {to_version}")
+    migration = MIGRATIONS[from_version] = Migration(from_version, to_version, transform, transform_content)
+    return migration
+
+def plan_migration(from_version: str, to_version: str = CURRENT_SCHEMA_VERSION) -> List[Migration]:
+    """
+    Find the chain of steps from one schema version to another.
+
+    Args:
+        from_version: Version of the stored metadata
+        to_version: Target version
+
+    Returns:
+        Steps to apply in order (empty if the versions are equal)
+
+    Raises:
+        ValueError: If no chain of registered steps leads to the target
+    """
+    steps: List[Migration] = []
+    version = from_version
+    while version != to_version:
+        migration = MIGRATIONS.get(version)
+        if migration is None or len(steps) > len(MIGRATIONS):
+            raise ValueError(f"No migration path from schema version {from_version} to {to_version}")
+        steps.append(migration)
+        version = migration.to_version
+    return steps
+
+def migrate_metadata(metadata: Dict[str, Any], steps: List[Migration]) -> Dict[str, Any]:
+    """
+    Apply the metadata transforms of a chain of steps.
+
+    Args:
+        metadata: Stored metadata of a vector (not modified)
+        steps: Steps from plan_migration
+
+    Returns:
+        Upgraded metadata, with schema_version set to the last step's version
+    """
+    metadata = dict(metadata)
+    for step in steps:
+        if step.transform:
+            metadata = step.transform(metadata)
+        metadata["schema_version"] = step.to_version
+    return metadata
+
+
+class RateLimiter:
+    """Spaces calls to at most `rate` per second."""
+
+    def __init__(self, rate: float, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], Any] = time.sleep):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate: Calls per second (0 or less disables the limit)
+            clock: Monotonic clock
+            sleep: Sleep function
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.clock = clock
+        self.sleep = sleep
+        self._next_call = 0.0
+
+    def wait(self) -> None:
+        """Block until the next call is allowed."""
+        if not self.interval:
+            return
+        now = self.clock()
+        if self._next_call > now:
+            self.sleep(self._next_call - now)
+            now = self._next_call
+        self._next_call = now + self.interval
+
+
+class SchemaMigrator:
+    """Resumable migration of the vectors of one or more namespaces to a schema version."""
+
+    def __init__(
+        self,
+        manager: Optional[KnowledgeBaseManager] = None,
+        target_version: str = CURRENT_SCHEMA_VERSION,
+        checkpoint_path: Optional[str] = MIGRATION_CHECKPOINT_PATH,
+        rate_limit: float = MIGRATION_RATE_LIMIT,
+        page_size: int = MIGRATION_PAGE_SIZE,
+        dry_run: bool = False,
+        limiter: Optional[RateLimiter] = None
+    ):
+        """
+        Initialize the migrator.
+
+        Args:
+            manager: Knowledge base manager (defaults to the shared one)
+            target_version: Schema version to migrate to
+            checkpoint_path: JSON file recording progress (None to keep it in memory)
+            rate_limit: Vector store requests per second
+            page_size: IDs per listed page
+            dry_run: Count what would change without writing anything
+            limiter: Rate limiter (defaults to one at rate_limit)
+        """
+        self.manager = manager or get_kb_manager()
+        self.target_version = target_version
+        self.checkpoint_path = checkpoint_path
+        self.page_size = page_size
+        self.dry_run = dry_run
+        self.limiter = limiter or RateLimiter(rate_limit)
+        self.checkpoint = self.load_checkpoint()
+
+    # Checkpoint
+
+    def load_checkpoint(self) -> Dict[str, Any]:
+        """Load saved progress towards the target version (empty if there is none)."""
+        checkpoint = {"target_version": self.target_version, "namespaces": {}}
+        if not self.checkpoint_path:
+            return checkpoint
+        try:
+            with open(self.checkpoint_path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return checkpoint
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read migration checkpoint {self.checkpoint_path}: {e}")
+            return checkpoint
+        if saved.get("target_version") != self.target_version:
+            logger.info(f"Checkpoint is for schema version {saved.get('target_version')}, starting over")
+            return checkpoint
+        return saved
+
+    def save_checkpoint(self) -> None:
+        """Save progress (written then renamed, so a kill never leaves a partial file)."""
+        if not self.checkpoint_path or self.dry_run:
+            return
+        with open(f"{self.checkpoint_path}.tmp", "w") as f:
+            json.dump(self.checkpoint, f, indent=2)
+        os.replace(f"{self.checkpoint_path}.tmp", self.checkpoint_path)
+
+    def namespace_state(self, namespace: str) -> Dict[str, Any]:
+        """Progress of a namespace: next page token, done flag and counts."""
+        return self.checkpoint["namespaces"].setdefault(namespace, {
+            "pagination_token": None,
+            "done": False,
+            "pages": 0,
+            "migrated": 0,
+            "reembedded": 0,
+            "skipped": 0,
+            "failed": 0
+        })
+
+    # Migration
+
+    def run(self, namespaces: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Migrate namespaces, resuming from the checkpoint.
+
+        Args:
+            namespaces: Namespaces to migrate (defaults to every namespace of the index)
+
+        Returns:
+            The checkpoint: per-namespace progress and counts
+        """
+        if namespaces is None:
+            self.limiter.wait()
+            namespaces = self.manager.index.list_namespaces()
+        for namespace in namespaces:
+            self.migrate_namespace(namespace)
+        return self.checkpoint
+
+    def migrate_namespace(self, namespace: str) -> Dict[str, Any]:
+        """
+        Migrate one namespace page by page, saving the checkpoint after each page.
+
+        Args:
+            namespace: Namespace to migrate
+
+        Returns:
+            Progress of the namespace
+        """
+        state = self.namespace_state(namespace)
+        if state["done"]:
+            logger.info(f"Namespace {namespace} already migrated to {self.target_version}")
+            return state
+
+        while True:
+            self.limiter.wait()
+            page = self.manager.index.list_paginated(
+                limit=self.page_size,
+                pagination_token=state["pagination_token"],
+                namespace=namespace
+            )
+            ids = [vector.id for vector in (getattr(page, "vectors", None) or [])]
+            if ids:
+                for key, count in self.migrate_ids(namespace, ids).items():
+                    state[key] += count
+
+            pagination = getattr(page, "pagination", None)
+            state["pagination_token"] = getattr(pagination, "next", None) if pagination else None
+            state["done"] = not state["pagination_token"]
+            state["pages"] += 1
+            self.save_checkpoint()
+            logger.info(
+                f"Namespace {namespace}: page {state['pages']}, {state['migrated']} migrated, "
+                f"{state['reembedded']} re-embedded, {state['skipped']} skipped, {state['failed']} failed"
+            )
+            if state["done"]:
+                return state
+
+    def migrate_ids(self, namespace: str, ids: List[str]) -> Dict[str, int]:
+        """
+        Migrate one page of vectors.
+
+        Args:
+            namespace: Namespace of the vectors
+            ids: Vector IDs of the page
+
+        Returns:
+            Counts of migrated, re-embedded, skipped and failed vectors
+        """
+        counts = {"migrated": 0, "reembedded": 0, "skipped": 0, "failed": 0}
+        # A failed fetch stops the run before the checkpoint moves past this page
+        self.limiter.wait()
+        fetch_response = self.manager.index.fetch(ids=ids, namespace=namespace)
+        vectors = dict(getattr(fetch_response, "vectors", None) or {})
+
+        upserts: List[Tuple[str, List[float], Dict[str, Any]]] = []
+        reembeds: List[Tuple[str, Dict[str, Any], Dict[str, Any], List[Migration]]] = []
+        for vector_id, vector in vectors.items():
+            metadata = dict(getattr(vector, "metadata", None) or {})
+            version = metadata.get("schema_version", BASE_SCHEMA_VERSION)
+            if version == self.target_version:
+                counts["skipped"] += 1
+                continue
+            try:
+                steps = plan_migration(version, self.target_version)
+                migrated = migrate_metadata(metadata, steps)
+            except Exception as e:
+                logger.error(f"Cannot migrate vector {vector_id} in namespace {namespace}: {e}")
+                counts["failed"] += 1
+                continue
+
+            if not any(step.transform_content for step in steps):
+                upserts.append((vector_id, list(vector.values), migrated))
+            elif CHUNK_ID_SEPARATOR in vector_id:
+                # Re-embedding the entry rewrites its chunks
+                counts["skipped"] += 1
+            else:
+                reembeds.append((vector_id, metadata, migrated, steps))
+
+        if self.dry_run:
+            counts["migrated"] += len(upserts)
+            counts["reembedded"] += len(reembeds)
+            return counts
+
+        # Metadata-only upgrades: stored values with the new metadata, in upsert batches
+        for offset in range(0, len(upserts), UPSERT_BATCH_SIZE):
+            batch = upserts[offset:offset + UPSERT_BATCH_SIZE]
+            self.limiter.wait()
+            try:
+                self.manager.index.upsert(vectors=batch, namespace=namespace)
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} migrated vectors to namespace {namespace}: {e}")
+                counts["failed"] += len(batch)
+                continue
+            self.manager.index_metadata(namespace, batch)
+            counts["migrated"] += len(batch)
+        if upserts:
+            notify_namespace_write(namespace)
+
+        for vector_id, stored_metadata, migrated, steps in reembeds:
+            self.limiter.wait()
+            if self.reembed(namespace, vector_id, stored_metadata, migrated, steps):
+                counts["reembedded"] += 1
+            else:
+                counts["failed"] += 1
+        return counts
+
+    def reembed(
+        self,
+        namespace: str,
+        entry_id: str,
+        stored_metadata: Dict[str, Any],
+        migrated: Dict[str, Any],
+        steps: List[Migration]
+    ) -> bool:
+        """
+        Migrate an entry whose content changes, re-embedding its changed chunks.
+
+        The content is read from the content store, or from the stored
+        preview when that is the whole content (its hash matches).
+
+        Args:
+            namespace: Namespace of the entry
+            entry_id: ID of the entry
+            stored_metadata: Stored metadata of the entry vector
+            migrated: Upgraded metadata
+            steps: Steps being applied
+
+        Returns:
+            True if the entry was migrated
+        """
+        content = self.manager.content_store.get(entry_id) if self.manager.content_store else None
+        if content is None:
+            preview = stored_metadata.get("content_preview", "")
+            if not preview or content_hash(preview) != stored_metadata.get("content_hash"):
+                logger.error(f"Cannot migrate entry {entry_id}: its full content is not available")
+                return False
+            content = preview
+
+        try:
+            for step in steps:
+                if step.transform_content:
+                    content = step.transform_content(content)
+            entry = decode_metadata({**migrated, "id": entry_id}, content)
+            entry_metadata = {key: value for key, value in migrated.items() if key not in VECTOR_FIELDS}
+            return self.manager.reembed_entry(entry, entry_metadata, namespace, stored_metadata)
+        except Exception as e:
+            logger.error(f"Error re-embedding entry {entry_id} in namespace {namespace}: {e}")
+            return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python -m helpers.schema_migrations migrate [--dry-run] [--restart] [namespace ...]")
+        sys.exit(1)
+
+    options = [arg for arg in sys.argv[2:] if arg.startswith("--")]
+    namespaces = [arg for arg in sys.argv[2:] if not arg.startswith("--")] or None
+    if "--restart" in options and os.path.exists(MIGRATION_CHECKPOINT_PATH):
+        os.remove(MIGRATION_CHECKPOINT_PATH)
+
+    report = SchemaMigrator(dry_run="--dry-run" in options).run(namespaces)
+    print(json.dumps(report, indent=2))
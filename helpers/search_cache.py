@@ -0,0 +1,235 @@
+"""
+Namespace-versioned cache of knowledge base search results.
+
+The same search (same query, same namespaces, same filter) repeats often,
+within a session and across users of public-kb, and each one costs up to
+one Pinecone query per namespace. SearchResultCache keeps the results of
+recent searches keyed by (namespaces, query embedding hash, filter,
+limit, search options).
+
+Every namespace has a version counter that notify_namespace_write
+increments after each create/update/delete. A cached result remembers the
+versions of its namespaces when its search started, and a lookup only
+returns it if they are unchanged, so a write makes every result drawn
+from its namespace stale at once without scanning the cache.
+
+Entries are shared by every user of a namespace, so no caller may change
+a cached one: EntryView results are read-only and are handed out as they
+are, while entry models are deep-copied when stored and on every hit
+(a copy costs microseconds, a Pinecone query tens of milliseconds).
+
+Versions are counted per process. Writes made elsewhere (the edge
+functions, other containers) are not seen, so results also expire after
+SEARCH_CACHE_TTL_S, like the metadata index sync.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from helpers.metadata_codec import EntryView
+from helpers.request_metrics import get_timeline
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+SEARCH_CACHE_ENABLED = os.getenv("KB_SEARCH_CACHE_ENABLED", "true").lower() == "true"
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("KB_SEARCH_CACHE_MAX_ENTRIES", "512"))  # Cached searches (least recently used are evicted)
+SEARCH_CACHE_TTL_S = float(os.getenv("KB_SEARCH_CACHE_TTL_S", "300"))  # Bounds staleness from writes made outside this process
+
+
+def embedding_hash(embedding: List[float]) -> str:
+    """
+    Hash a query embedding.
+
+    Args:
+        embedding: Query embedding
+
+    Returns:
+        Hex BLAKE2b digest of the float64 values
+    """
+    return hashlib.blake2b(array("d", embedding).tobytes(), digest_size=16).hexdigest()
+
+
+def search_key(
+    namespaces: Iterable[str],
+    query_embedding: List[float],
+    filter_dict: Optional[Dict[str, Any]],
+    limit: int,
+    **options: Any
+) -> Tuple:
+    """
+    Build the cache key of a search.
+
+    Args:
+        namespaces: Searched namespaces (order does not matter)
+        query_embedding: Embedding of the query
+        filter_dict: Metadata filter (key order does not matter)
+        limit: Maximum number of results
+        **options: Other arguments that change the results (e.g. the query
+            text for hybrid search, views, include_content)
+
+    Returns:
+        Hashable key
+    """
+    return (
+        tuple(sorted(set(namespaces))),
+        embedding_hash(query_embedding),
+        json.dumps(filter_dict or {}, sort_keys=True, default=str),
+        limit,
+        tuple(sorted(options.items()))
+    )
+
+
+def detach_results(results: List[Tuple[Any, float]]) -> List[Tuple[Any, float]]:
+    """
+    Copy search results so the cached ones cannot be changed through them.
+
+    Args:
+        results: (entry, score) tuples
+
+    Returns:
+        New (entry, score) tuples: EntryViews as they are (read-only),
+        entry models deep-copied
+    """
+    return [
+        (entry if isinstance(entry, EntryView) else entry.model_copy(deep=True), score)
+        for entry, score in results
+    ]
+
+
+class NamespaceVersions:
+    """Write counters of the namespaces written by this process."""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, namespace: str) -> None:
+        """Record a write to a namespace."""
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def get(self, namespace: str) -> int:
+        """Get the version of a namespace (0 if never written)."""
+        return self._versions.get(namespace, 0)
+
+    def snapshot(self, namespaces: Iterable[str]) -> Tuple[int, ...]:
+        """Get the versions of several namespaces, in sorted namespace order."""
+        return tuple(self.get(namespace) for namespace in sorted(set(namespaces)))
+
+
+# Incremented by notify_namespace_write in knowledge_base_helper
+namespace_versions = NamespaceVersions()
+
+
+class CachedSearch:
+    """The results of one search and the namespace versions they reflect."""
+
+    __slots__ = ("results", "versions", "expires_at")
+
+    def __init__(self, results: List[Any], versions: Tuple[int, ...], ttl: float):
+        self.results = results
+        self.versions = versions
+        self.expires_at = time.monotonic() + ttl
+
+
+class SearchResultCache:
+    """In-memory LRU of search results, invalidated by namespace versions."""
+
+    def __init__(
+        self,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        ttl: float = SEARCH_CACHE_TTL_S,
+        versions: Optional[NamespaceVersions] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached searches
+            ttl: Seconds a result is kept (for writes this process does not see)
+            versions: Namespace write counters (defaults to the process-wide ones)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.versions = versions or namespace_versions
+        self._entries: "OrderedDict[Tuple, CachedSearch]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "stores": 0, "evictions": 0}
+
+    def snapshot(self, namespaces: Iterable[str]) -> Tuple[int, ...]:
+        """
+        Get the current versions of the searched namespaces.
+
+        Take the snapshot before querying, so a write that lands during
+        the search makes its results stale.
+        """
+        return self.versions.snapshot(namespaces)
+
+    def get(self, key: Tuple, versions: Tuple[int, ...]) -> Optional[List[Any]]:
+        """
+        Get the cached results of a search.
+
+        Args:
+            key: Key from search_key
+            versions: Current namespace versions (from snapshot)
+
+        Returns:
+            A copy of the cached results (see detach_results), or None on a miss
+        """
+        timeline = get_timeline()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and (cached.versions != versions or time.monotonic() >= cached.expires_at):
+                del self._entries[key]
+                self.stats["stale"] += 1
+                cached = None
+            if cached is None:
+                self.stats["misses"] += 1
+                timeline.count("kb_search_cache.misses")
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        timeline.count("kb_search_cache.hits")
+        return detach_results(cached.results)
+
+    def put(self, key: Tuple, versions: Tuple[int, ...], results: List[Any]) -> None:
+        """
+        Store the results of a search.
+
+        Args:
+            key: Key from search_key
+            versions: Namespace versions when the search started
+            results: Search results (copied, so the caller may keep changing its own)
+        """
+        results = detach_results(results)
+        with self._lock:
+            self._entries[key] = CachedSearch(results, versions, self.ttl)
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Remove every cached search."""
+        with self._lock:
+            self._entries.clear()
+
+    def report(self) -> Dict[str, int]:
+        """Get the hit/miss/stale/store/eviction counters plus the current size."""
+        return {**self.stats, "entries": len(self._entries)}
+
+
+def create_search_cache() -> Optional[SearchResultCache]:
+    """Create a search cache, or None if caching is disabled."""
+    return SearchResultCache() if SEARCH_CACHE_ENABLED else None
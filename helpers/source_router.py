@@ -0,0 +1,298 @@
+"""
+Source router for the PricingSaaS agent backend.
+
+This module decides, per prompt, which knowledge sources (reports,
+community, knowledge base) are worth running. It scores a single prompt
+embedding against per-source centroid/exemplar vectors stored locally,
+so routing costs no extra LLM call. Whenever the router is unsure or
+unavailable it falls back to running every source.
+
+The exemplar vectors are built with:
+    python -m helpers.source_router build
+
+deploy.sh runs the build when data/source_router_vectors.json is missing
+or older than the exemplars, and packages both files under data/ (next
+to helpers/, where DATA_DIR points in the Lambda too).
+"""
+
+import os
+import sys
+import json
+import math
+import logging
+from typing import Callable, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Knowledge sources in client-visible order
+SOURCES = ("reports", "community", "kb")
+
+# Configuration
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+ROUTER_EXEMPLARS_PATH = os.getenv("SOURCE_ROUTER_EXEMPLARS", os.path.join(DATA_DIR, "source_router_exemplars.json"))
+ROUTER_VECTORS_PATH = os.getenv("SOURCE_ROUTER_VECTORS", os.path.join(DATA_DIR, "source_router_vectors.json"))
+ROUTER_ENABLED = os.getenv("SOURCE_ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_THRESHOLD = float(os.getenv("SOURCE_ROUTER_THRESHOLD", "0.35"))
+# Sources that always run regardless of their score (comma separated)
+ROUTER_ALWAYS_RUN = [s.strip() for s in os.getenv("SOURCE_ROUTER_ALWAYS_RUN", "").split(",") if s.strip()]
+
+# Approximate work done by each source, used to report what routing saves.
+# community: agent run + query optimization call; post query (+ topic query on a miss)
+# kb: no LLM run; one query per namespace (public, team, user)
+SOURCE_COSTS = {
+    "reports": {"llm_runs": 1, "pinecone_queries": 0},
+    "community": {"llm_runs": 2, "pinecone_queries": 1},
+    "kb": {"llm_runs": 0, "pinecone_queries": 3},
+}
+
+# Running totals for this container
+ROUTER_STATS = {
+    "decisions": 0,
+    "fallbacks": 0,
+    "sources_skipped": 0,
+    "llm_runs_saved": 0,
+    "pinecone_queries_saved": 0,
+}
+
+
+def normalize(vector: List[float]) -> List[float]:
+    """Scale a vector to unit length (zero vectors are returned unchanged)."""
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0:
+        return list(vector)
+    return [v / norm for v in vector]
+
+
+def dot(a: List[float], b: List[float]) -> float:
+    """Dot product of two vectors (cosine similarity for unit vectors)."""
+    return sum(x * y for x, y in zip(a, b))
+
+
+class RoutingDecision:
+    """Which sources to run for a prompt, and why."""
+
+    __slots__ = ("sources", "scores", "fallback_reason")
+
+    def __init__(
+        self,
+        sources: List[str],
+        scores: Optional[Dict[str, float]] = None,
+        fallback_reason: Optional[str] = None
+    ):
+        self.sources = list(sources)
+        self.scores = scores or {}
+        self.fallback_reason = fallback_reason
+
+    @classmethod
+    def run_everything(cls, reason: str, scores: Optional[Dict[str, float]] = None) -> "RoutingDecision":
+        """Create a decision that runs every source."""
+        return cls(list(SOURCES), scores, fallback_reason=reason)
+
+    @property
+    def skipped(self) -> List[str]:
+        """Sources the decision skips."""
+        return [source for source in SOURCES if source not in self.sources]
+
+    def savings(self) -> Dict[str, int]:
+        """Estimated LLM runs and Pinecone queries saved by skipping sources."""
+        saved = {"llm_runs": 0, "pinecone_queries": 0}
+        for source in self.skipped:
+            for key, value in SOURCE_COSTS[source].items():
+                saved[key] += value
+        return saved
+
+    def to_dict(self) -> Dict[str, object]:
+        """Convert the decision to a loggable dictionary."""
+        return {
+            "sources": self.sources,
+            "skipped": self.skipped,
+            "scores": {source: round(score, 4) for source, score in self.scores.items()},
+            "fallback_reason": self.fallback_reason,
+            "saved": self.savings(),
+        }
+
+
+class SourceRouter:
+    """Routes prompts to sources by similarity to per-source exemplar vectors."""
+
+    def __init__(
+        self,
+        vectors: Dict[str, List[List[float]]],
+        model: str,
+        threshold: float = ROUTER_THRESHOLD,
+        always_run: Optional[List[str]] = None
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            vectors: Centroid and exemplar vectors for each source
+            model: Embedding model the vectors were built with
+            threshold: Minimum similarity for a source to run
+            always_run: Sources that run regardless of their score
+        """
+        self.vectors = {
+            source: [normalize(vector) for vector in source_vectors]
+            for source, source_vectors in vectors.items()
+            if source in SOURCES and source_vectors
+        }
+        self.model = model
+        self.threshold = threshold
+        self.always_run = always_run if always_run is not None else ROUTER_ALWAYS_RUN
+
+    def score(self, embedding: List[float]) -> Dict[str, float]:
+        """
+        Score a prompt embedding against every source.
+
+        Args:
+            embedding: Prompt embedding from the router's model
+
+        Returns:
+            Best similarity per source
+        """
+        query = normalize(embedding)
+        return {
+            source: max(dot(query, vector) for vector in source_vectors)
+            for source, source_vectors in self.vectors.items()
+        }
+
+    def route(self, embedding: List[float]) -> RoutingDecision:
+        """
+        Decide which sources to run for a prompt embedding.
+
+        Sources without exemplar vectors always run. If no source clears the
+        threshold the router is not confident and runs everything.
+
+        Args:
+            embedding: Prompt embedding from the router's model
+
+        Returns:
+            RoutingDecision with the sources to run in client-visible order
+        """
+        scores = self.score(embedding)
+
+        selected = [
+            source for source in SOURCES
+            if source not in scores
+            or source in self.always_run
+            or scores[source] >= self.threshold
+        ]
+
+        if not any(source in scores and scores[source] >= self.threshold for source in selected):
+            return RoutingDecision.run_everything("no_confident_source", scores)
+
+        return RoutingDecision(selected, scores)
+
+
+def load_source_router(path: str = ROUTER_VECTORS_PATH) -> Optional[SourceRouter]:
+    """
+    Load the router from its vector file.
+
+    Args:
+        path: Path of the vector file built by build_router_vectors
+
+    Returns:
+        SourceRouter, or None if routing is disabled or the file is missing
+    """
+    if not ROUTER_ENABLED:
+        return None
+
+    if not os.path.exists(path):
+        logger.info(f"Source router vectors not found at {path}; running every source")
+        return None
+
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return SourceRouter(
+            vectors=data["vectors"],
+            model=data["model"],
+            threshold=data.get("threshold", ROUTER_THRESHOLD)
+        )
+    except Exception as e:
+        logger.error(f"Error loading source router vectors: {e}")
+        return None
+
+
+# We'll load the router on demand and keep it for the container lifetime
+_source_router = None
+_source_router_loaded = False
+
+def get_source_router() -> Optional[SourceRouter]:
+    """Get the source router instance, or None if routing is unavailable."""
+    global _source_router, _source_router_loaded
+    if not _source_router_loaded:
+        _source_router = load_source_router()
+        _source_router_loaded = True
+    return _source_router
+
+
+def log_routing_decision(decision: RoutingDecision) -> None:
+    """
+    Log a routing decision and add it to the container totals.
+
+    The log line is a single JSON object so routing savings can be
+    aggregated from the logs.
+
+    Args:
+        decision: The routing decision to record
+    """
+    saved = decision.savings()
+    ROUTER_STATS["decisions"] += 1
+    ROUTER_STATS["sources_skipped"] += len(decision.skipped)
+    ROUTER_STATS["llm_runs_saved"] += saved["llm_runs"]
+    ROUTER_STATS["pinecone_queries_saved"] += saved["pinecone_queries"]
+    if decision.fallback_reason:
+        ROUTER_STATS["fallbacks"] += 1
+
+    logger.info(json.dumps({"source_routing": decision.to_dict(), "totals": ROUTER_STATS}))
+
+
+def build_router_vectors(
+    embed: Callable[[str], List[float]],
+    model: str,
+    exemplars_path: str = ROUTER_EXEMPLARS_PATH,
+    output_path: str = ROUTER_VECTORS_PATH
+) -> Dict[str, int]:
+    """
+    Embed the exemplar prompts and write the router vector file.
+
+    Each source stores its centroid followed by its exemplar vectors.
+
+    Args:
+        embed: Function that embeds one text with the given model
+        model: Name of the embedding model used by embed
+        exemplars_path: JSON file mapping each source to exemplar prompts
+        output_path: Where to write the vector file
+
+    Returns:
+        Number of vectors written per source
+    """
+    with open(exemplars_path) as f:
+        exemplars = json.load(f)
+
+    vectors = {}
+    for source in SOURCES:
+        source_vectors = [normalize(embed(text)) for text in exemplars.get(source, [])]
+        if not source_vectors:
+            continue
+        centroid = normalize([sum(values) / len(source_vectors) for values in zip(*source_vectors)])
+        vectors[source] = [centroid] + source_vectors
+
+    with open(output_path, "w") as f:
+        json.dump({"model": model, "threshold": ROUTER_THRESHOLD, "vectors": vectors}, f)
+
+    return {source: len(source_vectors) for source, source_vectors in vectors.items()}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("Usage: python -m helpers.source_router build")
+        sys.exit(1)
+
+    from helpers.knowledge_base_helper import generate_embedding, EMBEDDING_MODEL
+
+    counts = build_router_vectors(generate_embedding, EMBEDDING_MODEL)
+    print(f"Wrote source router vectors to {ROUTER_VECTORS_PATH}: {counts}")
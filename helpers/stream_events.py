@@ -0,0 +1,396 @@
+"""
+Stream event model and WebSocket wire serializer.
+
+Agent sections produce compact, slotted event objects once, at the
+source, and every event is encoded into its WebSocket frame bytes at
+most once. Citations are built through the Citation factories below,
+which are the single place that knows the universal citation format:
+
+    {
+        "type": "citation",
+        "citation": {
+            "id": "unique-id",
+            "title": "[Source] Document Title",
+            "source": "report|community|kb",
+            "url": "optional-url",
+            "content": "optional-content",
+            "metadata": {}
+        }
+    }
+
+Events still support event["type"], event["data"] and event.get(...)
+so existing consumers of the dict format keep working.
+"""
+
+import re
+import json
+import time
+from typing import Any, Dict, Iterable, Optional
+
+# Collapse 3 or more consecutive newlines to 2
+_EXCESS_NEWLINES = re.compile(r'\n{3,}')
+
+SOURCE_PREFIXES = {
+    "report": "[Report]",
+    "community": "[Community]",
+    "kb": "[Knowledge Base]",
+}
+
+
+def _prefixed(source: str, title: str) -> str:
+    """Add the source prefix to a title unless it already has it."""
+    prefix = SOURCE_PREFIXES[source]
+    return title if title.startswith(prefix) else f"{prefix} {title}"
+
+
+def _pick(data: Any, *keys: str, default: Any = None) -> Any:
+    """Get the first present key from a dict, or attribute from an object."""
+    for key in keys:
+        if isinstance(data, dict):
+            if key in data:
+                return data[key]
+        elif hasattr(data, key):
+            return getattr(data, key)
+    return default
+
+
+class Citation:
+    """A citation in the universal format."""
+
+    __slots__ = ("id", "title", "source", "url", "content", "metadata", "_json")
+
+    def __init__(
+        self,
+        id: str,
+        title: str,
+        source: str,
+        content: str = "",
+        metadata: Optional[Dict[str, Any]] = None,
+        url: Optional[str] = None
+    ):
+        self.id = id
+        self.title = title
+        self.source = source
+        self.url = url
+        self.content = content
+        self.metadata = metadata or {}
+        self._json = None
+
+    ### FACTORIES
+
+    @classmethod
+    def report(cls, file_id: Optional[str], title: str, content: str = "") -> "Citation":
+        """Create an expert report citation."""
+        file_id = file_id or f"report-{time.time()}"
+        return cls(
+            id=file_id,
+            title=_prefixed("report", title),
+            source="report",
+            content=content or "",
+            metadata={"original_type": "file_citation", "file_id": file_id}
+        )
+
+    @classmethod
+    def community(
+        cls,
+        topic_id: Optional[str],
+        title: str,
+        url: str = "",
+        content: str = "",
+        post_id: Optional[str] = None
+    ) -> "Citation":
+        """Create a community post citation."""
+        topic_id = topic_id or f"community-{time.time()}"
+        metadata = {"original_type": "post_citation", "topic_id": topic_id}
+        if post_id is not None:
+            metadata["post_id"] = post_id
+        return cls(
+            id=topic_id,
+            title=_prefixed("community", title),
+            source="community",
+            url=url or "",
+            content=content or "",
+            metadata=metadata
+        )
+
+    @classmethod
+    def kb(cls, entry_id: str, title: str, url: str = "", content: str = "") -> "Citation":
+        """Create a knowledge base citation."""
+        return cls(
+            id=entry_id,
+            title=_prefixed("kb", title),
+            source="kb",
+            url=url or "",
+            content=content or "",
+            metadata={"original_type": "kb_citation", "entry_id": entry_id}
+        )
+
+    @classmethod
+    def from_report_annotation(cls, annotation: Any) -> "Citation":
+        """Create a citation from a reports agent file annotation."""
+        return cls.report(
+            _pick(annotation, "file_id"),
+            _pick(annotation, "filename", "title", default="Expert Report"),
+            _pick(annotation, "content", default="")
+        )
+
+    @classmethod
+    def from_community_annotation(cls, annotation: Any) -> "Citation":
+        """Create a citation from a community agent annotation (object or dict)."""
+        return cls.community(
+            _pick(annotation, "topic_id", "file_id"),
+            _pick(annotation, "title", "filename", default="Community Post"),
+            url=_pick(annotation, "discourse_url", "url", default=""),
+            content=_pick(annotation, "content", default=""),
+            post_id=_pick(annotation, "post_id", default="")
+        )
+
+    @classmethod
+    def from_topic_citation(cls, annotation: Dict[str, Any]) -> "Citation":
+        """Create a citation from a topic_citation stored in the community agent context."""
+        return cls.community(
+            annotation.get("topic_id"),
+            annotation.get("title", "Community Post"),
+            url=annotation.get("url", ""),
+            content=annotation.get("content", "")
+        )
+
+    @classmethod
+    def from_kb_citation(cls, citation: Dict[str, Any]) -> "Citation":
+        """Create a citation from a KnowledgeBaseAgent.process_query citation."""
+        return cls.kb(
+            citation.get("id"),
+            citation.get("title", ""),
+            url=citation.get("url", ""),
+            content=citation.get("content", "")
+        )
+
+    @classmethod
+    def from_universal(cls, annotation: Dict[str, Any]) -> "Citation":
+        """Create a citation from a dict already in the universal format."""
+        citation = annotation.get("citation", {})
+        return cls(
+            id=citation.get("id"),
+            title=citation.get("title"),
+            source=citation.get("source"),
+            url=citation.get("url"),
+            content=citation.get("content", ""),
+            metadata=citation.get("metadata", {})
+        )
+
+    @classmethod
+    def from_legacy(cls, data: Any, source: Optional[str] = None) -> "Citation":
+        """
+        Create a citation from any legacy annotation shape.
+
+        Handles the universal format, {"type": "file_citation"|"post_citation", ...}
+        dicts, {"file_citation": {...}} dicts, topic_citation dicts and raw
+        agent annotations (dicts or objects).
+
+        Args:
+            data: The legacy annotation
+            source: Force the citation source ("report" or "community"); by
+                default it is inferred from the annotation fields
+
+        Returns:
+            Citation in the universal format
+        """
+        if isinstance(data, Citation):
+            return data
+
+        if isinstance(data, dict):
+            kind = data.get("type")
+            if kind == "citation" and "citation" in data:
+                return cls.from_universal(data)
+            if kind in ("file_citation", "post_citation") and kind in data:
+                nested = data[kind]
+                if nested.get("source", "report" if kind == "file_citation" else "community") == "report":
+                    return cls.report(nested.get("file_id"), nested.get("title", "Unknown Report"), nested.get("content", ""))
+                return cls.community(
+                    nested.get("topic_id"),
+                    nested.get("title", "Unknown Community Post"),
+                    url=nested.get("url", ""),
+                    content=nested.get("content", ""),
+                    post_id=nested.get("post_id", "")
+                )
+            if "file_citation" in data:
+                nested = data["file_citation"]
+                if source == "community":
+                    return cls.community(nested.get("file_id"), nested.get("title", "Community Post"))
+                return cls.report(nested.get("file_id"), nested.get("title", "Unknown Report"), nested.get("content", ""))
+            if kind == "topic_citation":
+                return cls.from_topic_citation(data)
+
+        if source is None:
+            is_community = any(_pick(data, key) is not None for key in ("topic_id", "post_id", "discourse_url"))
+            source = "community" if is_community else "report"
+
+        if source == "community":
+            return cls.from_community_annotation(data)
+        return cls.from_report_annotation(data)
+
+    ### ENCODING
+
+    @property
+    def is_valid(self) -> bool:
+        """Whether the citation has the title and id the client needs."""
+        return bool(self.title and self.id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the universal citation dict."""
+        citation = {"id": self.id, "title": self.title, "source": self.source}
+        if self.url is not None:
+            citation["url"] = self.url
+        citation["content"] = self.content
+        citation["metadata"] = self.metadata
+        return {"type": "citation", "citation": citation}
+
+    @property
+    def json(self) -> str:
+        """The citation encoded as JSON (computed once)."""
+        if self._json is None:
+            self._json = json.dumps(self.to_dict())
+        return self._json
+
+
+class StreamEvent:
+    """Base class for stream events (supports the legacy dict-style access)."""
+
+    __slots__ = ("_frame",)
+    type = ""
+
+    @property
+    def data(self) -> Any:
+        return None
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "type":
+            return self.type
+        if key == "data":
+            return self.data
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class TextDelta(StreamEvent):
+    """A piece of answer text."""
+
+    __slots__ = ("text", "error")
+    type = "text_delta"
+
+    def __init__(self, text: str, error: bool = False):
+        self.text = text
+        self.error = error
+        self._frame = None
+
+    @property
+    def data(self) -> str:
+        return self.text
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "error":
+            return self.error
+        return super().__getitem__(key)
+
+
+class Annotation(StreamEvent):
+    """A citation to show alongside the answer."""
+
+    __slots__ = ("citation",)
+    type = "annotation"
+
+    def __init__(self, citation: Citation):
+        self.citation = citation
+        self._frame = None
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return self.citation.to_dict()
+
+
+class Completion(StreamEvent):
+    """Marks the end of all agent sections."""
+
+    __slots__ = ()
+    type = "completion"
+
+    def __init__(self):
+        self._frame = None
+
+
+def coerce_event(event: Any) -> StreamEvent:
+    """
+    Convert a legacy dict event into a typed event.
+
+    Args:
+        event: A StreamEvent or a {"type": ..., "data": ...} dict
+
+    Returns:
+        The typed event
+    """
+    if isinstance(event, StreamEvent):
+        return event
+
+    kind = event.get("type")
+    if kind == "text_delta":
+        return TextDelta(event.get("data", ""), error=bool(event.get("error")))
+    if kind == "annotation":
+        return Annotation(Citation.from_legacy(event.get("data")))
+    if kind == "completion":
+        return Completion()
+    raise ValueError(f"Unknown stream event type: {kind}")
+
+
+### WIRE SERIALIZER
+
+def encode_frame(event: StreamEvent) -> bytes:
+    """
+    Encode a text or annotation event as WebSocket frame bytes.
+
+    The frame is computed once and kept on the event, so replayed events
+    (e.g. from the answer cache) are sent without encoding again.
+
+    Args:
+        event: TextDelta or Annotation event
+
+    Returns:
+        UTF-8 JSON frame bytes
+    """
+    if event._frame is None:
+        if event.type == "text_delta":
+            text = _EXCESS_NEWLINES.sub('\n\n', event.text)
+            event._frame = ('{"text": ' + json.dumps(text) + ', "done": false}').encode('utf-8')
+        elif event.type == "annotation":
+            event._frame = ('{"text": "", "done": false, "annotation": ' + event.citation.json + '}').encode('utf-8')
+        else:
+            raise ValueError(f"Event type {event.type} has no single-event frame")
+    return event._frame
+
+
+def encode_annotations_frame(citations: Iterable[Citation], done: bool) -> bytes:
+    """
+    Encode a batch of citations as one WebSocket frame.
+
+    Reuses each citation's cached JSON instead of encoding it again.
+
+    Args:
+        citations: Citations to include
+        done: Whether this is the final frame of the stream
+
+    Returns:
+        UTF-8 JSON frame bytes
+    """
+    annotations = '[' + ', '.join(citation.json for citation in citations) + ']'
+    if done:
+        return ('{"text": "", "annotations": ' + annotations + ', "done": true}').encode('utf-8')
+    return ('{"text": "", "done": false, "annotations": ' + annotations + '}').encode('utf-8')
+
+
+def encode_error_frame(message: str) -> bytes:
+    """Encode a final error frame."""
+    return json.dumps({'error': message, 'done': True}).encode('utf-8')
@@ -0,0 +1,196 @@
+"""
+Stream helpers for combining agent sections.
+
+This module provides utilities for running several agent sections
+(reports, community, knowledge base) and merging their event streams
+back into a single, ordered stream for the client, and for batching
+consecutive text deltas into fewer WebSocket frames.
+"""
+
+import os
+import asyncio
+from typing import Any, AsyncIterator, Callable, List
+
+from helpers.stream_events import TextDelta
+
+# Text deltas arriving within this window are sent as one frame (0 disables coalescing)
+DELTA_COALESCE_WINDOW_MS = float(os.getenv("DELTA_COALESCE_WINDOW_MS", "40"))
+# A coalesced frame is sent as soon as its text reaches this size
+DELTA_COALESCE_MAX_BYTES = int(os.getenv("DELTA_COALESCE_MAX_BYTES", "2048"))
+
+# Marker placed on a section queue once the section has finished
+_SECTION_DONE = object()
+
+# A section is a zero-argument callable returning an async event generator
+SectionFactory = Callable[[], AsyncIterator[Any]]
+
+
+async def stream_sections_sequentially(sections: List[SectionFactory]) -> AsyncIterator[Any]:
+    """
+    Run each section one after another and yield its events.
+
+    Args:
+        sections: Section factories in client-visible order
+
+    Yields:
+        Events from each section, in section order
+    """
+    for section in sections:
+        async for event in section():
+            yield event
+
+
+async def stream_sections_concurrently(sections: List[SectionFactory]) -> AsyncIterator[Any]:
+    """
+    Start all sections at once and yield their events in section order.
+
+    The first section is streamed live. Events from later sections are
+    buffered while they run and flushed as soon as their turn comes, after
+    which the section continues to stream live. The client sees exactly the
+    same order as the sequential mode, but wall-clock latency approaches
+    the slowest single section instead of the sum of all of them.
+
+    Args:
+        sections: Section factories in client-visible order
+
+    Yields:
+        Events from each section, in section order
+    """
+    queues = [asyncio.Queue() for _ in sections]
+
+    async def pump(section: SectionFactory, queue: asyncio.Queue):
+        # Forward every event of the section into its own buffer
+        try:
+            async for event in section():
+                await queue.put(event)
+        except Exception as e:
+            # Sections handle their own errors; anything left is re-raised in order
+            await queue.put(e)
+        finally:
+            await queue.put(_SECTION_DONE)
+
+    tasks = [
+        asyncio.ensure_future(pump(section, queue))
+        for section, queue in zip(sections, queues)
+    ]
+
+    try:
+        for queue in queues:
+            while True:
+                event = await queue.get()
+                if event is _SECTION_DONE:
+                    break
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+    finally:
+        # Stop any sections that are still running (client gone or error raised)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _next_or_done(iterator: AsyncIterator[Any]) -> Any:
+    """Get the next event of an iterator, or _SECTION_DONE once it is exhausted."""
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return _SECTION_DONE
+
+
+class DeltaCoalescer:
+    """Batch consecutive text deltas into one event per time window or size."""
+
+    def __init__(
+        self,
+        window_ms: float = DELTA_COALESCE_WINDOW_MS,
+        max_bytes: int = DELTA_COALESCE_MAX_BYTES
+    ):
+        """
+        Initialize the coalescer.
+
+        Args:
+            window_ms: How long a buffered delta may wait for more text (0 disables coalescing)
+            max_bytes: Buffered text size (UTF-8 bytes) that triggers an immediate flush
+        """
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self.stats = {"deltas_received": 0, "deltas_sent": 0}
+
+    def _merge(self, pending: List[TextDelta]) -> TextDelta:
+        self.stats["deltas_sent"] += 1
+        if len(pending) == 1:
+            return pending[0]
+        return TextDelta(
+            "".join(delta.text for delta in pending),
+            error=any(delta.error for delta in pending)
+        )
+
+    async def coalesce(self, events: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """
+        Yield events with consecutive text deltas merged.
+
+        Buffered text is flushed when the window since its first delta
+        passes, when it reaches max_bytes, and before any other event
+        (annotations, completion), so the client sees the same order.
+
+        Args:
+            events: Typed stream events
+
+        Yields:
+            The same events, with runs of text deltas merged
+        """
+        loop = asyncio.get_running_loop()
+        iterator = events.__aiter__()
+        pending: List[TextDelta] = []
+        pending_bytes = 0
+        flush_at = 0.0
+        next_event = None
+
+        try:
+            while True:
+                if next_event is None:
+                    next_event = asyncio.ensure_future(_next_or_done(iterator))
+
+                if pending:
+                    # Wait for more text only until the window closes
+                    done, _ = await asyncio.wait({next_event}, timeout=max(0.0, flush_at - loop.time()))
+                    if not done:
+                        yield self._merge(pending)
+                        pending, pending_bytes = [], 0
+                        continue
+
+                event = await next_event
+                next_event = None
+                if event is _SECTION_DONE:
+                    break
+
+                if event.type != "text_delta":
+                    # Annotations and completion go out after the text before them
+                    if pending:
+                        yield self._merge(pending)
+                        pending, pending_bytes = [], 0
+                    yield event
+                    continue
+
+                self.stats["deltas_received"] += 1
+                if self.window <= 0:
+                    yield self._merge([event])
+                    continue
+
+                if not pending:
+                    flush_at = loop.time() + self.window
+                pending.append(event)
+                pending_bytes += len(event.text.encode('utf-8'))
+                if pending_bytes >= self.max_bytes:
+                    yield self._merge(pending)
+                    pending, pending_bytes = [], 0
+
+            if pending:
+                yield self._merge(pending)
+        finally:
+            # Stop reading the source if the consumer stopped early
+            if next_event is not None and not next_event.done():
+                next_event.cancel()
+                await asyncio.gather(next_event, return_exceptions=True)
@@ -0,0 +1,431 @@
+"""
+Vector storage backends for the knowledge base.
+
+KnowledgeBaseManager talks to its vector store through the VectorBackend
+interface: upsert, query, fetch, update, delete and list, each scoped to
+a namespace, with the call signatures and response shapes of a Pinecone
+index (plus list_paginated and list_namespaces, used by migrations).
+Two implementations are available:
+- PineconeBackend: the hosted Pinecone index (the default)
+- NumpyBackend: an in-process float32 matrix per namespace, with
+  vectorized cosine top-k and Pinecone-style metadata filters; for tests,
+  local runs and small namespaces that should not pay a network round trip
+
+The backend is selected with KB_VECTOR_BACKEND ("pinecone" or "numpy"),
+see knowledge_base_helper.create_vector_backend.
+"""
+
+import operator as op
+import threading
+import logging
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A vector to upsert: (id, values, metadata) tuple or {"id", "values", "metadata"} dict
+Vector = Union[Tuple[str, List[float], Dict[str, Any]], Dict[str, Any]]
+
+# Page size of list()
+LIST_PAGE_SIZE = 100
+
+# Ordering operators of metadata filters
+_ORDERINGS = {"$gt": op.gt, "$gte": op.ge, "$lt": op.lt, "$lte": op.le}
+
+
+class VectorBackend(ABC):
+    """
+    Namespaced vector store with the API of a Pinecone index.
+
+    Responses are objects with attributes, like Pinecone's:
+    - query(): .matches, each with .id, .score, .metadata (and .values)
+    - fetch(): .vectors, a dict of ID to an object with .id, .values, .metadata
+    """
+
+    @abstractmethod
+    def upsert(self, vectors: Sequence[Vector], namespace: str = "") -> Any:
+        """Insert or replace vectors."""
+
+    @abstractmethod
+    def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        namespace: str = "",
+        filter: Optional[Dict[str, Any]] = None,
+        include_metadata: bool = True,
+        include_values: bool = False
+    ) -> Any:
+        """Find the top_k vectors most similar (cosine) to a vector, among those matching the filter."""
+
+    @abstractmethod
+    def fetch(self, ids: List[str], namespace: str = "") -> Any:
+        """Get vectors by ID."""
+
+    @abstractmethod
+    def update(
+        self,
+        id: str,
+        values: Optional[List[float]] = None,
+        set_metadata: Optional[Dict[str, Any]] = None,
+        namespace: str = ""
+    ) -> Any:
+        """Replace the values of a vector and/or merge fields into its metadata."""
+
+    @abstractmethod
+    def delete(self, ids: Optional[List[str]] = None, namespace: str = "", delete_all: bool = False) -> Any:
+        """Delete vectors by ID, or every vector of the namespace."""
+
+    @abstractmethod
+    def list(self, prefix: Optional[str] = None, namespace: str = "") -> Iterator[List[str]]:
+        """Iterate over pages of vector IDs, optionally only those starting with a prefix."""
+
+    @abstractmethod
+    def list_paginated(
+        self,
+        prefix: Optional[str] = None,
+        limit: int = LIST_PAGE_SIZE,
+        pagination_token: Optional[str] = None,
+        namespace: str = ""
+    ) -> Any:
+        """
+        Get one page of vector IDs: .vectors (each with .id) and
+        .pagination.next, the token of the next page (no pagination or
+        token on the last page). A saved token resumes the listing.
+        """
+
+    @abstractmethod
+    def list_namespaces(self) -> List[str]:
+        """Names of the namespaces holding vectors."""
+
+
+class PineconeBackend(VectorBackend):
+    """VectorBackend on a Pinecone index."""
+
+    def __init__(self, index: Any):
+        """
+        Initialize the backend.
+
+        Args:
+            index: Pinecone index (see knowledge_base_helper.initialize_pinecone)
+        """
+        self.index = index
+
+    def upsert(self, vectors, namespace=""):
+        return self.index.upsert(vectors=vectors, namespace=namespace)
+
+    def query(self, vector, top_k, namespace="", filter=None, include_metadata=True, include_values=False):
+        kwargs = {"include_values": True} if include_values else {}
+        return self.index.query(
+            vector=vector,
+            top_k=top_k,
+            namespace=namespace,
+            filter=filter,
+            include_metadata=include_metadata,
+            **kwargs
+        )
+
+    def fetch(self, ids, namespace=""):
+        return self.index.fetch(ids=ids, namespace=namespace)
+
+    def update(self, id, values=None, set_metadata=None, namespace=""):
+        kwargs = {"values": values} if values is not None else {}
+        return self.index.update(id=id, set_metadata=set_metadata, namespace=namespace, **kwargs)
+
+    def delete(self, ids=None, namespace="", delete_all=False):
+        if delete_all:
+            return self.index.delete(delete_all=True, namespace=namespace)
+        return self.index.delete(ids=ids, namespace=namespace)
+
+    def list(self, prefix=None, namespace=""):
+        # list() is only available on serverless indexes
+        if prefix is None:
+            return self.index.list(namespace=namespace)
+        return self.index.list(prefix=prefix, namespace=namespace)
+
+    def list_paginated(self, prefix=None, limit=LIST_PAGE_SIZE, pagination_token=None, namespace=""):
+        kwargs = {"prefix": prefix} if prefix is not None else {}
+        if pagination_token:
+            kwargs["pagination_token"] = pagination_token
+        return self.index.list_paginated(limit=limit, namespace=namespace, **kwargs)
+
+    def list_namespaces(self):
+        return list((self.index.describe_index_stats().namespaces or {}).keys())
+
+
+def _as_list(value: Any) -> List[Any]:
+    # Metadata values are compared element-wise when they are lists;
+    # CSV strings (tags_csv) are treated as lists by $containsAny
+    return value if isinstance(value, list) else [value]
+
+
+def matches_filter(metadata: Dict[str, Any], filter_dict: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a Pinecone metadata filter against a vector's metadata.
+
+    Supports $and / $or, and per field $eq, $ne, $gt, $gte, $lt, $lte, $in,
+    $nin and $exists (plain values mean $eq). List-valued fields match when
+    any element does, like in Pinecone. $containsAny matches when any of
+    the given values is in the field (a list, or a comma-separated string).
+
+    Args:
+        metadata: Vector metadata
+        filter_dict: Pinecone filter (None or empty matches everything)
+
+    Returns:
+        True if the metadata matches
+    """
+    for key, condition in (filter_dict or {}).items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+            continue
+
+        present = key in metadata
+        values = _as_list(metadata.get(key))
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$exists":
+                matched = present == bool(operand)
+            elif not present:
+                matched = operator in ("$ne", "$nin")
+            elif operator == "$eq":
+                matched = operand in values
+            elif operator == "$ne":
+                matched = operand not in values
+            elif operator == "$in":
+                matched = any(value in operand for value in values)
+            elif operator == "$nin":
+                matched = not any(value in operand for value in values)
+            elif operator == "$containsAny":
+                field = metadata[key]
+                items = field.split(",") if isinstance(field, str) else _as_list(field)
+                matched = any(item in items for item in operand)
+            elif operator in ("$gt", "$gte", "$lt", "$lte"):
+                try:
+                    matched = any(_ORDERINGS[operator](value, operand) for value in values)
+                except TypeError:
+                    matched = False
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            if not matched:
+                return False
+    return True
+
+
+class _Namespace:
+    """Vectors of one namespace: a float32 matrix with the IDs and metadata of its rows."""
+
+    def __init__(self, dimensions: int):
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.metadata: List[Dict[str, Any]] = []
+        self.matrix = np.zeros((0, dimensions), dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+
+
+class NumpyBackend(VectorBackend):
+    """
+    In-process VectorBackend.
+
+    Each namespace is a float32 matrix (one row per vector) plus the row
+    norms, so a query is one matrix-vector product and an argpartition for
+    the top k. Metadata filters are evaluated per row before scoring.
+    Deletes swap the last row into the freed slot. Nothing is persisted.
+    """
+
+    def __init__(self):
+        """Initialize an empty backend."""
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+
+    def _get(self, namespace: str) -> Optional[_Namespace]:
+        return self._namespaces.get(namespace)
+
+    def upsert(self, vectors, namespace=""):
+        normalized = [
+            (vector["id"], vector["values"], vector.get("metadata") or {}) if isinstance(vector, dict)
+            else (vector[0], vector[1], vector[2] if len(vector) > 2 else {})
+            for vector in vectors
+        ]
+        if not normalized:
+            return SimpleNamespace(upserted_count=0)
+        values = np.asarray([values for _, values, _ in normalized], dtype=np.float32)
+
+        with self._lock:
+            store = self._namespaces.get(namespace)
+            if store is None:
+                store = self._namespaces[namespace] = _Namespace(values.shape[1])
+            if values.shape[1] != store.matrix.shape[1]:
+                raise ValueError(
+                    f"Vector dimension {values.shape[1]} does not match namespace dimension {store.matrix.shape[1]}"
+                )
+
+            first_new_row = len(store.ids)
+            new_rows = []
+            for (vector_id, _, metadata), row_values in zip(normalized, values):
+                row = store.rows.get(vector_id)
+                if row is None:
+                    store.rows[vector_id] = len(store.ids)
+                    new_rows.append(row_values)
+                    store.ids.append(vector_id)
+                    store.metadata.append(dict(metadata))
+                elif row >= first_new_row:
+                    # Repeated ID within this batch: the last one wins
+                    new_rows[row - first_new_row] = row_values
+                    store.metadata[row] = dict(metadata)
+                else:
+                    store.matrix[row] = row_values
+                    store.norms[row] = np.linalg.norm(row_values)
+                    store.metadata[row] = dict(metadata)
+            if new_rows:
+                # ids/metadata were appended above, the matrix grows in one copy
+                new_matrix = np.vstack(new_rows)
+                store.matrix = np.vstack([store.matrix, new_matrix])
+                store.norms = np.concatenate([store.norms, np.linalg.norm(new_matrix, axis=1)])
+        return SimpleNamespace(upserted_count=len(normalized))
+
+    def query(self, vector, top_k, namespace="", filter=None, include_metadata=True, include_values=False):
+        with self._lock:
+            store = self._get(namespace)
+            if store is None or not store.ids or top_k <= 0:
+                return SimpleNamespace(matches=[], namespace=namespace)
+
+            candidates = np.arange(len(store.ids))
+            if filter:
+                candidates = np.fromiter(
+                    (row for row, metadata in enumerate(store.metadata) if matches_filter(metadata, filter)),
+                    dtype=np.int64
+                )
+                if candidates.size == 0:
+                    return SimpleNamespace(matches=[], namespace=namespace)
+
+            # Cosine similarity of every candidate row in one product
+            query_vector = np.asarray(vector, dtype=np.float32)
+            query_norm = np.linalg.norm(query_vector)
+            denominators = store.norms[candidates] * query_norm
+            dots = store.matrix[candidates] @ query_vector
+            scores = np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators > 0)
+
+            # Top k without a full sort
+            k = min(top_k, scores.size)
+            top = np.argpartition(-scores, k - 1)[:k] if k < scores.size else np.arange(scores.size)
+            top = top[np.argsort(-scores[top], kind="stable")]
+
+            matches = []
+            for position in top:
+                row = candidates[position]
+                matches.append(SimpleNamespace(
+                    id=store.ids[row],
+                    score=float(scores[position]),
+                    metadata=dict(store.metadata[row]) if include_metadata else None,
+                    values=store.matrix[row].tolist() if include_values else []
+                ))
+        return SimpleNamespace(matches=matches, namespace=namespace)
+
+    def fetch(self, ids, namespace=""):
+        vectors = {}
+        with self._lock:
+            store = self._get(namespace)
+            for vector_id in ids:
+                row = store.rows.get(vector_id) if store else None
+                if row is not None:
+                    vectors[vector_id] = SimpleNamespace(
+                        id=vector_id,
+                        values=store.matrix[row].tolist(),
+                        metadata=dict(store.metadata[row])
+                    )
+        return SimpleNamespace(vectors=vectors, namespace=namespace)
+
+    def update(self, id, values=None, set_metadata=None, namespace=""):
+        with self._lock:
+            store = self._get(namespace)
+            row = store.rows.get(id) if store else None
+            if row is None:
+                # Like Pinecone, updating a missing ID is a no-op
+                return {}
+            if values is not None:
+                store.matrix[row] = np.asarray(values, dtype=np.float32)
+                store.norms[row] = np.linalg.norm(store.matrix[row])
+            if set_metadata:
+                store.metadata[row].update(set_metadata)
+        return {}
+
+    def delete(self, ids=None, namespace="", delete_all=False):
+        with self._lock:
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+                return {}
+            store = self._get(namespace)
+            if store is None:
+                return {}
+            for vector_id in ids or []:
+                row = store.rows.pop(vector_id, None)
+                if row is None:
+                    continue
+                # Move the last row into the freed slot
+                last = len(store.ids) - 1
+                if row != last:
+                    store.ids[row] = store.ids[last]
+                    store.metadata[row] = store.metadata[last]
+                    store.matrix[row] = store.matrix[last]
+                    store.norms[row] = store.norms[last]
+                    store.rows[store.ids[row]] = row
+                store.ids.pop()
+                store.metadata.pop()
+                store.matrix = store.matrix[:last]
+                store.norms = store.norms[:last]
+        return {}
+
+    def list(self, prefix=None, namespace=""):
+        with self._lock:
+            store = self._get(namespace)
+            ids = sorted(
+                vector_id for vector_id in (store.ids if store else [])
+                if prefix is None or vector_id.startswith(prefix)
+            )
+        for offset in range(0, len(ids), LIST_PAGE_SIZE):
+            yield ids[offset:offset + LIST_PAGE_SIZE]
+
+    def list_paginated(self, prefix=None, limit=LIST_PAGE_SIZE, pagination_token=None, namespace=""):
+        # IDs are listed in sorted order and the token is the last ID returned,
+        # so a token stays valid while vectors are added or deleted
+        with self._lock:
+            store = self._get(namespace)
+            ids = sorted(
+                vector_id for vector_id in (store.ids if store else [])
+                if (prefix is None or vector_id.startswith(prefix))
+                and (pagination_token is None or vector_id > pagination_token)
+            )
+        page = ids[:limit]
+        pagination = SimpleNamespace(next=page[-1]) if len(ids) > limit else None
+        return SimpleNamespace(
+            vectors=[SimpleNamespace(id=vector_id) for vector_id in page],
+            pagination=pagination,
+            namespace=namespace
+        )
+
+    def list_namespaces(self):
+        with self._lock:
+            return [namespace for namespace, store in self._namespaces.items() if store.ids]
+
+
+# One in-process store per container, shared by every manager
+numpy_backend = None
+
+def get_numpy_backend() -> NumpyBackend:
+    """Get the container's in-process vector backend."""
+    global numpy_backend
+    if numpy_backend is None:
+        numpy_backend = NumpyBackend()
+    return numpy_backend
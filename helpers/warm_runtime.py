@@ -0,0 +1,225 @@
+"""
+Container-lifetime runtime for the Lambda handler.
+
+A warm Lambda container serves many invocations, but lambda_handler used
+to rebuild everything on each one: the event loop, the API Gateway
+client, HTTP sessions and the agents. WarmRuntime keeps these objects
+for the container lifetime and rebuilds one only when it is missing or
+its health check fails (closed loop, closed session, discarded after an
+error). Loop-bound resources that are dropped (e.g. the HTTP session of
+a replaced loop) are closed, so their connections do not leak.
+
+Each build is timed, so every reuse on a warm invocation is credited
+with the time its cold build took. lambda_handler logs that estimate as
+the time saved on the warm path.
+"""
+
+import time
+import asyncio
+import inspect
+import logging
+from typing import Any, Callable, Dict, Optional
+
+import aiohttp
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class WarmRuntime:
+    """Objects kept warm across invocations of one container."""
+
+    def __init__(self):
+        """Initialize an empty runtime (everything is built on first use)."""
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._resources: Dict[str, Any] = {}
+        self._loop_bound: set = set()
+        # Background closes of dropped resources (kept so they are not garbage collected)
+        self._closing: set = set()
+        self._build_seconds: Dict[str, float] = {}
+        self.invocations = 0
+        self._start_invocation_stats()
+
+    def _start_invocation_stats(self) -> None:
+        self.invocation_stats = {"built": [], "reused": [], "saved_seconds": 0.0}
+
+    def _record(self, name: str, built: bool, seconds: float = 0.0) -> None:
+        if built:
+            self._build_seconds[name] = seconds
+            self.invocation_stats["built"].append(name)
+        else:
+            self.invocation_stats["reused"].append(name)
+            self.invocation_stats["saved_seconds"] += self._build_seconds.get(name, 0.0)
+
+    def start_invocation(self) -> None:
+        """Start tracking what one invocation builds and reuses."""
+        self.invocations += 1
+        self._start_invocation_stats()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Get the event loop, creating a new one if there is none or it was closed.
+
+        Resources bound to the previous loop are closed and dropped when it
+        is replaced.
+
+        Returns:
+            The event loop, also set as the current loop
+        """
+        if self._loop is None or self._loop.is_closed():
+            start = time.perf_counter()
+            self._loop = asyncio.new_event_loop()
+            for name in list(self._loop_bound):
+                self.discard(name)
+            self._record("event_loop", True, time.perf_counter() - start)
+        else:
+            self._record("event_loop", False)
+        asyncio.set_event_loop(self._loop)
+        return self._loop
+
+    def run(self, coroutine) -> Any:
+        """
+        Run a coroutine to completion on the warm event loop.
+
+        Args:
+            coroutine: The coroutine to run
+
+        Returns:
+            The coroutine's result
+        """
+        return self.get_loop().run_until_complete(coroutine)
+
+    def get(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        healthy: Optional[Callable[[Any], bool]] = None,
+        loop_bound: bool = False
+    ) -> Any:
+        """
+        Get a warm resource, building it if it is missing or unhealthy.
+
+        Args:
+            name: Resource name (e.g. "reports_agent", "apigateway:<endpoint>")
+            factory: Zero-argument callable building the resource
+            healthy: Optional check; an unhealthy resource is rebuilt
+            loop_bound: Whether the resource belongs to the current event loop
+                (dropped when the loop is replaced)
+
+        Returns:
+            The resource
+        """
+        resource = self._resources.get(name)
+        if resource is not None and (healthy is None or healthy(resource)):
+            self._record(name, False)
+            return resource
+
+        if resource is not None and name in self._loop_bound:
+            self._close(name, resource)
+
+        start = time.perf_counter()
+        resource = factory()
+        self._resources[name] = resource
+        if loop_bound:
+            self._loop_bound.add(name)
+        self._record(name, True, time.perf_counter() - start)
+        return resource
+
+    def discard(self, name: str) -> None:
+        """
+        Drop a resource so the next get() rebuilds it.
+
+        Call this after an error that may have left the resource broken.
+        Loop-bound resources are closed as well.
+
+        Args:
+            name: Resource name
+        """
+        resource = self._resources.pop(name, None)
+        if resource is not None:
+            logger.info(f"Discarded warm resource {name}")
+            if name in self._loop_bound:
+                self._close(name, resource)
+        self._loop_bound.discard(name)
+
+    def _close(self, name: str, resource: Any) -> None:
+        """
+        Close a dropped resource that has aclose() or close().
+
+        An awaitable close finishes in the background on the running loop,
+        or is run on the warm loop when called outside of one.
+
+        Args:
+            name: Resource name (for logging)
+            resource: The dropped resource
+        """
+        close = getattr(resource, "aclose", None) or getattr(resource, "close", None)
+        if not callable(close):
+            return
+        try:
+            result = close()
+            if not inspect.isawaitable(result):
+                return
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                if self._loop is not None and not self._loop.is_closed():
+                    self._loop.run_until_complete(result)
+                elif inspect.iscoroutine(result):
+                    result.close()
+                return
+            task = asyncio.ensure_future(result)
+        except Exception as e:
+            logger.warning(f"Error closing warm resource {name}: {e}")
+            return
+
+        def closed(task: asyncio.Future) -> None:
+            self._closing.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning(f"Error closing warm resource {name}: {task.exception()}")
+
+        self._closing.add(task)
+        task.add_done_callback(closed)
+
+    def report(self) -> str:
+        """Summarize what this invocation built and reused."""
+        stats = self.invocation_stats
+        path = "warm" if stats["reused"] else "cold"
+        return (
+            f"Invocation #{self.invocations} ({path} path): "
+            f"built {sorted(set(stats['built'])) or 'nothing'}, "
+            f"reused {len(stats['reused'])} resource(s), "
+            f"saving ~{stats['saved_seconds'] * 1000:.0f} ms"
+        )
+
+
+# One runtime per container
+runtime = None
+
+def get_runtime() -> WarmRuntime:
+    """Get the container's warm runtime."""
+    global runtime
+    if runtime is None:
+        runtime = WarmRuntime()
+    return runtime
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """
+    Get the warm aiohttp session for the running event loop.
+
+    Sessions belong to the loop they were created on, so a session is
+    rebuilt (and the old one closed) when it was closed or the loop changed. Per-request timeouts
+    are passed to each request instead of the session.
+
+    Returns:
+        A shared aiohttp ClientSession
+    """
+    loop = asyncio.get_running_loop()
+    return get_runtime().get(
+        "http_session",
+        aiohttp.ClientSession,
+        healthy=lambda session: not session.closed and getattr(session, "_loop", loop) is loop,
+        loop_bound=True
+    )
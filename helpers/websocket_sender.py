@@ -0,0 +1,170 @@
+"""
+Non-blocking WebSocket sender for API Gateway connections.
+
+post_to_connection is a blocking boto3 call. Making it inside the loop
+over agent events stalls the OpenAI stream while API Gateway answers.
+WebSocketSender decouples the two: frames are put on a bounded queue
+and a single worker posts them from a thread, one at a time, so:
+- frames reach the client in the order they were sent
+- a slow client fills the queue and send() waits (backpressure)
+- close() delivers what is still queued before the handler returns, then
+  the final frame; given a timeout, it drops the queued frames left when
+  it expires, so the final frame still goes out before the Lambda timeout
+"""
+
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import boto3
+
+from helpers.warm_runtime import get_runtime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Frames that may wait for delivery before send() applies backpressure
+WEBSOCKET_SEND_QUEUE_SIZE = int(os.getenv("WEBSOCKET_SEND_QUEUE_SIZE", "64"))
+
+# Marker closing the send queue
+_CLOSE = object()
+
+# Threads posting frames; kept for the container lifetime (each sender uses one post at a time)
+_post_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ws-post")
+
+def get_apigateway_client(endpoint_url: str):
+    """
+    Get the API Gateway management client for an endpoint.
+
+    Args:
+        endpoint_url: The WebSocket API endpoint (https://{domain}/{stage})
+
+    Returns:
+        A boto3 apigatewaymanagementapi client, kept warm per endpoint
+    """
+    return get_runtime().get(
+        f"apigateway:{endpoint_url}",
+        lambda: boto3.client("apigatewaymanagementapi", endpoint_url=endpoint_url)
+    )
+
+
+class WebSocketSender:
+    """Ordered, bounded, non-blocking frame delivery to one WebSocket connection."""
+
+    def __init__(self, apigateway, connection_id: str, max_queue: int = WEBSOCKET_SEND_QUEUE_SIZE):
+        """
+        Initialize the sender.
+
+        Args:
+            apigateway: The API Gateway management client
+            connection_id: The WebSocket connection ID
+            max_queue: Frames that may wait for delivery before send() blocks
+        """
+        self.apigateway = apigateway
+        self.connection_id = connection_id
+        self._queue: Optional[asyncio.Queue] = None
+        self._max_queue = max_queue
+        self._worker: Optional[asyncio.Task] = None
+        self.error: Optional[Exception] = None
+        self.stats = {"frames_sent": 0, "frames_dropped": 0, "post_seconds": 0.0, "backpressure_waits": 0}
+
+    @property
+    def failed(self) -> bool:
+        """Whether a post failed (e.g. the client disconnected)."""
+        return self.error is not None
+
+    def _post(self, data: bytes) -> None:
+        start = time.perf_counter()
+        self.apigateway.post_to_connection(ConnectionId=self.connection_id, Data=data)
+        self.stats["post_seconds"] += time.perf_counter() - start
+        self.stats["frames_sent"] += 1
+
+    async def _run(self) -> None:
+        # Post frames one at a time so they arrive in order
+        loop = asyncio.get_running_loop()
+        while True:
+            data = await self._queue.get()
+            try:
+                if data is _CLOSE:
+                    return
+                if self.failed:
+                    # Drop what is left once the connection is broken
+                    continue
+                await loop.run_in_executor(_post_executor, self._post, data)
+            except Exception as e:
+                logger.error(f"Error posting to connection {self.connection_id}: {e}")
+                # Drop the traceback: it references this worker's frame, which must
+                # not be cleared or kept alive by whoever handles the error later
+                self.error = e.with_traceback(None)
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> "WebSocketSender":
+        """Start the delivery worker on the running event loop."""
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self._max_queue)
+            self._worker = asyncio.ensure_future(self._run())
+        return self
+
+    async def send(self, data: bytes) -> None:
+        """
+        Queue a frame for delivery.
+
+        Waits while the queue is full (the client is slower than the agents).
+
+        Args:
+            data: Encoded frame bytes
+
+        Raises:
+            Exception: The error of an earlier failed post, so callers stop producing
+        """
+        if self.failed:
+            raise self.error
+        self.start()
+        if self._queue.full():
+            self.stats["backpressure_waits"] += 1
+        await self._queue.put(data)
+
+    def _drop_queued(self) -> int:
+        """Discard the frames still waiting in the queue."""
+        dropped = 0
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+            dropped += 1
+        self.stats["frames_dropped"] += dropped
+        return dropped
+
+    async def close(self, final: Optional[bytes] = None, timeout: Optional[float] = None) -> None:
+        """
+        Deliver the queued frames, then the final frame, and stop the worker.
+
+        Args:
+            final: Frame delivered last (e.g. the done frame); it is never dropped
+            timeout: Seconds the queued frames may take to deliver, or None to
+                wait for all of them. Frames still queued then are dropped.
+        """
+        if self._worker is None and final is None:
+            return
+        self.start()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            dropped = self._drop_queued()
+            logger.warning(f"Dropped {dropped} queued frame(s) for connection {self.connection_id} to send the final frame in time")
+        # At most the post in flight is still ahead of the final frame
+        if final is not None:
+            await self._queue.put(final)
+        await self._queue.put(_CLOSE)
+        await self._worker
+        self._worker = None
+
+    async def __aenter__(self) -> "WebSocketSender":
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
@@ -1,279 +1,131 @@
+import os
 import json
-import asyncio
-import boto3
 import re
-import time
+import logging
 from agents import Agent, Runner
 from openai.types.responses import ResponseTextDeltaEvent
 from agentMain import stream_agent_response
+from helpers.deadline import Deadline, stream_with_deadline
+from helpers.stream_helpers import DeltaCoalescer
+from helpers.websocket_sender import WebSocketSender, get_apigateway_client
+from helpers.warm_runtime import get_runtime
+from helpers.request_metrics import get_timeline, start_request_timeline
+from helpers.stream_events import (
+    TextDelta,
+    coerce_event,
+    encode_frame,
+    encode_annotations_frame,
+    encode_error_frame
+)
 
-async def send_streamed_response(apigateway, connection_id, prompt):
+# Leveled logging (per-event logs are sampled per request, see LOG_SAMPLE_RATE)
+logger = logging.getLogger(__name__)
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO"))
+
+# Seconds of DEADLINE_RESERVE_MS that queued frames may still take once the
+# deadline has passed; the rest of the reserve is left for the final frame
+FLUSH_RESERVE_S = int(os.getenv("WEBSOCKET_FLUSH_RESERVE_MS", "1500")) / 1000.0
+
+# Notice sent when the whole answer runs out of time before every section finished
+PARTIAL_RESULTS_NOTICE = TextDelta("\n\n⏱️ Partial results: ran out of time before all sections finished.\n\n")
+
+async def send_streamed_response(apigateway, connection_id, prompt, deadline=None):
     """
     Stream the agent's response over WebSocket to the client.
     
+    Every event is encoded into its frame exactly once (see helpers.stream_events),
+    and each citation's JSON is reused by the per-annotation, completion and final frames.
+    Consecutive text deltas are coalesced into one frame per time window / size
+    (DELTA_COALESCE_WINDOW_MS / DELTA_COALESCE_MAX_BYTES).
+    
     Args:
         apigateway: The API Gateway client
         connection_id: The WebSocket connection ID
         prompt: The user's pricing question
+        deadline: Deadline for the agent stream; the final annotations/done
+            frame is always sent once it passes (text frames still queued
+            FLUSH_RESERVE_S after it are dropped)
     """
+    if deadline is None:
+        deadline = Deadline(None)
+    
+    timeline = get_timeline()
+    coalescer = DeltaCoalescer()
+    
+    # Frames are posted by a background worker so the agent stream never waits on API Gateway
+    sender = WebSocketSender(apigateway, connection_id).start()
+    final_frame = None
+    
     try:
-        # Track annotations by source to ensure we include both types
-        report_annotations = []
-        community_annotations = []
-        all_annotations = []
+        # Track citations by source to ensure we include both types
+        report_citations = []
+        community_citations = []
+        
+        logger.info(f"Streaming response for prompt: {prompt}")
+        
+        # Stop reading agent events once the deadline passes so the final frames still go out
+        events = stream_with_deadline(
+            stream_agent_response(prompt, deadline=deadline),
+            deadline,
+            timeout_events=[PARTIAL_RESULTS_NOTICE]
+        )
         
-        print(f"Streaming response for prompt: {prompt}")
+        # Convert legacy dict events (typed events pass through untouched)
+        events = (coerce_event(event) async for event in events)
         
-        async for event in stream_agent_response(prompt):
-            print(event)  # Output raw stream events to console
+        async for event in coalescer.coalesce(events):
+            if timeline.sampled:
+                logger.info("Stream event: %s %r", event.type, event.get("data"))
+            timeline.mark("first_frame")
             
-            if event["type"] == "text_delta":
-                # Normalize text to prevent excessive newlines
-                text_data = event["data"]
-                # Replace 3 or more consecutive newlines with just 2
-                text_data = re.sub(r'\n{3,}', '\n\n', text_data)
-                
-                # Send text deltas immediately
-                apigateway.post_to_connection(
-                    ConnectionId=connection_id,
-                    Data=json.dumps({'text': text_data, 'done': False}).encode('utf-8')
-                )
-            elif event["type"] == "annotation":
-                # Process the universal citation format
-                annotation_dict = {}
-                
-                # Debug: Print raw annotation event
-                print(f"Raw annotation event: {json.dumps(event)}")
-                
-                if isinstance(event["data"], dict):
-                    # Check if it's already in the universal format
-                    if "type" in event["data"] and event["data"]["type"] == "citation" and "citation" in event["data"]:
-                        # Already in the universal format, use as is
-                        annotation_dict = event["data"]
-                        print(f"Using universal format annotation: {json.dumps(annotation_dict)}")
-                    
-                    # Handle legacy format with file_citation or post_citation
-                    elif "type" in event["data"] and event["data"]["type"] in ["file_citation", "post_citation"]:
-                        citation_type = event["data"]["type"]
-                        citation_data = event["data"].get(citation_type, {})
-                        source = citation_data.get("source", "report" if citation_type == "file_citation" else "community")
-                        
-                        print(f"Converting legacy {citation_type} to universal format")
-                        
-                        # Convert to universal format
-                        if citation_type == "file_citation":
-                            file_id = citation_data.get("file_id", f"report-{time.time()}")
-                            title = citation_data.get("title", "Unknown Report")
-                            
-                            annotation_dict = {
-                                "type": "citation",
-                                "citation": {
-                                    "id": file_id,
-                                    "title": title if title.startswith("[Report]") else f"[Report] {title}",
-                                    "source": "report",
-                                    "content": citation_data.get("content", ""),
-                                    "metadata": {
-                                        "original_type": "file_citation",
-                                        "file_id": file_id
-                                    }
-                                }
-                            }
-                        else:  # post_citation
-                            topic_id = citation_data.get("topic_id", f"community-{time.time()}")
-                            title = citation_data.get("title", "Unknown Community Post")
-                            
-                            annotation_dict = {
-                                "type": "citation",
-                                "citation": {
-                                    "id": topic_id,
-                                    "title": title if title.startswith("[Community]") else f"[Community] {title}",
-                                    "source": "community",
-                                    "url": citation_data.get("url", ""),
-                                    "content": citation_data.get("content", ""),
-                                    "metadata": {
-                                        "original_type": "post_citation",
-                                        "post_id": citation_data.get("post_id", ""),
-                                        "topic_id": topic_id
-                                    }
-                                }
-                            }
-                    
-                    # Handle raw annotation data (direct from agent)
-                    else:
-                        # Determine if this is from reports or community
-                        is_community = False
-                        if any(key in event["data"] for key in ["topic_id", "post_id", "discourse_url"]):
-                            is_community = True
-                        
-                        print(f"Processing raw annotation data, is_community={is_community}")
-                        
-                        if is_community:
-                            # Create a community citation
-                            post_id = event["data"].get("post_id", "")
-                            topic_id = event["data"].get("topic_id", event["data"].get("file_id", f"community-{time.time()}"))
-                            title = event["data"].get("title", event["data"].get("filename", f"Topic {topic_id}"))
-                            url = event["data"].get("discourse_url", event["data"].get("url", ""))
-                            
-                            annotation_dict = {
-                                "type": "citation",
-                                "citation": {
-                                    "id": topic_id,
-                                    "title": f"[Community] {title}",
-                                    "source": "community",
-                                    "url": url,
-                                    "content": event["data"].get("content", ""),
-                                    "metadata": {
-                                        "original_type": "post_citation",
-                                        "post_id": post_id,
-                                        "topic_id": topic_id
-                                    }
-                                }
-                            }
-                        else:
-                            # Create a report citation
-                            file_id = event["data"].get("file_id", f"report-{time.time()}")
-                            title = event["data"].get("title", event["data"].get("filename", f"Document {file_id}"))
-                            
-                            annotation_dict = {
-                                "type": "citation",
-                                "citation": {
-                                    "id": file_id,
-                                    "title": f"[Report] {title}",
-                                    "source": "report",
-                                    "content": event["data"].get("content", ""),
-                                    "metadata": {
-                                        "original_type": "file_citation",
-                                        "file_id": file_id
-                                    }
-                                }
-                            }
-                
-                # Debug: Print final processed annotation
-                print(f"Final processed annotation: {json.dumps(annotation_dict)}")
-                
-                # Track annotations by source
-                all_annotations.append(annotation_dict)
-                
-                # Determine the source and add to the appropriate list
-                if annotation_dict.get("type") == "citation":
-                    source = annotation_dict.get("citation", {}).get("source")
-                    if source == "report":
-                        report_annotations.append(annotation_dict)
-                        print(f"Added report annotation: {annotation_dict.get('citation', {}).get('title')}")
-                    elif source == "community":
-                        community_annotations.append(annotation_dict)
-                        print(f"Added community annotation: {annotation_dict.get('citation', {}).get('title')}")
+            if event.type == "text_delta":
+                # Send coalesced text deltas as soon as their window closes
+                await sender.send(encode_frame(event))
+            elif event.type == "annotation":
+                # Track citations by source
+                citation = event.citation
+                if citation.source == "report":
+                    report_citations.append(citation)
+                elif citation.source == "community":
+                    community_citations.append(citation)
                 
                 # Send individual annotation immediately for real-time display
-                apigateway.post_to_connection(
-                    ConnectionId=connection_id,
-                    Data=json.dumps({
-                        'text': '',
-                        'done': False,
-                        'annotation': annotation_dict
-                    }).encode('utf-8')
-                )
+                await sender.send(encode_frame(event))
 
-            elif event["type"] == "completion":
-                # Filter out annotations with empty titles or IDs
-                valid_report_annotations = []
-                valid_community_annotations = []
-                
-                # Process report annotations
-                for annotation in report_annotations:
-                    if annotation.get("type") == "citation":
-                        citation = annotation.get("citation", {})
-                        if citation.get("title") and citation.get("id"):
-                            valid_report_annotations.append(annotation)
-                
-                # Process community annotations
-                for annotation in community_annotations:
-                    if annotation.get("type") == "citation":
-                        citation = annotation.get("citation", {})
-                        if citation.get("title") and citation.get("id"):
-                            valid_community_annotations.append(annotation)
-                
-                # Combine both types of annotations
-                valid_annotations = valid_report_annotations + valid_community_annotations
-                
-                # Log annotation counts
-                print(f"Valid report annotations: {len(valid_report_annotations)}")
-                print(f"Valid community annotations: {len(valid_community_annotations)}")
-                print(f"Total valid annotations: {len(valid_annotations)}")
+            elif event.type == "completion":
+                # Filter out citations with empty titles or IDs
+                valid_citations = [c for c in report_citations + community_citations if c.is_valid]
+                logger.debug("Total valid annotations: %d", len(valid_citations))
                 
                 # When we get a completion event, send the annotations
-                apigateway.post_to_connection(
-                    ConnectionId=connection_id,
-                    Data=json.dumps({
-                        'text': '',
-                        'done': False,
-                        'annotations': valid_annotations
-                    }).encode('utf-8')
-                )
+                await sender.send(encode_annotations_frame(valid_citations, done=False))
 
-        # Final message to indicate the stream is done
-        valid_report_annotations = []
-        valid_community_annotations = []
+        # Final message with all valid citations from both sources
+        valid_report_citations = [c for c in report_citations if c.is_valid]
+        valid_community_citations = [c for c in community_citations if c.is_valid]
         
-        # Debug: Print all collected annotations by source
-        print(f"Report annotations collected: {len(report_annotations)}")
-        for i, annotation in enumerate(report_annotations):
-            print(f"Report annotation {i+1}: {json.dumps(annotation)}")
-            
-            # Validate and add to final list
-            if annotation.get("type") == "citation":
-                citation = annotation.get("citation", {})
-                if citation.get("title") and citation.get("id"):
-                    valid_report_annotations.append(annotation)
-                    print(f"  ✓ Valid report citation: {citation.get('title')}")
-                else:
-                    print(f"  ✗ Invalid report citation: missing title or id")
-        
-        print(f"Community annotations collected: {len(community_annotations)}")
-        for i, annotation in enumerate(community_annotations):
-            print(f"Community annotation {i+1}: {json.dumps(annotation)}")
-            
-            # Validate and add to final list
-            if annotation.get("type") == "citation":
-                citation = annotation.get("citation", {})
-                if citation.get("title") and citation.get("id"):
-                    valid_community_annotations.append(annotation)
-                    print(f"  ✓ Valid community citation: {citation.get('title')}")
-                else:
-                    print(f"  ✗ Invalid community citation: missing title or id")
+        timeline.count("citations", len(valid_report_citations) + len(valid_community_citations))
         
-        # Combine both types of annotations
-        final_annotations = valid_report_annotations + valid_community_annotations
-        
-        # Debug: Print final annotations by source
-        print(f"Final report annotations: {len(valid_report_annotations)}")
-        print(f"Final community annotations: {len(valid_community_annotations)}")
-        print(f"Total final annotations: {len(final_annotations)}")
-        
-        # List all final annotations
-        for i, annotation in enumerate(final_annotations):
-            if annotation.get("type") == "citation":
-                source = annotation.get("citation", {}).get("source", "unknown")
-                title = annotation.get("citation", {}).get("title", "untitled")
-                print(f"  {i+1}. [{source}] {title}")
-        
-        # Send final message with all valid annotations from both sources
-        apigateway.post_to_connection(
-            ConnectionId=connection_id,
-            Data=json.dumps({
-                'text': '',
-                'annotations': final_annotations,
-                'done': True
-            }).encode('utf-8')
-        )
+        final_frame = encode_annotations_frame(valid_report_citations + valid_community_citations, done=True)
     except Exception as e:
-        print(f"Error during WebSocket streaming: {e}")
-        import traceback
-        traceback.print_exc()
-        apigateway.post_to_connection(
-            ConnectionId=connection_id,
-            Data=json.dumps({'error': str(e), 'done': True}).encode('utf-8')
-        )
+        logger.exception(f"Error during WebSocket streaming: {e}")
+        timeline.count("errors")
+        # There is nobody to tell if the connection itself is broken
+        if not sender.failed:
+            final_frame = encode_error_frame(str(e))
+    finally:
+        # Deliver the queued frames, dropping the ones a slow client leaves
+        # queued past the deadline, then the final frame
+        remaining = deadline.remaining()
+        await sender.close(final=final_frame, timeout=None if remaining is None else remaining + FLUSH_RESERVE_S)
+        
+        # Frames sent vs text deltas received for this request
+        timeline.count("frames_sent", sender.stats["frames_sent"])
+        timeline.count("frames_dropped", sender.stats["frames_dropped"])
+        timeline.count("text_deltas_received", coalescer.stats["deltas_received"])
+        timeline.count("text_frames_sent", coalescer.stats["deltas_sent"])
+        timeline.count("backpressure_waits", sender.stats["backpressure_waits"])
+        timeline.record("websocket_post", sender.stats["post_seconds"] * 1000)
 
 def normalize_text(text):
     """
@@ -289,7 +141,13 @@ def normalize_text(text):
     return re.sub(r'\n{3,}', '\n\n', text)
 
 def lambda_handler(event, context):
-    print("Current IAM Role ARN:", context.invoked_function_arn)
+    # Spans, marks and counters of this request, emitted as one EMF record at the end
+    timeline = start_request_timeline()
+    logger.debug("Current IAM Role ARN: %s", context.invoked_function_arn)
+
+    # The loop, clients and agents are kept warm across invocations of this container
+    runtime = get_runtime()
+    runtime.start_invocation()
 
     # Extract connection ID and set up API Gateway client
     connection_id = event['requestContext']['connectionId']
@@ -297,17 +155,15 @@ def lambda_handler(event, context):
     stage = event['requestContext']['stage']
     endpoint_url = f"https://{domain}/{stage}"
 
-    apigateway = boto3.client(
-        "apigatewaymanagementapi",
-        endpoint_url=endpoint_url
-    )
+    # Reuse the client for this endpoint across warm invocations
+    apigateway = get_apigateway_client(endpoint_url)
 
     # Parse the prompt from the event body
     try:
         body = event.get('body', '{}')
         body_data = json.loads(body)
         prompt = body_data.get('prompt', 'Tell me something.')
-        print(f"Prompt: {prompt}")
+        logger.debug("Prompt: %s", prompt)
     except Exception as e:
         apigateway.post_to_connection(
             ConnectionId=connection_id,
@@ -315,11 +171,13 @@ def lambda_handler(event, context):
         )
         return {'statusCode': 400}
 
-    # Create and run the async loop for streaming
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(send_streamed_response(apigateway, connection_id, prompt))
-    loop.close()
+    # Time budget for the answer, leaving room for the final annotations/done frames
+    deadline = Deadline.from_lambda_context(context)
+
+    # Run the stream on the warm event loop (created on the first invocation only)
+    runtime.run(send_streamed_response(apigateway, connection_id, prompt, deadline))
+    logger.info(runtime.report())
+    timeline.emit()
 
     return {
         'statusCode': 200
@@ -0,0 +1,126 @@
+// Full entry content in the kb-content bucket
+//
+// Content is stored gzip-compressed as {id}.txt.gz (the Python helpers use
+// the same layout, see helpers/content_store.py); uncompressed {id}.txt
+// objects written by older versions are still read. Result sets are
+// hydrated with getContents: one concurrent batch of downloads, with the
+// bodies of hot entries kept in a small per-isolate LRU.
+
+const CONTENT_BUCKET = 'kb-content'
+const COMPRESSED_SUFFIX = '.txt.gz'
+const LEGACY_SUFFIX = '.txt'
+
+// Bodies kept in memory while the isolate is warm
+const CACHE_MAX_ENTRIES = 500
+const contentCache = new Map<string, string>()
+
+function cacheGet(id: string): string | undefined {
+  const content = contentCache.get(id)
+  if (content !== undefined) {
+    // Re-insert to mark as most recently used
+    contentCache.delete(id)
+    contentCache.set(id, content)
+  }
+  return content
+}
+
+function cachePut(id: string, content: string) {
+  contentCache.delete(id)
+  contentCache.set(id, content)
+  while (contentCache.size > CACHE_MAX_ENTRIES) {
+    contentCache.delete(contentCache.keys().next().value!)
+  }
+}
+
+async function gzip(text: string): Promise<Blob> {
+  const stream = new Blob([text]).stream().pipeThrough(new CompressionStream('gzip'))
+  return await new Response(stream).blob()
+}
+
+async function gunzip(blob: Blob): Promise<string> {
+  const stream = blob.stream().pipeThrough(new DecompressionStream('gzip'))
+  return await new Response(stream).text()
+}
+
+/**
+ * Store the full content of an entry (compressed)
+ */
+export async function putContent(supabaseClient: any, id: string, content: string): Promise<void> {
+  const { error } = await supabaseClient
+    .storage
+    .from(CONTENT_BUCKET)
+    .upload(`${id}${COMPRESSED_SUFFIX}`, await gzip(content), {
+      contentType: 'application/gzip',
+      upsert: true
+    })
+  if (error) {
+    throw error
+  }
+  cachePut(id, content)
+}
+
+async function downloadContent(supabaseClient: any, id: string): Promise<string | null> {
+  const bucket = supabaseClient.storage.from(CONTENT_BUCKET)
+
+  const compressed = await bucket.download(`${id}${COMPRESSED_SUFFIX}`)
+  if (compressed.data && !compressed.error) {
+    return await gunzip(compressed.data)
+  }
+
+  const legacy = await bucket.download(`${id}${LEGACY_SUFFIX}`)
+  if (legacy.data && !legacy.error) {
+    return await legacy.data.text()
+  }
+  return null
+}
+
+/**
+ * Get the full content of several entries in one concurrent batch.
+ * Entries without stored content are missing from the result.
+ */
+export async function getContents(supabaseClient: any, ids: string[]): Promise<Record<string, string>> {
+  const contents: Record<string, string> = {}
+  const missing: string[] = []
+
+  for (const id of new Set(ids)) {
+    const cached = cacheGet(id)
+    if (cached !== undefined) {
+      contents[id] = cached
+    } else {
+      missing.push(id)
+    }
+  }
+
+  await Promise.all(missing.map(async (id) => {
+    try {
+      const content = await downloadContent(supabaseClient, id)
+      if (content !== null) {
+        contents[id] = content
+        cachePut(id, content)
+      }
+    } catch (error) {
+      console.error(`Error getting content of ${id}:`, error)
+    }
+  }))
+
+  return contents
+}
+
+/**
+ * Get the full content of one entry, or null if it is not stored
+ */
+export async function getContent(supabaseClient: any, id: string): Promise<string | null> {
+  const contents = await getContents(supabaseClient, [id])
+  return contents[id] ?? null
+}
+
+/**
+ * Delete the stored content of an entry
+ */
+export async function removeContent(supabaseClient: any, id: string): Promise<void> {
+  contentCache.delete(id)
+  await supabaseClient
+    .storage
+    .from(CONTENT_BUCKET)
+    .remove([`${id}${COMPRESSED_SUFFIX}`, `${id}${LEGACY_SUFFIX}`])
+}
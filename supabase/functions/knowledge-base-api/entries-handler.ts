@@ -10,6 +10,7 @@ import {
   validateEntry,
   getNamespaceForVisibility
 } from './utils.ts'
+import { getContent, putContent, removeContent } from './content-store.ts'
 
 const PINECONE_INDEX_NAME = 'knowledge-base'
 
@@ -90,21 +91,8 @@ export async function entriesHandler(context: HandlerContext): Promise<Response>
                 const vector = response.vectors[entryId]
                 const metadata = vector.metadata
                 
-                // Get content from separate storage if not in metadata
-                let content = ''
-                
-                // Try to get content from Supabase storage first
-                const { data, error } = await supabaseClient
-                  .storage
-                  .from('kb-content')
-                  .download(`${entryId}.txt`)
-                
-                if (data && !error) {
-                  content = await data.text()
-                } else {
-                  // Fall back to content preview in metadata
-                  content = metadata.content_preview || ''
-                }
+                // Get the full content from storage, falling back to the preview in metadata
+                const content = await getContent(supabaseClient, entryId) ?? (metadata.content_preview || '')
                 
                 entry = metadataToEntry(metadata, content)
                 break
@@ -263,13 +251,7 @@ export async function entriesHandler(context: HandlerContext): Promise<Response>
         
         // Store content in Supabase Storage
         try {
-          await supabaseClient
-            .storage
-            .from('kb-content')
-            .upload(`${id}.txt`, entryData.content, {
-              contentType: 'text/plain',
-              upsert: true
-            })
+          await putContent(supabaseClient, id, entryData.content)
         } catch (error) {
           console.error('Error storing content in Supabase:', error)
           // Continue anyway - we'll fall back to content_preview if needed
@@ -382,13 +364,7 @@ export async function entriesHandler(context: HandlerContext): Promise<Response>
         // If content updated, store in Supabase Storage
         if (updateData.content) {
           try {
-            await supabaseClient
-              .storage
-              .from('kb-content')
-              .upload(`${entryId}.txt`, updateData.content, {
-                contentType: 'text/plain',
-                upsert: true
-              })
+            await putContent(supabaseClient, entryId, updateData.content)
           } catch (error) {
             console.error('Error storing content in Supabase:', error)
             // Continue anyway - we'll fall back to content_preview if needed
@@ -407,15 +383,10 @@ export async function entriesHandler(context: HandlerContext): Promise<Response>
           // Insert into new namespace with full vector
           if (!embedding) {
             // Need to get current content to generate embedding
-            let content = ''
             try {
-              const { data, error } = await supabaseClient
-                .storage
-                .from('kb-content')
-                .download(`${entryId}.txt`)
+              const content = await getContent(supabaseClient, entryId)
               
-              if (data && !error) {
-                content = await data.text()
+              if (content !== null) {
                 embedding = await generateEmbedding(content, openaiApiKey)
               }
             } catch (error) {
@@ -533,10 +504,7 @@ export async function entriesHandler(context: HandlerContext): Promise<Response>
         
         // Delete content from Supabase Storage
         try {
-          await supabaseClient
-            .storage
-            .from('kb-content')
-            .remove([`${entryId}.txt`])
+          await removeContent(supabaseClient, entryId)
         } catch (error) {
           console.error('Error removing content from Supabase:', error)
           // Continue anyway
@@ -7,6 +7,7 @@ import {
   metadataToEntry,
   getNamespaceForVisibility
 } from './utils.ts'
+import { getContents } from './content-store.ts'
 
 const PINECONE_INDEX_NAME = 'knowledge-base'
 const DEFAULT_TOP_K = 5
@@ -39,6 +40,8 @@ export async function searchHandler(context: HandlerContext): Promise<Response>
   // Parse request body
   const requestData = await req.json()
   const searchType = requestData.searchType || 'semantic'
+  // Full bodies by default; includeContent: false returns content previews only
+  const includeContent = requestData.includeContent !== false
   
   // Initialize Pinecone client
   const pinecone = initPinecone(pineconeApiKey, pineconeEnv)
@@ -101,32 +104,9 @@ export async function searchHandler(context: HandlerContext): Promise<Response>
             const matches = response.matches || []
             
             for (const match of matches) {
-              const metadata = match.metadata!
-              
-              // Get content from Supabase Storage if possible
-              let content = ''
-              try {
-                const { data, error } = await supabaseClient
-                  .storage
-                  .from('kb-content')
-                  .download(`${match.id}.txt`)
-                
-                if (data && !error) {
-                  content = await data.text()
-                } else {
-                  // Fall back to content preview in metadata
-                  content = metadata.content_preview || ''
-                }
-              } catch (error) {
-                console.error('Error getting content:', error)
-                content = metadata.content_preview || ''
-              }
-              
-              // Convert metadata to entry
-              const entry = metadataToEntry(metadata, content)
-              
               allResults.push({
-                entry,
+                id: match.id,
+                metadata: match.metadata!,
                 score: match.score
               })
             }
@@ -135,9 +115,9 @@ export async function searchHandler(context: HandlerContext): Promise<Response>
           }
         }
         
-        // Sort by score (descending) and limit to topK results
+        // Sort by score (descending), limit to topK results, then load their content in one batch
         allResults.sort((a, b) => b.score - a.score)
-        const results = allResults.slice(0, topK)
+        const results = await hydrateResults(supabaseClient, allResults.slice(0, topK), includeContent)
         
         return new Response(
           JSON.stringify({ results }),
@@ -149,8 +129,48 @@ export async function searchHandler(context: HandlerContext): Promise<Response>
       case 'metadata': {
         const filters = requestData.filters || {}
         const topK = requestData.topK || DEFAULT_TOP_K
+        const offset = requestData.offset || 0
         
-        // Convert filters to Pinecone filter format
+        // Answer the filter from the kb_entries_meta table (kept in sync by the
+        // entries handler): sorted, paginated, and without a vector query per namespace
+        const rows = await queryEntriesMeta(supabaseClient, { ...filters }, visibilityLevels, userId, {
+          offset,
+          limit: topK,
+          sortBy: requestData.sortBy,
+          ascending: requestData.sortOrder === 'asc'
+        })
+        
+        if (rows) {
+          // Fetch the matching entries by ID, one fetch per namespace
+          const idsByNamespace: Record<string, string[]> = {}
+          for (const row of rows) {
+            const namespace = getNamespaceForVisibility(row.visibility, row.created_by)
+            idsByNamespace[namespace] = [...(idsByNamespace[namespace] || []), row.id]
+          }
+          
+          const vectors: Record<string, any> = {}
+          await Promise.all(Object.entries(idsByNamespace).map(async ([namespace, ids]) => {
+            try {
+              const response = await index.fetch({ ids, namespace })
+              Object.assign(vectors, response.vectors || {})
+            } catch (error) {
+              console.error(`Error fetching from namespace ${namespace}:`, error)
+            }
+          }))
+          
+          // Keep the order of the metadata query
+          const matches = rows
+            .filter(row => vectors[row.id]?.metadata)
+            .map(row => ({ id: row.id, metadata: vectors[row.id].metadata, score: 1.0 }))  // No actual score for metadata search
+          const results = await hydrateResults(supabaseClient, matches, includeContent)
+          
+          return new Response(
+            JSON.stringify({ results }),
+            { headers: { ...corsHeaders, 'Content-Type': 'application/json' } }
+          )
+        }
+        
+        // Filters the table cannot answer: query Pinecone with a zero vector and filters
         const pineconeFilter = convertToPineconeFilter(filters)
         
         // Collect results from all namespaces
@@ -158,12 +178,11 @@ export async function searchHandler(context: HandlerContext): Promise<Response>
         
         for (const namespace of namespaces) {
           try {
-            // List entries using Pinecone query with zero vector and filters
             const zeroVector = new Array(1536).fill(0)
             
             const response = await index.query({
               vector: zeroVector,
-              topK,
+              topK: offset + topK,
               namespace,
               filter: pineconeFilter,
               includeMetadata: true
@@ -173,32 +192,9 @@ export async function searchHandler(context: HandlerContext): Promise<Response>
             const matches = response.matches || []
             
             for (const match of matches) {
-              const metadata = match.metadata!
-              
-              // Get content from Supabase Storage if possible
-              let content = ''
-              try {
-                const { data, error } = await supabaseClient
-                  .storage
-                  .from('kb-content')
-                  .download(`${match.id}.txt`)
-                
-                if (data && !error) {
-                  content = await data.text()
-                } else {
-                  // Fall back to content preview in metadata
-                  content = metadata.content_preview || ''
-                }
-              } catch (error) {
-                console.error('Error getting content:', error)
-                content = metadata.content_preview || ''
-              }
-              
-              // Convert metadata to entry
-              const entry = metadataToEntry(metadata, content)
-              
               allResults.push({
-                entry,
+                id: match.id,
+                metadata: match.metadata!,
                 score: 1.0  // No actual score for metadata search
               })
             }
@@ -207,8 +203,8 @@ export async function searchHandler(context: HandlerContext): Promise<Response>
           }
         }
         
-        // Limit to topK results
-        const results = allResults.slice(0, topK)
+        // Apply the page
+        const results = await hydrateResults(supabaseClient, allResults.slice(offset, offset + topK), includeContent)
         
         return new Response(
           JSON.stringify({ results }),
@@ -253,32 +249,9 @@ export async function searchHandler(context: HandlerContext): Promise<Response>
             const matches = response.matches || []
             
             for (const match of matches) {
-              const metadata = match.metadata!
-              
-              // Get content from Supabase Storage if possible
-              let content = ''
-              try {
-                const { data, error } = await supabaseClient
-                  .storage
-                  .from('kb-content')
-                  .download(`${match.id}.txt`)
-                
-                if (data && !error) {
-                  content = await data.text()
-                } else {
-                  // Fall back to content preview in metadata
-                  content = metadata.content_preview || ''
-                }
-              } catch (error) {
-                console.error('Error getting content:', error)
-                content = metadata.content_preview || ''
-              }
-              
-              // Convert metadata to entry
-              const entry = metadataToEntry(metadata, content)
-              
               allResults.push({
-                entry,
+                id: match.id,
+                metadata: match.metadata!,
                 score: match.score
               })
             }
@@ -287,9 +260,9 @@ export async function searchHandler(context: HandlerContext): Promise<Response>
           }
         }
         
-        // Sort by score (descending) and limit to topK results
+        // Sort by score (descending), limit to topK results, then load their content in one batch
         allResults.sort((a, b) => b.score - a.score)
-        const results = allResults.slice(0, topK)
+        const results = await hydrateResults(supabaseClient, allResults.slice(0, topK), includeContent)
         
         return new Response(
           JSON.stringify({ results }),
@@ -313,6 +286,87 @@ export async function searchHandler(context: HandlerContext): Promise<Response>
   }
 }
 
+// Filters answered by the kb_entries_meta table, and the columns results can be sorted by
+const META_FILTER_FIELDS = ['tags', 'created_by', 'created_at', 'updated_at', 'title']
+const META_SORT_FIELDS = ['updated_at', 'created_at', 'title']
+
+/**
+ * Find entries matching metadata filters in the kb_entries_meta table.
+ * Returns null when a filter cannot be expressed on the table, so the
+ * caller falls back to a Pinecone query.
+ */
+async function queryEntriesMeta(
+  supabaseClient: any,
+  filters: Record<string, any>,
+  visibilityLevels: string[],
+  userId: string,
+  page: { offset: number, limit: number, sortBy?: string, ascending?: boolean }
+): Promise<{ id: string, visibility: string, created_by: string }[] | null> {
+  if (Object.keys(filters).some(key => !META_FILTER_FIELDS.includes(key))) {
+    return null
+  }
+  
+  const sortBy = META_SORT_FIELDS.includes(page.sortBy || '') ? page.sortBy! : 'updated_at'
+  let query = supabaseClient
+    .from('kb_entries_meta')
+    .select('id, visibility, created_by')
+    .in('visibility', visibilityLevels)
+  
+  // Private entries are only visible to their creator
+  if (visibilityLevels.includes('private')) {
+    query = query.or(`visibility.neq.private,created_by.eq.${userId}`)
+  }
+  
+  if (filters.tags) {
+    query = query.overlaps('tags', Array.isArray(filters.tags) ? filters.tags : [filters.tags])
+  }
+  if (filters.created_by) {
+    query = query.eq('created_by', filters.created_by)
+  }
+  for (const field of ['created_at', 'updated_at']) {
+    if (filters[field]?.$gte) query = query.gte(field, filters[field].$gte)
+    if (filters[field]?.$lte) query = query.lte(field, filters[field].$lte)
+  }
+  if (filters.title) {
+    if (typeof filters.title !== 'string' || filters.title.startsWith('/')) {
+      return null
+    }
+    query = filters.title.includes('*')
+      ? query.ilike('title', filters.title.replaceAll('*', '%'))
+      : query.eq('title', filters.title)
+  }
+  
+  const { data, error } = await query
+    .order(sortBy, { ascending: !!page.ascending })
+    .order('id')
+    .range(page.offset, page.offset + page.limit - 1)
+  
+  if (error) {
+    console.error('Error querying kb_entries_meta:', error)
+    return null
+  }
+  return data || []
+}
+
+/**
+ * Turn matches into results, loading the full content of all of them in
+ * one concurrent batch (or keeping the content previews)
+ */
+async function hydrateResults(
+  supabaseClient: any,
+  matches: { id: string, metadata: any, score: number }[],
+  includeContent: boolean
+): Promise<{ entry: any, score: number }[]> {
+  const contents = includeContent
+    ? await getContents(supabaseClient, matches.map(match => match.id))
+    : {}
+  
+  return matches.map(match => ({
+    entry: metadataToEntry(match.metadata, contents[match.id] ?? (match.metadata.content_preview || '')),
+    score: match.score
+  }))
+}
+
 /**
  * Convert client filter format to Pinecone filter format
  */
@@ -0,0 +1,105 @@
+"""
+Tests for the semantic answer cache.
+
+This module checks similarity lookups, per-section TTLs, per-user KB
+sections, namespace invalidation and event recording/replay.
+"""
+
+import asyncio
+import time
+import unittest
+
+from helpers.answer_cache import (
+    SemanticAnswerCache,
+    record_events,
+    replay_events
+)
+
+EVENTS = [
+    {"type": "text_delta", "data": "Use value-based tiers."},
+    {"type": "annotation", "data": {"type": "citation", "citation": {"id": "doc-1", "title": "[Report] Guide", "source": "report"}}},
+]
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+    """Test cases for the SemanticAnswerCache class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.cache = SemanticAnswerCache(threshold=0.95, ttls={"reports": 60, "community": 60, "kb": 60})
+
+    def test_similar_prompt_hits(self):
+        """A near-identical embedding replays the stored events."""
+        self.cache.store([1.0, 0.0], "how to price tiers", "reports", "u1", EVENTS)
+        self.assertEqual(self.cache.lookup([0.99, 0.05], "reports", "u1"), EVENTS)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_different_prompt_misses(self):
+        """A dissimilar embedding does not match."""
+        self.cache.store([1.0, 0.0], "how to price tiers", "reports", "u1", EVENTS)
+        self.assertIsNone(self.cache.lookup([0.0, 1.0], "reports", "u1"))
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+    def test_sections_expire_independently(self):
+        """Each section follows its own TTL."""
+        cache = SemanticAnswerCache(threshold=0.95, ttls={"reports": 60, "community": 0.01})
+        cache.store([1.0, 0.0], "q", "reports", "u1", EVENTS)
+        cache.store([1.0, 0.0], "q", "community", "u1", EVENTS)
+        time.sleep(0.02)
+
+        self.assertIsNotNone(cache.lookup([1.0, 0.0], "reports", "u1"))
+        self.assertIsNone(cache.lookup([1.0, 0.0], "community", "u1"))
+
+    def test_kb_sections_are_per_user(self):
+        """KB answers are never shared between users."""
+        self.cache.store([1.0, 0.0], "q", "kb", "u1", EVENTS, namespaces=["user-u1"])
+        self.assertIsNone(self.cache.lookup([1.0, 0.0], "kb", "u2"))
+        self.assertIsNotNone(self.cache.lookup([1.0, 0.0], "kb", "u1"))
+
+    def test_namespace_write_invalidates_kb_sections(self):
+        """A write to a namespace drops the KB sections that drew from it."""
+        self.cache.store([1.0, 0.0], "q", "reports", "u1", EVENTS)
+        self.cache.store([1.0, 0.0], "q", "kb", "u1", EVENTS, namespaces=["public-kb", "user-u1"])
+
+        self.assertEqual(self.cache.invalidate_namespace("public-kb"), 1)
+        self.assertIsNone(self.cache.lookup([1.0, 0.0], "kb", "u1"))
+        self.assertIsNotNone(self.cache.lookup([1.0, 0.0], "reports", "u1"))
+
+    def test_eviction(self):
+        """The least recently used prompt is evicted past max_entries."""
+        cache = SemanticAnswerCache(threshold=0.95, max_entries=1)
+        cache.store([1.0, 0.0], "a", "reports", "u1", EVENTS)
+        cache.store([0.0, 1.0], "b", "reports", "u1", EVENTS)
+        self.assertIsNone(cache.lookup([1.0, 0.0], "reports", "u1"))
+
+
+class TestRecordAndReplay(unittest.TestCase):
+    """Test cases for recording and replaying section events."""
+
+    def test_record_then_replay(self):
+        """Recorded events replay in the same order."""
+        stored = []
+
+        async def run():
+            recorded = [e async for e in record_events(replay_events(EVENTS), stored.append)]
+            replayed = [e async for e in replay_events(stored[0])]
+            return recorded, replayed
+
+        recorded, replayed = asyncio.run(run())
+        self.assertEqual(recorded, EVENTS)
+        self.assertEqual(replayed, EVENTS)
+
+    def test_errors_are_not_recorded(self):
+        """Sections that yielded an error event are not stored."""
+        stored = []
+        events = EVENTS + [{"type": "text_delta", "data": "⚠️ failed", "error": True}]
+
+        async def run():
+            return [e async for e in record_events(replay_events(events), stored.append)]
+
+        asyncio.run(run())
+        self.assertEqual(stored, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
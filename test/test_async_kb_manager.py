@@ -0,0 +1,150 @@
+"""
+Tests for the async knowledge base manager.
+
+This module checks that namespace queries run concurrently, that the
+per-namespace results are merged into the overall top results, and that
+entry lookups keep the namespace priority order.
+"""
+
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from helpers.knowledge_base_helper import (
+    AsyncKnowledgeBaseManager,
+    KnowledgeBaseManager,
+    merge_top_k
+)
+from helpers.schema_definitions import CURRENT_SCHEMA_VERSION
+
+SAMPLE_EMBEDDING = [0.1] * 1536
+
+
+def make_metadata(entry_id, title="Entry"):
+    """Build stored metadata for a test entry."""
+    return {
+        "id": entry_id,
+        "title": title,
+        "content_preview": f"Content of {entry_id}",
+        "created_by": "test-user",
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": "2024-01-01T00:00:00",
+        "visibility": "public",
+        "schema_version": CURRENT_SCHEMA_VERSION
+    }
+
+
+class SlowIndex:
+    """Stand-in for a Pinecone index whose calls each take `delay` seconds."""
+
+    def __init__(self, matches, delay=0.1):
+        self.matches = matches
+        self.delay = delay
+
+    def query(self, vector, top_k, namespace, filter=None, include_metadata=True):
+        time.sleep(self.delay)
+        return SimpleNamespace(matches=[
+            SimpleNamespace(metadata=make_metadata(entry_id), score=score)
+            for entry_id, score in self.matches.get(namespace, [])[:top_k]
+        ])
+
+    def fetch(self, ids, namespace):
+        time.sleep(self.delay)
+        vectors = {
+            entry_id: SimpleNamespace(metadata=make_metadata(entry_id, title=namespace))
+            for entry_id, _ in self.matches.get(namespace, [])
+            if entry_id in ids
+        }
+        return SimpleNamespace(vectors=vectors)
+
+
+def make_manager(index):
+    """Create an async manager on top of a manager using the given index."""
+    with patch("helpers.knowledge_base_helper.initialize_pinecone", return_value=index):
+        return AsyncKnowledgeBaseManager(KnowledgeBaseManager())
+
+
+class TestMergeTopK(unittest.TestCase):
+    """Test cases for merge_top_k."""
+
+    def test_keeps_best_results_across_lists(self):
+        """The overall best results are returned, best first."""
+        merged = merge_top_k([[("a", 0.9), ("b", 0.5)], [("c", 0.8)], [("d", 0.95)]], 3)
+        self.assertEqual(merged, [("d", 0.95), ("a", 0.9), ("c", 0.8)])
+
+    def test_ties_keep_namespace_order(self):
+        """Equal scores keep the order of the input lists."""
+        merged = merge_top_k([[("public", 0.7)], [("team", 0.7)], [("user", 0.7)]], 2)
+        self.assertEqual(merged, [("public", 0.7), ("team", 0.7)])
+
+    def test_zero_limit(self):
+        """A zero limit returns nothing."""
+        self.assertEqual(merge_top_k([[("a", 0.9)]], 0), [])
+
+
+class TestAsyncKnowledgeBaseManager(unittest.TestCase):
+    """Test cases for the AsyncKnowledgeBaseManager class."""
+
+    def test_search_queries_namespaces_concurrently(self):
+        """Three 0.1 s namespace queries finish in well under 0.3 s."""
+        index = SlowIndex({
+            "public-kb": [("p1", 0.9), ("p2", 0.6)],
+            "team-kb": [("t1", 0.8)],
+            "user-test-user": [("u1", 0.95)]
+        })
+        manager = make_manager(index)
+
+        start = time.perf_counter()
+        results = asyncio.run(manager.search("pricing", "test-user", limit=3, query_embedding=SAMPLE_EMBEDDING))
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.25)
+        self.assertEqual([entry.id for entry, _ in results], ["u1", "p1", "t1"])
+        self.assertEqual([score for _, score in results], [0.95, 0.9, 0.8])
+
+    def test_search_matches_sync_manager(self):
+        """The async search returns the same results as the sync one."""
+        index = SlowIndex({
+            "public-kb": [("p1", 0.7)],
+            "team-kb": [("t1", 0.9), ("t2", 0.7)],
+            "user-test-user": []
+        }, delay=0)
+        manager = make_manager(index)
+
+        async_results = asyncio.run(manager.search("pricing", "test-user", limit=5, query_embedding=SAMPLE_EMBEDDING))
+        sync_results = manager.manager.search("pricing", "test-user", limit=5, query_embedding=SAMPLE_EMBEDDING)
+        self.assertEqual(
+            [(entry.id, score) for entry, score in async_results],
+            [(entry.id, score) for entry, score in sync_results]
+        )
+
+    def test_get_entry_prefers_earlier_namespace(self):
+        """An ID found in several namespaces is returned from the first one."""
+        index = SlowIndex({
+            "public-kb": [],
+            "team-kb": [("shared", 0.0)],
+            "user-test-user": [("shared", 0.0)]
+        }, delay=0.05)
+        manager = make_manager(index)
+
+        entry = asyncio.run(manager.get_entry("shared", "test-user"))
+        self.assertEqual(entry.title, "team-kb")
+        self.assertIsNone(asyncio.run(manager.get_entry("missing", "test-user")))
+
+    def test_filter_by_metadata_keeps_namespace_order(self):
+        """Filtered entries are returned in namespace order, up to the limit."""
+        index = SlowIndex({
+            "public-kb": [("p1", 0.0)],
+            "team-kb": [("t1", 0.0), ("t2", 0.0)],
+            "user-test-user": [("u1", 0.0)]
+        }, delay=0)
+        manager = make_manager(index)
+
+        entries = asyncio.run(manager.filter_by_metadata("test-user", {"tags": ["pricing"]}, limit=3))
+        self.assertEqual([entry.id for entry in entries], ["p1", "t1", "t2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Tests for the community agent stream.
+
+This module runs stream_community_agent_response on a scripted agent run
+and checks that it yields typed events, that the WebSocket sender
+encodes them without converting legacy dicts, and that failed or partial
+searches mark the answer as degraded.
+"""
+
+import json
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from openai.types.responses import ResponseTextDeltaEvent
+
+from agents import RunContextWrapper
+
+from agent_modules.communityAgent import (
+    PricingAgentContext,
+    community_knowledge_search,
+    send_community_streamed_response,
+    stream_community_agent_response
+)
+from helpers.stream_events import Annotation, Completion, TextDelta
+
+
+class ScriptedRun:
+    """Streamed run yielding a text delta and an annotation, and adding a topic citation to the context."""
+
+    def __init__(self, context):
+        self.context = context
+
+    async def stream_events(self):
+        yield SimpleNamespace(type="raw_response_event", data=ResponseTextDeltaEvent.model_construct(
+            type="response.output_text.delta", delta="Seat pricing\n\n\n\nworks."
+        ))
+        yield SimpleNamespace(type="raw_response_event", data=SimpleNamespace(
+            type="response.output_text.annotation.added",
+            annotation={"topic_id": "42", "title": "Seat pricing thread", "url": "https://community.example/t/42"}
+        ))
+        self.context.annotations = [{"type": "topic_citation", "topic_id": "7", "title": "Usage pricing"}]
+
+
+def run_scripted(coroutine_factory):
+    with patch(
+        "agent_modules.communityAgent.Runner.run_streamed",
+        side_effect=lambda agent, items, context: ScriptedRun(context)
+    ):
+        return asyncio.run(coroutine_factory())
+
+
+class TestCommunityStream(unittest.TestCase):
+    """Test cases for the community agent stream and sender."""
+
+    def test_stream_yields_typed_events(self):
+        """Text, both annotation kinds and the completion are typed events."""
+        async def collect():
+            return [event async for event in stream_community_agent_response("seat pricing")]
+
+        events = run_scripted(collect)
+
+        self.assertEqual([type(event) for event in events], [TextDelta, Annotation, Annotation, Completion])
+        self.assertEqual(events[1].citation.id, "42")
+        self.assertEqual(events[1].citation.source, "community")
+        self.assertEqual(events[2].citation.title, "[Community] Usage pricing")
+
+    def test_sender_encodes_events(self):
+        """Frames carry the collapsed text and every citation, ending with a done frame."""
+        apigateway = MagicMock()
+
+        run_scripted(lambda: send_community_streamed_response(apigateway, "connection-1", "seat pricing"))
+
+        frames = [json.loads(call.kwargs["Data"]) for call in apigateway.post_to_connection.call_args_list]
+        self.assertEqual(frames[0]["text"], "Seat pricing\n\nworks.")
+        self.assertTrue(frames[-1]["done"])
+        self.assertEqual([annotation["citation"]["id"] for annotation in frames[-1]["annotations"]], ["42", "7"])
+
+
+class TestCommunitySearchTool(unittest.TestCase):
+    """Test cases for degraded searches in the community search tool."""
+
+    def search(self, **patches):
+        context = PricingAgentContext()
+        with patch("agent_modules.communityAgent.get_community_index", return_value=MagicMock()), \
+                patch("agent_modules.communityAgent.OPENAI_API_KEY", "test"), \
+                patch("agent_modules.communityAgent.process_pinecone_results", **patches):
+            output = asyncio.run(community_knowledge_search.on_invoke_tool(
+                RunContextWrapper(context), json.dumps({"query": "seat pricing"})
+            ))
+        return context, output
+
+    def test_timed_out_search_is_degraded(self):
+        """A search that timed out records why its results are partial."""
+        context, output = self.search(return_value={"error": "Community search timed out; results may be partial."})
+        self.assertIn("timed out", output)
+        self.assertEqual(context.search_error, "Community search timed out; results may be partial.")
+
+    def test_tool_error_is_degraded(self):
+        """A search that raised is reported to the agent and recorded in the context."""
+        context, output = self.search(side_effect=RuntimeError("index unavailable"))
+        self.assertIn("index unavailable", output)
+        self.assertEqual(context.search_error, "index unavailable")
+
+    def test_complete_search_is_not_degraded(self):
+        """A search with results leaves the context unmarked."""
+        context, _ = self.search(return_value={"message": "No relevant content found for your query."})
+        self.assertIsNone(context.search_error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+Tests for the full-content store.
+
+This module checks compressed storage, legacy blobs, batched reads with
+the LRU cache, and that KnowledgeBaseManager stores bodies on write and
+hydrates previews on demand.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from helpers.content_store import ContentStore, LocalContentStore, SupabaseContentStore, compress_content
+from helpers.entry_locations import EntryLocationIndex
+from helpers.knowledge_base_helper import CONTENT_PREVIEW_CHARS, KnowledgeBaseManager
+from helpers.metadata_index import MetadataIndex
+from helpers.vector_backends import NumpyBackend
+
+LONG_BODY = "Seat pricing is billed per user per month with annual discounts. " * 40
+
+
+class CountingStore(LocalContentStore):
+    """Local store that counts blob reads."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = []
+
+    def read_blob(self, name):
+        self.reads.append(name)
+        return super().read_blob(name)
+
+
+class TestContentStore(unittest.TestCase):
+    """Test cases for the content store."""
+
+    def setUp(self):
+        """Use a fresh directory per test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = CountingStore(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_content_is_stored_compressed(self):
+        """Bodies round-trip and are written gzip-compressed."""
+        self.store.put("entry-1", LONG_BODY)
+
+        blob_path = os.path.join(self.tmpdir.name, "entry-1.txt.gz")
+        self.assertLess(os.path.getsize(blob_path), len(LONG_BODY) / 5)
+        self.assertEqual(CountingStore(self.tmpdir.name).get("entry-1"), LONG_BODY)
+        self.assertGreater(self.store.report()["compression_ratio"], 5)
+
+    def test_store_missing_a_blob_operation_cannot_be_created(self):
+        """Subclasses must implement every blob operation."""
+        class ReadOnlyStore(ContentStore):
+            def read_blob(self, name):
+                return None
+
+        with self.assertRaises(TypeError):
+            ReadOnlyStore()
+
+    def test_legacy_uncompressed_blobs_are_read(self):
+        """Plain {id}.txt blobs written by older code are still served."""
+        with open(os.path.join(self.tmpdir.name, "old.txt"), "w") as f:
+            f.write("Legacy body")
+        self.assertEqual(self.store.get("old"), "Legacy body")
+
+    def test_get_many_reads_only_uncached_entries(self):
+        """Cached bodies skip storage; the rest are read in one batch; missing ones are left out."""
+        self.store.put("a", "Body A")
+        CountingStore(self.tmpdir.name).put("b", "Body B")
+
+        contents = self.store.get_many(["a", "b", "missing", "b"])
+
+        self.assertEqual(contents, {"a": "Body A", "b": "Body B"})
+        self.assertEqual(sorted(set(self.store.reads)), ["b.txt.gz", "missing.txt", "missing.txt.gz"])
+        self.assertEqual(self.store.stats["hits"], 1)
+
+    def test_cache_is_bounded(self):
+        """The LRU evicts least recently used bodies beyond its byte budget."""
+        store = CountingStore(self.tmpdir.name, cache_max_bytes=10)
+        store.put("a", "12345")
+        store.put("b", "12345")
+        store.get("a")
+        store.put("c", "12345")
+
+        store.reads.clear()
+        store.get_many(["a", "b", "c"])
+        self.assertEqual(store.reads, ["b.txt.gz"])
+        self.assertLessEqual(store.report()["cache_bytes"], 10)
+
+    def test_delete_removes_blob_and_cache(self):
+        """Deleted bodies are gone from storage and cache."""
+        self.store.put("a", "Body A")
+        self.store.delete("a")
+        self.assertIsNone(self.store.get("a"))
+
+    def test_supabase_missing_object_is_none(self):
+        """A storage 404 reads as a missing blob; other errors propagate."""
+        class Bucket:
+            def download(self, name):
+                if name.startswith("missing"):
+                    raise Exception("{'statusCode': 404, 'message': 'Object not found'}")
+                return compress_content("Stored body")
+
+        client = type("Client", (), {})()
+        client.storage = type("Storage", (), {"from_": lambda self, bucket: Bucket()})()
+        store = SupabaseContentStore(client=client)
+
+        self.assertEqual(store.get("entry-1"), "Stored body")
+        self.assertIsNone(store.get("missing-1"))
+
+
+class TestManagerContent(unittest.TestCase):
+    """Test cases for KnowledgeBaseManager with a content store."""
+
+    def setUp(self):
+        """Create a manager on the in-process backend with a local content store."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.store = CountingStore(self.tmpdir.name)
+        for name, side_effect in [
+            ("generate_embedding", lambda text, model=None: [1.0, 0.5, 0.25]),
+            ("generate_embeddings", lambda texts, model=None: [[1.0, 0.5, 0.25] for _ in texts])
+        ]:
+            patcher = patch(f"helpers.knowledge_base_helper.{name}", side_effect=side_effect)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.manager = KnowledgeBaseManager(
+            locations=EntryLocationIndex(":memory:"),
+            metadata_index=MetadataIndex(":memory:"),
+            backend=NumpyBackend(),
+            content_store=self.store
+        )
+        self.entry_id = self.manager.create_entry(
+            {"title": "Seats", "content": LONG_BODY, "visibility": "team"}, "owner"
+        )
+
+    def test_search_returns_previews_then_full_bodies(self):
+        """Search returns previews unless content is requested."""
+        entry, _ = self.manager.search("seat pricing", "reader", limit=1)[0]
+        self.assertEqual(entry.content, LONG_BODY[:CONTENT_PREVIEW_CHARS])
+
+        entry, _ = self.manager.search("seat pricing", "reader", limit=1, include_content=True)[0]
+        self.assertEqual(entry.content, LONG_BODY)
+
+        self.assertEqual(self.manager.hydrate([self.manager.get_entry(self.entry_id, "reader", include_content=False)])[0].content, LONG_BODY)
+
+    def test_get_entry_hydrates_and_delete_removes_content(self):
+        """get_entry returns the full body; deleting the entry deletes it."""
+        self.assertEqual(self.manager.get_entry(self.entry_id, "reader").content, LONG_BODY)
+
+        self.assertTrue(self.manager.delete_entry(self.entry_id, "owner"))
+        self.assertIsNone(self.store.get(self.entry_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests for the deadline helpers.
+
+This module checks deadline budgets, Lambda context handling and the
+cancellation of streams that run past their deadline.
+"""
+
+import asyncio
+import time
+import unittest
+
+from helpers.deadline import (
+    Deadline,
+    get_current_deadline,
+    run_with_deadline,
+    stream_with_deadline
+)
+
+
+class MockContext:
+    """Mock AWS Lambda context object with time information."""
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+class TestDeadline(unittest.TestCase):
+    """Test cases for the Deadline object."""
+
+    def test_from_lambda_context_keeps_reserve(self):
+        """The deadline ends the reserve before the Lambda timeout."""
+        deadline = Deadline.from_lambda_context(MockContext(10000), reserve_ms=3000)
+        self.assertAlmostEqual(deadline.remaining(), 7.0, places=1)
+
+    def test_from_lambda_context_without_time_info(self):
+        """Contexts without time information give an unbounded deadline."""
+        deadline = Deadline.from_lambda_context(object())
+        self.assertIsNone(deadline.remaining())
+        self.assertFalse(deadline.expired)
+
+    def test_child_is_capped_by_parent(self):
+        """A child budget never outlives its parent."""
+        parent = Deadline.after(1.0)
+        self.assertLessEqual(parent.child(60).remaining(), 1.0)
+        self.assertLessEqual(parent.child(0.5).remaining(), 0.5)
+
+    def test_run_with_deadline_times_out(self):
+        """Blocking calls past their deadline raise TimeoutError."""
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(run_with_deadline(time.sleep, 0.5, deadline=Deadline.after(0.05)))
+
+
+class TestStreamWithDeadline(unittest.TestCase):
+    """Test cases for deadline-bounded streams."""
+
+    def test_stream_is_cut_short(self):
+        """A slow stream is cancelled and the timeout events are yielded."""
+        cleaned_up = []
+
+        async def slow_stream():
+            try:
+                yield "first"
+                await asyncio.sleep(10)
+                yield "never"
+            finally:
+                cleaned_up.append(True)
+
+        async def run():
+            stream = stream_with_deadline(slow_stream(), Deadline.after(0.05), ["partial"])
+            return [event async for event in stream]
+
+        self.assertEqual(asyncio.run(run()), ["first", "partial"])
+        self.assertEqual(cleaned_up, [True])
+
+    def test_stream_exposes_current_deadline(self):
+        """Code inside the stream can read the deadline it runs under."""
+        deadline = Deadline.after(5)
+
+        async def stream():
+            yield get_current_deadline() is deadline
+
+        async def run():
+            return [event async for event in stream_with_deadline(stream(), deadline)]
+
+        self.assertEqual(asyncio.run(run()), [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Tests for the persistent embedding cache.
+
+This module checks the memory and disk tiers, content-addressed keys,
+float32 storage, size-based eviction and the batched lookup path.
+"""
+
+import os
+import tempfile
+import unittest
+
+from helpers.embedding_cache import EmbeddingCache, cache_key
+
+
+class CountingEmbedder:
+    """Fake embeddings API that counts the texts it is asked to embed."""
+
+    def __init__(self, dimensions=4):
+        self.dimensions = dimensions
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text))] * self.dimensions for text in texts]
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Test cases for the EmbeddingCache class."""
+
+    def setUp(self):
+        """Use a fresh SQLite file per test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "embeddings.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_cache(self, **kwargs):
+        kwargs.setdefault("enabled", True)
+        return EmbeddingCache(path=self.path, **kwargs)
+
+    def test_keys_depend_on_model_dimensions_and_normalized_text(self):
+        """Whitespace differences share a key; model and dimensions do not."""
+        key = cache_key("text-embedding-3-small", 1536, "annual  pricing\n")
+        self.assertEqual(key, cache_key("text-embedding-3-small", 1536, " annual pricing"))
+        self.assertNotEqual(key, cache_key("text-embedding-ada-002", 1536, "annual pricing"))
+        self.assertNotEqual(key, cache_key("text-embedding-3-small", 512, "annual pricing"))
+
+    def test_memory_hit_skips_the_api(self):
+        """A repeated text is served from memory."""
+        cache = self.make_cache()
+        embedder = CountingEmbedder()
+
+        first = cache.get_or_compute("seat pricing", "model", lambda text: embedder([text])[0])
+        second = cache.get_or_compute("seat pricing", "model", lambda text: embedder([text])[0])
+
+        self.assertEqual(first, second)
+        self.assertEqual(embedder.texts, ["seat pricing"])
+        self.assertEqual(cache.stats["memory_hits"], 1)
+
+    def test_disk_tier_survives_a_new_process(self):
+        """A new cache on the same file serves vectors stored by an earlier one."""
+        self.make_cache().put("usage pricing", "model", [0.25, -1.5, 3.0])
+
+        cache = self.make_cache()
+        self.assertEqual(cache.get("usage pricing", "model"), [0.25, -1.5, 3.0])
+        self.assertEqual(cache.stats["disk_hits"], 1)
+
+    def test_vectors_are_stored_as_float32(self):
+        """Each stored dimension takes four bytes."""
+        cache = self.make_cache()
+        cache.put("text", "model", [0.1] * 1536)
+
+        self.assertEqual(cache.report()["disk_bytes"], 1536 * 4)
+        self.assertAlmostEqual(cache.get("text", "model")[0], 0.1, places=6)
+
+    def test_disk_tier_evicts_least_recently_used(self):
+        """The disk tier is trimmed to its size budget, oldest first."""
+        cache = self.make_cache(memory_items=1, max_bytes=3 * 16)
+        for text in ["a", "b", "c"]:
+            cache.put(text, "model", [1.0] * 4)
+        # Touch "a" so "b" is now the least recently used
+        cache.get("a", "model")
+        cache.put("d", "model", [1.0] * 4)
+
+        self.assertGreater(cache.stats["evictions"], 0)
+        self.assertLessEqual(cache.report()["disk_bytes"], 3 * 16)
+        self.assertIsNotNone(cache.get("a", "model"))
+        self.assertIsNone(cache.get("b", "model"))
+
+    def test_batch_computes_only_missing_texts_once(self):
+        """Cached and duplicate texts are not sent to the API."""
+        cache = self.make_cache()
+        embedder = CountingEmbedder()
+        cache.put("cached", "model", [9.0] * 4)
+
+        vectors = cache.get_many_or_compute(["new", "cached", "new", "other"], "model", embedder)
+
+        self.assertEqual(embedder.texts, ["new", "other"])
+        self.assertEqual(vectors[1], [9.0] * 4)
+        self.assertEqual(vectors[0], vectors[2])
+        self.assertEqual(len(vectors), 4)
+
+    def test_disabled_cache_always_computes(self):
+        """A disabled cache passes every call through."""
+        cache = self.make_cache(enabled=False)
+        embedder = CountingEmbedder()
+
+        cache.get_many_or_compute(["a", "a"], "model", embedder)
+        cache.get_many_or_compute(["a"], "model", embedder)
+
+        self.assertEqual(embedder.texts, ["a", "a", "a"])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_unwritable_disk_falls_back_to_memory(self):
+        """A disk tier that cannot be opened leaves a working memory cache."""
+        cache = EmbeddingCache(path=os.path.join(self.tmpdir.name, "missing", "db.sqlite3"), enabled=True)
+        cache.put("text", "model", [1.0, 2.0])
+
+        self.assertEqual(cache.get("text", "model"), [1.0, 2.0])
+        self.assertIsNone(cache.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Tests for the request-scoped embedding service.
+
+This module checks that each (text, model) pair is embedded at most once
+per request, that concurrent callers share one call, and that failures
+can be retried.
+"""
+
+import asyncio
+import time
+import unittest
+
+from helpers.embedding_service import RequestEmbeddings, get_embedding_model
+
+
+class TestRequestEmbeddings(unittest.TestCase):
+    """Test cases for the RequestEmbeddings class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.calls = []
+
+        def embed(text, model):
+            self.calls.append((text, model))
+            time.sleep(0.02)
+            return [float(len(text)), float(len(model))]
+
+        self.embeddings = RequestEmbeddings(embed)
+
+    def test_same_pair_is_embedded_once(self):
+        """Repeated requests for the same text and model reuse the result."""
+        async def run():
+            first = await self.embeddings.embed("pricing tiers", "model-a")
+            second = await self.embeddings.embed("pricing tiers", "model-a")
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, [("pricing tiers", "model-a")])
+        self.assertEqual(self.embeddings.stats, {"calls": 1, "reused": 1})
+
+    def test_concurrent_callers_share_one_call(self):
+        """Sections asking at the same time share the in-flight call."""
+        async def run():
+            return await asyncio.gather(*[
+                self.embeddings.embed("pricing tiers", "model-a") for _ in range(3)
+            ])
+
+        results = asyncio.run(run())
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results[0], results[2])
+
+    def test_models_are_kept_apart(self):
+        """The same text with a different model is a different embedding."""
+        async def run():
+            await self.embeddings.embed("pricing tiers", "model-a")
+            await self.embeddings.embed("pricing tiers", "model-b")
+
+        asyncio.run(run())
+        self.assertEqual(len(self.calls), 2)
+        self.assertIsNotNone(self.embeddings.get("pricing tiers", "model-b"))
+
+    def test_failed_calls_are_retried(self):
+        """A failed call is not cached."""
+        attempts = []
+
+        def flaky(text, model):
+            attempts.append(text)
+            if len(attempts) == 1:
+                raise RuntimeError("rate limited")
+            return [1.0]
+
+        embeddings = RequestEmbeddings(flaky)
+
+        async def run():
+            with self.assertRaises(RuntimeError):
+                await embeddings.embed("q", "m")
+            return await embeddings.embed("q", "m")
+
+        self.assertEqual(asyncio.run(run()), [1.0])
+        self.assertEqual(len(attempts), 2)
+
+    def test_router_and_kb_share_a_model(self):
+        """Routing uses the KB model so the prompt embedding can be reused."""
+        self.assertEqual(get_embedding_model("router"), get_embedding_model("kb"))
+
+
+if __name__ == '__main__':
+    unittest.main()
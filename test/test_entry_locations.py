@@ -0,0 +1,163 @@
+"""
+Tests for the entry location index.
+
+This module checks the index itself and that get/update/delete use it to
+reach an entry with a single fetch, repairing stale locations.
+"""
+
+import os
+import asyncio
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from helpers.entry_locations import EntryLocationIndex
+from helpers.knowledge_base_helper import AsyncKnowledgeBaseManager, KnowledgeBaseManager, build_entry_vectors
+from helpers.schema_definitions import KnowledgeBaseEntryExtended, CURRENT_SCHEMA_VERSION
+
+SAMPLE_ENTRY = {
+    "id": "entry-1",
+    "title": "Team pricing notes",
+    "content": "Team plans are billed per seat with annual discounts.",
+    "created_by": "owner",
+    "visibility": "team",
+    "schema_version": CURRENT_SCHEMA_VERSION
+}
+
+
+class CountingIndex:
+    """Fake Pinecone index holding vectors per namespace and counting fetches."""
+
+    def __init__(self):
+        self.namespaces = {}
+        self.fetches = []
+        self.update = MagicMock()
+        self.delete = MagicMock()
+
+    def add(self, namespace, entry_data):
+        entry = KnowledgeBaseEntryExtended(**entry_data)
+        for vector_id, values, metadata in build_entry_vectors(entry, [entry.content], [[1.0, 0.0]]):
+            self.namespaces.setdefault(namespace, {})[vector_id] = SimpleNamespace(values=values, metadata=metadata)
+
+    def fetch(self, ids, namespace):
+        self.fetches.append(namespace)
+        stored = self.namespaces.get(namespace, {})
+        return SimpleNamespace(vectors={vector_id: stored[vector_id] for vector_id in ids if vector_id in stored})
+
+    def list(self, prefix, namespace):
+        return iter([])
+
+
+class TestEntryLocationIndex(unittest.TestCase):
+    """Test cases for the EntryLocationIndex class."""
+
+    def test_put_get_remove(self):
+        """Locations are recorded, replaced and forgotten."""
+        locations = EntryLocationIndex(":memory:")
+        self.assertIsNone(locations.get("entry-1"))
+
+        locations.put("entry-1", "team-kb", "team", "owner")
+        self.assertEqual(locations.get("entry-1"), {"namespace": "team-kb", "visibility": "team", "owner": "owner"})
+
+        locations.put_many([("entry-1", "public-kb", "public", "owner"), ("entry-2", "user-owner", "private", "owner")])
+        self.assertEqual(locations.get("entry-1")["namespace"], "public-kb")
+        self.assertEqual(locations.get("entry-2")["namespace"], "user-owner")
+
+        locations.remove("entry-1")
+        self.assertIsNone(locations.get("entry-1"))
+
+    def test_persists_in_file(self):
+        """A file-backed index survives a new instance (a warm container)."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "locations.sqlite3")
+            EntryLocationIndex(path).put("entry-1", "team-kb", "team", "owner")
+            self.assertEqual(EntryLocationIndex(path).get("entry-1")["namespace"], "team-kb")
+
+    def test_unusable_file_falls_back_to_memory(self):
+        """A path that cannot be opened leaves a working in-memory index."""
+        locations = EntryLocationIndex("/nonexistent-dir/locations.sqlite3")
+        locations.put("entry-1", "team-kb")
+        self.assertEqual(locations.path, ":memory:")
+        self.assertEqual(locations.get("entry-1")["namespace"], "team-kb")
+
+
+class TestLocationAwareManager(unittest.TestCase):
+    """Test cases for KnowledgeBaseManager lookups through the location index."""
+
+    def setUp(self):
+        """Create a manager on a fake index with one team entry."""
+        self.index = CountingIndex()
+        self.index.add("team-kb", SAMPLE_ENTRY)
+        self.locations = EntryLocationIndex(":memory:")
+        with patch("helpers.knowledge_base_helper.initialize_pinecone", return_value=self.index):
+            self.manager = KnowledgeBaseManager(locations=self.locations)
+
+    def test_unknown_entry_is_probed_once_then_direct(self):
+        """The first lookup probes and records the location; the next is one fetch."""
+        self.assertIsNotNone(self.manager.get_entry("entry-1", "reader"))
+        self.assertEqual(self.index.fetches, ["public-kb", "team-kb"])
+        self.assertEqual(self.locations.get("entry-1")["namespace"], "team-kb")
+
+        self.index.fetches.clear()
+        self.assertIsNotNone(self.manager.get_entry("entry-1", "reader"))
+        self.assertEqual(self.index.fetches, ["team-kb"])
+
+    def test_stale_location_is_repaired(self):
+        """A location that no longer holds the entry is replaced after one probe."""
+        self.locations.put("entry-1", "public-kb", "public", "owner")
+
+        entry = self.manager.get_entry("entry-1", "reader")
+
+        self.assertEqual(entry.id, "entry-1")
+        self.assertEqual(self.index.fetches, ["public-kb", "team-kb"])
+        self.assertEqual(self.locations.get("entry-1")["namespace"], "team-kb")
+        self.assertEqual(self.locations.stats["repairs"], 1)
+
+    def test_async_stale_location_is_repaired(self):
+        """The async lookup probes each namespace once after a stale location."""
+        self.locations.put("entry-1", "public-kb", "public", "owner")
+
+        entry = asyncio.run(AsyncKnowledgeBaseManager(self.manager).find_entry("entry-1", "reader"))
+
+        self.assertEqual(entry.id, "entry-1")
+        self.assertEqual(sorted(self.index.fetches), ["public-kb", "team-kb", "user-reader"])
+        self.assertEqual(self.locations.get("entry-1")["namespace"], "team-kb")
+        self.assertEqual(self.locations.stats["repairs"], 1)
+
+    def test_location_outside_readable_namespaces_is_ignored(self):
+        """Another user's private namespace is never fetched for this user."""
+        self.locations.put("entry-1", "user-owner", "private", "owner")
+
+        self.manager.get_entry("entry-1", "reader")
+
+        self.assertNotIn("user-owner", self.index.fetches)
+
+    def test_unreadable_location_is_kept(self):
+        """A miss for a user who cannot read the location leaves it for the owner."""
+        self.index.add("user-owner", {**SAMPLE_ENTRY, "id": "entry-2", "visibility": "private"})
+        self.locations.put("entry-2", "user-owner", "private", "owner")
+
+        self.assertIsNone(self.manager.get_entry("entry-2", "reader"))
+        self.assertIsNone(asyncio.run(AsyncKnowledgeBaseManager(self.manager).find_entry("entry-2", "reader")))
+        self.assertEqual(self.locations.get("entry-2")["namespace"], "user-owner")
+
+        self.index.fetches.clear()
+        self.assertIsNotNone(self.manager.get_entry("entry-2", "owner"))
+        self.assertEqual(self.index.fetches, ["user-owner"])
+
+    def test_update_and_delete_use_one_fetch(self):
+        """With a known location, update and delete each fetch only once."""
+        self.locations.put("entry-1", "team-kb", "team", "owner")
+
+        self.assertTrue(self.manager.update_entry("entry-1", {"tags": ["seats"]}, "owner"))
+        self.assertEqual(self.index.fetches, ["team-kb"])
+
+        self.index.fetches.clear()
+        self.assertTrue(self.manager.delete_entry("entry-1", "owner"))
+        self.assertEqual(self.index.fetches, ["team-kb"])
+        self.assertIsNone(self.locations.get("entry-1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+Tests for hybrid (BM25 + vector) search.
+
+This module checks BM25 ranking in the metadata index, reciprocal rank
+fusion, that hybrid search returns exact-term matches the vector query
+ranks too low to return, also after an entry's metadata is edited, and
+that it never waits for a metadata sync.
+"""
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from helpers.entry_locations import EntryLocationIndex
+from helpers.knowledge_base_helper import (
+    AsyncKnowledgeBaseManager,
+    KnowledgeBaseManager,
+    get_default_namespaces,
+    reciprocal_rank_fusion
+)
+from helpers.metadata_index import MetadataIndex
+from helpers.vector_backends import NumpyBackend
+
+
+def metadata(entry_id, title, tags=(), preview="", **fields):
+    """Entry metadata as stored in Pinecone."""
+    return {"id": entry_id, "title": title, "tags": list(tags), "content_preview": preview, "created_by": "owner", **fields}
+
+
+class Ranked:
+    """Minimal ranked result."""
+
+    def __init__(self, entry_id):
+        self.id = entry_id
+
+
+class TestTextSearch(unittest.TestCase):
+    """Test cases for MetadataIndex.search_text."""
+
+    def setUp(self):
+        self.index = MetadataIndex(":memory:")
+        self.index.upsert_many("public-kb", [
+            metadata("a", "Overage fees", ["billing"], "Usage above the plan is billed as overage."),
+            metadata("b", "Seat pricing", ["seats"], "Seat-based plans charge per user.", visibility="public"),
+            metadata("c", "Annual discounts", ["discounts"], "Discounts for annual seat commitments.")
+        ])
+        self.index.upsert("team-kb", metadata("d", "Team overage notes", [], "Overage is rare."))
+
+    def test_ranks_by_bm25(self):
+        """Matches of rarer terms and in the title rank first; terms are stemmed."""
+        results = self.index.search_text(["public-kb"], "seat-based overage")
+        self.assertEqual([row[1]["id"] for row in results][:1], ["b"])
+        self.assertEqual({row[1]["id"] for row in results}, {"a", "b", "c"})
+        self.assertTrue(all(row[2] > 0 for row in results))
+
+        self.assertEqual([row[1]["id"] for row in self.index.search_text(["public-kb"], "seats")], ["b", "c"])
+
+    def test_namespaces_and_filters_apply(self):
+        """Only the given namespaces and entries matching the filter are returned."""
+        self.assertEqual(
+            sorted(row[1]["id"] for row in self.index.search_text(["public-kb", "team-kb"], "overage")), ["a", "d"]
+        )
+        self.assertEqual(
+            [row[1]["id"] for row in self.index.search_text(["public-kb"], "seat", filter_dict={"tags": ["seats"]})], ["b"]
+        )
+
+    def test_writes_keep_text_current(self):
+        """Replaced and removed entries are replaced and removed in text search."""
+        self.index.upsert("public-kb", metadata("a", "Usage tiers", [], "Tiered usage pricing."))
+        self.index.remove("c")
+        self.assertEqual([row[1]["id"] for row in self.index.search_text(["public-kb"], "overage discounts")], [])
+
+        self.index.update("public-kb", {"id": "b", "title": "Per-user plans", "tags": []})
+        self.assertEqual([row[1]["id"] for row in self.index.search_text(["public-kb"], "seat-based")], ["b"])
+
+        self.index.replace_namespace("public-kb", [metadata("e", "Overage caps", [], "")])
+        self.assertEqual([row[1]["id"] for row in self.index.search_text(["public-kb"], "overage tiers seat")], ["e"])
+
+
+class TestReciprocalRankFusion(unittest.TestCase):
+    """Test cases for reciprocal_rank_fusion."""
+
+    def test_fuses_by_rank(self):
+        """Entries in both lists come first; scores are sums of 1 / (k + rank)."""
+        vector = [(Ranked("a"), 0.9), (Ranked("b"), 0.8)]
+        lexical = [(Ranked("c"), 12.0), (Ranked("b"), 3.0)]
+
+        fused = reciprocal_rank_fusion([vector, lexical], limit=3, k=60)
+
+        self.assertEqual([entry.id for entry, _ in fused], ["b", "a", "c"])
+        self.assertAlmostEqual(fused[0][1], 1 / 62 + 1 / 62)
+        self.assertIs(fused[0][0], vector[1][0])
+
+
+class TestHybridSearch(unittest.TestCase):
+    """Test cases for hybrid search in KnowledgeBaseManager."""
+
+    def setUp(self):
+        """Entries whose embeddings all favor seats, and one about overage."""
+        patcher = patch(
+            "helpers.knowledge_base_helper.generate_embeddings",
+            side_effect=lambda texts, model=None: [[0.0, 1.0] if "overage" in text else [1.0, 0.0] for text in texts]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = KnowledgeBaseManager(
+            locations=EntryLocationIndex(":memory:"),
+            metadata_index=MetadataIndex(":memory:"),
+            backend=NumpyBackend()
+        )
+        self.seat_ids = [
+            self.manager.create_entry(
+                {"title": f"Seat plan {i}", "content": f"Per-user pricing for plan {i}.", "visibility": "public"}, "owner"
+            )
+            for i in range(3)
+        ]
+        self.overage_id = self.manager.create_entry(
+            {"title": "Overage fees", "content": "Usage above the plan is billed as overage.", "visibility": "public"}, "owner"
+        )
+        self.manager.refresh_metadata_index(get_default_namespaces("reader"), wait_for_sync=True)
+        # A query embedding close to the seat entries
+        self.query_embedding = [1.0, 0.1]
+
+    def test_hybrid_returns_exact_term_matches(self):
+        """At the same limit, only hybrid search returns the exact-term match."""
+        vector_only = self.manager.search("overage", "reader", limit=2, query_embedding=self.query_embedding)
+        self.assertNotIn(self.overage_id, [entry.id for entry, _ in vector_only])
+
+        hybrid = self.manager.search("overage", "reader", limit=2, query_embedding=self.query_embedding, hybrid=True)
+        self.assertIn(self.overage_id, [entry.id for entry, _ in hybrid])
+        self.assertEqual(len(hybrid), 2)
+
+    def test_hybrid_matches_content_after_an_update(self):
+        """A title and tag edit keeps the entry's content searchable."""
+        self.manager.search("overage", "reader", limit=2, query_embedding=self.query_embedding, hybrid=True)
+        entry = self.manager.get_entry(self.overage_id, "owner", include_content=False)
+        self.assertTrue(self.manager.apply_update(entry, {"title": "Extra usage fees", "tags": ["billing"]}, "owner"))
+
+        hybrid = self.manager.search("overage", "reader", limit=2, query_embedding=self.query_embedding, hybrid=True)
+        self.assertIn(self.overage_id, [entry.id for entry, _ in hybrid])
+        self.assertIn("Extra usage fees", [entry.title for entry, _ in hybrid])
+
+    def test_async_hybrid_search(self):
+        """The async manager fuses the same rankings."""
+        async_manager = AsyncKnowledgeBaseManager(self.manager)
+        results = asyncio.run(async_manager.search(
+            "overage", "reader", limit=2, query_embedding=self.query_embedding, hybrid=True, views=True
+        ))
+        self.assertIn(self.overage_id, [entry.id for entry, _ in results])
+
+    def test_unsynced_namespace_is_not_waited_for_or_cached(self):
+        """BM25 skips namespaces never synced, and the degraded result is not cached."""
+        self.manager.metadata_index.sync_ttl = -1
+        with patch.object(self.manager.metadata_index, "has_synced", side_effect=lambda namespace: namespace != "team-kb"), \
+                patch.object(self.manager, "schedule_sync") as schedule_sync:
+            hybrid = self.manager.search("overage", "reader", limit=2, query_embedding=self.query_embedding, hybrid=True)
+            asyncio.run(AsyncKnowledgeBaseManager(self.manager).search(
+                "overage", "reader", limit=2, query_embedding=self.query_embedding, hybrid=True
+            ))
+        self.assertIn(self.overage_id, [entry.id for entry, _ in hybrid])
+        self.assertIn("team-kb", [call.args[0] for call in schedule_sync.call_args_list])
+        self.assertEqual(self.manager.search_cache.report()["stores"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
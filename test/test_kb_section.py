@@ -0,0 +1,87 @@
+"""
+Tests for the knowledge base section of agentMain.
+
+This module drives stream_knowledge_base_section with a stub Knowledge
+Base Agent through its success and error paths. The section only needs
+openai_agents for its context types, so a minimal stand-in is installed
+when the package is missing.
+"""
+
+import sys
+import asyncio
+import contextvars
+import importlib.util
+import unittest
+from types import ModuleType
+from unittest.mock import MagicMock, patch
+
+if importlib.util.find_spec("openai_agents") is None:
+    openai_agents = ModuleType("openai_agents")
+    openai_agents.Tool = type("Tool", (), {})
+    openai_agents.State = type("State", (dict,), {})
+    openai_agents.AgentContext = type("AgentContext", (), {"__init__": lambda self, state=None: setattr(self, "state", state)})
+    sys.modules["openai_agents"] = openai_agents
+
+from agentMain import stream_knowledge_base_section
+from helpers.request_metrics import start_request_timeline
+
+
+class StubKBAgent:
+    """Knowledge Base Agent returning a fixed response or raising."""
+
+    def __init__(self, response=None, error=None):
+        self.response = response
+        self.error = error
+
+    async def process_query(self, prompt, context, query_embedding=None):
+        if self.error:
+            raise self.error
+        return self.response
+
+
+class TestKnowledgeBaseSection(unittest.TestCase):
+    """Test cases for stream_knowledge_base_section."""
+
+    def run_section(self, agent):
+        """Collect the section's events and timeline with the given agent."""
+        runtime = MagicMock()
+        runtime.get.side_effect = lambda name, factory: agent
+
+        async def handler():
+            timeline = start_request_timeline(sampled=False)
+            with patch("agentMain.get_runtime", return_value=runtime):
+                events = [event async for event in stream_knowledge_base_section("seat pricing", "user-1")]
+            return events, timeline
+
+        events, timeline = contextvars.Context().run(asyncio.run, handler())
+        return events, timeline, runtime
+
+    def test_success_streams_results_without_error(self):
+        """Results and citations are streamed and no error event is added."""
+        agent = StubKBAgent(response={
+            "results": [{"content": "Seat pricing charges per user."}],
+            "citations": [{"id": "entry-1", "title": "Seat pricing"}]
+        })
+        events, timeline, runtime = self.run_section(agent)
+
+        self.assertFalse(any(event.get("error") for event in events if event.type == "text_delta"))
+        self.assertIn("Seat pricing charges per user.\n\n", [event.data for event in events if event.type == "text_delta"])
+        self.assertEqual([event.type for event in events].count("annotation"), 1)
+        self.assertTrue(events[-1].data.strip().endswith("Knowledge base search complete"))
+        self.assertIn("kb.done", timeline.marks)
+        runtime.discard.assert_not_called()
+
+    def test_error_yields_error_event_and_discards_agent(self):
+        """A failing agent ends the section with one error event and is rebuilt next time."""
+        events, timeline, runtime = self.run_section(StubKBAgent(error=RuntimeError("index unavailable")))
+
+        errors = [event for event in events if event.type == "text_delta" and event.error]
+        self.assertEqual(len(errors), 1)
+        self.assertIn("index unavailable", errors[0].data)
+        self.assertIs(events[-1], errors[0])
+        self.assertIn("kb.done", timeline.marks)
+        runtime.discard.assert_called_once_with("kb_agent")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,12 +8,16 @@ including schema validation, embedding generation, and CRUD operations.
 import unittest
 import os
 import json
+import tempfile
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 from datetime import datetime
 
 import pinecone
 from openai import OpenAI
 
+from helpers.entry_locations import EntryLocationIndex
+from helpers.metadata_index import MetadataIndex
 from helpers.schema_definitions import (
     KnowledgeBaseEntryCore,
     KnowledgeBaseEntryExtended,
@@ -23,7 +27,14 @@ from helpers.schema_definitions import (
     CURRENT_SCHEMA_VERSION
 )
 from helpers.knowledge_base_helper import (
+    CHUNK_MAX_TOKENS,
+    SEARCH_OVERFETCH,
     KnowledgeBaseManager,
+    batch_for_embedding,
+    build_entry_vectors,
+    chunk_text,
+    content_hash,
+    ensure_pinecone_index,
     generate_embedding,
     get_namespace_for_visibility,
     initialize_pinecone,
@@ -139,32 +150,90 @@ class TestKnowledgeBaseHelper(unittest.TestCase):
         self.assertEqual(get_namespace_for_visibility("private", "user123"), "user-user123")
     
     def test_initialize_pinecone(self, mock_pinecone_class, mock_openai_client):
-        """Test Pinecone initialization."""
+        """Test Pinecone initialization: one describe call, cached, no writes."""
         # Mock environment variables
         with patch.dict(os.environ, {
             "PINECONE_API_KEY": "test-api-key",
             "PINECONE_INDEX": "test-index"
-        }):
+        }), patch('helpers.knowledge_base_helper._verified_indexes', {}), \
+                patch('helpers.knowledge_base_helper.INDEX_MARKER_PATH', ""):
             # Create mock Pinecone instance
             mock_pinecone = MagicMock()
             mock_pinecone_class.return_value = mock_pinecone
-            
-            # Mock Pinecone index list response
-            mock_pinecone.list_indexes.return_value = []
+            mock_pinecone.describe_index.return_value = SimpleNamespace(dimension=1536, host="test-index-host")
             
             # Create mock index
             mock_index = MagicMock()
             mock_pinecone.Index.return_value = mock_index
             
-            # Initialize Pinecone
+            # Initialize Pinecone twice (a cold then a warm start)
             index = initialize_pinecone()
+            initialize_pinecone()
             
             # Check that the Pinecone constructor was called with the correct API key
-            mock_pinecone_class.assert_called_once_with(api_key="test-api-key")
+            mock_pinecone_class.assert_called_with(api_key="test-api-key")
             
-            # Check that create_index was called
-            mock_pinecone.create_index.assert_called_once()
+            # Verified once by description, connected by host, nothing written
+            mock_pinecone.describe_index.assert_called_once_with("test-index")
+            mock_pinecone.Index.assert_called_with(host="test-index-host")
+            mock_pinecone.list_indexes.assert_not_called()
+            mock_pinecone.create_index.assert_not_called()
+            mock_index.upsert.assert_not_called()
             self.assertEqual(index, mock_index)
+    
+    def test_initialize_pinecone_reuses_marker(self, mock_pinecone_class, mock_openai_client):
+        """A fresh marker file spares a new container the describe call."""
+        with tempfile.TemporaryDirectory() as tmpdir, patch.dict(os.environ, {
+            "PINECONE_API_KEY": "test-api-key",
+            "PINECONE_INDEX": "test-index"
+        }), patch('helpers.knowledge_base_helper.INDEX_MARKER_PATH', os.path.join(tmpdir, "marker.json")):
+            mock_pinecone = MagicMock()
+            mock_pinecone_class.return_value = mock_pinecone
+            mock_pinecone.describe_index.return_value = SimpleNamespace(dimension=1536, host="test-index-host")
+            
+            with patch('helpers.knowledge_base_helper._verified_indexes', {}):
+                initialize_pinecone()
+            # A new container: empty in-process cache, same /tmp
+            with patch('helpers.knowledge_base_helper._verified_indexes', {}):
+                initialize_pinecone()
+            
+            mock_pinecone.describe_index.assert_called_once()
+    
+    def test_initialize_pinecone_rejects_wrong_dimension(self, mock_pinecone_class, mock_openai_client):
+        """A dimension mismatch fails loudly instead of recreating the index."""
+        with patch.dict(os.environ, {"PINECONE_API_KEY": "test-api-key"}), \
+                patch('helpers.knowledge_base_helper._verified_indexes', {}), \
+                patch('helpers.knowledge_base_helper.INDEX_MARKER_PATH', ""):
+            mock_pinecone = MagicMock()
+            mock_pinecone_class.return_value = mock_pinecone
+            mock_pinecone.describe_index.return_value = SimpleNamespace(dimension=512, host="test-index-host")
+            
+            with self.assertRaises(RuntimeError):
+                initialize_pinecone()
+            mock_pinecone.delete_index.assert_not_called()
+    
+    def test_ensure_pinecone_index(self, mock_pinecone_class, mock_openai_client):
+        """The admin command creates a missing index, and recreates only when asked."""
+        with patch.dict(os.environ, {
+            "PINECONE_API_KEY": "test-api-key",
+            "PINECONE_INDEX": "test-index"
+        }), patch('helpers.knowledge_base_helper._verified_indexes', {}), \
+                patch('helpers.knowledge_base_helper.INDEX_MARKER_PATH', ""):
+            mock_pinecone = MagicMock()
+            mock_pinecone_class.return_value = mock_pinecone
+            mock_pinecone.list_indexes.return_value = []
+            mock_pinecone.describe_index.return_value = SimpleNamespace(dimension=1536, host="test-index-host")
+            
+            self.assertTrue(ensure_pinecone_index())
+            mock_pinecone.create_index.assert_called_once()
+            
+            # An existing index with other dimensions is left alone without --recreate
+            mock_pinecone.create_index.reset_mock()
+            mock_pinecone.list_indexes.return_value = [{"name": "test-index"}]
+            mock_pinecone.describe_index.return_value = SimpleNamespace(dimension=512, host="test-index-host")
+            self.assertFalse(ensure_pinecone_index())
+            mock_pinecone.delete_index.assert_not_called()
+            mock_pinecone.create_index.assert_not_called()
 
 
 @patch('helpers.knowledge_base_helper.generate_embedding', return_value=SAMPLE_EMBEDDING)
@@ -299,6 +368,322 @@ class TestKnowledgeBaseManager(unittest.TestCase):
         self.assertTrue(found, "Expected sample entry in search results")
 
 
+@patch('helpers.knowledge_base_helper.generate_embeddings')
+@patch('helpers.knowledge_base_helper.initialize_pinecone')
+class TestBulkIngestion(unittest.TestCase):
+    """Test cases for KnowledgeBaseManager.create_entries."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.mock_index = MagicMock()
+        self.user_id = "test-user"
+    
+    def make_entries(self, count, visibility="private"):
+        """Build entry data without IDs."""
+        entries = []
+        for i in range(count):
+            entry = SAMPLE_ENTRY.copy()
+            entry.pop("id")
+            entry["title"] = f"Entry {i}"
+            entry["visibility"] = visibility
+            entries.append(entry)
+        return entries
+    
+    def test_batches_embeddings_and_upserts(self, mock_initialize_pinecone, mock_generate_embeddings):
+        """Many entries take few embeddings requests and chunked upserts per namespace."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        mock_generate_embeddings.side_effect = lambda texts: [SAMPLE_EMBEDDING for _ in texts]
+        
+        entries = self.make_entries(150) + self.make_entries(10, visibility="public")
+        with patch('helpers.knowledge_base_helper.UPSERT_BATCH_SIZE', 100):
+            report = KnowledgeBaseManager().create_entries(entries, self.user_id)
+        
+        self.assertEqual(report["created"], 160)
+        self.assertEqual(report["failed"], 0)
+        self.assertGreater(report["entries_per_second"], 0)
+        self.assertEqual(mock_generate_embeddings.call_count, 2)
+        
+        # 150 private entries in two chunks, 10 public entries in one
+        upserts = [(call.kwargs["namespace"], len(call.kwargs["vectors"])) for call in self.mock_index.upsert.call_args_list]
+        self.assertEqual(sorted(upserts), [("public-kb", 10), ("user-test-user", 50), ("user-test-user", 100)])
+    
+    def test_reports_per_item_errors(self, mock_initialize_pinecone, mock_generate_embeddings):
+        """Invalid entries are reported without stopping the rest of the load."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        mock_generate_embeddings.side_effect = lambda texts: [SAMPLE_EMBEDDING for _ in texts]
+        
+        entries = self.make_entries(3)
+        entries[1].pop("title")
+        report = KnowledgeBaseManager().create_entries(entries, self.user_id)
+        
+        results = report["results"]
+        self.assertEqual(report["created"], 2)
+        self.assertIsNotNone(results[0]["id"])
+        self.assertIsNone(results[1]["id"])
+        self.assertIn("Invalid entry", results[1]["error"])
+        self.assertIsNone(results[2]["error"])
+        
+        # Only the valid entries were embedded
+        self.assertEqual(len(mock_generate_embeddings.call_args.args[0]), 2)
+    
+    def test_failed_upsert_fails_its_chunk(self, mock_initialize_pinecone, mock_generate_embeddings):
+        """A failing upsert only fails the entries of its namespace chunk."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        mock_generate_embeddings.side_effect = lambda texts: [SAMPLE_EMBEDDING for _ in texts]
+        
+        def upsert(vectors, namespace):
+            if namespace == "public-kb":
+                raise RuntimeError("Pinecone unavailable")
+        self.mock_index.upsert.side_effect = upsert
+        
+        entries = self.make_entries(2) + self.make_entries(2, visibility="public")
+        report = KnowledgeBaseManager().create_entries(entries, self.user_id)
+        
+        self.assertEqual(report["created"], 2)
+        self.assertEqual([result["error"] is None for result in report["results"]], [True, True, False, False])
+    
+    def test_partially_written_entry_is_cleaned_up(self, mock_initialize_pinecone, mock_generate_embeddings):
+        """An entry with one failed batch is deleted from the others and never indexed."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        mock_generate_embeddings.side_effect = lambda texts: [SAMPLE_EMBEDDING for _ in texts]
+        upserted = []
+        
+        def upsert(vectors, namespace):
+            upserted.append([vector_id for vector_id, _, _ in vectors])
+            if len(upserted) == 2:
+                raise RuntimeError("Pinecone unavailable")
+        self.mock_index.upsert.side_effect = upsert
+        
+        long_entry = dict(self.make_entries(1)[0], content=LONG_CONTENT)
+        manager = KnowledgeBaseManager(locations=EntryLocationIndex(":memory:"), metadata_index=MetadataIndex(":memory:"))
+        with patch('helpers.knowledge_base_helper.UPSERT_BATCH_SIZE', 4), \
+                patch('helpers.knowledge_base_helper.notify_namespace_write') as notify:
+            report = manager.create_entries([long_entry] + self.make_entries(1), self.user_id)
+        
+        self.assertEqual([result["id"] is None for result in report["results"]], [True, False])
+        long_id = upserted[0][0]
+        self.mock_index.delete.assert_called_once_with(
+            ids=upserted[0] + [vector_id for vector_id in upserted[2] if vector_id.startswith(long_id)],
+            namespace="user-test-user"
+        )
+        indexed = [metadata["id"] for _, metadata in manager.metadata_index.query(["user-test-user"])]
+        self.assertEqual(indexed, [report["results"][1]["id"]])
+        self.assertIsNone(manager.locations.get(long_id))
+        notify.assert_called_once_with("user-test-user")
+    
+    def test_batch_for_embedding_limits(self, mock_initialize_pinecone, mock_generate_embeddings):
+        """Embedding batches respect both the item and the token limits."""
+        self.assertEqual(batch_for_embedding(["a"] * 5, max_items=2), [[0, 1], [2, 3], [4]])
+        self.assertEqual(batch_for_embedding(["x" * 400] * 3, max_tokens=250), [[0, 1], [2]])
+
+
+LONG_CONTENT = " ".join(f"Pricing paragraph {i} explains seat and usage tiers." for i in range(400))
+
+
+class TestChunking(unittest.TestCase):
+    """Test cases for chunked embedding of long entries."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.mock_index = MagicMock()
+        self.user_id = "test-user"
+    
+    def test_chunk_text_bounds_and_overlap(self):
+        """Chunks stay within the token bound and overlap their neighbours."""
+        chunks = chunk_text(LONG_CONTENT, max_tokens=200, overlap_tokens=20)
+        
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= 200 * 4 for chunk in chunks))
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertIn(current.split()[0], previous)
+        self.assertEqual(chunk_text("short text"), ["short text"])
+    
+    @patch('helpers.knowledge_base_helper.generate_embeddings')
+    @patch('helpers.knowledge_base_helper.initialize_pinecone')
+    def test_long_entry_upserts_linked_chunks(self, mock_initialize_pinecone, mock_generate_embeddings):
+        """A long entry gets chunk vectors plus a normalized parent vector."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        mock_generate_embeddings.side_effect = lambda texts: [[1.0, 0.0] if i % 2 else [0.0, 1.0] for i, _ in enumerate(texts)]
+        
+        entry_data = SAMPLE_ENTRY.copy()
+        entry_data["content"] = LONG_CONTENT
+        entry_id = KnowledgeBaseManager().create_entry(entry_data, self.user_id)
+        
+        vectors = [vector for call in self.mock_index.upsert.call_args_list for vector in call.kwargs["vectors"]]
+        parent_id, parent_vector, parent_metadata = vectors[0]
+        self.assertEqual(parent_id, entry_id)
+        self.assertAlmostEqual(sum(value * value for value in parent_vector), 1.0)
+        self.assertNotIn("parent_id", parent_metadata)
+        
+        for chunk_index, (vector_id, _, metadata) in enumerate(vectors[1:]):
+            self.assertEqual(vector_id, f"{entry_id}#chunk-{chunk_index}")
+            self.assertEqual(metadata["parent_id"], entry_id)
+            self.assertEqual(metadata["tags"], SAMPLE_ENTRY["tags"])
+            self.assertLessEqual(len(metadata["content_preview"]), CHUNK_MAX_TOKENS * 4)
+        self.assertGreater(len(vectors), 2)
+    
+    @patch('helpers.knowledge_base_helper.initialize_pinecone')
+    def test_search_collapses_chunks_to_entries(self, mock_initialize_pinecone):
+        """Chunk hits of one entry count once, with the best chunk's score and text."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        metadata = entry_to_metadata(KnowledgeBaseEntryExtended(**SAMPLE_ENTRY))
+        other = dict(metadata, id="other-entry")
+        self.mock_index.query.return_value = MagicMock(matches=[
+            MagicMock(id=f"{SAMPLE_ENTRY['id']}#chunk-3", score=0.93,
+                      metadata=dict(metadata, parent_id=SAMPLE_ENTRY["id"], content_preview="best chunk")),
+            MagicMock(id=SAMPLE_ENTRY["id"], score=0.9, metadata=metadata),
+            MagicMock(id="other-entry", score=0.8, metadata=other),
+            MagicMock(id=f"{SAMPLE_ENTRY['id']}#chunk-1", score=0.7,
+                      metadata=dict(metadata, parent_id=SAMPLE_ENTRY["id"], content_preview="other chunk")),
+        ])
+        
+        results = KnowledgeBaseManager().search("query", self.user_id, limit=5, namespaces=["public-kb"], query_embedding=SAMPLE_EMBEDDING)
+        
+        self.assertEqual([(entry.id, score) for entry, score in results], [(SAMPLE_ENTRY["id"], 0.93), ("other-entry", 0.8)])
+        self.assertEqual(results[0][0].content, "best chunk")
+    
+    @patch('helpers.knowledge_base_helper.initialize_pinecone')
+    def test_best_chunk_text_replaces_the_preview(self, mock_initialize_pinecone):
+        """When the entry vector ranks first, the entry still gets its best chunk's text."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        metadata = entry_to_metadata(KnowledgeBaseEntryExtended(**SAMPLE_ENTRY))
+        self.mock_index.query.return_value = MagicMock(matches=[
+            MagicMock(id=SAMPLE_ENTRY["id"], score=0.95, metadata=dict(metadata, content_preview="entry preview")),
+            MagicMock(id=f"{SAMPLE_ENTRY['id']}#chunk-2", score=0.9,
+                      metadata=dict(metadata, parent_id=SAMPLE_ENTRY["id"], content_preview="best chunk")),
+            MagicMock(id=f"{SAMPLE_ENTRY['id']}#chunk-0", score=0.7,
+                      metadata=dict(metadata, parent_id=SAMPLE_ENTRY["id"], content_preview="other chunk")),
+        ])
+        
+        results = KnowledgeBaseManager().search("query", self.user_id, limit=5, namespaces=["public-kb"], query_embedding=SAMPLE_EMBEDDING)
+        
+        self.assertEqual([(entry.id, score) for entry, score in results], [(SAMPLE_ENTRY["id"], 0.95)])
+        self.assertEqual(results[0][0].content, "best chunk")
+    
+    @patch('helpers.knowledge_base_helper.initialize_pinecone')
+    def test_overfetch_only_in_chunked_namespaces(self, mock_initialize_pinecone):
+        """Extra matches are queried unless the index knows the namespace has no chunked entry."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        self.mock_index.query.return_value = MagicMock(matches=[])
+        metadata = entry_to_metadata(KnowledgeBaseEntryExtended(**SAMPLE_ENTRY))
+        manager = KnowledgeBaseManager(locations=EntryLocationIndex(":memory:"), metadata_index=MetadataIndex(":memory:"))
+        
+        def top_k(namespace):
+            manager.search_namespace(namespace, SAMPLE_EMBEDDING, limit=5)
+            return self.mock_index.query.call_args.kwargs["top_k"]
+        
+        self.assertEqual(top_k("public-kb"), 5 * SEARCH_OVERFETCH)
+        manager.metadata_index.replace_namespace("public-kb", [metadata])
+        self.assertEqual(top_k("public-kb"), 5)
+        manager.metadata_index.upsert("public-kb", dict(metadata, id="long-entry", chunk_hashes=["a", "b"]))
+        self.assertEqual(top_k("public-kb"), 5 * SEARCH_OVERFETCH)
+        manager.metadata_index.remove("long-entry")
+        self.assertEqual(top_k("public-kb"), 5)
+    
+    @patch('helpers.knowledge_base_helper.initialize_pinecone')
+    def test_delete_removes_chunks(self, mock_initialize_pinecone):
+        """Deleting a chunked entry deletes its chunk vectors too."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        chunk_ids = [f"{SAMPLE_ENTRY['id']}#chunk-0", f"{SAMPLE_ENTRY['id']}#chunk-1"]
+        self.mock_index.list.return_value = iter([chunk_ids])
+        
+        manager = KnowledgeBaseManager()
+        self.assertTrue(manager.apply_delete(KnowledgeBaseEntryExtended(**SAMPLE_ENTRY), self.user_id))
+        
+        self.mock_index.delete.assert_called_once_with(ids=[SAMPLE_ENTRY["id"]] + chunk_ids, namespace="user-test-user")
+
+
+@patch('helpers.knowledge_base_helper.generate_embeddings')
+@patch('helpers.knowledge_base_helper.initialize_pinecone')
+class TestIncrementalReembedding(unittest.TestCase):
+    """Test cases for content-hash-driven re-embedding in update_entry."""
+    
+    def setUp(self):
+        """Store an entry in a fake index."""
+        self.user_id = "test-user"
+        self.namespace = "user-test-user"
+        self.stored = {}
+        self.mock_index = MagicMock()
+        self.mock_index.fetch.side_effect = lambda ids, namespace: SimpleNamespace(
+            vectors={vector_id: self.stored[vector_id] for vector_id in ids if vector_id in self.stored}
+        )
+        self.mock_index.list.side_effect = lambda prefix, namespace: iter([
+            [vector_id for vector_id in self.stored if vector_id.startswith(prefix)]
+        ])
+    
+    def store(self, content):
+        """Store the vectors of SAMPLE_ENTRY with the given content."""
+        entry = KnowledgeBaseEntryExtended(**dict(SAMPLE_ENTRY, content=content))
+        chunks = chunk_text(content)
+        for vector_id, values, metadata in build_entry_vectors(entry, chunks, [[float(i), 1.0] for i in range(len(chunks))]):
+            self.stored[vector_id] = SimpleNamespace(values=values, metadata=metadata)
+        return entry
+    
+    def embed(self, texts):
+        """Fake embeddings API recording the embedded texts."""
+        self.embedded.extend(texts)
+        return [[9.0, 9.0] for _ in texts]
+    
+    def test_metadata_change_is_metadata_only(self, mock_initialize_pinecone, mock_generate_embeddings):
+        """A title change makes no embedding call and rewrites no vector."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        entry = self.store(SAMPLE_ENTRY["content"])
+        
+        self.assertTrue(KnowledgeBaseManager().apply_update(entry, {"title": "A new title"}, self.user_id))
+        
+        mock_generate_embeddings.assert_not_called()
+        self.mock_index.upsert.assert_not_called()
+        self.mock_index.update.assert_called_once()
+    
+    def test_whitespace_edit_is_saved_without_embedding(self, mock_initialize_pinecone, mock_generate_embeddings):
+        """Content with the same hash makes no embedding call but is stored and previewed."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        content_store = MagicMock()
+        content_store.put_many.return_value = {}
+        entry = self.store(SAMPLE_ENTRY["content"])
+        
+        new_content = SAMPLE_ENTRY["content"].replace(" ", "  ") + "\n"
+        manager = KnowledgeBaseManager(content_store=content_store)
+        self.assertTrue(manager.apply_update(entry, {"content": new_content}, self.user_id))
+        
+        mock_generate_embeddings.assert_not_called()
+        vector_id, values, metadata = self.mock_index.upsert.call_args.kwargs["vectors"][0]
+        self.assertEqual((vector_id, values), (SAMPLE_ENTRY["id"], [0.0, 1.0]))
+        self.assertEqual(metadata["content_preview"], new_content)
+        content_store.put_many.assert_called_once_with({SAMPLE_ENTRY["id"]: new_content})
+    
+    def test_changed_content_is_reembedded(self, mock_initialize_pinecone, mock_generate_embeddings):
+        """A content edit replaces the stored vector and records the new hash."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        self.embedded = []
+        mock_generate_embeddings.side_effect = self.embed
+        entry = self.store(SAMPLE_ENTRY["content"])
+        
+        new_content = "Completely rewritten guidance on annual discounts."
+        KnowledgeBaseManager().apply_update(entry, {"content": new_content}, self.user_id)
+        
+        self.assertEqual(self.embedded, [new_content])
+        vector_id, values, metadata = self.mock_index.upsert.call_args.kwargs["vectors"][0]
+        self.assertEqual((vector_id, values), (SAMPLE_ENTRY["id"], [9.0, 9.0]))
+        self.assertEqual(metadata["content_hash"], content_hash(new_content))
+    
+    def test_only_edited_chunks_are_reembedded(self, mock_initialize_pinecone, mock_generate_embeddings):
+        """Editing the end of a long entry re-embeds only the chunks that changed."""
+        mock_initialize_pinecone.return_value = self.mock_index
+        self.embedded = []
+        mock_generate_embeddings.side_effect = self.embed
+        entry = self.store(LONG_CONTENT)
+        chunk_count = len(chunk_text(LONG_CONTENT))
+        
+        new_content = LONG_CONTENT.replace("Pricing paragraph 399", "Pricing paragraph 399 (revised)")
+        KnowledgeBaseManager().apply_update(entry, {"content": new_content}, self.user_id)
+        
+        self.assertGreaterEqual(len(self.embedded), 1)
+        self.assertLess(len(self.embedded), chunk_count)
+        upserted = {vector_id: values for call in self.mock_index.upsert.call_args_list for vector_id, values, _ in call.kwargs["vectors"]}
+        self.assertEqual(upserted[f"{SAMPLE_ENTRY['id']}#chunk-0"], [0.0, 1.0])
+
+
 # Commented out until openai_agents dependency is available
 # @patch('agent_modules.knowledgeBaseAgent.get_kb_manager')
 # class TestKnowledgeBaseAgent(unittest.TestCase):
@@ -0,0 +1,117 @@
+"""
+Tests for the metadata codec.
+
+This module checks that encode_metadata produces Pinecone-ready metadata
+in one pass, that decode_metadata round-trips it (validated, or trusted
+without re-validation), and that EntryView decodes lazily and is read-only.
+"""
+
+import unittest
+from datetime import datetime
+
+from pydantic import ValidationError
+
+from helpers.knowledge_base_helper import collapse_matches, sanitize_metadata
+from helpers.metadata_codec import EntryView, decode_metadata, encode_metadata
+from helpers.schema_definitions import KnowledgeBaseEntryExtended
+
+SAMPLE_ENTRY = KnowledgeBaseEntryExtended(
+    id="entry-1",
+    title="Seat pricing",
+    content="Seat pricing is billed per user per month.",
+    created_at=datetime(2024, 3, 1, 12, 0),
+    updated_at=datetime(2024, 3, 2, 12, 0),
+    created_by="owner",
+    tags=["pricing", "", "seats"],
+    confidence=4,
+    visibility="team",
+    custom_fields={"plans": {"pro": 49}, "region": "EU", "code": "123", "empty": None}
+)
+
+
+class TestMetadataCodec(unittest.TestCase):
+    """Test cases for encode_metadata and decode_metadata."""
+
+    def test_encode_is_pinecone_ready(self):
+        """Content and None values are dropped, tags and custom fields flattened."""
+        metadata = encode_metadata(SAMPLE_ENTRY)
+
+        self.assertNotIn("content", metadata)
+        self.assertNotIn("source", metadata)
+        self.assertNotIn("custom_empty", metadata)
+        self.assertEqual(metadata["tags"], ["pricing", "seats"])
+        self.assertEqual(metadata["tags_csv"], "pricing,seats")
+        self.assertEqual(metadata["created_at"], "2024-03-01T12:00:00")
+        self.assertEqual(metadata["custom_plans"], '{"pro": 49}')
+        # Already sanitized: a second pass changes nothing
+        self.assertEqual(sanitize_metadata(metadata), metadata)
+
+    def test_round_trip(self):
+        """Validated and trusted decodes restore the same entry."""
+        metadata = encode_metadata(SAMPLE_ENTRY)
+        expected = SAMPLE_ENTRY.model_copy(update={
+            "tags": ["pricing", "seats"],
+            "custom_fields": {"plans": {"pro": 49}, "region": "EU", "code": "123"}
+        })
+
+        for trusted in (False, True):
+            entry = decode_metadata(metadata, SAMPLE_ENTRY.content, trusted=trusted)
+            self.assertEqual(entry.model_dump(), expected.model_dump())
+
+    def test_trusted_decode_skips_validation(self):
+        """Trusted metadata is not re-validated unless it lacks required fields."""
+        metadata = {**encode_metadata(SAMPLE_ENTRY), "visibility": "everyone"}
+        self.assertEqual(decode_metadata(metadata, "Body", trusted=True).visibility, "everyone")
+        with self.assertRaises(ValidationError):
+            decode_metadata(metadata, "Body")
+
+        metadata = encode_metadata(SAMPLE_ENTRY)
+        del metadata["id"]
+        with self.assertRaises(ValidationError):
+            decode_metadata(metadata, "Body", trusted=True)
+
+    def test_legacy_csv_tags(self):
+        """Metadata with tags_csv only still decodes its tags."""
+        metadata = {"id": "e", "title": "Old entry", "created_by": "owner", "tags_csv": "a,b"}
+        self.assertEqual(decode_metadata(metadata, "Body", trusted=True).tags, ["a", "b"])
+        self.assertEqual(EntryView(metadata, "Body").tags, ["a", "b"])
+
+
+class TestEntryView(unittest.TestCase):
+    """Test cases for EntryView."""
+
+    def setUp(self):
+        self.metadata = encode_metadata(SAMPLE_ENTRY)
+        self.view = EntryView(self.metadata, "Preview")
+
+    def test_fields_read_like_the_model(self):
+        """Fields are decoded on read, with model defaults for missing ones."""
+        self.assertEqual(self.view.title, "Seat pricing")
+        self.assertEqual(self.view.created_at, datetime(2024, 3, 1, 12, 0))
+        self.assertEqual(self.view.custom_fields["plans"], {"pro": 49})
+        self.assertEqual(self.view.content, "Preview")
+        self.assertIsNone(self.view.source)
+        with self.assertRaises(AttributeError):
+            self.view.missing_field
+
+    def test_read_only_and_convertible(self):
+        """Views cannot be modified; copies and full models are built on demand."""
+        with self.assertRaises(AttributeError):
+            self.view.title = "Changed"
+
+        self.assertEqual(self.view.model_copy(update={"content": "Full body"}).content, "Full body")
+        entry = self.view.to_entry()
+        self.assertIsInstance(entry, KnowledgeBaseEntryExtended)
+        self.assertIs(self.view.to_entry(), entry)
+
+    def test_collapse_matches_returns_views(self):
+        """collapse_matches can return views, or decode them to entries."""
+        match = type("Match", (), {"id": "entry-1", "score": 0.9, "metadata": self.metadata})()
+        view, score = collapse_matches([match], views=True)[0]
+        self.assertIsInstance(view, EntryView)
+        self.assertEqual(score, 0.9)
+        self.assertIsInstance(collapse_matches([match])[0][0], KnowledgeBaseEntryExtended)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+"""
+Tests for the local metadata index.
+
+This module checks tag postings, owner/date filters, sorting and
+pagination of the index, and that filter_by_metadata answers from it,
+refreshes stale namespaces in the background, backs off after failed
+syncs and falls back to Pinecone for other filters.
+"""
+
+import asyncio
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from helpers.entry_locations import EntryLocationIndex
+from helpers.knowledge_base_helper import AsyncKnowledgeBaseManager, KnowledgeBaseManager
+from helpers.metadata_index import MetadataIndex, UnsupportedFilter
+from helpers.schema_definitions import CURRENT_SCHEMA_VERSION
+from helpers.vector_backends import NumpyBackend
+
+
+def make_metadata(entry_id, tags=(), created_by="owner", updated_at="2024-01-01T00:00:00", **extra):
+    """Build stored metadata for an entry."""
+    return {
+        "id": entry_id,
+        "title": f"Entry {entry_id}",
+        "tags": list(tags),
+        "tags_csv": ",".join(tags),
+        "created_by": created_by,
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": updated_at,
+        "visibility": "team",
+        "schema_version": CURRENT_SCHEMA_VERSION,
+        **extra
+    }
+
+
+class TestMetadataIndex(unittest.TestCase):
+    """Test cases for the MetadataIndex class."""
+
+    def setUp(self):
+        """Index a few entries in two namespaces."""
+        self.index = MetadataIndex(":memory:")
+        self.index.upsert_many("team-kb", [
+            make_metadata("a", ["pricing", "seats"], updated_at="2024-03-01T00:00:00"),
+            make_metadata("b", ["pricing"], created_by="other", updated_at="2024-02-01T00:00:00"),
+            make_metadata("c", ["usage"], updated_at="2024-01-01T00:00:00")
+        ])
+        self.index.upsert("public-kb", make_metadata("d", ["pricing"], updated_at="2024-04-01T00:00:00"))
+
+    def ids(self, namespaces=("team-kb", "public-kb"), filter_dict=None, **kwargs):
+        return [metadata["id"] for _, metadata in self.index.query(list(namespaces), filter_dict, **kwargs)]
+
+    def test_tag_filters(self):
+        """Tag filters use any-of by default and all-of with $all."""
+        self.assertEqual(self.ids(filter_dict={"tags": ["pricing"]}), ["d", "a", "b"])
+        self.assertEqual(self.ids(filter_dict={"tags_csv": {"$containsAny": ["seats", "usage"]}}), ["a", "c"])
+        self.assertEqual(self.ids(filter_dict={"tags": {"$all": ["pricing", "seats"]}}), ["a"])
+
+    def test_owner_and_date_filters(self):
+        """Owner equality and date ranges combine with each other."""
+        self.assertEqual(self.ids(filter_dict={"created_by": "owner", "updated_at": {"$lt": "2024-03-15"}}), ["a", "c"])
+        self.assertEqual(self.ids(filter_dict={"created_by": {"$in": ["other"]}}), ["b"])
+
+    def test_empty_in_and_nin(self):
+        """An empty $in matches nothing and an empty $nin everything, like in Pinecone."""
+        self.assertEqual(self.ids(filter_dict={"created_by": {"$in": []}}), [])
+        self.assertEqual(self.ids(filter_dict={"created_by": []}), [])
+        self.assertEqual(self.ids(filter_dict={"created_by": {"$nin": []}}), ["d", "a", "b", "c"])
+        self.assertEqual(self.ids(filter_dict={"created_by": {"$nin": ["other"]}}), ["d", "a", "c"])
+        self.assertEqual(self.ids(filter_dict={"source": {"$nin": ["web"]}}), ["d", "a", "b", "c"])
+
+    def test_sort_and_pagination(self):
+        """Results are sorted by the requested field and paginated."""
+        self.assertEqual(self.ids(sort_by="updated_at", descending=False, limit=2), ["c", "b"])
+        self.assertEqual(self.ids(sort_by="updated_at", descending=False, limit=2, offset=2), ["a", "d"])
+        self.assertEqual(self.ids(namespaces=["team-kb"]), ["a", "b", "c"])
+
+    def test_updates_replace_tags_and_remove_forgets(self):
+        """Re-indexing an entry replaces its tag postings; remove drops it."""
+        self.index.upsert("team-kb", make_metadata("a", ["enterprise"]))
+        self.assertNotIn("a", self.ids(filter_dict={"tags": ["pricing"]}))
+        self.assertEqual(self.ids(filter_dict={"tags": ["enterprise"]}), ["a"])
+
+        self.index.remove("a")
+        self.assertEqual(self.ids(filter_dict={"tags": ["enterprise"]}), [])
+
+    def test_unsupported_filters_raise(self):
+        """Fields and operators outside the index are rejected."""
+        with self.assertRaises(UnsupportedFilter):
+            self.index.query(["team-kb"], {"custom_region": "eu"})
+        with self.assertRaises(UnsupportedFilter):
+            self.index.query(["team-kb"], {"title": {"$contains": "pricing"}})
+        with self.assertRaises(UnsupportedFilter):
+            self.index.query(["team-kb"], sort_by="content")
+
+    def test_sync_state_follows_ttl(self):
+        """A namespace needs a sync until replaced, and again after the TTL."""
+        index = MetadataIndex(":memory:", sync_ttl=60)
+        self.assertTrue(index.needs_sync("team-kb"))
+        index.replace_namespace("team-kb", [make_metadata("x")])
+        self.assertFalse(index.needs_sync("team-kb"))
+        index.sync_ttl = -1
+        self.assertTrue(index.needs_sync("team-kb"))
+
+
+class ListingIndex:
+    """Fake Pinecone index that supports listing and fetching by ID."""
+
+    def __init__(self, namespaces):
+        self.namespaces = namespaces
+        self.fetches = 0
+        self.query = MagicMock(return_value=SimpleNamespace(matches=[]))
+        self.upsert = MagicMock()
+        self.delete = MagicMock()
+
+    def list(self, prefix="", namespace=""):
+        return iter([[vector_id for vector_id in self.namespaces.get(namespace, {}) if vector_id.startswith(prefix)]])
+
+    def fetch(self, ids, namespace):
+        self.fetches += 1
+        stored = self.namespaces.get(namespace, {})
+        return SimpleNamespace(vectors={
+            vector_id: SimpleNamespace(metadata=dict(stored[vector_id]))
+            for vector_id in ids if vector_id in stored
+        })
+
+
+class TestFilterByMetadata(unittest.TestCase):
+    """Test cases for KnowledgeBaseManager.filter_by_metadata on the metadata index."""
+
+    def setUp(self):
+        """Create a manager over a team namespace with an entry and a chunk."""
+        self.index = ListingIndex({
+            "team-kb": {
+                "a": make_metadata("a", ["pricing"]),
+                "a#chunk-0": make_metadata("a", ["pricing"], parent_id="a"),
+                "b": make_metadata("b", ["usage"])
+            }
+        })
+        with patch("helpers.knowledge_base_helper.initialize_pinecone", return_value=self.index):
+            self.manager = KnowledgeBaseManager(
+                locations=EntryLocationIndex(":memory:"),
+                metadata_index=MetadataIndex(":memory:")
+            )
+
+    def test_first_filter_syncs_in_background(self):
+        """A never-synced namespace is filtered in Pinecone while its sync runs in the background."""
+        with patch.object(self.manager, "schedule_sync") as schedule_sync:
+            self.manager.filter_by_metadata("reader", {"tags": ["pricing"]}, namespaces=["team-kb"])
+        schedule_sync.assert_called_once_with("team-kb")
+        self.index.query.assert_called_once()
+        self.assertEqual(self.index.fetches, 0)
+
+    def test_syncs_once_then_answers_locally(self):
+        """Once synced, filters touch no Pinecone API."""
+        self.manager.refresh_metadata_index(["team-kb"], wait_for_sync=True)
+        fetches = self.index.fetches
+
+        entries = self.manager.filter_by_metadata("reader", {"tags": ["pricing"]}, namespaces=["team-kb"])
+        self.assertEqual([entry.id for entry in entries], ["a"])
+        entries = self.manager.filter_by_metadata("reader", {"tags": ["usage"]}, namespaces=["team-kb"])
+        self.assertEqual([entry.id for entry in entries], ["b"])
+        self.assertEqual(self.index.fetches, fetches)
+        self.index.query.assert_not_called()
+
+    def test_async_filter_runs_off_the_event_loop(self):
+        """The async manager queries and decodes the index in a worker thread."""
+        self.manager.refresh_metadata_index(["team-kb"], wait_for_sync=True)
+        query = self.manager.query_metadata_index
+        threads = []
+
+        def recording_query(*args):
+            threads.append(threading.get_ident())
+            return query(*args)
+
+        with patch.object(self.manager, "query_metadata_index", side_effect=recording_query):
+            entries = asyncio.run(AsyncKnowledgeBaseManager(self.manager).filter_by_metadata(
+                "reader", {"tags": ["pricing"]}, namespaces=["team-kb"]
+            ))
+        self.assertEqual([entry.id for entry in entries], ["a"])
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(len(threads), 1)
+
+    def test_stale_namespace_is_served_while_refreshing(self):
+        """After the TTL the current index answers and the refresh runs in the background."""
+        self.manager.refresh_metadata_index(["team-kb"], wait_for_sync=True)
+        self.manager.metadata_index.sync_ttl = -1
+        with patch.object(self.manager, "schedule_sync") as schedule_sync:
+            entries = self.manager.filter_by_metadata("reader", {"tags": ["pricing"]}, namespaces=["team-kb"])
+        self.assertEqual([entry.id for entry in entries], ["a"])
+        schedule_sync.assert_called_once_with("team-kb")
+        self.index.query.assert_not_called()
+
+    def test_failed_sync_backs_off(self):
+        """A namespace whose sync failed is not rescanned until its retry time."""
+        with patch.object(self.index, "list", side_effect=RuntimeError("unavailable")) as listing:
+            self.assertEqual(self.manager.refresh_metadata_index(["team-kb"], wait_for_sync=True), [])
+            self.assertIsNone(self.manager.schedule_sync("team-kb"))
+            self.manager.refresh_metadata_index(["team-kb"], wait_for_sync=True)
+        self.assertEqual(listing.call_count, 1)
+
+        with patch("helpers.knowledge_base_helper.time.monotonic", return_value=float("inf")):
+            self.assertEqual(self.manager.refresh_metadata_index(["team-kb"], wait_for_sync=True), ["team-kb"])
+
+    def test_writes_update_the_index(self):
+        """Created and deleted entries are reflected without a re-sync."""
+        self.manager.refresh_metadata_index(["team-kb"], wait_for_sync=True)
+        with patch("helpers.knowledge_base_helper.generate_embedding", return_value=[0.1] * 1536):
+            entry_id = self.manager.create_entry(
+                {"title": "New", "content": "Seat pricing", "visibility": "team", "tags": ["new"]}, "owner"
+            )
+
+        entries = self.manager.filter_by_metadata("owner", {"tags": ["new"]}, namespaces=["team-kb"])
+        self.assertEqual([entry.id for entry in entries], [entry_id])
+
+        self.manager.apply_delete(entries[0], "owner")
+        self.assertEqual(self.manager.filter_by_metadata("owner", {"tags": ["new"]}, namespaces=["team-kb"]), [])
+
+    def test_metadata_update_keeps_the_content(self):
+        """After a title edit, filters return the content and BM25 still matches it."""
+        manager = KnowledgeBaseManager(
+            locations=EntryLocationIndex(":memory:"),
+            metadata_index=MetadataIndex(":memory:"),
+            backend=NumpyBackend()
+        )
+        with patch("helpers.knowledge_base_helper.generate_embedding", return_value=[0.1] * 1536):
+            entry_id = manager.create_entry(
+                {"title": "New", "content": "Annual seat discounts", "visibility": "team", "tags": ["new"]}, "owner"
+            )
+        manager.refresh_metadata_index(["team-kb"], wait_for_sync=True)
+        entry = manager.filter_by_metadata("owner", {"tags": ["new"]}, namespaces=["team-kb"])[0]
+
+        self.assertTrue(manager.apply_update(entry, {"title": "Renamed"}, "owner"))
+
+        entries = manager.filter_by_metadata("owner", {"tags": ["new"]}, namespaces=["team-kb"])
+        self.assertEqual(entries[0].title, "Renamed")
+        self.assertEqual(entries[0].content, "Annual seat discounts")
+        matches = manager.metadata_index.search_text(["team-kb"], "discounts", 5)
+        self.assertEqual([metadata["id"] for _, metadata, _ in matches], [entry_id])
+
+    def test_unsupported_filter_falls_back_to_pinecone(self):
+        """Filters on fields the index does not cover are sent to Pinecone."""
+        self.manager.filter_by_metadata("reader", {"custom_region": "eu"}, namespaces=["team-kb"])
+        self.index.query.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Tests for the per-request latency timeline.
+
+This module checks spans, marks and counters, their propagation to
+section tasks and worker threads, and the EMF record layout.
+"""
+
+import asyncio
+import contextvars
+import time
+import unittest
+
+from helpers.request_metrics import (
+    RequestTimeline,
+    get_timeline,
+    start_request_timeline,
+    timed,
+    timed_coroutine
+)
+
+
+class TestRequestTimeline(unittest.TestCase):
+    """Test cases for the RequestTimeline class."""
+
+    def test_spans_marks_and_counters(self):
+        """Spans add up, marks keep the first time and counters accumulate."""
+        timeline = RequestTimeline(sampled=False)
+        with timeline.span("pinecone"):
+            time.sleep(0.01)
+        timeline.record("pinecone", 5)
+        timeline.mark("reports.first_token")
+        first = timeline.marks["reports.first_token"]
+        timeline.mark("reports.first_token")
+        timeline.count("frames_sent", 3)
+        timeline.count("frames_sent")
+
+        self.assertEqual(len(timeline.spans["pinecone"]), 2)
+        self.assertGreaterEqual(sum(timeline.spans["pinecone"]), 15)
+        self.assertEqual(timeline.marks["reports.first_token"], first)
+        self.assertEqual(timeline.counters["frames_sent"], 4)
+
+    def test_emf_record(self):
+        """The EMF record declares every metric and carries its value."""
+        timeline = RequestTimeline(sampled=False)
+        timeline.record("discourse", 12.5)
+        timeline.count("frames_sent", 7)
+        record = timeline.to_emf()
+
+        metrics = {m["Name"]: m["Unit"] for m in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+        self.assertEqual(metrics["discourse_ms"], "Milliseconds")
+        self.assertEqual(metrics["frames_sent"], "Count")
+        self.assertEqual(record["discourse_ms"], 12.5)
+        self.assertEqual(record["frames_sent"], 7)
+        self.assertIn("total", record)
+
+    def test_timeline_reaches_tasks_and_threads(self):
+        """Spans recorded in section tasks and to_thread workers land in the request."""
+        @timed_coroutine("discourse")
+        async def fetch():
+            await asyncio.sleep(0)
+
+        def search():
+            with timed("kb_search"):
+                pass
+
+        async def handler():
+            timeline = start_request_timeline(sampled=False)
+            await asyncio.gather(fetch(), asyncio.to_thread(search))
+            return timeline
+
+        timeline = contextvars.Context().run(asyncio.run, handler())
+        self.assertIn("discourse", timeline.spans)
+        self.assertIn("kb_search", timeline.spans)
+
+    def test_outside_a_request_nothing_is_recorded(self):
+        """Code running outside a request records into a no-op timeline."""
+        timeline = contextvars.Context().run(get_timeline)
+        timeline.count("frames_sent")
+        self.assertEqual(timeline.counters, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+"""
+Tests for schema migrations.
+
+This module migrates entries on the in-process vector backend to a test
+schema version: metadata-only steps are written back without embedding,
+content steps re-embed the changed entries, and a run killed mid-way
+resumes from its checkpoint.
+"""
+
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from helpers.entry_locations import EntryLocationIndex
+from helpers.knowledge_base_helper import CHUNK_ID_SEPARATOR, KnowledgeBaseManager
+from helpers.metadata_index import MetadataIndex
+from helpers.schema_definitions import KB_ENTRY_SCHEMA, SCHEMA_VERSIONS
+from helpers.schema_migrations import (
+    MIGRATIONS,
+    RateLimiter,
+    SchemaMigrator,
+    plan_migration,
+    register_migration
+)
+from helpers.vector_backends import NumpyBackend
+
+LONG_CONTENT = " ".join(f"Paragraph {i} about seat pricing and annual discounts." for i in range(400))
+
+
+def rename_source(metadata):
+    """Test step: source becomes origin."""
+    if "source" in metadata:
+        metadata["origin"] = metadata.pop("source")
+    return metadata
+
+
+class FakeClock:
+    """Clock that advances only when slept on."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestSchemaMigrator(unittest.TestCase):
+    """Test cases for SchemaMigrator on NumpyBackend."""
+
+    def setUp(self):
+        """Create entries at 1.0.0 and register a 1.1.0 schema version."""
+        for patcher in [
+            patch.dict(SCHEMA_VERSIONS, {"1.1.0": KB_ENTRY_SCHEMA}),
+            patch.dict(MIGRATIONS, clear=True)
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        embed_patcher = patch(
+            "helpers.knowledge_base_helper.generate_embeddings",
+            side_effect=lambda texts, model=None: [[1.0, float(len(text) % 7), 0.5] for text in texts]
+        )
+        self.embed = embed_patcher.start()
+        self.addCleanup(embed_patcher.stop)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.checkpoint_path = os.path.join(self.tmpdir.name, "checkpoint.json")
+
+        self.backend = NumpyBackend()
+        self.manager = KnowledgeBaseManager(
+            locations=EntryLocationIndex(":memory:"),
+            metadata_index=MetadataIndex(":memory:"),
+            backend=self.backend
+        )
+        self.entry_ids = [
+            self.manager.create_entry(
+                {"title": f"Entry {i}", "content": f"Seat pricing note number {i}.", "visibility": "public", "source": "web"},
+                "owner"
+            )
+            for i in range(5)
+        ]
+        self.embed.reset_mock()
+
+    def make_migrator(self, **kwargs):
+        clock = FakeClock()
+        return SchemaMigrator(
+            manager=self.manager,
+            target_version="1.1.0",
+            checkpoint_path=self.checkpoint_path,
+            page_size=2,
+            limiter=RateLimiter(100, clock=clock, sleep=clock.sleep),
+            **kwargs
+        )
+
+    def stored(self, vector_id):
+        return self.backend.fetch(ids=[vector_id], namespace="public-kb").vectors[vector_id]
+
+    def test_metadata_migration_keeps_vectors(self):
+        """Metadata-only steps upgrade every vector without embedding."""
+        register_migration("1.0.0", "1.1.0", transform=rename_source)
+        values = self.stored(self.entry_ids[0]).values
+
+        report = self.make_migrator().run(["public-kb"])
+
+        state = report["namespaces"]["public-kb"]
+        self.assertEqual((state["migrated"], state["pages"], state["done"]), (5, 3, True))
+        self.embed.assert_not_called()
+        stored = self.stored(self.entry_ids[0])
+        self.assertEqual(stored.metadata["schema_version"], "1.1.0")
+        self.assertEqual(stored.metadata["origin"], "web")
+        self.assertNotIn("source", stored.metadata)
+        self.assertEqual(stored.values, values)
+
+        # A second run finds nothing left to do
+        self.assertTrue(self.make_migrator().run(["public-kb"])["namespaces"]["public-kb"]["done"])
+
+    def test_killed_run_resumes_from_checkpoint(self):
+        """A run killed after a page resumes at the next page."""
+        register_migration("1.0.0", "1.1.0", transform=rename_source)
+        migrator = self.make_migrator()
+        original = migrator.migrate_ids
+        calls = []
+
+        def fail_on_second_page(namespace, ids):
+            calls.append(ids)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return original(namespace, ids)
+
+        with patch.object(migrator, "migrate_ids", side_effect=fail_on_second_page):
+            with self.assertRaises(KeyboardInterrupt):
+                migrator.run(["public-kb"])
+
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        self.assertEqual(checkpoint["namespaces"]["public-kb"]["pages"], 1)
+        self.assertEqual(checkpoint["namespaces"]["public-kb"]["pagination_token"], calls[0][-1])
+
+        state = self.make_migrator().run(["public-kb"])["namespaces"]["public-kb"]
+        self.assertEqual((state["migrated"], state["skipped"], state["pages"]), (5, 0, 3))
+        for entry_id in self.entry_ids:
+            self.assertEqual(self.stored(entry_id).metadata["schema_version"], "1.1.0")
+
+    def test_content_migration_reembeds_changed_chunks(self):
+        """Content steps re-embed entries (chunked ones through their entry vector)."""
+        long_id = self.manager.create_entry(
+            {"title": "Long entry", "content": LONG_CONTENT, "visibility": "public"}, "owner"
+        )
+        register_migration("1.0.0", "1.1.0", transform_content=lambda content: content.replace("Seat", "Per-seat"))
+        self.embed.reset_mock()
+
+        state = self.make_migrator().run(["public-kb"])["namespaces"]["public-kb"]
+
+        self.assertEqual(state["reembedded"], 5)
+        self.assertEqual(state["failed"], 1)  # the long entry has no content store and no full preview
+        embedded = [text for call in self.embed.call_args_list for text in call.args[0]]
+        self.assertEqual(len(embedded), 5)
+        self.assertTrue(all(text.startswith("Per-seat") for text in embedded))
+        self.assertEqual(self.manager.get_entry(self.entry_ids[0], "reader").content, "Per-seat pricing note number 0.")
+        chunk_ids = [vector_id for page in self.backend.list(prefix=f"{long_id}{CHUNK_ID_SEPARATOR}", namespace="public-kb") for vector_id in page]
+        self.assertTrue(chunk_ids)
+        self.assertEqual(self.stored(long_id).metadata["schema_version"], "1.0.0")
+
+    def test_dry_run_writes_nothing(self):
+        """A dry run counts what would change."""
+        register_migration("1.0.0", "1.1.0", transform=rename_source)
+        state = self.make_migrator(dry_run=True).run()["namespaces"]["public-kb"]
+        self.assertEqual(state["migrated"], 5)
+        self.assertEqual(self.stored(self.entry_ids[0]).metadata["schema_version"], "1.0.0")
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_missing_path_fails_vectors(self):
+        """Vectors without a migration path are counted as failed and left unchanged."""
+        with self.assertRaises(ValueError):
+            plan_migration("1.0.0", "1.1.0")
+        state = self.make_migrator().run(["public-kb"])["namespaces"]["public-kb"]
+        self.assertEqual(state["failed"], 5)
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for RateLimiter."""
+
+    def test_calls_are_spaced(self):
+        """Calls beyond the rate wait for their slot."""
+        clock = FakeClock()
+        limiter = RateLimiter(4, clock=clock, sleep=clock.sleep)
+        for _ in range(5):
+            limiter.wait()
+        self.assertEqual(clock.sleeps, [0.25] * 4)
+
+        clock.now += 10
+        limiter.wait()
+        self.assertEqual(len(clock.sleeps), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
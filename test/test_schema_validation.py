@@ -0,0 +1,116 @@
+"""
+Tests for schema validation.
+
+This module checks that validators are compiled once per schema version,
+that validate_entry keeps its errors, that date-time formats are checked,
+and that validate_entries and create_entries report every error of
+every invalid entry.
+"""
+
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from jsonschema import ValidationError
+
+from helpers import schema_definitions
+from helpers.entry_locations import EntryLocationIndex
+from helpers.knowledge_base_helper import KnowledgeBaseManager
+from helpers.metadata_index import MetadataIndex
+from helpers.schema_definitions import (
+    CURRENT_SCHEMA_VERSION,
+    format_validation_errors,
+    get_validator,
+    validate_entries,
+    validate_entry
+)
+from helpers.vector_backends import NumpyBackend
+
+
+def make_entry(**fields):
+    """A valid entry with the system fields filled in."""
+    now = datetime.now().isoformat()
+    entry = {
+        "id": "entry-1",
+        "title": "Seat pricing",
+        "content": "Seat pricing is billed per user per month.",
+        "created_at": now,
+        "updated_at": now,
+        "created_by": "owner",
+        "schema_version": CURRENT_SCHEMA_VERSION
+    }
+    entry.update(fields)
+    return entry
+
+
+class TestSchemaValidation(unittest.TestCase):
+    """Test cases for the compiled validators."""
+
+    def test_validator_is_compiled_once(self):
+        """The schema is checked and compiled on first use only."""
+        with patch.dict(schema_definitions._validators, clear=True):
+            with patch("helpers.schema_definitions.validator_for", wraps=schema_definitions.validator_for) as validator_for:
+                validate_entry(make_entry())
+                validate_entry(make_entry())
+                self.assertIs(get_validator(), get_validator(CURRENT_SCHEMA_VERSION))
+            self.assertEqual(validator_for.call_count, 1)
+
+    def test_validate_entry_raises(self):
+        """Invalid entries and unknown versions raise ValidationError."""
+        self.assertTrue(validate_entry(make_entry()))
+        with self.assertRaises(ValidationError):
+            validate_entry(make_entry(title="ab"))
+        with self.assertRaises(ValidationError):
+            validate_entry(make_entry(schema_version="0.1.0"))
+
+    def test_date_time_format_is_checked(self):
+        """ISO timestamps with or without an offset pass; other strings do not."""
+        validate_entry(make_entry(expiration="2025-12-31T00:00:00Z"))
+        validate_entry(make_entry(expiration="2025-12-31T00:00:00"))
+        with self.assertRaises(ValidationError):
+            validate_entry(make_entry(expiration="next quarter"))
+
+    def test_validate_entries_collects_all_errors(self):
+        """Every error of every entry is returned, in input order."""
+        errors = validate_entries([
+            make_entry(),
+            make_entry(title="ab", visibility="everyone"),
+            make_entry(schema_version="0.1.0")
+        ])
+
+        self.assertEqual(errors[0], [])
+        self.assertEqual(sorted(error.path[0] for error in errors[1]), ["title", "visibility"])
+        self.assertIn("Unknown schema version", format_validation_errors(errors[2]))
+        self.assertTrue(format_validation_errors(errors[1]).startswith("title: "))
+
+
+class TestCreateEntriesValidation(unittest.TestCase):
+    """Test cases for validation in bulk writes."""
+
+    def test_invalid_entries_report_every_error(self):
+        """Invalid entries fail with all their errors; valid ones are created."""
+        patcher = patch(
+            "helpers.knowledge_base_helper.generate_embeddings",
+            side_effect=lambda texts, model=None: [[1.0, 0.5, 0.25] for _ in texts]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        manager = KnowledgeBaseManager(
+            locations=EntryLocationIndex(":memory:"),
+            metadata_index=MetadataIndex(":memory:"),
+            backend=NumpyBackend()
+        )
+
+        report = manager.create_entries([
+            {"title": "Seats", "content": "Seat pricing is billed per user.", "visibility": "team"},
+            {"title": "ab", "content": "short", "visibility": "everyone"}
+        ], "owner")
+
+        self.assertEqual(report["created"], 1)
+        self.assertIsNone(report["results"][1]["id"])
+        for field in ("title", "content", "visibility"):
+            self.assertIn(f"{field}: ", report["results"][1]["error"])
+
+
+if __name__ == '__main__':
+    unittest.main()
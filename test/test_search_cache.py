@@ -0,0 +1,156 @@
+"""
+Tests for the knowledge base search result cache.
+
+This module checks that cached results are keyed by the whole search,
+that a namespace write makes results drawn from it stale, that callers
+cannot change cached entries, and that KnowledgeBaseManager answers
+repeated searches without querying the vector backend.
+"""
+
+import asyncio
+import contextvars
+import unittest
+from unittest.mock import patch
+
+from helpers.entry_locations import EntryLocationIndex
+from helpers.knowledge_base_helper import AsyncKnowledgeBaseManager, KnowledgeBaseManager
+from helpers.metadata_codec import EntryView
+from helpers.metadata_index import MetadataIndex
+from helpers.request_metrics import start_request_timeline
+from helpers.search_cache import NamespaceVersions, SearchResultCache, search_key
+from helpers.vector_backends import NumpyBackend
+
+EMBEDDING = [0.1, 0.2, 0.3]
+
+
+def ranked(entry_id):
+    """One read-only search result."""
+    return [(EntryView({"id": entry_id, "title": entry_id, "created_by": "owner"}, ""), 1.0)]
+
+
+def ids(results):
+    return None if results is None else [entry.id for entry, _ in results]
+
+
+class TestSearchResultCache(unittest.TestCase):
+    """Test cases for SearchResultCache."""
+
+    def setUp(self):
+        self.versions = NamespaceVersions()
+        self.cache = SearchResultCache(max_entries=2, ttl=60, versions=self.versions)
+
+    def test_key_covers_the_search(self):
+        """Namespace and filter order don't matter; everything else does."""
+        key = search_key(["public-kb", "team-kb"], EMBEDDING, {"a": 1, "b": 2}, 5, views=True)
+        self.assertEqual(key, search_key(["team-kb", "public-kb"], EMBEDDING, {"b": 2, "a": 1}, 5, views=True))
+        self.assertNotEqual(key, search_key(["public-kb"], EMBEDDING, {"a": 1, "b": 2}, 5, views=True))
+        self.assertNotEqual(key, search_key(["public-kb", "team-kb"], [0.1, 0.2, 0.31], {"a": 1, "b": 2}, 5, views=True))
+        self.assertNotEqual(key, search_key(["public-kb", "team-kb"], EMBEDDING, {"a": 1, "b": 2}, 6, views=True))
+        self.assertNotEqual(key, search_key(["public-kb", "team-kb"], EMBEDDING, {"a": 1, "b": 2}, 5, views=False))
+
+    def test_write_makes_results_stale(self):
+        """A bump of any searched namespace invalidates the result; other namespaces don't."""
+        key = search_key(["public-kb", "team-kb"], EMBEDDING, None, 5)
+        self.cache.put(key, self.cache.snapshot(["public-kb", "team-kb"]), ranked("a"))
+
+        self.versions.bump("private-kb-owner")
+        self.assertEqual(ids(self.cache.get(key, self.cache.snapshot(["public-kb", "team-kb"]))), ["a"])
+
+        self.versions.bump("team-kb")
+        self.assertIsNone(self.cache.get(key, self.cache.snapshot(["public-kb", "team-kb"])))
+        self.assertEqual(self.cache.report()["stale"], 1)
+
+    def test_expiry_and_eviction(self):
+        """Results expire after the TTL; the least recently used search is evicted."""
+        versions = self.cache.snapshot(["public-kb"])
+        keys = [search_key(["public-kb"], EMBEDDING, None, limit) for limit in (1, 2, 3)]
+        self.cache.put(keys[0], versions, ranked("one"))
+        self.cache.put(keys[1], versions, ranked("two"))
+        self.cache.get(keys[0], versions)
+        self.cache.put(keys[2], versions, ranked("three"))
+        self.assertIsNone(self.cache.get(keys[1], versions))
+        self.assertEqual(self.cache.report()["evictions"], 1)
+
+        with patch("helpers.search_cache.time.monotonic", return_value=float("inf")):
+            self.assertIsNone(self.cache.get(keys[0], versions))
+
+
+class TestManagerSearchCache(unittest.TestCase):
+    """Test cases for cached searches in KnowledgeBaseManager."""
+
+    def setUp(self):
+        patcher = patch(
+            "helpers.knowledge_base_helper.generate_embeddings",
+            side_effect=lambda texts, model=None: [[1.0, float(len(text) % 5)] for text in texts]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.backend = NumpyBackend()
+        self.manager = KnowledgeBaseManager(
+            locations=EntryLocationIndex(":memory:"),
+            metadata_index=MetadataIndex(":memory:"),
+            backend=self.backend,
+            search_cache=SearchResultCache()
+        )
+        self.entry_id = self.manager.create_entry(
+            {"title": "Seat pricing", "content": "Per-user pricing.", "visibility": "public"}, "owner"
+        )
+
+    def search(self, **kwargs):
+        return self.manager.search("seat pricing", "reader", limit=3, namespaces=["public-kb"], query_embedding=[1.0, 0.5], **kwargs)
+
+    def test_repeated_search_skips_backend(self):
+        """A repeated search is answered from the cache and counted in the request metrics."""
+        def handler():
+            timeline = start_request_timeline(sampled=False)
+            first = self.search()
+            with patch.object(self.backend, "query", side_effect=AssertionError("queried")):
+                second = self.search()
+            return timeline, first, second
+
+        timeline, first, second = contextvars.Context().run(handler)
+        self.assertEqual([entry.id for entry, _ in second], [entry.id for entry, _ in first])
+        self.assertEqual(timeline.counters["kb_search_cache.hits"], 1)
+        self.assertEqual(timeline.counters["kb_search_cache.misses"], 1)
+
+    def test_write_refreshes_results(self):
+        """After a write to the namespace, the search runs again and sees the new entry."""
+        self.search()
+        new_id = self.manager.create_entry(
+            {"title": "Seat discounts", "content": "Annual seat discounts.", "visibility": "public"}, "owner"
+        )
+        self.assertIn(new_id, [entry.id for entry, _ in self.search()])
+
+        self.assertTrue(self.manager.delete_entry(new_id, "owner"))
+        self.assertNotIn(new_id, [entry.id for entry, _ in self.search()])
+
+    def test_cached_entries_cannot_be_changed_by_callers(self):
+        """Entry models are copied in and out of the cache; views are shared read-only."""
+        first = self.search()
+        first[0][0].title = "Changed"
+        first[0][0].tags.append("changed")
+        second = self.search()
+        self.assertEqual(second[0][0].title, "Seat pricing")
+        self.assertNotIn("changed", second[0][0].tags)
+        second[0][0].title = "Changed again"
+        self.assertEqual(self.search()[0][0].title, "Seat pricing")
+
+        views = self.search(views=True)
+        self.assertIs(self.search(views=True)[0][0], views[0][0])
+        with self.assertRaises(AttributeError):
+            views[0][0].title = "Changed"
+
+    def test_failed_search_is_not_cached(self):
+        """Results missing a namespace after a query error are returned but not cached."""
+        with patch.object(self.backend, "query", side_effect=RuntimeError("unavailable")):
+            self.assertEqual(self.search(), [])
+        self.assertEqual([entry.id for entry, _ in self.search()], [self.entry_id])
+
+        async_manager = AsyncKnowledgeBaseManager(self.manager)
+        with patch.object(self.backend, "query", side_effect=RuntimeError("unavailable")):
+            self.assertEqual(asyncio.run(async_manager.search("other", "reader", query_embedding=[0.0, 1.0])), [])
+        self.assertEqual(self.manager.search_cache.report()["stores"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Tests for the source router.
+
+This module checks routing decisions against small synthetic vectors,
+the run-everything fallback, the vector file builder, and that the
+deployed package carries a router built from the committed exemplars.
+"""
+
+import os
+import json
+import tempfile
+import unittest
+
+from helpers.source_router import (
+    DATA_DIR,
+    ROUTER_EXEMPLARS_PATH,
+    ROUTER_VECTORS_PATH,
+    SOURCES,
+    RoutingDecision,
+    SourceRouter,
+    build_router_vectors,
+    load_source_router
+)
+
+# One axis per source so similarities are easy to reason about
+VECTORS = {
+    "reports": [[1.0, 0.0, 0.0]],
+    "community": [[0.0, 1.0, 0.0]],
+    "kb": [[0.0, 0.0, 1.0]],
+}
+
+
+class TestSourceRouter(unittest.TestCase):
+    """Test cases for the SourceRouter class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.router = SourceRouter(VECTORS, model="test-model", threshold=0.5, always_run=[])
+
+    def test_routes_to_confident_sources(self):
+        """Only sources above the threshold run."""
+        decision = self.router.route([0.9, 0.1, 0.0])
+        self.assertEqual(decision.sources, ["reports"])
+        self.assertEqual(decision.skipped, ["community", "kb"])
+        self.assertIsNone(decision.fallback_reason)
+
+    def test_savings_counts_skipped_sources(self):
+        """Savings add up the cost of every skipped source."""
+        decision = self.router.route([0.9, 0.1, 0.0])
+        self.assertEqual(decision.savings(), {"llm_runs": 2, "pinecone_queries": 4})
+
+    def test_falls_back_when_not_confident(self):
+        """A prompt close to no source runs everything."""
+        # Equally similar to every source (about 0.58 each)
+        router = SourceRouter(VECTORS, model="test-model", threshold=0.7, always_run=[])
+        decision = router.route([0.1, 0.1, 0.1])
+        self.assertEqual(decision.sources, list(SOURCES))
+        self.assertEqual(decision.fallback_reason, "no_confident_source")
+
+    def test_always_run_and_missing_sources(self):
+        """Sources without vectors or marked always-run are never skipped."""
+        router = SourceRouter({"reports": VECTORS["reports"]}, model="m", threshold=0.5, always_run=["community"])
+        decision = router.route([1.0, 0.0, 0.0])
+        self.assertEqual(decision.sources, ["reports", "community", "kb"])
+
+    def test_run_everything(self):
+        """The explicit fallback keeps every source and its reason."""
+        decision = RoutingDecision.run_everything("router_unavailable")
+        self.assertEqual(decision.sources, list(SOURCES))
+        self.assertEqual(decision.savings(), {"llm_runs": 0, "pinecone_queries": 0})
+
+
+class TestRouterVectors(unittest.TestCase):
+    """Test cases for building and loading router vectors."""
+
+    def test_build_and_load(self):
+        """Vectors built from exemplars load back into a working router."""
+        exemplars = {"reports": ["a", "b"], "community": ["c"], "kb": ["d"]}
+        embeddings = {"a": [1, 0, 0], "b": [1, 0.1, 0], "c": [0, 1, 0], "d": [0, 0, 1]}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            exemplars_path = os.path.join(tmp, "exemplars.json")
+            vectors_path = os.path.join(tmp, "vectors.json")
+            with open(exemplars_path, "w") as f:
+                json.dump(exemplars, f)
+
+            counts = build_router_vectors(
+                lambda text: embeddings[text], "test-model", exemplars_path, vectors_path
+            )
+            router = load_source_router(vectors_path)
+
+        # Centroid plus one vector per exemplar
+        self.assertEqual(counts, {"reports": 3, "community": 2, "kb": 2})
+        self.assertEqual(router.model, "test-model")
+        self.assertIn("community", router.route([0, 1, 0]).sources)
+
+    def test_committed_exemplars_build_a_router(self):
+        """The packaged exemplars cover every source and build a router that loads."""
+        with tempfile.TemporaryDirectory() as tmp:
+            vectors_path = os.path.join(tmp, "vectors.json")
+            counts = build_router_vectors(
+                lambda text: [float(len(text)), float(sum(map(ord, text)) % 7), 1.0],
+                "test-model",
+                ROUTER_EXEMPLARS_PATH,
+                vectors_path
+            )
+            router = load_source_router(vectors_path)
+
+        self.assertEqual(sorted(counts), sorted(SOURCES))
+        self.assertIsNotNone(router)
+        self.assertEqual(sorted(router.score([1.0, 0.0, 0.0])), sorted(SOURCES))
+
+    def test_deploy_packages_router_vectors(self):
+        """deploy.sh builds the vectors and zips them where DATA_DIR points."""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(os.path.join(root, "deploy.sh")) as f:
+            script = f.read()
+
+        self.assertEqual(DATA_DIR, os.path.join(root, "data"))
+        self.assertEqual(ROUTER_VECTORS_PATH, os.path.join(DATA_DIR, "source_router_vectors.json"))
+        self.assertIn("-m helpers.source_router build", script)
+        self.assertTrue(any(
+            line.startswith("zip ") and "data/source_router_vectors.json" in line
+            for line in script.splitlines()
+        ))
+
+    def test_missing_file_disables_router(self):
+        """Without a vector file the router is unavailable."""
+        self.assertIsNone(load_source_router("/nonexistent/vectors.json"))
+
+
+if __name__ == '__main__':
+    unittest.main()
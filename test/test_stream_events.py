@@ -0,0 +1,124 @@
+"""
+Tests for the typed stream events and the WebSocket wire serializer.
+
+This module checks the citation factories against the universal
+citation format, the dict-style access kept for existing consumers,
+and that frames are encoded once and decode to the former frame shapes.
+"""
+
+import json
+import unittest
+
+from helpers.stream_events import (
+    Citation,
+    TextDelta,
+    Annotation,
+    Completion,
+    coerce_event,
+    encode_frame,
+    encode_annotations_frame
+)
+
+
+class RawAnnotation:
+    """Stand-in for an agent annotation object."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class TestCitationFactories(unittest.TestCase):
+    """Test cases for the Citation factories."""
+
+    def test_report_annotation(self):
+        """Report annotations get the [Report] prefix and file metadata."""
+        citation = Citation.from_report_annotation(RawAnnotation(file_id="file-1", filename="Guide.pdf"))
+        self.assertEqual(citation.to_dict(), {
+            "type": "citation",
+            "citation": {
+                "id": "file-1",
+                "title": "[Report] Guide.pdf",
+                "source": "report",
+                "content": "",
+                "metadata": {"original_type": "file_citation", "file_id": "file-1"}
+            }
+        })
+
+    def test_community_annotation(self):
+        """Community annotations keep their URL and post metadata."""
+        citation = Citation.from_community_annotation(
+            RawAnnotation(topic_id="42", post_id="7", title="Seat pricing", discourse_url="https://forum/t/42")
+        )
+        data = citation.to_dict()["citation"]
+        self.assertEqual(data["title"], "[Community] Seat pricing")
+        self.assertEqual(data["url"], "https://forum/t/42")
+        self.assertEqual(data["metadata"], {"original_type": "post_citation", "topic_id": "42", "post_id": "7"})
+
+    def test_kb_citation(self):
+        """KB citations carry the entry ID."""
+        citation = Citation.from_kb_citation({"id": "kb-1", "title": "Tiers", "url": "https://kb/1"})
+        self.assertEqual(citation.source, "kb")
+        self.assertEqual(citation.title, "[Knowledge Base] Tiers")
+        self.assertEqual(citation.metadata["entry_id"], "kb-1")
+
+    def test_prefix_is_added_once(self):
+        """Titles that already carry the prefix are left alone."""
+        citation = Citation.from_legacy({"type": "file_citation", "file_citation": {"file_id": "f", "title": "[Report] Guide"}})
+        self.assertEqual(citation.title, "[Report] Guide")
+
+    def test_legacy_raw_dicts_infer_source(self):
+        """Raw dicts with topic fields are community citations."""
+        self.assertEqual(Citation.from_legacy({"topic_id": "1", "title": "T"}).source, "community")
+        self.assertEqual(Citation.from_legacy({"file_id": "f", "filename": "R"}).source, "report")
+
+    def test_universal_round_trip(self):
+        """Universal-format dicts convert back to the same dict."""
+        data = Citation.kb("kb-1", "Tiers").to_dict()
+        self.assertEqual(Citation.from_legacy(data).to_dict(), data)
+
+
+class TestStreamEvents(unittest.TestCase):
+    """Test cases for the typed events and the serializer."""
+
+    def test_dict_style_access(self):
+        """Events still answer event["type"], event["data"] and .get()."""
+        event = TextDelta("hello", error=True)
+        self.assertEqual(event["type"], "text_delta")
+        self.assertEqual(event["data"], "hello")
+        self.assertTrue(event.get("error"))
+        self.assertIsNone(Completion().get("data"))
+        self.assertIsNone(event.get("missing"))
+
+    def test_events_are_slotted(self):
+        """Events do not carry a per-instance __dict__."""
+        self.assertFalse(hasattr(TextDelta("x"), "__dict__"))
+        self.assertFalse(hasattr(Citation.kb("1", "t"), "__dict__"))
+
+    def test_text_frame(self):
+        """Text frames decode to the former shape with newlines collapsed."""
+        frame = encode_frame(TextDelta("a\n\n\n\nb"))
+        self.assertEqual(json.loads(frame), {"text": "a\n\nb", "done": False})
+
+    def test_frames_are_encoded_once(self):
+        """Encoding the same event again returns the same bytes object."""
+        event = Annotation(Citation.kb("kb-1", "Tiers"))
+        self.assertIs(encode_frame(event), encode_frame(event))
+        self.assertEqual(json.loads(encode_frame(event))["annotation"], event.citation.to_dict())
+
+    def test_annotations_frames(self):
+        """Batch frames reuse the citation JSON and match the former shape."""
+        citations = [Citation.kb("kb-1", "Tiers"), Citation.report("f-1", "Guide")]
+        final = json.loads(encode_annotations_frame(citations, done=True))
+        self.assertEqual(final, {"text": "", "annotations": [c.to_dict() for c in citations], "done": True})
+        self.assertFalse(json.loads(encode_annotations_frame([], done=False))["done"])
+
+    def test_coerce_legacy_dict_events(self):
+        """Legacy dict events become typed events."""
+        event = coerce_event({"type": "annotation", "data": {"topic_id": "1", "title": "T"}})
+        self.assertIsInstance(event, Annotation)
+        self.assertEqual(event.citation.source, "community")
+        self.assertIsInstance(coerce_event({"type": "completion", "data": None}), Completion)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+Tests for the section stream helpers.
+
+This module checks that concurrent section streaming keeps the
+client-visible order of the sequential mode while running sections
+at the same time.
+"""
+
+import asyncio
+import time
+import unittest
+
+from helpers.stream_events import Annotation, Citation, Completion, TextDelta
+from helpers.stream_helpers import (
+    DeltaCoalescer,
+    stream_sections_concurrently,
+    stream_sections_sequentially
+)
+
+
+def make_section(name, delays):
+    """Create a section factory that yields one event per delay."""
+    async def section():
+        for i, delay in enumerate(delays):
+            await asyncio.sleep(delay)
+            yield f"{name}-{i}"
+    return section
+
+
+async def collect(stream):
+    """Collect all events from an async stream."""
+    return [event async for event in stream]
+
+
+class TestStreamSections(unittest.TestCase):
+    """Test cases for sequential and concurrent section streaming."""
+
+    def test_concurrent_preserves_order(self):
+        """Concurrent mode yields the same order as sequential mode."""
+        sections = [
+            make_section("reports", [0.02, 0.02]),
+            make_section("community", [0.0, 0.01]),
+            make_section("kb", [0.0]),
+        ]
+
+        sequential = asyncio.run(collect(stream_sections_sequentially(sections)))
+        concurrent = asyncio.run(collect(stream_sections_concurrently(sections)))
+
+        self.assertEqual(concurrent, sequential)
+        self.assertEqual(concurrent[0], "reports-0")
+        self.assertEqual(concurrent[-1], "kb-0")
+
+    def test_concurrent_runs_sections_at_once(self):
+        """Total latency is close to the slowest section, not the sum."""
+        sections = [make_section(f"s{i}", [0.1]) for i in range(3)]
+
+        start = time.perf_counter()
+        asyncio.run(collect(stream_sections_concurrently(sections)))
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.25)
+
+    def test_concurrent_reraises_in_order(self):
+        """Errors from a later section surface after earlier sections finish."""
+        async def failing():
+            yield "bad-0"
+            raise RuntimeError("boom")
+
+        sections = [make_section("good", [0.01]), failing]
+        seen = []
+
+        async def run():
+            async for event in stream_sections_concurrently(sections):
+                seen.append(event)
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run())
+        self.assertEqual(seen, ["good-0", "bad-0"])
+
+
+async def timed_events(items):
+    """Yield (delay, event) items after their delay."""
+    for delay, event in items:
+        await asyncio.sleep(delay)
+        yield event
+
+
+class TestDeltaCoalescer(unittest.TestCase):
+    """Test cases for the DeltaCoalescer class."""
+
+    def coalesce(self, coalescer, items):
+        return asyncio.run(collect(coalescer.coalesce(timed_events(items))))
+
+    def test_burst_is_merged(self):
+        """Deltas arriving within the window become one event."""
+        coalescer = DeltaCoalescer(window_ms=50, max_bytes=2048)
+        events = self.coalesce(coalescer, [(0, TextDelta("a")), (0, TextDelta("b")), (0, TextDelta("c"))])
+
+        self.assertEqual([e.text for e in events], ["abc"])
+        self.assertEqual(coalescer.stats, {"deltas_received": 3, "deltas_sent": 1})
+
+    def test_window_flushes_without_new_events(self):
+        """Buffered text goes out when the window closes, even if the source is quiet."""
+        coalescer = DeltaCoalescer(window_ms=20, max_bytes=2048)
+        events = self.coalesce(coalescer, [(0, TextDelta("a")), (0.1, TextDelta("b"))])
+        self.assertEqual([e.text for e in events], ["a", "b"])
+
+    def test_size_limit_flushes(self):
+        """A buffer reaching max_bytes is sent immediately."""
+        coalescer = DeltaCoalescer(window_ms=1000, max_bytes=4)
+        events = self.coalesce(coalescer, [(0, TextDelta("ab")), (0, TextDelta("cd")), (0, TextDelta("e"))])
+        self.assertEqual([e.text for e in events], ["abcd", "e"])
+
+    def test_annotations_flush_and_keep_order(self):
+        """Annotations and completion go out after the text before them."""
+        annotation = Annotation(Citation.kb("kb-1", "Tiers"))
+        completion = Completion()
+        coalescer = DeltaCoalescer(window_ms=1000)
+        events = self.coalesce(coalescer, [
+            (0, TextDelta("a")), (0, annotation), (0, TextDelta("b")), (0, TextDelta("c")), (0, completion)
+        ])
+
+        self.assertEqual(events[1:2], [annotation])
+        self.assertEqual([e.text for e in (events[0], events[2])], ["a", "bc"])
+        self.assertIs(events[3], completion)
+
+    def test_errors_survive_merging(self):
+        """A merged delta keeps the error flag of its parts."""
+        events = self.coalesce(DeltaCoalescer(window_ms=50), [(0, TextDelta("a")), (0, TextDelta("b", error=True))])
+        self.assertTrue(events[0].error)
+
+    def test_zero_window_disables_coalescing(self):
+        """With a zero window every delta is its own event."""
+        events = self.coalesce(DeltaCoalescer(window_ms=0), [(0, TextDelta("a")), (0, TextDelta("b"))])
+        self.assertEqual(len(events), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+"""
+Tests for the vector backends.
+
+This module runs one contract suite against the in-process NumPy backend
+(and, with PINECONE_API_KEY and KB_TEST_PINECONE_INDEX set, against a real
+Pinecone index), checks that PineconeBackend passes calls through to the
+index unchanged, and runs KnowledgeBaseManager end to end on NumpyBackend.
+"""
+
+import os
+import time
+import uuid
+import unittest
+from unittest.mock import MagicMock, patch
+
+from helpers.entry_locations import EntryLocationIndex
+from helpers.knowledge_base_helper import KnowledgeBaseManager, create_vector_backend, get_default_namespaces
+from helpers.metadata_index import MetadataIndex
+from helpers.vector_backends import NumpyBackend, PineconeBackend, matches_filter
+
+# Words the fake embedding model knows: one dimension each
+VOCABULARY = ["seat", "usage", "annual", "discount", "enterprise", "free", "trial", "tier"]
+
+
+def fake_embedding(text):
+    """Embed a text as the counts of the vocabulary words it contains."""
+    words = text.lower().split()
+    return [float(sum(word.startswith(term) for word in words)) + 0.01 for term in VOCABULARY]
+
+
+class VectorBackendContract:
+    """Behavior every vector backend must have (mixed into a TestCase per backend)."""
+
+    # Seconds to wait for writes to become visible (eventually consistent backends)
+    settle_seconds = 0
+
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        """Upsert three vectors into a fresh namespace."""
+        self.backend = self.make_backend()
+        self.namespace = f"contract-{uuid.uuid4().hex[:8]}"
+        self.backend.upsert(vectors=[
+            ("a", [1.0, 0.0, 0.0, 0.0], {"tags": ["pricing", "seats"], "created_at": "2024-01-01", "title": "A"}),
+            ("b", [0.8, 0.6, 0.0, 0.0], {"tags": ["pricing"], "created_at": "2024-02-01", "title": "B"}),
+            {"id": "c", "values": [0.0, 0.0, 1.0, 0.0], "metadata": {"tags": ["usage"], "created_at": "2024-03-01", "title": "C"}}
+        ], namespace=self.namespace)
+        self.settle()
+
+    def tearDown(self):
+        self.backend.delete(namespace=self.namespace, delete_all=True)
+
+    def settle(self):
+        if self.settle_seconds:
+            time.sleep(self.settle_seconds)
+
+    def test_query_ranks_by_cosine(self):
+        """Matches come back best first, limited to top_k, with metadata."""
+        response = self.backend.query(vector=[1.0, 0.1, 0.0, 0.0], top_k=2, namespace=self.namespace, include_metadata=True)
+        self.assertEqual([match.id for match in response.matches], ["a", "b"])
+        self.assertGreater(response.matches[0].score, response.matches[1].score)
+        self.assertEqual(response.matches[0].metadata["title"], "A")
+
+    def test_query_applies_metadata_filter(self):
+        """List fields match $in on any element; ranges compare values."""
+        response = self.backend.query(
+            vector=[0.0, 0.0, 1.0, 0.0], top_k=3, namespace=self.namespace,
+            filter={"tags": {"$in": ["pricing"]}, "created_at": {"$gte": "2024-02-01"}}, include_metadata=True
+        )
+        self.assertEqual([match.id for match in response.matches], ["b"])
+
+    def test_fetch_update_delete(self):
+        """Fetched vectors carry values and metadata; updates merge; deletes remove."""
+        fetched = self.backend.fetch(ids=["a", "missing"], namespace=self.namespace).vectors
+        self.assertEqual(list(fetched), ["a"])
+        self.assertAlmostEqual(fetched["a"].values[0], 1.0)
+
+        self.backend.update(id="a", set_metadata={"title": "A2"}, namespace=self.namespace)
+        self.backend.delete(ids=["b"], namespace=self.namespace)
+        self.settle()
+
+        fetched = self.backend.fetch(ids=["a", "b", "c"], namespace=self.namespace).vectors
+        self.assertEqual(sorted(fetched), ["a", "c"])
+        self.assertEqual(fetched["a"].metadata["title"], "A2")
+        self.assertEqual(fetched["a"].metadata["tags"], ["pricing", "seats"])
+
+    def test_list_by_prefix(self):
+        """IDs are listed in pages, optionally by prefix."""
+        self.backend.upsert(vectors=[("a#chunk-0", [1.0, 0.0, 0.0, 0.0], {})], namespace=self.namespace)
+        self.settle()
+        self.assertEqual([vector_id for page in self.backend.list(prefix="a#", namespace=self.namespace) for vector_id in page], ["a#chunk-0"])
+        self.assertEqual(sorted(vector_id for page in self.backend.list(namespace=self.namespace) for vector_id in page), ["a", "a#chunk-0", "b", "c"])
+
+    def test_list_paginated_resumes_from_token(self):
+        """Pages of IDs chain through their tokens until the last page."""
+        ids, token = [], None
+        while True:
+            page = self.backend.list_paginated(limit=2, pagination_token=token, namespace=self.namespace)
+            ids.extend(vector.id for vector in page.vectors)
+            token = page.pagination.next if getattr(page, "pagination", None) else None
+            if not token:
+                break
+        self.assertEqual(sorted(ids), ["a", "b", "c"])
+        self.assertIn(self.namespace, self.backend.list_namespaces())
+
+
+class TestNumpyBackend(VectorBackendContract, unittest.TestCase):
+    """Contract tests for the in-process NumPy backend."""
+
+    def make_backend(self):
+        return NumpyBackend()
+
+    def test_zero_vector_query_scores_zero(self):
+        """A zero query vector (metadata-only query) still returns filtered matches."""
+        response = self.backend.query(vector=[0.0] * 4, top_k=5, namespace=self.namespace, filter={"title": "C"})
+        self.assertEqual([(match.id, match.score) for match in response.matches], [("c", 0.0)])
+
+    def test_upsert_replaces_and_rejects_other_dimensions(self):
+        """Re-upserting an ID replaces it; vectors of another dimension are rejected."""
+        self.backend.upsert(vectors=[("c", [1.0, 0.0, 0.0, 0.0], {"title": "C2"})], namespace=self.namespace)
+        response = self.backend.query(vector=[1.0, 0.0, 0.0, 0.0], top_k=1, namespace=self.namespace, filter={"title": "C2"})
+        self.assertEqual(response.matches[0].id, "c")
+        self.assertAlmostEqual(response.matches[0].score, 1.0, places=5)
+        with self.assertRaises(ValueError):
+            self.backend.upsert(vectors=[("d", [1.0, 0.0], {})], namespace=self.namespace)
+
+    def test_delete_keeps_remaining_rows_addressable(self):
+        """Deleting a row moves the last row into its slot without losing it."""
+        self.backend.delete(ids=["a"], namespace=self.namespace)
+        fetched = self.backend.fetch(ids=["b", "c"], namespace=self.namespace).vectors
+        self.assertEqual(fetched["c"].metadata["title"], "C")
+        self.assertAlmostEqual(fetched["c"].values[2], 1.0)
+
+    def test_filter_operators(self):
+        """$or, $nin, $exists and $containsAny on CSV strings follow Pinecone semantics."""
+        metadata = {"tags": ["pricing"], "tags_csv": "pricing,seats", "visibility": "team"}
+        self.assertTrue(matches_filter(metadata, {"$or": [{"visibility": "public"}, {"tags": "pricing"}]}))
+        self.assertTrue(matches_filter(metadata, {"tags_csv": {"$containsAny": ["seats"]}}))
+        self.assertFalse(matches_filter(metadata, {"tags": {"$nin": ["pricing"]}}))
+        self.assertTrue(matches_filter(metadata, {"source": {"$exists": False}}))
+
+
+@unittest.skipUnless(
+    os.environ.get("PINECONE_API_KEY") and os.environ.get("KB_TEST_PINECONE_INDEX"),
+    "set PINECONE_API_KEY and KB_TEST_PINECONE_INDEX (a 4-dimension cosine index) to run against Pinecone"
+)
+class TestPineconeBackendLive(VectorBackendContract, unittest.TestCase):
+    """Contract tests against a real Pinecone index."""
+
+    settle_seconds = 10
+
+    def make_backend(self):
+        from pinecone import Pinecone
+        return PineconeBackend(Pinecone(api_key=os.environ["PINECONE_API_KEY"]).Index(os.environ["KB_TEST_PINECONE_INDEX"]))
+
+
+class TestPineconeBackend(unittest.TestCase):
+    """Test cases for PineconeBackend on a mocked index."""
+
+    def test_calls_pass_through(self):
+        """Calls reach the index with Pinecone's keyword arguments."""
+        index = MagicMock()
+        backend = PineconeBackend(index)
+
+        backend.query(vector=[0.1], top_k=3, namespace="team-kb", filter={"a": 1}, include_metadata=True)
+        index.query.assert_called_once_with(vector=[0.1], top_k=3, namespace="team-kb", filter={"a": 1}, include_metadata=True)
+
+        backend.update(id="x", set_metadata={"a": 1}, namespace="team-kb")
+        index.update.assert_called_once_with(id="x", set_metadata={"a": 1}, namespace="team-kb")
+
+        backend.list(prefix="x#", namespace="team-kb")
+        index.list.assert_called_once_with(prefix="x#", namespace="team-kb")
+
+    def test_backend_is_selected_by_name(self):
+        """create_vector_backend builds the configured backend."""
+        self.assertIsInstance(create_vector_backend("numpy"), NumpyBackend)
+        with patch("helpers.knowledge_base_helper.initialize_pinecone", return_value=MagicMock()):
+            self.assertIsInstance(create_vector_backend("pinecone"), PineconeBackend)
+        with self.assertRaises(ValueError):
+            create_vector_backend("faiss")
+
+
+class TestManagerOnNumpyBackend(unittest.TestCase):
+    """KnowledgeBaseManager end to end on the in-process backend."""
+
+    def setUp(self):
+        """Create a manager with its own backend and indexes, embedding with the fake model."""
+        for name, side_effect in [
+            ("generate_embedding", lambda text, model=None: fake_embedding(text)),
+            ("generate_embeddings", lambda texts, model=None: [fake_embedding(text) for text in texts])
+        ]:
+            patcher = patch(f"helpers.knowledge_base_helper.{name}", side_effect=side_effect)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.manager = KnowledgeBaseManager(
+            locations=EntryLocationIndex(":memory:"),
+            metadata_index=MetadataIndex(":memory:"),
+            backend=NumpyBackend()
+        )
+        self.seat_id = self.manager.create_entry(
+            {"title": "Seats", "content": "Seat pricing with annual discount", "visibility": "team", "tags": ["seats"]}, "owner"
+        )
+        self.usage_id = self.manager.create_entry(
+            {"title": "Usage", "content": "Usage pricing on a free trial tier", "visibility": "public", "tags": ["usage"]}, "owner"
+        )
+        self.manager.refresh_metadata_index(get_default_namespaces("reader"), wait_for_sync=True)
+
+    def test_search_ranks_entries(self):
+        """Semantic search over several namespaces returns the closest entry first."""
+        results = self.manager.search("annual seat discount", "reader", limit=2)
+        self.assertEqual([entry.id for entry, _ in results], [self.seat_id, self.usage_id])
+
+    def test_get_update_filter_delete(self):
+        """An entry can be read, re-embedded, filtered and deleted."""
+        self.assertEqual(self.manager.get_entry(self.usage_id, "reader").title, "Usage")
+
+        self.assertTrue(self.manager.update_entry(self.usage_id, {"content": "Enterprise tier with seat discount"}, "owner"))
+        results = self.manager.search("enterprise", "reader", limit=1)
+        self.assertEqual(results[0][0].id, self.usage_id)
+
+        entries = self.manager.filter_by_metadata("reader", {"tags": ["seats"]})
+        self.assertEqual([entry.id for entry in entries], [self.seat_id])
+
+        self.assertTrue(self.manager.delete_entry(self.seat_id, "owner"))
+        self.assertIsNone(self.manager.get_entry(self.seat_id, "reader"))
+        self.assertEqual([entry.id for entry, _ in self.manager.search("seat", "reader")], [self.usage_id])
+
+
+if __name__ == '__main__':
+    unittest.main()
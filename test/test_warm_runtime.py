@@ -0,0 +1,125 @@
+"""
+Tests for the container-lifetime warm runtime.
+
+This module checks that resources are built once and reused, rebuilt
+when unhealthy or discarded, and that loop-bound resources follow the
+event loop and are closed when dropped.
+"""
+
+import asyncio
+import unittest
+
+from unittest.mock import patch
+
+from helpers.warm_runtime import WarmRuntime, get_http_session
+
+
+class Closable:
+    """Loop-bound resource recording whether it was closed."""
+
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+class TestWarmRuntime(unittest.TestCase):
+    """Test cases for the WarmRuntime class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.runtime = WarmRuntime()
+        self.builds = 0
+
+    def factory(self):
+        self.builds += 1
+        return {"build": self.builds}
+
+    def test_resources_are_reused(self):
+        """A second invocation reuses what the first one built."""
+        self.runtime.start_invocation()
+        first = self.runtime.get("agent", self.factory)
+        self.runtime.start_invocation()
+        second = self.runtime.get("agent", self.factory)
+
+        self.assertIs(first, second)
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(self.runtime.invocation_stats["reused"], ["agent"])
+        self.assertIn("warm path", self.runtime.report())
+
+    def test_unhealthy_resources_are_rebuilt(self):
+        """A resource failing its health check is built again."""
+        self.runtime.get("client", self.factory)
+        rebuilt = self.runtime.get("client", self.factory, healthy=lambda client: False)
+        self.assertEqual(rebuilt, {"build": 2})
+
+    def test_discarded_resources_are_rebuilt(self):
+        """discard() forces a rebuild on the next get()."""
+        self.runtime.get("agent", self.factory)
+        self.runtime.discard("agent")
+        self.assertEqual(self.runtime.get("agent", self.factory), {"build": 2})
+
+    def test_loop_is_reused_until_closed(self):
+        """The event loop survives invocations and is replaced once closed."""
+        async def current_loop():
+            return asyncio.get_running_loop()
+
+        first = self.runtime.run(current_loop())
+        self.assertIs(self.runtime.run(current_loop()), first)
+
+        first.close()
+        self.assertIsNot(self.runtime.run(current_loop()), first)
+        self.runtime.get_loop().close()
+
+    def test_loop_bound_resources_follow_the_loop(self):
+        """Resources tied to a replaced loop are rebuilt."""
+        self.runtime.get_loop()
+        self.runtime.get("session", self.factory, loop_bound=True)
+        self.runtime.get_loop().close()
+        self.runtime.get_loop()
+
+        self.assertEqual(self.runtime.get("session", self.factory, loop_bound=True), {"build": 2})
+        self.runtime.get_loop().close()
+
+    def test_dropped_loop_bound_resources_are_closed(self):
+        """Replaced, discarded and unhealthy loop-bound resources are closed; others are not."""
+        self.runtime.get_loop()
+        replaced = self.runtime.get("session", Closable, loop_bound=True)
+        agent = self.runtime.get("agent", Closable)
+        self.runtime.get_loop().close()
+        self.runtime.get_loop()
+        self.assertTrue(replaced.closed)
+
+        discarded = self.runtime.get("session", Closable, loop_bound=True)
+        self.runtime.discard("session")
+        self.runtime.discard("agent")
+        self.assertTrue(discarded.closed)
+        self.assertFalse(agent.closed)
+
+        unhealthy = self.runtime.get("session", Closable, loop_bound=True)
+
+        async def rebuild():
+            self.runtime.get("session", Closable, healthy=lambda session: False, loop_bound=True)
+            await asyncio.sleep(0)
+
+        self.runtime.run(rebuild())
+        self.assertTrue(unhealthy.closed)
+        self.runtime.get_loop().close()
+
+    def test_http_session_of_a_replaced_loop_is_closed(self):
+        """A new loop gets a new session and the old one is closed."""
+        with patch("helpers.warm_runtime.runtime", self.runtime):
+            first = self.runtime.run(get_http_session())
+            self.runtime.get_loop().close()
+            second = self.runtime.run(get_http_session())
+
+            self.assertIsNot(first, second)
+            self.assertTrue(first.closed)
+            self.runtime.discard("http_session")
+            self.assertTrue(second.closed)
+        self.runtime.get_loop().close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Tests for the non-blocking WebSocket sender.
+
+This module checks that frames are delivered in order off the event
+loop, that a slow client applies backpressure, that close() flushes
+everything (or, past its timeout, drops the queued frames but still sends
+the final one), and that a broken connection stops delivery.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from helpers.websocket_sender import WebSocketSender
+
+
+class FakeApiGateway:
+    """Stand-in for the apigatewaymanagementapi client."""
+
+    def __init__(self, delay=0.0, fail_after=None):
+        self.delay = delay
+        self.fail_after = fail_after
+        self.frames = []
+        self.threads = set()
+
+    def post_to_connection(self, ConnectionId, Data):
+        self.threads.add(threading.get_ident())
+        if self.fail_after is not None and len(self.frames) >= self.fail_after:
+            raise RuntimeError("GoneException")
+        time.sleep(self.delay)
+        self.frames.append(Data)
+
+
+class TestWebSocketSender(unittest.TestCase):
+    """Test cases for the WebSocketSender class."""
+
+    def test_frames_arrive_in_order_after_close(self):
+        """Every frame is delivered, in order, by the time close() returns."""
+        apigateway = FakeApiGateway(delay=0.001)
+
+        async def run():
+            async with WebSocketSender(apigateway, "conn") as sender:
+                for i in range(20):
+                    await sender.send(str(i).encode())
+            return sender
+
+        sender = asyncio.run(run())
+        self.assertEqual(apigateway.frames, [str(i).encode() for i in range(20)])
+        self.assertEqual(sender.stats["frames_sent"], 20)
+        self.assertNotIn(threading.get_ident(), apigateway.threads)
+
+    def test_event_loop_is_not_blocked(self):
+        """Other coroutines keep running while a post is in flight."""
+        apigateway = FakeApiGateway(delay=0.1)
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        async def run():
+            async with WebSocketSender(apigateway, "conn") as sender:
+                await sender.send(b"slow")
+                await ticker()
+
+        start = time.perf_counter()
+        asyncio.run(run())
+        self.assertLess(ticks[-1] - start, 0.09)
+
+    def test_slow_client_applies_backpressure(self):
+        """send() waits once the queue is full."""
+        apigateway = FakeApiGateway(delay=0.01)
+
+        async def run():
+            async with WebSocketSender(apigateway, "conn", max_queue=2) as sender:
+                for i in range(6):
+                    await sender.send(b"x")
+            return sender
+
+        sender = asyncio.run(run())
+        self.assertGreater(sender.stats["backpressure_waits"], 0)
+        self.assertEqual(len(apigateway.frames), 6)
+
+    def test_close_timeout_drops_queued_frames_but_not_the_final_one(self):
+        """A slow client loses the frames still queued at the timeout, not the final frame."""
+        apigateway = FakeApiGateway(delay=0.05)
+
+        async def run():
+            sender = WebSocketSender(apigateway, "conn").start()
+            for i in range(20):
+                await sender.send(str(i).encode())
+            start = time.perf_counter()
+            await sender.close(final=b"done", timeout=0.12)
+            return sender, time.perf_counter() - start
+
+        sender, elapsed = asyncio.run(run())
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(apigateway.frames[-1], b"done")
+        self.assertEqual(apigateway.frames[:-1], [str(i).encode() for i in range(len(apigateway.frames) - 1)])
+        self.assertEqual(sender.stats["frames_dropped"], 20 - (len(apigateway.frames) - 1))
+        self.assertGreater(sender.stats["frames_dropped"], 0)
+
+    def test_broken_connection_stops_delivery(self):
+        """After a failed post, send() raises and later frames are dropped."""
+        apigateway = FakeApiGateway(fail_after=1)
+
+        async def run():
+            sender = WebSocketSender(apigateway, "conn").start()
+            await sender.send(b"first")
+            await sender.send(b"second")
+            await sender.send(b"third")
+            await asyncio.sleep(0.05)
+            with self.assertRaises(RuntimeError):
+                await sender.send(b"fourth")
+            await sender.close()
+            return sender
+
+        sender = asyncio.run(run())
+        self.assertTrue(sender.failed)
+        self.assertEqual(apigateway.frames, [b"first"])
+
+
+if __name__ == '__main__':
+    unittest.main()